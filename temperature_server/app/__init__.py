@@ -8,13 +8,9 @@ from flask_cors import CORS
 from pathlib import Path
 from config import Config
 from logger import setup_logger
-
-# flask_compressはオプション（インストールされていなくても動作する）
-try:
-    from flask_compress import Compress
-    compress_available = True
-except ImportError:
-    compress_available = False
+from utils.request_logging import init_request_logging, RequestLogPolicy, parse_route_levels
+from utils.compression import init_compression
+from utils.json_provider import init_json_provider
 
 logger = setup_logger(__name__)
 
@@ -29,39 +25,23 @@ def create_app():
     app.config['DEBUG'] = Config.FLASK_DEBUG
     app.config['SECRET_KEY'] = Config.SECRET_KEY
     
-    # gzip圧縮を有効化（通信量削減、オプション）
-    if compress_available:
-        Compress(app)
-        logger.info("Response compression (gzip) enabled")
-    else:
-        logger.info("Response compression disabled (flask-compress not installed)")
+    # JSON のエンコード（orjson、NumPy・datetime 対応）
+    logger.info(f"JSON encoder: {init_json_provider(app)}")
     
-    # ===== リクエストロギングミドルウェア（全リクエストを記録） =====
-    @app.before_request
-    def log_request():
-        """すべてのリクエストをログに記録（ESP32からのPOST検証用）"""
-        logger.info(f"[REQUEST] {request.method} {request.path} from {request.remote_addr}")
-        logger.info(f"[REQUEST] Query string: {request.query_string.decode()}")
-        logger.info(f"[REQUEST] Headers: {dict(request.headers)}")
-        
-        # DELETEリクエストの詳細ログ
-        if request.method == 'DELETE' and '/api/sensors/' in request.path:
-            logger.info(f"[DELETE DEBUG] Path: {request.path}")
-            logger.info(f"[DELETE DEBUG] Full URL: {request.url}")
-            logger.info(f"[DELETE DEBUG] View function: {request.endpoint if hasattr(request, 'endpoint') else 'unknown'}")
+    # レスポンス圧縮（通信量削減、ETag ごとに圧縮済みボディをキャッシュ）
+    encodings = init_compression(app)
+    if encodings:
+        logger.info(f"Response compression enabled ({', '.join(encodings)})")
+    else:
+        logger.info("Response compression disabled")
     
-    @app.after_request
-    def log_response(response):
-        """すべてのレスポンスをログに記録"""
-        logger.info(f"[RESPONSE] {request.method} {request.path} -> {response.status_code}")
-        
-        # DELETEリクエストの詳細ログ
-        if request.method == 'DELETE' and '/api/sensors/' in request.path:
-            logger.info(f"[DELETE DEBUG] Response status: {response.status_code}")
-            logger.info(f"[DELETE DEBUG] Response Content-Type: {response.headers.get('Content-Type')}")
-            logger.info(f"[DELETE DEBUG] Response size: {response.content_length if hasattr(response, 'content_length') else 'unknown'}")
-        
-        return response
+    # ===== リクエストロギング（エンドポイントごとの詳細度・サンプリング、非同期書き込み） =====
+    init_request_logging(app, RequestLogPolicy(
+        default_level=Config.REQUEST_LOG_LEVEL,
+        sample_rate=Config.REQUEST_LOG_SAMPLE_RATE,
+        slow_ms=Config.REQUEST_LOG_SLOW_MS,
+        routes=parse_route_levels(Config.REQUEST_LOG_ROUTES)
+    ))
     
     # CORS設定（ホワイトリスト方式）
     cors_config = {
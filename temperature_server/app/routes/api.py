@@ -1,39 +1,59 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from logger import setup_logger
 from datetime import datetime
 import sys
+import time
 import uuid
 import subprocess
 import io
+import json
+import zlib
 from pathlib import Path
 
 # パス設定
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from database.queries import TemperatureQueries, SystemLogQueries
+from database.queries import TemperatureQueries, SystemLogQueries, JST
+from services.ingest_queue import ingest_queue
+from services.reading_stream import reading_broadcaster, RESYNC
+from services.retention import retention_engine
+from services.serial_gateway import serial_gateway
+from services.data_export import iter_csv, EXPORT_FORMATS, ARROW_FORMATS, arrow_available
+from services.temperature_batch import run_batch_query, batch_cache_key, combined_cache_key, RESPONSE_FORMATS
+from database.latest_cache import latest_cache
+from utils.validators import (
+    validate_temperature, validate_humidity, validate_readings_batch, validate_sensor_ids, validate_export_range
+)
+from utils.http_cache import conditional
+from utils.response_cache import response_cache, cached_json
+from utils.compression import compressed_cache, skip_compression, iter_gzip
+from config import Config
+
+# 一括アップロードで NDJSON として扱う Content-Type
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines')
 
 logger = setup_logger(__name__)
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/temperature', methods=['POST'])
+@skip_compression
 def receive_temperature():
     """ESP32からの温度データ受信"""
     request_id = str(uuid.uuid4())[:8]
     
     try:
-        logger.info(f"[{request_id}] POST /api/temperature リクエスト受信")
-        logger.info(f"[{request_id}] IP: {request.remote_addr}")
-        
-        # 生リクエストボディを取得
-        raw_body = request.get_data(as_text=True)
-        logger.info(f"[{request_id}] Content-Type: {request.content_type}")
-        logger.info(f"[{request_id}] 生リクエストボディ: {raw_body}")
+        # 詳細は DEBUG のみ（遅延整形: 出力されない場合は文字列を組み立てない）
+        # リクエスト1件ごとの記録はリクエストロギング（utils/request_logging.py）が行う
+        logger.debug(
+            "[%s] POST /api/temperature from %s Content-Type=%s body=%r",
+            request_id, request.remote_addr, request.content_type, request.get_data()
+        )
         
         # JSONをパース
         data = request.get_json(force=True, silent=True)
         if not data:
-            logger.warning(f"[{request_id}] ❌ JSONデコード失敗: {raw_body}")
+            logger.warning("[%s] ❌ JSONデコード失敗: %r", request_id, request.get_data())
             return jsonify({
                 "status": "error",
                 "error_code": "VALIDATION_ERROR",
@@ -41,14 +61,12 @@ def receive_temperature():
                 "request_id": request_id
             }), 400
         
-        logger.info(f"[{request_id}] JSONデコード成功: {data}")
-        
         # バリデーション
         sensor_id = data.get('device_id') or data.get('sensor_id')
         temperature = data.get('temperature') or data.get('temp')
         
         if not sensor_id or temperature is None:
-            logger.warning(f"[{request_id}] ❌ バリデーション失敗: 必須フィールド不足")
+            logger.warning("[%s] ❌ バリデーション失敗: 必須フィールド不足", request_id)
             return jsonify({
                 "status": "error",
                 "error_code": "VALIDATION_ERROR",
@@ -56,6 +74,17 @@ def receive_temperature():
                 "request_id": request_id
             }), 400
         
+        # コミットはクライアントへの応答後のため、書き込めない値（NaN・範囲外）はここで弾く
+        for is_valid, error_msg in (validate_temperature(temperature), validate_humidity(data.get('humidity'))):
+            if not is_valid:
+                logger.warning("[%s] ❌ バリデーション失敗: %s", request_id, error_msg)
+                return jsonify({
+                    "status": "error",
+                    "error_code": "VALIDATION_ERROR",
+                    "message": f"Temperature/humidity out of valid range: {error_msg}",
+                    "request_id": request_id
+                }), 400
+        
         # データベースに挿入
         try:
             temperature = float(temperature)
@@ -65,17 +94,16 @@ def receive_temperature():
             battery_mode = data.get('battery_mode', False)
             connection_type = 'wifi_ap' if rssi is not None else 'esp_now'
             
-            logger.info(f"[{request_id}] DB挿入開始 - sensor_id: {sensor_id}, temp: {temperature}°C")
+            logger.debug("[%s] キュー投入 - sensor_id: %s, temp: %s°C", request_id, sensor_id, temperature)
             
-            TemperatureQueries.insert_reading(
+            # 書き込みキューに積んで即座に応答（コミットはライタースレッドがまとめて実施）
+            ingest_queue.enqueue(
                 sensor_id, temperature, sensor_name, humidity, rssi, battery_mode, connection_type
             )
             
-            logger.info(f"[{request_id}] ✅ データ保存成功")
-            
             return jsonify({
                 "status": "success",
-                "message": "Data received and stored",
+                "message": "Data received and queued",
                 "device_id": sensor_id,
                 "temperature": temperature,
                 "request_id": request_id,
@@ -100,22 +128,210 @@ def receive_temperature():
             "request_id": request_id
         }), 500
 
+class BulkBodyError(Exception):
+    """一括アップロードのボディが不正（HTTPステータス付き）"""
+    
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _read_bulk_body():
+    """
+    一括アップロードのボディを読み込む（gzip の場合は上限付きで展開）
+    
+    Returns:
+        bytes: ボディ
+    """
+    limit = Config.BULK_MAX_BODY_BYTES
+    if request.content_length is not None and request.content_length > limit:
+        raise BulkBodyError(f"Request body too large (max {limit} bytes)", 413)
+    
+    body = request.get_data(cache=False)
+    if request.content_encoding == 'gzip' or body[:2] == b'\x1f\x8b':
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            body = decompressor.decompress(body, limit + 1)
+        except zlib.error as e:
+            raise BulkBodyError(f"Invalid gzip body: {e}")
+        if len(body) > limit or decompressor.unconsumed_tail:
+            raise BulkBodyError(f"Decompressed body too large (max {limit} bytes)", 413)
+    return body
+
+
+def _parse_bulk_items(body):
+    """
+    一括アップロードのボディを要素のリストに変換
+    
+    Returns:
+        (items, defaults, line_errors)
+        items: 要素のリスト（NDJSON で解析できなかった行は None）
+        defaults: オブジェクト形式の共通項目
+        line_errors: {インデックス: エラーメッセージ}（NDJSON の不正な行）
+    """
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise BulkBodyError("Body must be UTF-8")
+    
+    if request.mimetype not in NDJSON_MIMETYPES:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise BulkBodyError(f"Invalid JSON format: {e}")
+        
+        if isinstance(data, list):
+            return data, {}, {}
+        if isinstance(data, dict) and isinstance(data.get('readings'), list):
+            # {"device_id": ..., "name": ..., "readings": [...]}: 共通項目を各要素の既定値にする
+            defaults = {key: value for key, value in data.items() if key != 'readings'}
+            return data['readings'], defaults, {}
+        raise BulkBodyError("Body must be a JSON array or an object with a 'readings' array")
+    
+    items = []
+    line_errors = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            line_errors[len(items)] = f"JSONの形式が不正です: {e}"
+            items.append(None)
+    return items, {}, line_errors
+
+
+@api_bp.route('/temperature/bulk', methods=['POST'])
+@skip_compression
+def receive_temperature_bulk():
+    """
+    複数の温度データを一括受信（スリープ中に測定を溜めるバッテリー駆動のESP等）
+    
+    ボディ（Content-Encoding: gzip で圧縮可）:
+    - JSON配列: [{"device_id": ..., "temperature": ..., "timestamp": ...}, ...]
+    - JSONオブジェクト: {"device_id": ..., "name": ..., "readings": [{"temperature": ..., "age": ...}, ...]}
+    - NDJSON（Content-Type: application/x-ndjson）: 1行に1件
+    
+    timestamp（エポック秒 / ISO 8601）または age（送信の何秒前か）で測定時刻を指定する。
+    正常な要素は1トランザクションで保存し、要素ごとの結果を返す
+    （一部が不正な場合は 207、すべて不正な場合は 400）
+    """
+    request_id = str(uuid.uuid4())[:8]
+    
+    try:
+        try:
+            items, defaults, line_errors = _parse_bulk_items(_read_bulk_body())
+        except BulkBodyError as e:
+            logger.warning(f"[{request_id}] ❌ 一括アップロードのボディが不正: {e.message}")
+            return jsonify({
+                "status": "error",
+                "error_code": "VALIDATION_ERROR" if e.status_code == 400 else "PAYLOAD_TOO_LARGE",
+                "message": e.message,
+                "request_id": request_id
+            }), e.status_code
+        
+        if not items:
+            return jsonify({
+                "status": "error",
+                "error_code": "VALIDATION_ERROR",
+                "message": "No readings in request body",
+                "request_id": request_id
+            }), 400
+        if len(items) > Config.BULK_MAX_READINGS:
+            return jsonify({
+                "status": "error",
+                "error_code": "PAYLOAD_TOO_LARGE",
+                "message": f"Too many readings (max {Config.BULK_MAX_READINGS})",
+                "request_id": request_id
+            }), 413
+        
+        # 1回の走査で全要素をバリデーション（受信時刻は全要素で共通）
+        received_at = datetime.now(JST)
+        validated, errors = validate_readings_batch(
+            items, defaults, received_at, Config.BULK_MAX_CLOCK_SKEW, Config.BULK_MAX_AGE_DAYS
+        )
+        errors = [(index, line_errors.get(index, message)) for index, message in errors]
+        
+        rows = [
+            TemperatureQueries.build_reading_row(
+                reading['sensor_id'], reading['temperature'], reading['sensor_name'],
+                reading['humidity'], reading['rssi'], reading['battery_mode'], None, reading['timestamp']
+            )
+            for _, reading in validated
+        ]
+        if rows:
+            # 時刻順に1トランザクションで保存し、コミット後にSSE購読者へ配信
+            rows.sort(key=lambda row: row[-1])
+            try:
+                TemperatureQueries.insert_readings_batch(rows)
+            except Exception as db_error:
+                logger.error(f"[{request_id}] ❌ DB挿入エラー: {db_error}", exc_info=True)
+                return jsonify({
+                    "status": "error",
+                    "error_code": "DATABASE_ERROR",
+                    "message": f"Failed to insert data: {str(db_error)}",
+                    "request_id": request_id
+                }), 500
+            reading_broadcaster.publish(rows)
+        
+        results = [None] * len(items)
+        for index, reading in validated:
+            results[index] = {"index": index, "status": "stored", "sensor_id": reading['sensor_id']}
+        for index, message in errors:
+            results[index] = {"index": index, "status": "rejected", "error": message}
+        
+        logger.info(
+            f"[{request_id}] POST /api/temperature/bulk: stored={len(rows)}, rejected={len(errors)} "
+            f"from {request.remote_addr}"
+        )
+        
+        if not rows:
+            status, code = "error", 400
+        elif errors:
+            status, code = "partial", 207
+        else:
+            status, code = "success", 201
+        return jsonify({
+            "status": status,
+            "stored": len(rows),
+            "rejected": len(errors),
+            "results": results,
+            "request_id": request_id
+        }), code
+    
+    except Exception as e:
+        logger.error(f"[{request_id}] ❌ 予期しないエラー: {e}", exc_info=True)
+        return jsonify({
+            "status": "error",
+            "error_code": "INTERNAL_ERROR",
+            "message": "Internal server error",
+            "request_id": request_id
+        }), 500
+
 @api_bp.route('/sensors', methods=['GET'])
+@conditional(Config.HTTP_CACHE_LATEST)
 def get_all_sensors():
-    """全センサーの最新データを取得"""
+    """
+    全センサーの最新データを取得
+    
+    新着データがなければ 304 を返す（utils/http_cache.py）。
+    レスポンスをキャッシュできるよう、リクエストIDはボディではなく X-Request-ID ヘッダーで返す
+    """
     request_id = str(uuid.uuid4())[:8]
     
     try:
-        logger.info(f"[{request_id}] GET /api/sensors リクエスト")
+        logger.debug("[%s] GET /api/sensors リクエスト", request_id)
         sensors = TemperatureQueries.get_all_latest()
-        logger.info(f"[{request_id}] {len(sensors)}台のセンサーを取得")
+        logger.debug("[%s] %d台のセンサーを取得", request_id, len(sensors))
         
-        return jsonify({
+        response = jsonify({
             "status": "success",
             "sensors": sensors,
-            "count": len(sensors),
-            "request_id": request_id
+            "count": len(sensors)
         })
+        response.headers['X-Request-ID'] = request_id
+        return response
     
     except Exception as e:
         logger.error(f"[{request_id}] ❌ センサー取得エラー: {e}", exc_info=True)
@@ -127,8 +343,9 @@ def get_all_sensors():
         }), 500
 
 @api_bp.route('/temperature/<sensor_id>', methods=['GET'])
+@conditional(Config.HTTP_CACHE_HISTORY, window=Config.HTTP_CACHE_WINDOW)
 def get_sensor_data(sensor_id):
-    """特定センサーのデータを取得"""
+    """特定センサーのデータを取得（新着データがなく時間窓も同じなら 304）"""
     request_id = str(uuid.uuid4())[:8]
     
     try:
@@ -151,13 +368,14 @@ def get_sensor_data(sensor_id):
         
         logger.info(f"[{request_id}] {len(readings)}件のレコードを取得")
 
-        return jsonify({
+        response = jsonify({
             "status": "success",
             "sensor_id": sensor_id,
             "readings": readings,
-            "statistics": stats,
-            "request_id": request_id
+            "statistics": stats
         })
+        response.headers['X-Request-ID'] = request_id
+        return response
     
     except Exception as e:
         logger.error(f"[{request_id}] ❌ センサーデータ取得エラー: {e}", exc_info=True)
@@ -227,6 +445,47 @@ def delete_old_data():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@api_bp.route('/retention', methods=['GET'])
+def get_retention_status():
+    """データ保持（リテンション）のポリシー・進捗・前回の実行結果を取得"""
+    try:
+        return jsonify({
+            "status": "success",
+            "retention": retention_engine.get_status()
+        })
+    except Exception as e:
+        logger.error(f"Error getting retention status: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@api_bp.route('/retention/run', methods=['POST'])
+def run_retention():
+    """データ保持処理をバックグラウンドで開始（進捗は GET /api/retention で確認）"""
+    if not retention_engine.run_async():
+        return jsonify({
+            "status": "error",
+            "message": "リテンション処理は既に実行中です"
+        }), 409
+    
+    return jsonify({
+        "status": "success",
+        "message": "リテンション処理を開始しました"
+    }), 202
+
+
+@api_bp.route('/serial', methods=['GET'])
+def get_serial_status():
+    """シリアルゲートウェイ（ポートごと）の接続状態と受信統計を取得"""
+    try:
+        return jsonify({
+            "status": "success",
+            "serial": serial_gateway.get_status()
+        })
+    except Exception as e:
+        logger.error(f"Error getting serial status: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @api_bp.route('/delete-test-sensors', methods=['POST'])
 def delete_test_sensors():
     """テストセンサーのデータを削除"""
@@ -243,63 +502,49 @@ def delete_test_sensors():
         logger.error(f"Error deleting test sensors: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-@api_bp.route('/temperature/batch', methods=['POST'])
+@api_bp.route('/temperature/batch', methods=['GET', 'POST'])
+@conditional(Config.HTTP_CACHE_HISTORY, window=Config.HTTP_CACHE_WINDOW)
 def get_temperature_batch():
-    """複数センサーのデータを一括取得（高速化・間引き対応）"""
-    try:
-        data = request.get_json()
-        if not data or 'sensor_ids' not in data:
-            return jsonify({'status': 'error', 'message': 'sensor_idsが指定されていません'}), 400
-        
-        sensor_ids = data.get('sensor_ids', [])
-        # hoursがNoneの場合はデフォルト値を使用
-        hours_value = data.get('hours', 24)
-        hours = float(hours_value) if hours_value is not None else 24.0
-        # 初期読み込み時は間引きを強制（パフォーマンス向上）
-        max_points_value = data.get('max_points')
-        if max_points_value is not None:
-            max_points = int(max_points_value)
-        else:
-            max_points = 200 if hours <= 1 else 500  # 1時間以下は200ポイントに制限
-        
-        if not isinstance(sensor_ids, list) or len(sensor_ids) == 0:
-            return jsonify({'status': 'error', 'message': 'sensor_idsは空でないリストである必要があります'}), 400
-        
-        logger.debug(f"GET /api/temperature/batch - sensor_ids={sensor_ids}, hours={hours}, max_points={max_points}")
-        
-        # バッチ取得（サーバー側で間引き、統計情報は取得しない（高速化））
-        readings_map = TemperatureQueries.get_range_batch(sensor_ids, hours, max_points_per_sensor=max_points)
-        
-        # 統計情報は取得しない（初期読み込み時の高速化）
-        include_stats = data.get('include_stats', False)  # デフォルトはFalse
-        
-        results = {}
-        total_original_points = 0
-        total_downsampled_points = 0
-        
-        for sensor_id in sensor_ids:
-            readings = readings_map.get(sensor_id, [])
-            result_data = {
-                "readings": readings
-            }
-            # 統計情報が必要な場合のみ取得（通常は不要）
-            if include_stats:
-                stats = TemperatureQueries.get_statistics(sensor_id, hours)
-                result_data["statistics"] = stats
-            results[sensor_id] = result_data
-            total_downsampled_points += len(readings)
-        
-        logger.debug(f"GET /api/temperature/batch - Found data for {len(results)} sensors, {total_downsampled_points} total points")
-        
-        return jsonify({
-            "status": "success",
-            "data": results,
-            "count": len(results),
-            "total_points": total_downsampled_points
-        })
-    except Exception as e:
-        logger.error(f"Error fetching batch temperature data: {e}", exc_info=True)
-        return jsonify({"status": "error", "message": str(e)}), 500
+    """
+    複数センサーのデータを一括取得（高速化・間引き対応、処理は services/temperature_batch.py）
+    
+    POST: JSONボディ（since による差分取得を含むすべての指定）
+    GET:  クエリパラメータ（ブラウザの HTTP キャッシュ・ETag の再検証が効く）
+        sensor_ids: センサーID（カンマ区切り）
+        hours, max_points, downsample_mode, format, include_stats
+    
+    同じ条件のレスポンスは対象センサーに新着データがない間、応答キャッシュから返す（差分取得を除く）
+    """
+    if request.method == 'GET':
+        data = _batch_params_from_query()
+    else:
+        try:
+            data = request.get_json()
+        except Exception as e:
+            logger.error(f"Error fetching batch temperature data: {e}", exc_info=True)
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    key, sensor_ids = batch_cache_key(data)
+    stamp = latest_cache.sensor_stamp(sensor_ids) if key is not None else None
+    return cached_json(key, stamp, lambda: run_batch_query(data))
+
+
+def _batch_params_from_query():
+    """GET /api/temperature/batch のクエリパラメータを POST と同じ dict に変換"""
+    args = request.args
+    data = {
+        'sensor_ids': [
+            sensor_id.strip()
+            for value in args.getlist('sensor_ids')
+            for sensor_id in value.split(',')
+            if sensor_id.strip()
+        ],
+        'include_stats': args.get('include_stats', '').lower() in ('1', 'true'),
+    }
+    for key in ('hours', 'max_points', 'downsample_mode', 'format'):
+        if key in args:
+            data[key] = args[key]
+    return data
 
 
 def check_ap_status():
@@ -346,47 +591,139 @@ def get_ap_status():
 
 
 @api_bp.route('/dashboard/combined', methods=['POST'])
+@conditional(Config.HTTP_CACHE_HISTORY, window=Config.HTTP_CACHE_WINDOW)
 def get_dashboard_combined():
-    """ダッシュボード用統合エンドポイント（センサーリスト＋グラフデータを一度に取得）"""
+    """
+    ダッシュボード用統合エンドポイント（センサーリスト＋グラフデータを一度に取得）
+    
+    センサーリストを含むため、いずれかのセンサーにデータが追加されるまで応答キャッシュから返す
+    （リクエストIDは X-Request-ID ヘッダーで返す）
+    """
     request_id = str(uuid.uuid4())[:8]
     
     try:
         data = request.get_json() or {}
+    except Exception as e:
+        logger.error(f"[{request_id}] Error fetching dashboard combined data: {e}")
+        return jsonify({"status": "error", "message": str(e), "request_id": request_id}), 500
+    
+    stamp = latest_cache.version
+    response = cached_json(combined_cache_key(data), stamp, lambda: _build_dashboard_combined(data, request_id))
+    response.headers['X-Request-ID'] = request_id
+    return response
+
+
+def _build_dashboard_combined(data, request_id):
+    """ダッシュボード統合データを作成（(レスポンスの dict, HTTPステータス) を返す）"""
+    try:
         sensor_ids = data.get('sensor_ids', [])
         hours = float(data.get('hours', 6))  # デフォルト6時間
+        response_format = data.get('format') or 'rows'
+        if response_format not in RESPONSE_FORMATS:
+            return {
+                "status": "error",
+                "message": f"formatは {', '.join(RESPONSE_FORMATS)} のいずれかである必要があります",
+                "request_id": request_id
+            }, 400
         
-        logger.info(f"[{request_id}] GET /api/dashboard/combined - sensor_ids={sensor_ids}, hours={hours}")
+        logger.info(f"[{request_id}] GET /api/dashboard/combined - sensor_ids={sensor_ids}, hours={hours}, format={response_format}")
         
         # センサーリストを取得
         sensors = TemperatureQueries.get_all_latest()
         
         # グラフデータを取得
         if sensor_ids and len(sensor_ids) > 0:
-            readings_map = TemperatureQueries.get_range_batch(sensor_ids, hours)
+            if response_format == 'columnar':
+                readings_map = TemperatureQueries.get_range_batch_columnar(sensor_ids, hours)
+                total_points = sum(entry['count'] for entry in readings_map.values())
+            else:
+                readings_map = TemperatureQueries.get_range_batch(sensor_ids, hours)
+                total_points = sum(len(readings) for readings in readings_map.values())
         else:
             readings_map = {}
+            total_points = 0
         
         # レスポンス構築
         response = {
             "status": "success",
-            "request_id": request_id,
             "sensors": sensors,
             "data": readings_map,
             "hours": hours,
             "count": len(sensors)
         }
+        if response_format == 'columnar':
+            response["format"] = "columnar"
         
-        logger.info(f"[{request_id}] Dashboard combined data ready - {len(sensors)} sensors, {sum(len(v.get('readings', [])) for v in readings_map.values())} data points")
+        logger.info(f"[{request_id}] Dashboard combined data ready - {len(sensors)} sensors, {total_points} data points")
         
-        return jsonify(response)
+        return response, 200
         
     except Exception as e:
         logger.error(f"[{request_id}] Error fetching dashboard combined data: {e}")
-        return jsonify({
+        return {
             "status": "error",
             "message": str(e),
             "request_id": request_id
-        }), 500
+        }, 500
+
+
+@api_bp.route('/cache', methods=['GET'])
+def get_cache_status():
+    """応答キャッシュ・圧縮済みボディのキャッシュの統計（ヒット・ミス・削除の件数など）を取得"""
+    return jsonify({
+        "status": "success",
+        "cache": response_cache.get_stats(),
+        "compressed": compressed_cache.get_stats()
+    })
+
+
+@api_bp.route('/stream/readings', methods=['GET'])
+def stream_readings():
+    """
+    新着データのプッシュ配信（Server-Sent Events）
+    
+    クエリパラメータ:
+        sensor_ids: 配信対象のセンサーID（カンマ区切り、省略時は全センサー）
+    
+    イベント:
+        readings: 新着データのJSON配列（書き込みキューのコミット単位）
+        resync:   取りこぼしが発生したため、クライアント側で再取得が必要
+    """
+    sensor_ids = [
+        sensor_id.strip()
+        for value in request.args.getlist('sensor_ids')
+        for sensor_id in value.split(',')
+        if sensor_id.strip()
+    ]
+    
+    subscription = reading_broadcaster.subscribe(sensor_ids or None)
+    if subscription is None:
+        logger.warning("Stream subscriber limit reached")
+        return jsonify({
+            "status": "error",
+            "message": "Too many stream clients"
+        }), 503
+    
+    heartbeat_interval = Config.STREAM_HEARTBEAT_INTERVAL
+    
+    def generate():
+        # 切断時の再接続間隔（ミリ秒）
+        yield "retry: 5000\n\n"
+        while True:
+            batch = subscription.get(timeout=heartbeat_interval)
+            if batch is None:
+                # プロキシ・ブラウザに接続を切られないようにコメント行を送る
+                yield ": keepalive\n\n"
+            elif batch is RESYNC:
+                yield "event: resync\ndata: {}\n\n"
+            else:
+                yield f"event: readings\ndata: {batch}\n\n"
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: reading_broadcaster.unsubscribe(subscription))
+    return response
 
 
 @api_bp.route('/test-delete', methods=['GET'])
@@ -494,65 +831,56 @@ def delete_sensor(sensor_id):
         }), 500
 
 
+def _export_response(chunks, filename, mimetype, compressible, as_gzip_file=False):
+    """
+    エクスポートのストリーミングレスポンスを作成
+    
+    テキスト形式（compressible）は gzip=1 の場合は .gz ファイル、それ以外はクライアントが対応していれば
+    転送時に gzip 圧縮する（Content-Encoding）。parquet・arrow は形式内で圧縮済みのためそのまま返す
+    """
+    headers = {}
+    if compressible and as_gzip_file:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+        chunks = iter_gzip(chunks)
+    elif compressible:
+        if Config.COMPRESS_ENABLED and request.accept_encodings['gzip']:
+            chunks = iter_gzip(chunks)
+            headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    
+    response = Response(chunks, mimetype=mimetype, headers=headers)
+    if mimetype.startswith('text/'):
+        response.headers['Content-Type'] = f'{mimetype}; charset=utf-8'
+    return response
+
+
 @api_bp.route('/export/csv', methods=['GET'])
 def export_csv():
-    """温度データをCSV形式でエクスポート"""
+    """
+    温度データをCSV形式でエクスポート（ストリーミング、処理は services/data_export.py）
+    
+    クエリパラメータ:
+        hours: 期間（時間、デフォルト720 = 1ヶ月）
+        sensor_id: 対象のセンサーID（省略時は全センサー）
+        gzip: 1 の場合は .csv.gz ファイルとしてダウンロード
+    
+    gzip を指定しない場合も、クライアントが対応していれば転送時に gzip 圧縮する（Content-Encoding）
+    """
     request_id = str(uuid.uuid4())[:8]
     
     try:
-        import csv
-        import io
-        from flask import Response
-        
         hours = request.args.get('hours', 720, type=float)  # デフォルト1ヶ月
         sensor_id = request.args.get('sensor_id', None)
+        as_gzip_file = request.args.get('gzip', '').lower() in ('1', 'true')
         
-        logger.info(f"[{request_id}] GET /api/export/csv - hours={hours}, sensor_id={sensor_id}")
+        logger.info(f"[{request_id}] GET /api/export/csv - hours={hours}, sensor_id={sensor_id}, gzip={as_gzip_file}")
         
-        # データ取得
-        if sensor_id:
-            readings = TemperatureQueries.get_range(sensor_id, hours)
-        else:
-            # 全センサーのデータを取得
-            sensors = TemperatureQueries.get_all_latest()
-            all_readings = []
-            for sensor in sensors:
-                readings = TemperatureQueries.get_range(sensor['sensor_id'], hours)
-                all_readings.extend(readings)
-            readings = all_readings
-        
-        # CSV生成
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # ヘッダー
-        writer.writerow(['センサーID', 'センサー名', '温度 (°C)', '湿度 (%)', 'RSSI (dBm)', 'バッテリー', '接続タイプ', 'タイムスタンプ'])
-        
-        # データ行
-        for reading in readings:
-            writer.writerow([
-                reading.get('sensor_id', ''),
-                reading.get('sensor_name', ''),
-                reading.get('temperature', ''),
-                reading.get('humidity', ''),
-                reading.get('rssi', ''),
-                'バッテリー' if reading.get('battery_mode') else 'AC',
-                reading.get('connection_type', ''),
-                reading.get('timestamp', '')
-            ])
-        
-        # レスポンス生成
-        output.seek(0)
+        since_ms = int((time.time() - hours * 3600) * 1000)
+        chunks = iter_csv(since_ms, sensor_ids=[sensor_id] if sensor_id else None)
         filename = f"temperature_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Type': 'text/csv; charset=utf-8'
-            }
-        )
+        return _export_response(chunks, filename, 'text/csv', True, as_gzip_file)
     
     except Exception as e:
         logger.error(f"[{request_id}] ❌ CSVエクスポートエラー: {e}", exc_info=True)
@@ -564,6 +892,87 @@ def export_csv():
         }), 500
 
 
+@api_bp.route('/export', methods=['GET'])
+def export_data():
+    """
+    温度データを分析ツール向けの形式でエクスポート（ストリーミング、処理は services/data_export.py）
+    
+    クエリパラメータ:
+        format: parquet / arrow（Arrow IPC ストリーム）/ ndjson / csv（デフォルト ndjson）
+        sensor_ids: 対象のセンサーID（カンマ区切り・複数指定可、省略時は全センサー）
+        start, end: 期間（エポック秒・ミリ秒または ISO 8601、end は含まない、省略時は最新まで）
+        hours: start を省略した場合の期間（時間、デフォルト720）
+        gzip: 1 の場合は .gz ファイルとしてダウンロード（ndjson・csv のみ）
+    
+    parquet・arrow は pyarrow が必要（ない場合は 501）
+    """
+    request_id = str(uuid.uuid4())[:8]
+    args = request.args
+    
+    try:
+        export_format = args.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({
+                "status": "error",
+                "error_code": "VALIDATION_ERROR",
+                "message": f"format は {' / '.join(EXPORT_FORMATS)} のいずれかです",
+                "request_id": request_id
+            }), 400
+        if export_format in ARROW_FORMATS and not arrow_available:
+            return jsonify({
+                "status": "error",
+                "error_code": "EXPORT_ERROR",
+                "message": f"{export_format} 形式には pyarrow のインストールが必要です",
+                "request_id": request_id
+            }), 501
+        
+        sensor_ids = [
+            sensor_id.strip()
+            for value in args.getlist('sensor_ids') + args.getlist('sensor_id')
+            for sensor_id in value.split(',')
+            if sensor_id.strip()
+        ] or None
+        if sensor_ids is not None:
+            is_valid, error_msg, sensor_ids = validate_sensor_ids(sensor_ids)
+            if not is_valid:
+                return jsonify({
+                    "status": "error",
+                    "error_code": "VALIDATION_ERROR",
+                    "message": error_msg,
+                    "request_id": request_id
+                }), 400
+        
+        is_valid, error_msg, time_range = validate_export_range(args.get('start'), args.get('end'), args.get('hours'))
+        if not is_valid:
+            return jsonify({
+                "status": "error",
+                "error_code": "VALIDATION_ERROR",
+                "message": error_msg,
+                "request_id": request_id
+            }), 400
+        since_ms, until_ms = time_range
+        as_gzip_file = args.get('gzip', '').lower() in ('1', 'true')
+        
+        logger.info(
+            f"[{request_id}] GET /api/export - format={export_format}, sensors={sensor_ids or 'all'}, "
+            f"since_ms={since_ms}, until_ms={until_ms}"
+        )
+        
+        iter_rows, mimetype, extension, compressible = EXPORT_FORMATS[export_format]
+        chunks = iter_rows(since_ms, until_ms, sensor_ids)
+        filename = f"temperature_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+        return _export_response(chunks, filename, mimetype, compressible, as_gzip_file)
+    
+    except Exception as e:
+        logger.error(f"[{request_id}] ❌ エクスポートエラー: {e}", exc_info=True)
+        return jsonify({
+            "status": "error",
+            "error_code": "EXPORT_ERROR",
+            "message": f"エクスポートに失敗しました: {str(e)}",
+            "request_id": request_id
+        }), 500
+
+
 @api_bp.route('/export/logs', methods=['GET'])
 def export_logs():
     """システムログをテキスト形式でエクスポート"""
@@ -628,17 +1037,11 @@ def backup_database():
     request_id = str(uuid.uuid4())[:8]
     
     try:
-        import shutil
-        from flask import Response
-        from pathlib import Path
-        from config import Config
+        from database.models import DB_PATH, backup_database as create_backup
         
         logger.info(f"[{request_id}] GET /api/backup")
         
-        # データベースファイルのパス
-        db_path = Path(Config.DATA_DIR) / "temperature.db"
-        
-        if not db_path.exists():
+        if not DB_PATH.exists():
             return jsonify({
                 "status": "error",
                 "error_code": "FILE_NOT_FOUND",
@@ -650,8 +1053,8 @@ def backup_database():
         backup_filename = f"temperature_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
         backup_path = Path(Config.DATA_DIR) / backup_filename
         
-        # データベースをコピー
-        shutil.copy2(db_path, backup_path)
+        # オンラインバックアップ（WAL 内のコミット済みの行も含む、ファイルのコピーは不可）
+        create_backup(backup_path)
         
         logger.info(f"[{request_id}] ✅ バックアップ作成完了: {backup_path}")
         
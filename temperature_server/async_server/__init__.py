@@ -0,0 +1,20 @@
+"""
+temperature_server/async_server
+asyncio サーバー（aiohttp、オプション）
+
+Flask + スレッドの代わりに1つのイベントループで以下を提供する:
+- POST /api/temperature
+- GET  /api/sensors
+- POST /api/temperature/batch
+- GET  /api/stream/readings（SSE）
+
+待機中のダッシュボード・SSE接続はスレッドを占有しないため、
+Raspberry Pi でも数千の同時接続を保持できる。
+
+    pip install aiohttp
+    python run_async.py
+"""
+
+from async_server.app import create_async_app
+
+__all__ = ['create_async_app']
@@ -0,0 +1,263 @@
+"""
+temperature_server/async_server/app.py
+aiohttp アプリケーション
+
+- 読み取りのSQL（batch 等）は読み取り用の Executor で実行し、イベントループを止めない
+- 書き込みは AsyncIngestWriter（書き込み専用の1スレッドの Executor）だけが行う
+- シリアル受信（AsyncSerialGateway）とバックグラウンドタスクはコルーチンとして動かす
+  （gunicorn と同じくプライマリロックを取れた場合のみ）
+"""
+
+import asyncio
+import json
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from aiohttp import web
+from config import Config
+from database.models import init_database
+from database.queries import TemperatureQueries
+from services.background_tasks import background_tasks
+from services.process_roles import primary_lock
+from services.reading_stream import RESYNC
+from services.temperature_batch import run_batch_query
+from utils.json_provider import to_json_bytes
+from utils.validators import validate_temperature, validate_humidity
+from async_server.broadcast import AsyncReadingBroadcaster
+from async_server.ingest import AsyncIngestWriter
+from async_server.serial_transport import create_async_serial_gateway
+
+logger = logging.getLogger(__name__)
+
+BROADCASTER = web.AppKey('broadcaster', AsyncReadingBroadcaster)
+INGEST = web.AppKey('ingest', AsyncIngestWriter)
+READ_EXECUTOR = web.AppKey('read_executor', ThreadPoolExecutor)
+PRIMARY_TASKS = web.AppKey('primary_tasks', bool)
+
+
+def _error(status, message, error_code=None, request_id=None):
+    """エラーレスポンス（Flask 版と同じ形式）"""
+    body = {"status": "error", "message": message}
+    if error_code:
+        body["error_code"] = error_code
+    if request_id:
+        body["request_id"] = request_id
+    return web.json_response(body, status=status)
+
+
+async def receive_temperature(request):
+    """ESP32からの温度データ受信"""
+    request_id = str(uuid.uuid4())[:8]
+
+    try:
+        data = json.loads(await request.read())
+    except (ValueError, UnicodeDecodeError):
+        data = None
+    if not data or not isinstance(data, dict):
+        logger.warning("[%s] ❌ JSONデコード失敗", request_id)
+        return _error(400, "Invalid JSON format", "VALIDATION_ERROR", request_id)
+
+    sensor_id = data.get('device_id') or data.get('sensor_id')
+    temperature = data.get('temperature') or data.get('temp')
+    if not sensor_id or temperature is None:
+        logger.warning("[%s] ❌ バリデーション失敗: 必須フィールド不足", request_id)
+        return _error(400, "Missing required fields: device_id/sensor_id, temperature", "VALIDATION_ERROR", request_id)
+
+    # コミットはクライアントへの応答後のため、書き込めない値（NaN・範囲外）はここで弾く
+    for is_valid, error_msg in (validate_temperature(temperature), validate_humidity(data.get('humidity'))):
+        if not is_valid:
+            logger.warning("[%s] ❌ バリデーション失敗: %s", request_id, error_msg)
+            return _error(400, f"Temperature/humidity out of valid range: {error_msg}", "VALIDATION_ERROR", request_id)
+
+    try:
+        temperature = float(temperature)
+        rssi = data.get('rssi')
+        # 書き込みキューに積んで即座に応答（満杯の場合は空きを待つ）
+        await request.app[INGEST].put([{
+            'sensor_id': sensor_id,
+            'temperature': temperature,
+            'sensor_name': data.get('name') or data.get('sensor_name', 'Unknown'),
+            'humidity': data.get('humidity'),
+            'rssi': rssi,
+            'battery_mode': data.get('battery_mode', False),
+            'connection_type': 'wifi_ap' if rssi is not None else 'esp_now',
+        }])
+    except Exception as e:
+        logger.error(f"[{request_id}] ❌ キュー投入エラー: {e}", exc_info=True)
+        return _error(500, f"Failed to insert data: {e}", "DATABASE_ERROR", request_id)
+
+    return web.json_response({
+        "status": "success",
+        "message": "Data received and queued",
+        "device_id": sensor_id,
+        "temperature": temperature,
+        "request_id": request_id,
+        "timestamp": datetime.now().isoformat()
+    }, status=201)
+
+
+async def get_all_sensors(request):
+    """全センサーの最新データを取得"""
+    request_id = str(uuid.uuid4())[:8]
+    loop = asyncio.get_running_loop()
+    try:
+        # 通常はメモリキャッシュから返る（削除直後の再読み込みのみSQL）
+        sensors = await loop.run_in_executor(request.app[READ_EXECUTOR], TemperatureQueries.get_all_latest)
+    except Exception as e:
+        logger.error(f"[{request_id}] ❌ センサー取得エラー: {e}", exc_info=True)
+        return _error(500, "Failed to fetch sensors", "SENSOR_ERROR", request_id)
+
+    return web.json_response({
+        "status": "success",
+        "sensors": sensors,
+        "count": len(sensors),
+        "request_id": request_id
+    })
+
+
+async def get_temperature_batch(request):
+    """複数センサーのデータを一括取得（処理は services/temperature_batch.py）"""
+    try:
+        data = await request.json()
+    except ValueError as e:
+        return _error(400, f"Invalid JSON format: {e}")
+
+    loop = asyncio.get_running_loop()
+    body, status_code = await loop.run_in_executor(request.app[READ_EXECUTOR], _batch_body, data)
+    return web.Response(body=body, status=status_code, content_type='application/json')
+
+
+def _batch_body(data):
+    """一括取得のレスポンスボディを作成（読み取り用の Executor で実行、エンコードもループの外で行う）"""
+    payload, status_code = run_batch_query(data)
+    return to_json_bytes(payload), status_code
+
+
+async def stream_readings(request):
+    """
+    新着データのプッシュ配信（Server-Sent Events）
+
+    待機中の接続はスレッドを占有しない（コルーチン1つとキュー1つのみ）
+    """
+    sensor_ids = [
+        sensor_id.strip()
+        for value in request.query.getall('sensor_ids', [])
+        for sensor_id in value.split(',')
+        if sensor_id.strip()
+    ]
+
+    broadcaster = request.app[BROADCASTER]
+    subscription = broadcaster.subscribe(sensor_ids or None)
+    if subscription is None:
+        logger.warning("Stream subscriber limit reached")
+        return _error(503, "Too many stream clients")
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    try:
+        await response.prepare(request)
+        # 切断時の再接続間隔（ミリ秒）
+        await response.write(b"retry: 5000\n\n")
+        while True:
+            batch = await subscription.get(timeout=Config.STREAM_HEARTBEAT_INTERVAL)
+            if batch is None:
+                # プロキシ・ブラウザに接続を切られないようにコメント行を送る
+                await response.write(b": keepalive\n\n")
+            elif batch is RESYNC:
+                await response.write(b"event: resync\ndata: {}\n\n")
+            else:
+                await response.write(f"event: readings\ndata: {batch}\n\n".encode('utf-8'))
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass
+    finally:
+        broadcaster.unsubscribe(subscription)
+    return response
+
+
+async def _run_periodic(task):
+    """バックグラウンドタスクをコルーチンとして定期実行（処理自体はスレッドで実行）"""
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(task.initial_delay)
+    while True:
+        try:
+            await loop.run_in_executor(None, task.func)
+            delay = task.interval
+        except Exception as e:
+            logger.error(f"{task.name} error: {e}")
+            delay = task.error_delay
+        await asyncio.sleep(delay)
+
+
+async def _services(app):
+    """起動・終了処理（cleanup_ctx）"""
+    loop = asyncio.get_running_loop()
+    writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AsyncDBWriter')
+
+    await loop.run_in_executor(writer_executor, init_database)
+    await loop.run_in_executor(app[READ_EXECUTOR], TemperatureQueries.reload_latest_cache)
+
+    ingest = AsyncIngestWriter(
+        writer_executor,
+        app[BROADCASTER],
+        batch_size=Config.INGEST_BATCH_SIZE,
+        flush_interval=Config.INGEST_FLUSH_INTERVAL,
+        maxsize=Config.INGEST_QUEUE_MAXSIZE
+    )
+    ingest.start()
+    app[INGEST] = ingest
+
+    tasks = []
+    primary = app[PRIMARY_TASKS] and primary_lock.acquire()
+    if primary:
+        if Config.SERIAL_ENABLED:
+            gateway = create_async_serial_gateway(ingest.put_nowait)
+            tasks.append(loop.create_task(gateway.run()))
+        for task in background_tasks.get_tasks():
+            tasks.append(loop.create_task(_run_periodic(task)))
+        logger.info(f"Async server started as primary ({len(tasks)} background coroutines)")
+    elif app[PRIMARY_TASKS]:
+        logger.info("Serial reader and background tasks run in another process")
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # 書き込みキューに残っているデータを書き出す
+    await ingest.stop()
+    if primary:
+        primary_lock.release()
+    writer_executor.shutdown(wait=True)
+    app[READ_EXECUTOR].shutdown(wait=False)
+
+
+def create_async_app(primary_tasks=True):
+    """
+    aiohttp アプリケーションを作成
+
+    Args:
+        primary_tasks (bool): プライマリロックを取れた場合にシリアル受信・バックグラウンドタスクを動かす
+                              （False の場合は書き込みキューのみ、テスト用）
+
+    Returns:
+        aiohttp.web.Application
+    """
+    app = web.Application(client_max_size=Config.BULK_MAX_BODY_BYTES)
+    app[BROADCASTER] = AsyncReadingBroadcaster(
+        max_subscribers=Config.ASYNC_STREAM_MAX_CLIENTS,
+        client_queue_size=Config.STREAM_CLIENT_QUEUE_SIZE
+    )
+    app[READ_EXECUTOR] = ThreadPoolExecutor(max_workers=Config.DB_READ_POOL_SIZE, thread_name_prefix='AsyncDBReader')
+    app[PRIMARY_TASKS] = primary_tasks
+
+    app.router.add_post('/api/temperature', receive_temperature)
+    app.router.add_get('/api/sensors', get_all_sensors)
+    app.router.add_post('/api/temperature/batch', get_temperature_batch)
+    app.router.add_get('/api/stream/readings', stream_readings)
+
+    app.cleanup_ctx.append(_services)
+    return app
@@ -0,0 +1,129 @@
+"""
+temperature_server/async_server/broadcast.py
+新着データのプッシュ配信（asyncio 版）
+
+services/reading_stream.py と同じ仕様（購読者ごとの上限付きキュー、溢れたら resync）で、
+購読者のキューを asyncio.Queue にしたもの。publish() はイベントループ上で呼ぶ。
+"""
+
+import asyncio
+import json
+import logging
+from services.reading_stream import STREAM_COLUMNS, RESYNC
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSubscription:
+    """SSE接続1本分の購読"""
+
+    def __init__(self, sensor_ids=None, maxsize=100):
+        """
+        Args:
+            sensor_ids: 配信対象のセンサーID（None の場合は全センサー）
+            maxsize (int): 未送信のバッチを保持する最大数
+        """
+        self.sensor_ids = frozenset(sensor_ids) if sensor_ids else None
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, events):
+        """
+        シリアライズ済みの (sensor_id, JSON文字列) のリストを受け取り、対象分だけ積む
+
+        Returns:
+            bool: 取りこぼしが発生した場合False
+        """
+        if self.sensor_ids is not None:
+            events = [event for event in events if event[0] in self.sensor_ids]
+        if not events:
+            return True
+
+        try:
+            self._queue.put_nowait('[' + ','.join(payload for _, payload in events) + ']')
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            # 古いバッチを捨てて resync を積む
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC)
+            return False
+
+    async def get(self, timeout):
+        """
+        次のバッチを取得
+
+        Returns:
+            JSON配列の文字列 / RESYNC / タイムアウト時はNone
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class AsyncReadingBroadcaster:
+    """新着データを購読者に配信（イベントループ上で使用）"""
+
+    def __init__(self, max_subscribers=2000, client_queue_size=100):
+        """
+        Args:
+            max_subscribers (int): 同時接続数の上限
+            client_queue_size (int): 購読者ごとの未送信バッチの上限
+        """
+        self.max_subscribers = max_subscribers
+        self.client_queue_size = client_queue_size
+        self._subscribers = set()
+
+        # 統計情報
+        self.stats = {
+            'published': 0,
+            'batches': 0,
+            'resyncs': 0,
+        }
+
+    def subscribe(self, sensor_ids=None):
+        """
+        購読を開始
+
+        Returns:
+            AsyncSubscription（上限に達している場合None）
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = AsyncSubscription(sensor_ids, maxsize=self.client_queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """購読を終了"""
+        self._subscribers.discard(subscription)
+
+    def publish(self, rows):
+        """
+        コミット済みの行を配信
+
+        Args:
+            rows: build_reading_row() で作成した行タプルのリスト
+        """
+        if not self._subscribers or not rows:
+            return
+
+        # 1行につき1回だけシリアライズし、全購読者で共有する
+        events = [
+            (row[0], json.dumps(dict(zip(STREAM_COLUMNS, row)), ensure_ascii=False))
+            for row in rows
+        ]
+        for subscription in list(self._subscribers):
+            if not subscription.offer(events):
+                self.stats['resyncs'] += 1
+
+        self.stats['published'] += len(rows)
+        self.stats['batches'] += 1
+
+    def get_stats(self):
+        """統計情報を取得"""
+        stats = dict(self.stats)
+        stats['subscribers'] = len(self._subscribers)
+        return stats
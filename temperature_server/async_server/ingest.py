@@ -0,0 +1,183 @@
+"""
+temperature_server/async_server/ingest.py
+温度データの書き込みキュー（asyncio 版）
+
+- ハンドラ・シリアル受信は asyncio.Queue に積むだけで戻る（満杯の場合は空きを待つ）
+- 1つのコルーチンがまとめて取り出し、書き込み専用の1スレッドの Executor でコミットする
+  （SQLite への書き込みは常にこのスレッドだけが行い、イベントループは止めない）
+- コミット後に SSE の購読者へ配信する
+- コミットの失敗時は同期版（services/ingest_queue.py）と同じくリトライし、それでも失敗した行は
+  スピルファイルに退避して次のコミット成功時に書き戻す（services/ingest_spill.py）
+"""
+
+import asyncio
+import time
+import logging
+from database.queries import TemperatureQueries
+from services.ingest_spill import write_with_retry, has_spill, replay_spill
+from utils.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncIngestWriter:
+    """asyncio.Queue + 単一ライター Executor による書き込みキュー"""
+
+    def __init__(self, executor, broadcaster, batch_size=200, flush_interval=0.25, maxsize=10000):
+        """
+        初期化
+
+        Args:
+            executor: 書き込み専用の Executor（max_workers=1）
+            broadcaster: コミット済みの行を配信する AsyncReadingBroadcaster
+            batch_size (int): 1トランザクションでコミットする最大行数
+            flush_interval (float): 最初の行を受け取ってからコミットするまでの最大待ち時間（秒）
+            maxsize (int): キューの最大件数（満杯の場合 put() は空きを待つ）
+        """
+        self.executor = executor
+        self.broadcaster = broadcaster
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+
+        # 統計情報
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'rejected': 0,
+            'lost': 0,
+            'dropped': 0,
+        }
+        self.commit_latency = LatencyStats()
+
+    def start(self):
+        """ライターのコルーチンを開始"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._writer_loop())
+
+    async def stop(self):
+        """キューを最後まで書き出して停止"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info(f"Async ingest writer stopped (written={self.stats['written']})")
+
+    def _build_rows(self, readings):
+        """ingest_queue.enqueue_many() と同じキーを持つdictのリストを行タプルに変換（受信時刻はこの時点で確定）"""
+        return [
+            TemperatureQueries.build_reading_row(
+                reading['sensor_id'],
+                reading['temperature'],
+                reading.get('sensor_name'),
+                reading.get('humidity'),
+                reading.get('rssi'),
+                reading.get('battery_mode', False),
+                reading.get('connection_type'),
+                reading.get('timestamp')
+            )
+            for reading in readings
+        ]
+
+    async def put(self, readings):
+        """
+        温度データをキューに積む（キューが満杯の場合は空きを待つ、同じトランザクションでコミットされる）
+
+        Args:
+            readings: ingest_queue.enqueue_many() と同じキーを持つdictのリスト
+        """
+        rows = self._build_rows(readings)
+        if rows:
+            await self._queue.put((time.monotonic(), rows))
+            self.stats['enqueued'] += len(rows)
+
+    def put_nowait(self, readings):
+        """
+        温度データをキューに積む（待たない、シリアル受信のコールバック等の同期コードから使用）
+
+        Returns:
+            bool: 積んだ場合True、キューが満杯で破棄した場合False
+        """
+        rows = self._build_rows(readings)
+        if not rows:
+            return True
+        try:
+            self._queue.put_nowait((time.monotonic(), rows))
+        except asyncio.QueueFull:
+            self.stats['dropped'] += len(rows)
+            logger.warning(f"Async ingest queue is full, dropped {len(rows)} readings")
+            return False
+        self.stats['enqueued'] += len(rows)
+        return True
+
+    async def _writer_loop(self):
+        """キューからまとめて取り出してコミット"""
+        loop = asyncio.get_running_loop()
+        # 前回の実行で退避した行を書き戻す
+        await self._replay_spill(loop)
+        while True:
+            groups = [await self._queue.get()]
+            rows = list(groups[0][1])
+            deadline = loop.time() + self.flush_interval
+
+            # 最初の行から flush_interval 経過するか batch_size に達するまで集める
+            # （1回の put() の行は分割しない）
+            while len(rows) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    group = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                groups.append(group)
+                rows.extend(group[1])
+
+            try:
+                # リトライの待ち時間も書き込み用のスレッドで待つ（イベントループは止めない）
+                result = await loop.run_in_executor(self.executor, write_with_retry, rows)
+                self.stats['failed'] += result.failed
+                self.stats['spilled'] += len(result.spilled)
+                self.stats['rejected'] += len(result.rejected)
+                self.stats['lost'] += len(result.lost)
+                if not result.committed:
+                    continue
+                committed_at = time.monotonic()
+                for enqueued_at, _ in groups:
+                    self.commit_latency.record(committed_at - enqueued_at)
+                self.stats['written'] += len(result.committed)
+                self.stats['batches'] += 1
+                # コミット済みの行をSSE購読者に配信
+                self.broadcaster.publish(result.committed)
+                # 書き込めるようになったので退避していた行を書き戻す
+                await self._replay_spill(loop)
+            finally:
+                for _ in groups:
+                    self._queue.task_done()
+
+    async def _replay_spill(self, loop):
+        """スピルファイルの行を書き戻して配信"""
+        if not has_spill():
+            return
+        result = await loop.run_in_executor(self.executor, replay_spill)
+        self.stats['replayed'] += len(result.committed)
+        self.stats['rejected'] += len(result.rejected)
+        if result.committed:
+            self.broadcaster.publish(result.committed)
+
+    def get_stats(self):
+        """統計情報を取得"""
+        stats = dict(self.stats)
+        stats['pending'] = self._queue.qsize()
+        stats['commit_latency'] = self.commit_latency.to_dict()
+        return stats
@@ -0,0 +1,216 @@
+"""
+temperature_server/async_server/serial_transport.py
+シリアルポートの受信（asyncio 版）
+
+- ポートを非ブロッキング（timeout=0）で開き、loop.add_reader() でファイルディスクリプタを監視する
+  （受信スレッド・パーススレッドは作らない）
+- 受信したバイト列は LineAssembler で行・バイナリフレームに分割し、SerialReader.process() で
+  パース・検証して書き込みキュー（AsyncIngestWriter）に積む
+- ポートの再スキャン・指数バックオフでの再接続はコルーチンで行う（SerialGatewayManager と同じ方針）
+"""
+
+import asyncio
+import time
+import logging
+import serial
+from services.serial_reader import SerialReader
+from services.serial_gateway import detect_serial_ports, DEFAULT_PORT_PATTERNS
+
+logger = logging.getLogger(__name__)
+
+
+class _AsyncPort:
+    """ポート1つ分の状態"""
+
+    __slots__ = ('port', 'reader', 'failures', 'next_attempt', 'last_error', 'connected_at', 'reconnects')
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = None
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.last_error = None
+        self.connected_at = None
+        self.reconnects = 0
+
+
+class AsyncSerialGateway:
+    """複数のシリアルポートをイベントループ上で受信"""
+
+    def __init__(self, ingest, ports=None, port_patterns=DEFAULT_PORT_PATTERNS, baudrate=115200,
+                 max_line_length=4096, scan_interval=5.0, reconnect_initial=1.0, reconnect_max=60.0):
+        """
+        初期化
+
+        Args:
+            ingest: 1フレーム分のセンサーデータを受け取る関数（AsyncIngestWriter.put_nowait）
+            ports: 使用するポートのリスト（None の場合は port_patterns で自動検出）
+            port_patterns: 自動検出に使う glob パターン
+            baudrate (int): ボーレート
+            max_line_length (int): 1行の最大バイト数
+            scan_interval (float): ポートを再スキャンする間隔（秒）
+            reconnect_initial (float): 再接続の初回待ち時間（秒、失敗ごとに倍）
+            reconnect_max (float): 再接続の最大待ち時間（秒）
+        """
+        self.ingest = ingest
+        self.ports = list(ports) if ports else None
+        self.port_patterns = tuple(port_patterns)
+        self.baudrate = baudrate
+        self.max_line_length = max_line_length
+        self.scan_interval = scan_interval
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+        self._ports = {}
+        self._loop = None
+
+    async def run(self):
+        """ポートの監視（キャンセルされるまで）"""
+        self._loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    next_retry = await self.scan()
+                except Exception as e:
+                    logger.error(f"Error scanning serial ports: {e}", exc_info=True)
+                    next_retry = None
+                wait = self.scan_interval if next_retry is None else min(self.scan_interval, next_retry)
+                await asyncio.sleep(max(wait, 0.1))
+        finally:
+            for state in list(self._ports.values()):
+                self._close(state)
+            self._ports.clear()
+
+    async def scan(self):
+        """
+        ポートを再スキャンし、追加・削除・切断に対応
+
+        Returns:
+            float: 次の再接続予定までの秒数（予定がない場合None）
+        """
+        now = time.monotonic()
+        present = set(await self._loop.run_in_executor(None, detect_serial_ports, self.ports, self.port_patterns))
+
+        for port in [port for port in self._ports if port not in present]:
+            logger.info(f"Serial gateway removed: {port}")
+            self._close(self._ports.pop(port))
+        for port in present - set(self._ports):
+            logger.info(f"Serial gateway detected: {port}")
+            self._ports[port] = _AsyncPort(port)
+
+        next_retry = None
+        for state in self._ports.values():
+            if state.reader is None and now >= state.next_attempt:
+                self._connect(state, now)
+            if state.reader is None:
+                wait = max(0.0, state.next_attempt - now)
+                next_retry = wait if next_retry is None else min(next_retry, wait)
+        return next_retry
+
+    def get_connected_ports(self):
+        """受信中のポートの一覧"""
+        return sorted(port for port, state in self._ports.items() if state.reader is not None)
+
+    def get_status(self):
+        """ポートごとの接続状態と受信統計を取得"""
+        now = time.monotonic()
+        return {
+            'running': self._loop is not None,
+            'auto_detect': not self.ports,
+            'ports': [
+                {
+                    'port': state.port,
+                    'connected': state.reader is not None,
+                    'failures': state.failures,
+                    'reconnects': state.reconnects,
+                    'last_error': state.last_error,
+                    'retry_in_sec': None if state.reader else round(max(0.0, state.next_attempt - now), 1),
+                    'stats': state.reader.get_stats() if state.reader is not None else None,
+                }
+                for state in sorted(self._ports.values(), key=lambda s: s.port)
+            ],
+        }
+
+    def _connect(self, state, now):
+        """ポートを開いて監視を開始（失敗時は再試行を予約）"""
+        reader = SerialReader(
+            port=state.port,
+            baudrate=self.baudrate,
+            timeout=0,
+            max_line_length=self.max_line_length,
+            ingest=self.ingest
+        )
+        if not reader.connect():
+            state.last_error = reader.last_error or 'connection failed'
+            self._schedule_retry(state, now)
+            return
+
+        reader.is_running = True
+        self._loop.add_reader(reader.serial_conn.fileno(), self._on_readable, state)
+        if state.connected_at is not None:
+            state.reconnects += 1
+        state.reader = reader
+        state.connected_at = now
+        state.failures = 0
+        state.last_error = None
+        logger.info(f"Serial gateway connected: {state.port}")
+
+    def _on_readable(self, state):
+        """受信可能になったときのコールバック（イベントループ上）"""
+        reader = state.reader
+        try:
+            data = reader.serial_conn.read(reader.serial_conn.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            # デバイスの切断等: 監視をやめて再接続を予約
+            state.last_error = str(e)
+            logger.warning(f"Serial gateway disconnected: {state.port} ({e})")
+            self._close(state)
+            self._schedule_retry(state, time.monotonic())
+            return
+        if not data:
+            return
+
+        for line in reader.line_assembler.feed(data):
+            started = time.monotonic()
+            reader.process(line)
+            reader.parse_time.record(time.monotonic() - started)
+
+    def _schedule_retry(self, state, now):
+        """指数バックオフで次の接続試行時刻を決める"""
+        state.failures += 1
+        delay = min(self.reconnect_max, self.reconnect_initial * (2 ** (state.failures - 1)))
+        state.next_attempt = now + delay
+        logger.info(f"Serial gateway {state.port}: retry in {delay:.1f}s (failures={state.failures})")
+
+    def _close(self, state):
+        """監視をやめてポートを閉じる"""
+        reader, state.reader = state.reader, None
+        if reader is None:
+            return
+        reader.is_running = False
+        try:
+            self._loop.remove_reader(reader.serial_conn.fileno())
+        except (OSError, ValueError):
+            pass
+        reader.disconnect()
+
+
+def create_async_serial_gateway(ingest, config_obj=None):
+    """
+    AsyncSerialGateway のファクトリ関数（設定は create_serial_gateway() と同じ）
+
+    Args:
+        ingest: 1フレーム分のセンサーデータを受け取る関数
+        config_obj: Config オブジェクト（デフォルト: Config）
+    """
+    from services.serial_gateway import create_serial_gateway
+    settings = create_serial_gateway(config_obj)
+    return AsyncSerialGateway(
+        ingest,
+        ports=settings.ports,
+        port_patterns=settings.port_patterns,
+        baudrate=settings.baudrate,
+        max_line_length=settings.max_line_length,
+        scan_interval=settings.scan_interval,
+        reconnect_initial=settings.reconnect_initial,
+        reconnect_max=settings.reconnect_max
+    )
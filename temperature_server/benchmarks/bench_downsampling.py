@@ -0,0 +1,97 @@
+"""
+temperature_server/benchmarks/bench_downsampling.py
+間引きエンジンのベンチマーク
+
+従来の Python 実装（downsample_legacy）と NumPy ベクトル化版（各モード）を
+同じ合成データ（温度の緩やかな変動＋ノイズ＋スパイク）で比較する。
+
+使い方:
+    python benchmarks/bench_downsampling.py
+    python benchmarks/bench_downsampling.py --points 1000000 --max-points 2000
+"""
+
+import sys
+import time
+import math
+import random
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.downsampling import (
+    downsample_legacy,
+    downsample_readings,
+    select_indices,
+    numpy_available,
+    DOWNSAMPLE_MODES
+)
+
+
+def generate_readings(count, seed=42):
+    """30秒間隔の合成温度データを生成"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    readings = []
+    for i in range(count):
+        temperature = 22.0 + 3.0 * math.sin(i / 2880 * 2 * math.pi) + rng.gauss(0, 0.05)
+        if rng.random() < 0.0005:
+            temperature += rng.choice((-4.0, 4.0))  # スパイク
+        readings.append({
+            'sensor_id': 'BENCH_01',
+            'temperature': round(temperature, 2),
+            'timestamp': (start + timedelta(seconds=30 * i)).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    return readings
+
+
+def measure(label, func, repeat):
+    """最速の実行時間を計測"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    print(f"  {label:<32} {best * 1000:>10.1f} ms  ({len(result)} points)")
+    return best
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='Benchmark downsampling engines')
+    parser.add_argument('--points', type=int, default=1_000_000, help='Number of input points')
+    parser.add_argument('--max-points', type=int, default=500, help='max_points per series')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions (best time is reported)')
+    args = parser.parse_args()
+
+    if not numpy_available:
+        print("❌ numpy is not installed")
+        return
+
+    import numpy as np
+
+    print(f"Generating {args.points:,} readings...")
+    readings = generate_readings(args.points)
+    temperatures = np.array([r['temperature'] for r in readings], dtype=np.float64)
+
+    print(f"\n[dict list → dict list] max_points={args.max_points}")
+    legacy = measure('legacy (pure Python)', lambda: downsample_legacy(readings, args.max_points), args.repeat)
+    for mode in DOWNSAMPLE_MODES:
+        elapsed = measure(
+            f'numpy {mode}',
+            lambda: downsample_readings(readings, args.max_points, mode),
+            args.repeat
+        )
+        print(f"  {'':<32} speedup x{legacy / elapsed:.1f}")
+
+    print(f"\n[float64 array → indices] max_points={args.max_points}")
+    for mode in DOWNSAMPLE_MODES:
+        measure(f'numpy {mode}', lambda: select_indices(temperatures, args.max_points, mode), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
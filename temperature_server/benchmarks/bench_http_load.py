@@ -0,0 +1,162 @@
+"""
+temperature_server/benchmarks/bench_http_load.py
+HTTPサーバーの負荷試験（Flask 開発サーバー vs gunicorn）
+
+サーバーを一時ディレクトリのデータベースで起動し、複数のクライアントプロセスから
+ESP の送信（POST /api/temperature、毎回接続を閉じる）とダッシュボードの参照
+（GET /api/sensors、keep-alive）を混ぜて送り、requests/sec とレイテンシを計測する。
+
+使い方:
+    python benchmarks/bench_http_load.py
+    python benchmarks/bench_http_load.py --server gunicorn --clients 32 --duration 20
+    WEB_WORKERS=4 python benchmarks/bench_http_load.py --server gunicorn
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import subprocess
+import http.client
+import multiprocessing
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+SERVER_COMMANDS = {
+    'dev': [sys.executable, 'run.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+}
+
+
+def wait_for_port(host, port, timeout=30.0):
+    """サーバーが接続を受け付けるまで待つ"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def client_worker(args):
+    """
+    クライアント1つ分の負荷（別プロセスで実行）
+
+    Returns:
+        (レイテンシ[秒]のリスト, エラー数)
+    """
+    host, port, duration, ingest_ratio, index = args
+    rng = random.Random(index)
+    body = json.dumps({'device_id': f'LOAD_{index:03d}', 'name': 'Load', 'temperature': 22.5, 'humidity': 45.0})
+    keepalive = None
+    latencies = []
+    errors = 0
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if rng.random() < ingest_ratio:
+                # ESP: 送信ごとに接続を作り、閉じる
+                conn = http.client.HTTPConnection(host, port, timeout=10)
+                conn.request('POST', '/api/temperature', body=body,
+                             headers={'Content-Type': 'application/json', 'Connection': 'close'})
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                ok = response.status == 201
+            else:
+                # ダッシュボード: keep-alive で参照
+                if keepalive is None:
+                    keepalive = http.client.HTTPConnection(host, port, timeout=10)
+                keepalive.request('GET', '/api/sensors')
+                response = keepalive.getresponse()
+                response.read()
+                ok = response.status == 200
+                if response.will_close:
+                    keepalive.close()
+                    keepalive = None
+        except (OSError, http.client.HTTPException):
+            ok = False
+            if keepalive is not None:
+                keepalive.close()
+                keepalive = None
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors += 1
+    return latencies, errors
+
+
+def run_load(server, clients, duration, ingest_ratio, port):
+    """サーバーを起動して負荷をかける"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(
+            os.environ,
+            DATA_DIR=tmpdir,
+            LOGS_DIR=tmpdir,
+            FLASK_HOST='127.0.0.1',
+            FLASK_PORT=str(port),
+            FLASK_DEBUG='False',
+            SERIAL_ENABLED='False',
+            RETENTION_ENABLED='False',
+        )
+        process = subprocess.Popen(
+            SERVER_COMMANDS[server], cwd=str(project_root), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            if not wait_for_port('127.0.0.1', port):
+                raise RuntimeError(f"{server} server did not start on port {port}")
+            time.sleep(1.0)
+
+            started = time.perf_counter()
+            with multiprocessing.Pool(clients) as pool:
+                results = pool.map(
+                    client_worker,
+                    [('127.0.0.1', port, duration, ingest_ratio, i) for i in range(clients)]
+                )
+            elapsed = time.perf_counter() - started
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    latencies = sorted(l for result, _ in results for l in result)
+    errors = sum(e for _, e in results)
+    return latencies, errors, elapsed
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='HTTP load test: Flask dev server vs gunicorn')
+    parser.add_argument('--server', choices=['dev', 'gunicorn', 'both'], default='both')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent client processes')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per server')
+    parser.add_argument('--ingest-ratio', type=float, default=0.7, help='Fraction of POST /api/temperature')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    servers = ['dev', 'gunicorn'] if args.server == 'both' else [args.server]
+    print(f"{args.clients} clients, {args.duration:.0f}s, ingest ratio {args.ingest_ratio}")
+    for server in servers:
+        latencies, errors, elapsed = run_load(server, args.clients, args.duration, args.ingest_ratio, args.port)
+        if not latencies:
+            print(f"{server:9s} no successful requests ({errors} errors)")
+            continue
+        ms = [l * 1000 for l in latencies]
+        print(
+            f"{server:9s} {len(ms) / elapsed:8.0f} req/s  "
+            f"p50 {ms[len(ms) // 2]:7.2f} ms  p99 {ms[int(len(ms) * 0.99)]:7.2f} ms  "
+            f"max {ms[-1]:7.2f} ms  errors {errors}"
+        )
+
+
+if __name__ == '__main__':
+    main()
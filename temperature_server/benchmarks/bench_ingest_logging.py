@@ -0,0 +1,80 @@
+"""
+temperature_server/benchmarks/bench_ingest_logging.py
+取り込みハンドラ（POST /api/temperature）のレイテンシ計測
+
+ESP32 と同じ形のリクエストを Flask のテストクライアントで連続送信し、
+リクエスト1件あたりの処理時間（ミドルウェアのリクエストログを含む）を計測する。
+REQUEST_LOG_* の設定を変えて実行すると、ログ設定ごとの差を比較できる。
+
+使い方:
+    python benchmarks/bench_ingest_logging.py
+    python benchmarks/bench_ingest_logging.py --requests 5000
+    REQUEST_LOG_ROUTES="api.receive_temperature=full" python benchmarks/bench_ingest_logging.py
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app
+from database.models import init_database
+from services.ingest_queue import ingest_queue
+
+HEADERS = {
+    'User-Agent': 'ESP8266HTTPClient',
+    'Connection': 'close',
+    'Accept-Encoding': 'identity;q=1,chunked;q=0.1,*;q=0',
+}
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='Benchmark ingest handler latency')
+    parser.add_argument('--requests', type=int, default=2000, help='Number of POST requests')
+    parser.add_argument('--warmup', type=int, default=100, help='Warm-up requests (not measured)')
+    args = parser.parse_args()
+
+    init_database()
+    app = create_app()
+    client = app.test_client()
+    body = json.dumps({
+        'device_id': 'BENCH_INGEST_01',
+        'name': 'Bench',
+        'temperature': 22.5,
+        'humidity': 45.0,
+        'rssi': -60,
+    })
+
+    def post():
+        started = time.perf_counter()
+        response = client.post('/api/temperature', data=body, content_type='application/json', headers=HEADERS)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 201, response.status_code
+        return elapsed
+
+    for _ in range(args.warmup):
+        post()
+    ingest_queue.flush()
+
+    samples = [post() for _ in range(args.requests)]
+    ingest_queue.flush()
+
+    samples_ms = sorted(s * 1000 for s in samples)
+    total = sum(samples)
+    print(f"POST /api/temperature x {args.requests}")
+    print(f"  mean   {statistics.mean(samples_ms):8.3f} ms")
+    print(f"  p50    {samples_ms[len(samples_ms) // 2]:8.3f} ms")
+    print(f"  p95    {samples_ms[int(len(samples_ms) * 0.95)]:8.3f} ms")
+    print(f"  p99    {samples_ms[int(len(samples_ms) * 0.99)]:8.3f} ms")
+    print(f"  rate   {args.requests / total:8.0f} req/s (single thread)")
+
+
+if __name__ == '__main__':
+    main()
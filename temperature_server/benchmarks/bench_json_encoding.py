@@ -0,0 +1,150 @@
+"""
+temperature_server/benchmarks/bench_json_encoding.py
+一括取得レスポンスの JSON エンコードのベンチマーク
+
+/api/temperature/batch と同じ形の合成データ（rows: 行ごとのdict、columnar: 列ごとの配列）を
+Flask の既定（標準の json、sort_keys・ensure_ascii）・標準の json（フォールバック）・orjson で
+エンコードし、1回あたりの時間とピークメモリ（tracemalloc）を比較する。
+columnar はセンサーごとに作成・エンコードする方式（iter_object_chunks）も計測する。
+
+使い方:
+    python benchmarks/bench_json_encoding.py
+    python benchmarks/bench_json_encoding.py --sensors 16 --points 20000
+    JSON_ENCODER=stdlib python benchmarks/bench_json_encoding.py
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import json_provider
+from utils.json_provider import dumps_bytes, iter_object_chunks, use_orjson
+
+START_MS = 1_760_000_000_000
+
+
+def make_rows(sensor_id, points, rng):
+    """rows 形式の1センサー分（get_range_batch の戻り値と同じ形）"""
+    readings = []
+    for i in range(points):
+        ts = START_MS + i * 30_000
+        readings.append({
+            'id': i,
+            'sensor_id': sensor_id,
+            'sensor_name': '温度センサー',
+            'temperature': round(22.0 + 3.0 * math.sin(i / 2880 * 2 * math.pi) + rng.gauss(0, 0.05), 2),
+            'humidity': round(45.0 + rng.gauss(0, 0.5), 1),
+            'rssi': -60,
+            'battery_mode': 0,
+            'connection_type': 'esp_now',
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts / 1000)),
+            'ts': ts,
+        })
+    return {'readings': readings, 'cursor': f'raw:{START_MS + points * 30_000}'}
+
+
+def make_columns(points, rng):
+    """columnar 形式の1センサー分（get_range_batch_columnar の値と同じ形）"""
+    return {
+        'sensor_name': '温度センサー',
+        'connection_type': 'esp_now',
+        'resolution': 'raw',
+        'count': points,
+        'timestamps': [START_MS + i * 30_000 for i in range(points)],
+        'temperatures': [round(22.0 + 3.0 * math.sin(i / 2880 * 2 * math.pi) + rng.gauss(0, 0.05), 2) for i in range(points)],
+        'humidity': [round(45.0 + rng.gauss(0, 0.5), 1) for i in range(points)],
+    }
+
+
+def flask_default(obj):
+    """Flask 2.3 の既定のプロバイダー（compact）と同じ指定"""
+    return json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode()
+
+
+def stdlib(obj):
+    """標準の json（orjson がない場合のフォールバック）"""
+    return json_provider._stdlib_encoder.encode(obj).encode()
+
+
+def measure(func, repeat):
+    """(1回あたりの時間[ms], ピークメモリ[MB], 出力サイズ[bytes])"""
+    tracemalloc.start()
+    output = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - started) / repeat
+    return elapsed * 1000, peak / 1024 / 1024, len(output)
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding of batch responses')
+    parser.add_argument('--sensors', type=int, default=8)
+    parser.add_argument('--points', type=int, default=5000, help='Points per sensor')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    sensor_ids = [f'esp32_{i:02d}' for i in range(args.sensors)]
+    print(f"{args.sensors} sensors x {args.points} points, encoder={'orjson' if use_orjson else 'json'}")
+    print(f"{'case':34s} {'time':>10s} {'peak mem':>10s} {'size':>10s}")
+
+    def report(name, func):
+        ms, peak_mb, size = measure(func, args.repeat)
+        print(f"{name:34s} {ms:8.1f}ms {peak_mb:8.1f}MB {size / 1024:8.0f}KB")
+
+    # エンコードのみ（レスポンスの dict は作成済み）
+    rows_payload = {'status': 'success', 'data': {sid: make_rows(sid, args.points, rng) for sid in sensor_ids}}
+    report('rows    flask default', lambda: flask_default(rows_payload))
+    report('rows    stdlib json', lambda: stdlib(rows_payload))
+    if use_orjson:
+        report('rows    orjson', lambda: dumps_bytes(rows_payload))
+    del rows_payload
+
+    columns = {sid: make_columns(args.points, rng) for sid in sensor_ids}
+    columnar_payload = {'status': 'success', 'format': 'columnar', 'data': columns}
+    report('columnar flask default', lambda: flask_default(columnar_payload))
+    report('columnar stdlib json', lambda: stdlib(columnar_payload))
+    if use_orjson:
+        report('columnar orjson', lambda: dumps_bytes(columnar_payload))
+    if json_provider.np is not None:
+        # NumPy の配列はそのまま変換する（orjson は C 連続の配列を直接エンコード）
+        np = json_provider.np
+        arrays = {sid: dict(entry, timestamps=np.array(entry['timestamps'], dtype=np.int64),
+                            temperatures=np.array(entry['temperatures']), humidity=np.array(entry['humidity']))
+                  for sid, entry in columns.items()}
+        numpy_payload = {'status': 'success', 'format': 'columnar', 'data': arrays}
+        report('columnar numpy arrays', lambda: dumps_bytes(numpy_payload))
+        del arrays, numpy_payload
+    del columns, columnar_payload
+
+    # データの作成を含む（全センサー分の dict を作ってからエンコード vs センサーごと）
+    def build_then_encode():
+        local = random.Random(1)
+        data = {sid: make_columns(args.points, local) for sid in sensor_ids}
+        return dumps_bytes({'status': 'success', 'format': 'columnar', 'data': data})
+
+    def encode_per_sensor():
+        local = random.Random(1)
+        entries = ((sid, make_columns(args.points, local)) for sid in sensor_ids)
+        return b''.join(iter_object_chunks({'status': 'success', 'format': 'columnar'}, 'data', entries))
+
+    report('columnar build all + encode', build_then_encode)
+    report('columnar build/encode per sensor', encode_per_sensor)
+
+
+if __name__ == '__main__':
+    main()
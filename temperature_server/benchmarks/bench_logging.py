@@ -0,0 +1,134 @@
+"""
+temperature_server/benchmarks/bench_logging.py
+ログのスループット計測（records/sec）
+
+以下の2つを比較する:
+- legacy: 以前の setup_logger（ロガー名ごとの TimedRotatingFileHandler に
+          呼び出し元のスレッドで同期書き込み、全レコードに SensitiveDataFilter）
+- async:  現在の setup_logger（共有の QueueHandler → LogWriter がバッチ書き込み）
+
+呼び出し元から見たスループット（ログ呼び出しが戻るまで）と、
+ファイルに書き終わるまでを含めたスループットの両方を表示する。
+
+使い方:
+    python benchmarks/bench_logging.py
+    python benchmarks/bench_logging.py --records 50000 --threads 8 --loggers 10
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import logging
+import logging.handlers
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+
+
+class LegacySensitiveDataFilter(logging.Filter):
+    """以前のセンシティブデータフィルター（全レコードでメッセージを整形）"""
+
+    def filter(self, record):
+        if hasattr(record, 'msg') and record.msg:
+            msg = record.getMessage()
+            for secret in (Config.AP_PASSWORD, Config.SECRET_KEY):
+                if secret and secret in msg:
+                    msg = msg.replace(secret, '***')
+                    record.msg = msg
+                    record.args = None
+        return True
+
+
+def setup_legacy_logger(name, logs_dir):
+    """以前の setup_logger と同じ構成のロガー"""
+    logger = logging.getLogger(f"legacy.{name}")
+    logger.handlers = []
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    handler = logging.handlers.TimedRotatingFileHandler(
+        str(logs_dir / f'{name}.log'), when='midnight', interval=1, backupCount=5, encoding='utf-8'
+    )
+    handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    handler.addFilter(LegacySensitiveDataFilter())
+    logger.addHandler(handler)
+    return logger
+
+
+def run(loggers, records, threads):
+    """
+    複数スレッドからログを出力
+
+    Returns:
+        float: 全スレッドのログ呼び出しが戻るまでの秒数
+    """
+    per_thread = records // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        barrier.wait()
+        for i in range(per_thread):
+            logger = loggers[(index + i) % len(loggers)]
+            logger.info("POST /api/temperature -> %d %.1fms from %s", 201, 0.4, '192.168.4.23')
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - started
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='Benchmark logging throughput')
+    parser.add_argument('--records', type=int, default=40000, help='Total log records')
+    parser.add_argument('--threads', type=int, default=4, help='Number of logging threads')
+    parser.add_argument('--loggers', type=int, default=8, help='Number of module loggers')
+    args = parser.parse_args()
+    total = args.records // args.threads * args.threads
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logs_dir = Path(tmpdir)
+        names = [f"bench.module{i}" for i in range(args.loggers)]
+
+        # legacy（同期書き込みなので呼び出しが戻った時点で書き込み済み）
+        legacy = [setup_legacy_logger(name, logs_dir) for name in names]
+        elapsed = run(legacy, total, args.threads)
+        for logger in legacy:
+            for handler in logger.handlers:
+                handler.close()
+        print(f"legacy per-module handlers: {total / elapsed:10.0f} records/s")
+
+        # async（ログ出力先を一時ディレクトリにしてからバックエンドを初期化）
+        Config.LOGS_DIR = logs_dir
+        Config.FLASK_ENV = 'production'
+        Config.FLASK_DEBUG = False
+        from logger import setup_logger, get_log_writer
+
+        loggers = [setup_logger(name) for name in names]
+        for logger in loggers:
+            logger.setLevel(logging.INFO)
+        writer = get_log_writer()
+        started = time.perf_counter()
+        elapsed = run(loggers, total, args.threads)
+        writer.flush(timeout=60)
+        drained = time.perf_counter() - started
+        print(f"async queue (caller side):  {total / elapsed:10.0f} records/s")
+        print(f"async queue (written):      {total / drained:10.0f} records/s "
+              f"({writer.stats['batches']} batches, {writer.stats['records'] / max(writer.stats['batches'], 1):.0f} records/batch)")
+        writer.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -212,6 +212,40 @@ class CLIManager:
         except Exception as e:
             print(f"❌ 失敗: {e}")
 
+    @staticmethod
+    def run_retention():
+        """保持期間を過ぎたデータを削除"""
+        print("🗑️  保持期間を過ぎたデータを削除中...")
+        try:
+            from services.retention import retention_engine
+            result = retention_engine.run_once()
+            if result is None:
+                print("⚠️  リテンション処理は既に実行中です")
+                return
+            for target, deleted in result['deleted'].items():
+                print(f"  {target}: {deleted}件")
+            vacuum = result['vacuum']
+            print(f"  空き領域の解放: {vacuum.get('freed_bytes', 0) / (1024**2):.1f} MB (auto_vacuum={vacuum['auto_vacuum']})")
+            print(f"✓ 完了 ({result['duration_ms']}ms, 最大チャンク {result['max_chunk_ms']}ms)")
+        except Exception as e:
+            print(f"❌ 失敗: {e}")
+    
+    @staticmethod
+    def enable_incremental_vacuum():
+        """DBを auto_vacuum=INCREMENTAL に切り替え（VACUUM を実行）"""
+        confirm = input("⚠️  VACUUM 中は書き込みが停止します。実行しますか? (yes/no): ")
+        if confirm.lower() != 'yes':
+            print("キャンセルしました")
+            return
+        print("🗄️  VACUUM を実行中...")
+        try:
+            from database.queries import RetentionQueries
+            RetentionQueries.enable_incremental_vacuum()
+            info = RetentionQueries.get_vacuum_info()
+            print(f"✓ auto_vacuum={info['auto_vacuum']} ({info['page_count'] * info['page_size'] / (1024**2):.1f} MB)")
+        except Exception as e:
+            print(f"❌ 失敗: {e}")
+
 def main():
     parser = argparse.ArgumentParser(
         description="🔧 Raspberry Pi 温度サーバー管理ツール"
@@ -241,6 +275,8 @@ def main():
     subparsers.add_parser('clear-cache', help='キャッシュをクリア')
     subparsers.add_parser('reboot', help='システムを再起動')
     subparsers.add_parser('init-db', help='データベースを初期化')
+    subparsers.add_parser('retention', help='保持期間を過ぎたデータを削除')
+    subparsers.add_parser('vacuum-enable', help='DBを auto_vacuum=INCREMENTAL に切り替え')
     
     args = parser.parse_args()
     
@@ -280,6 +316,10 @@ def main():
         CLIManager.reboot()
     elif args.command == 'init-db':
         CLIManager.init_database()
+    elif args.command == 'retention':
+        CLIManager.run_retention()
+    elif args.command == 'vacuum-enable':
+        CLIManager.enable_incremental_vacuum()
 
 if __name__ == '__main__':
     main()
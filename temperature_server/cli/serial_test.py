@@ -30,6 +30,7 @@ temperature_server/cli/serial_test.py
    
 2. テストJSONを送信する場合:
    python cli/serial_test.py --send /dev/ttyUSB0
+   （--binary を付けるとバイナリフレーム形式で送信）
    
 3. シリアルポート一覧を確認:
    python cli/serial_test.py --list
@@ -48,6 +49,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from services.serial_reader import SerialReader, create_serial_reader
+from services.serial_frames import encode_frame
 from config import Config
 from logger import setup_logger
 
@@ -73,9 +75,16 @@ def list_serial_ports():
             print(f"  ⚠️  {port} (cannot connect)")
 
 
-def send_test_data(port='/dev/ttyUSB0'):
+def _encode_test_data(data, binary):
+    """テストデータを送信用のバイト列に変換（JSON行 または バイナリフレーム）"""
+    if binary:
+        return encode_frame(data['device_id'], data['sensors'])
+    return (json.dumps(data) + "\n").encode()
+
+
+def send_test_data(port='/dev/ttyUSB0', binary=False):
     """テストデータを送信"""
-    print(f"📤 Sending test data to {port}...")
+    print(f"📤 Sending test data to {port} ({'binary' if binary else 'JSON'})...")
     
     try:
         ser = serial.Serial(port, 115200, timeout=1)
@@ -95,9 +104,9 @@ def send_test_data(port='/dev/ttyUSB0'):
         }
         
         print(f"  Test 1: Single sensor")
-        json_line = json.dumps(test_data_1) + "\n"
-        ser.write(json_line.encode())
-        print(f"    Sent: {json_line.strip()}")
+        payload = _encode_test_data(test_data_1, binary)
+        ser.write(payload)
+        print(f"    Sent: {len(payload)} bytes")
         time.sleep(1)
         
         # テスト2: 複数センサー
@@ -129,9 +138,9 @@ def send_test_data(port='/dev/ttyUSB0'):
         }
         
         print(f"  Test 2: Multiple sensors (ESP32 + ESP8266)")
-        json_line = json.dumps(test_data_2) + "\n"
-        ser.write(json_line.encode())
-        print(f"    Sent: {json_line.strip()}")
+        payload = _encode_test_data(test_data_2, binary)
+        ser.write(payload)
+        print(f"    Sent: {len(payload)} bytes")
         
         print("✅ Test data sent successfully")
         ser.close()
@@ -190,6 +199,12 @@ def main():
         help='Send test data to serial port (default: /dev/ttyUSB0)'
     )
     
+    parser.add_argument(
+        '--binary',
+        action='store_true',
+        help='Send test data as binary frames instead of JSON lines (with --send)'
+    )
+    
     args = parser.parse_args()
     
     if args.list:
@@ -197,7 +212,7 @@ def main():
     elif args.listen:
         listen_serial()
     elif args.send:
-        send_test_data(args.send)
+        send_test_data(args.send, binary=args.binary)
     else:
         parser.print_help()
 
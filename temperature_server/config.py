@@ -33,8 +33,8 @@ class Config:
 
     # ===== ディレクトリ設定 =====
     BASE_DIR = Path(__file__).parent
-    DATA_DIR = BASE_DIR / 'data'
-    LOGS_DIR = BASE_DIR / 'logs'
+    DATA_DIR = Path(os.getenv('DATA_DIR', BASE_DIR / 'data'))
+    LOGS_DIR = Path(os.getenv('LOGS_DIR', BASE_DIR / 'logs'))
 
     # ディレクトリを作成
     DATA_DIR.mkdir(exist_ok=True)
@@ -51,6 +51,19 @@ class Config:
     LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', 30))
     LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))  # 10MB
     LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json（JSON Lines） / text
+    LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 512))  # 書き込みスレッドが1回にまとめる最大レコード数
+    # ログのローテーション: internal（毎日0時にプロセス内で切り替え、1プロセス用）/
+    # external（logrotate 等で切り替え、移動・削除されたファイルを開き直す。gunicorn の複数ワーカーでは external）
+    LOG_ROTATION = os.getenv('LOG_ROTATION', 'internal')
+    # リクエストログ（エンドポイントごとの詳細度: off / summary / full、サンプリング率 0.0〜1.0）
+    REQUEST_LOG_LEVEL = os.getenv('REQUEST_LOG_LEVEL', 'summary')
+    REQUEST_LOG_SAMPLE_RATE = float(os.getenv('REQUEST_LOG_SAMPLE_RATE', 1.0))
+    REQUEST_LOG_SLOW_MS = float(os.getenv('REQUEST_LOG_SLOW_MS', 1000))  # これより遅いリクエストは必ず記録
+    REQUEST_LOG_ROUTES = os.getenv(
+        'REQUEST_LOG_ROUTES',
+        'api.receive_temperature=summary:0.01,api.receive_temperature_bulk=summary:0.1,static=off'
+    )
 
     # ===== CORS設定 =====
     ALLOWED_ORIGINS = os.getenv(
@@ -60,7 +73,89 @@ class Config:
 
     # ===== シリアル通信設定（USB/Serial経由のESP32データ受信） =====
     SERIAL_ENABLED = os.getenv('SERIAL_ENABLED', 'True').lower() == 'true'
-    SERIAL_PORT = os.getenv('SERIAL_PORT', None)  # None=自動検出、例: '/dev/ttyUSB0'
+    SERIAL_PORT = os.getenv('SERIAL_PORT', None)  # None=自動検出、例: '/dev/ttyUSB0'（カンマ区切りで複数指定可）
+    SERIAL_PORT_PATTERNS = os.getenv('SERIAL_PORT_PATTERNS', '/dev/ttyUSB*,/dev/ttyACM*')  # 自動検出の glob パターン
     SERIAL_BAUDRATE = int(os.getenv('SERIAL_BAUDRATE', 115200))  # ボーレート
     SERIAL_TIMEOUT = float(os.getenv('SERIAL_TIMEOUT', 1.0))  # タイムアウト（秒）
+    SERIAL_MAX_LINE_LENGTH = int(os.getenv('SERIAL_MAX_LINE_LENGTH', 4096))  # 1行の最大バイト数（超過分は破棄）
+    SERIAL_SCAN_INTERVAL = float(os.getenv('SERIAL_SCAN_INTERVAL', 5.0))  # ポートの再スキャン間隔（秒）
+    SERIAL_RECONNECT_INITIAL = float(os.getenv('SERIAL_RECONNECT_INITIAL', 1.0))  # 再接続の初回待ち時間（秒、失敗ごとに倍）
+    SERIAL_RECONNECT_MAX = float(os.getenv('SERIAL_RECONNECT_MAX', 60.0))  # 再接続の最大待ち時間（秒）
+    SERIAL_PARSE_QUEUE_SIZE = int(os.getenv('SERIAL_PARSE_QUEUE_SIZE', 1000))  # 受信→パース間のキューの最大行数（超過分は破棄）
 
+    # ===== データ取り込み設定（書き込みキュー） =====
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 200))  # 1トランザクションの最大行数
+    INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 0.25))  # 秒
+    INGEST_QUEUE_MAXSIZE = int(os.getenv('INGEST_QUEUE_MAXSIZE', 10000))  # キューの最大件数
+    INGEST_SPILL_FILE = os.getenv('INGEST_SPILL_FILE', str(DATA_DIR / 'ingest_spill.jsonl'))  # コミットできなかった行の退避先
+    INGEST_REJECTED_FILE = os.getenv('INGEST_REJECTED_FILE', str(DATA_DIR / 'ingest_rejected.jsonl'))  # 内容が不正で書き込めない行の記録先
+
+    # ===== 一括アップロード設定（POST /api/temperature/bulk） =====
+    BULK_MAX_READINGS = int(os.getenv('BULK_MAX_READINGS', 5000))  # 1リクエストの最大件数
+    BULK_MAX_BODY_BYTES = int(os.getenv('BULK_MAX_BODY_BYTES', 5 * 1024 * 1024))  # ボディの最大サイズ（gzip展開後）
+    BULK_MAX_CLOCK_SKEW = float(os.getenv('BULK_MAX_CLOCK_SKEW', 300))  # 未来の時刻として許容する誤差（秒）
+    BULK_MAX_AGE_DAYS = float(os.getenv('BULK_MAX_AGE_DAYS', 30))  # 受け付ける測定時刻の古さ（日）
+
+    # ===== データベース設定（SQLite） =====
+    DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', 8))  # 読み取り接続の保持数
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')  # WAL では NORMAL で十分
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 64 * 1024 * 1024))  # 64MB
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 8192))  # 接続ごとのページキャッシュ（KB）
+    DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', 5.0))  # 秒
+    DB_WATCH_INTERVAL = float(os.getenv('DB_WATCH_INTERVAL', 0.25))  # 他プロセスの書き込みを検知する間隔（秒、複数ワーカー時）
+    ROLLUP_RAW_ROW_LIMIT = int(os.getenv('ROLLUP_RAW_ROW_LIMIT', 20000))  # 期間内の生データがこの件数を超えるセンサーのみ集計テーブルからグラフを返す
+
+    # ===== 本番サーバー設定（gunicorn、gunicorn.conf.py で使用） =====
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 2))  # ワーカープロセス数
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 32))  # ワーカーあたりのスレッド数（SSE接続も1本ずつ占有する）
+    WEB_KEEPALIVE = int(os.getenv('WEB_KEEPALIVE', 5))  # keep-alive 接続の待ち時間（秒）
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 30))  # 応答しないワーカーを再起動するまでの時間（秒）
+    PRIMARY_LOCK_FILE = os.getenv('PRIMARY_LOCK_FILE', str(DATA_DIR / 'primary.lock'))  # シリアル受信等を担当するプロセスのロック
+
+    # ===== リアルタイム配信設定（Server-Sent Events） =====
+    STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', 20))  # 同時接続数の上限
+    STREAM_CLIENT_QUEUE_SIZE = int(os.getenv('STREAM_CLIENT_QUEUE_SIZE', 100))  # 接続ごとの未送信バッチ上限
+    STREAM_HEARTBEAT_INTERVAL = float(os.getenv('STREAM_HEARTBEAT_INTERVAL', 15.0))  # 秒
+    ASYNC_STREAM_MAX_CLIENTS = int(os.getenv('ASYNC_STREAM_MAX_CLIENTS', 2000))  # asyncio サーバー（run_async.py）の同時接続数の上限
+
+    # ===== HTTPキャッシュ設定（読み取りAPIの ETag / Cache-Control） =====
+    HTTP_CACHE_LATEST = os.getenv('HTTP_CACHE_LATEST', 'no-cache')  # /api/sensors（毎回再検証、変更がなければ 304）
+    HTTP_CACHE_HISTORY = os.getenv('HTTP_CACHE_HISTORY', 'private, max-age=10')  # 履歴・一括取得
+    HTTP_CACHE_WINDOW = float(os.getenv('HTTP_CACHE_WINDOW', 60))  # 期間指定のデータの ETag を変える間隔（秒）
+
+    # ===== 応答キャッシュ設定（一括取得のシリアライズ済みボディ、utils/response_cache.py） =====
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 128))  # 最大エントリ数
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 16 * 1024 * 1024))  # ボディの合計サイズの上限
+    RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 15))  # エントリの有効期間（秒、期間指定の範囲のずれの上限）
+
+    # ===== レスポンス圧縮設定（utils/compression.py） =====
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'True').lower() == 'true'
+    COMPRESS_ALGORITHMS = os.getenv('COMPRESS_ALGORITHMS', 'zstd,br,gzip')  # 優先順（brotli・zstandard は未インストールなら使わない）
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # これより小さいボディは圧縮しない（バイト）
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', 5))
+    COMPRESS_ZSTD_LEVEL = int(os.getenv('COMPRESS_ZSTD_LEVEL', 3))
+    COMPRESS_CACHE_MAX_ENTRIES = int(os.getenv('COMPRESS_CACHE_MAX_ENTRIES', 256))  # 圧縮済みボディのキャッシュ（ETag ごと）
+    COMPRESS_CACHE_MAX_BYTES = int(os.getenv('COMPRESS_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    COMPRESS_CACHE_TTL = float(os.getenv('COMPRESS_CACHE_TTL', 300))
+
+    # ===== JSON エンコーダー設定（utils/json_provider.py） =====
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson')  # orjson（未インストールなら標準の json）/ stdlib
+
+    # ===== データエクスポート設定（services/data_export.py） =====
+    EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', 2000))  # 1回の SELECT で読む行数（出力チャンクの単位）
+    EXPORT_ROW_GROUP_SIZE = int(os.getenv('EXPORT_ROW_GROUP_SIZE', 65536))  # parquet の row group・arrow の出力チャンクの行数
+    EXPORT_PARQUET_COMPRESSION = os.getenv('EXPORT_PARQUET_COMPRESSION', 'zstd')  # zstd / snappy / gzip / none
+    EXPORT_ARROW_COMPRESSION = os.getenv('EXPORT_ARROW_COMPRESSION', 'zstd')  # Arrow IPC のバッファ圧縮（zstd / lz4 / none）
+
+    # ===== データ保持設定（リテンション） =====
+    # 定期実行は明示的に有効にした場合のみ（古いデータを削除するため、既定では無効）
+    RETENTION_ENABLED = os.getenv('RETENTION_ENABLED', 'False').lower() == 'true'
+    RETENTION_RAW_DAYS = int(os.getenv('RETENTION_RAW_DAYS', 90))  # 生データの保持日数（0=無期限）
+    RETENTION_ROLLUP_1M_DAYS = int(os.getenv('RETENTION_ROLLUP_1M_DAYS', 365))  # 1分集計の保持日数（0=無期限）
+    RETENTION_ROLLUP_YEARS = int(os.getenv('RETENTION_ROLLUP_YEARS', 5))  # 1時間/1日集計の保持年数（0=無期限）
+    RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', 3600))  # 実行間隔（秒）
+    RETENTION_CHUNK_SIZE = int(os.getenv('RETENTION_CHUNK_SIZE', 2000))  # 1トランザクションで削除する最大行数
+    RETENTION_CHUNK_PAUSE = float(os.getenv('RETENTION_CHUNK_PAUSE', 0.05))  # チャンク間の待ち時間（秒）
+    RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', 256))  # incremental_vacuum 1回あたりのページ数
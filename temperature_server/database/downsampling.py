@@ -0,0 +1,317 @@
+"""
+temperature_server/database/downsampling.py
+温度データの間引き（ダウンサンプリング）エンジン
+
+モード:
+- extremes: 最初/最後・最大値/最小値・急激な変化・均等間引きを保持（従来方式）
+- lttb:     Largest-Triangle-Three-Buckets（グラフの形状を保つ）
+- minmax:   バケットごとの最小値・最大値を保持（スパイクを落とさない）
+
+NumPy がある場合は連続した float64 配列上でベクトル化して処理する。
+NumPy がない場合は従来の Python 実装（extremes）にフォールバックする。
+"""
+
+import logging
+
+# numpyはオプション（インストールされていなくても動作する）
+try:
+    import numpy as np
+    numpy_available = True
+except ImportError:
+    np = None
+    numpy_available = False
+
+logger = logging.getLogger(__name__)
+
+DOWNSAMPLE_MODES = ('extremes', 'lttb', 'minmax')
+DEFAULT_DOWNSAMPLE_MODE = 'extremes'
+
+# extremes モードで「急激な変化」とみなす温度差（°C）
+CHANGE_THRESHOLD = 0.5
+
+
+def downsample_legacy(data_points, max_points):
+    """
+    温度データを間引き（最大値・最小値・急激な変化を保持）
+
+    従来の Python 実装（NumPy がない環境でのフォールバック、ベンチマークの基準）
+
+    Args:
+        data_points: 温度データのリスト（dict形式、temperatureキーを含む）
+        max_points: 最大データポイント数
+
+    Returns:
+        間引き後のデータポイントリスト
+    """
+    if len(data_points) <= max_points:
+        return data_points
+
+    downsampled = []
+
+    # 1. 最初と最後のポイントは必ず含める
+    downsampled.append(data_points[0])
+
+    # 2. 最大値・最小値を検出して保持
+    max_temp = data_points[0].get('temperature', 0)
+    min_temp = data_points[0].get('temperature', 0)
+    max_index = 0
+    min_index = 0
+
+    for i in range(1, len(data_points) - 1):
+        temp = data_points[i].get('temperature', 0)
+        if temp > max_temp:
+            max_temp = temp
+            max_index = i
+        if temp < min_temp:
+            min_temp = temp
+            min_index = i
+
+    # 重複チェック用のセット（O(1)参照で高速化）
+    added_indices = {0}  # 最初のポイントのインデックス
+
+    # 最大値・最小値のポイントを追加（重複チェック）
+    if max_index > 0 and max_index < len(data_points) - 1:
+        if max_index not in added_indices:
+            downsampled.append(data_points[max_index])
+            added_indices.add(max_index)
+
+    if min_index > 0 and min_index < len(data_points) - 1 and min_index != max_index:
+        if min_index not in added_indices:
+            downsampled.append(data_points[min_index])
+            added_indices.add(min_index)
+
+    # 3. 急激な変化（変化率が大きい箇所）を検出して保持
+    important_indices = set()
+
+    for i in range(1, len(data_points) - 1):
+        prev_temp = data_points[i - 1].get('temperature', 0)
+        curr_temp = data_points[i].get('temperature', 0)
+        next_temp = data_points[i + 1].get('temperature', 0)
+
+        # 前後のポイントとの変化率を計算
+        change1 = abs(curr_temp - prev_temp)
+        change2 = abs(next_temp - curr_temp)
+
+        # 急激な変化がある場合は保持
+        if change1 > CHANGE_THRESHOLD or change2 > CHANGE_THRESHOLD:
+            important_indices.add(i)
+
+    # 重要ポイントを追加（最大値・最小値と重複しないように）
+    for index in important_indices:
+        if index not in added_indices:
+            downsampled.append(data_points[index])
+            added_indices.add(index)
+
+    # 4. 残りのポイントを均等に間引き
+    remaining_slots = max_points - len(downsampled) - 1  # -1は最後のポイント用
+    if remaining_slots > 0:
+        adjusted_step = max(1, (len(data_points) - 1) // remaining_slots)
+        for i in range(adjusted_step, len(data_points) - 1, adjusted_step):
+            # 既に追加されているポイントはスキップ
+            if i not in added_indices:
+                downsampled.append(data_points[i])
+                added_indices.add(i)
+
+    # 5. 最後のポイントを追加
+    if len(data_points) > 1:
+        last_index = len(data_points) - 1
+        if last_index not in added_indices:
+            downsampled.append(data_points[last_index])
+            added_indices.add(last_index)
+
+    # 6. 元の並び順（時系列順）に戻す（タイムスタンプの文字列比較は不要）
+    return [data_points[i] for i in sorted(added_indices)]
+
+
+def _extremes_indices(y, max_points):
+    """extremes モード（従来方式と同じ選択規則）のベクトル化実装"""
+    n = len(y)
+    last = n - 1
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = True
+
+    # 最大値・最小値（最後のポイントを除き、同値の場合は先頭を採用）
+    max_index = int(np.argmax(y[:last]))
+    min_index = int(np.argmin(y[:last]))
+    if 0 < max_index < last:
+        keep[max_index] = True
+    if 0 < min_index < last:
+        keep[min_index] = True
+
+    # 前後いずれかとの差が閾値を超える内部ポイント
+    diffs = np.abs(np.diff(y))
+    keep[1:last] |= (diffs[:-1] > CHANGE_THRESHOLD) | (diffs[1:] > CHANGE_THRESHOLD)
+
+    # 残り枠を均等間引きで埋める（最後のポイント分を1枠確保）
+    remaining_slots = max_points - int(np.count_nonzero(keep)) - 1
+    if remaining_slots > 0:
+        step = max(1, last // remaining_slots)
+        keep[step:last:step] = True
+
+    keep[last] = True
+    return np.flatnonzero(keep)
+
+
+def _lttb_indices(y, x, max_points):
+    """Largest-Triangle-Three-Buckets"""
+    n = len(y)
+    if max_points < 3:
+        return np.array([0, n - 1], dtype=np.int64)
+
+    # 先頭・末尾を除いた区間を max_points - 2 個のバケットに分割
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # 次のバケットの平均（最後のバケットの次は末尾ポイント）
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # 直前の選択点・候補点・次バケット平均が作る三角形の面積（定数倍）
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def _minmax_indices(y, max_points):
+    """バケットごとの最小値・最大値（先頭・末尾を含む）"""
+    n = len(y)
+    buckets = max(1, (max_points - 2) // 2)
+    size = -(-n // buckets)  # 切り上げ
+    padded = buckets * size
+
+    # 端数を埋めて (バケット数, バケット幅) の2次元配列として一括処理
+    low = np.full(padded, np.inf)
+    high = np.full(padded, -np.inf)
+    low[:n] = y
+    high[:n] = y
+    offsets = np.arange(0, padded, size)
+    mins = offsets + np.argmin(low.reshape(buckets, size), axis=1)
+    maxs = offsets + np.argmax(high.reshape(buckets, size), axis=1)
+
+    indices = np.concatenate(([0, n - 1], mins, maxs))
+    return np.unique(indices[indices < n])
+
+
+def select_indices(temperatures, max_points, mode=DEFAULT_DOWNSAMPLE_MODE, times=None):
+    """
+    間引き後に残すインデックスを選択（時系列順）
+
+    Args:
+        temperatures: 温度の配列（時系列順）
+        max_points: 最大データポイント数
+        mode: DOWNSAMPLE_MODES のいずれか
+        times: 時刻の配列（lttb のX軸、省略時は等間隔とみなす）
+
+    Returns:
+        numpy.ndarray (int64) のインデックス
+    """
+    if mode not in DOWNSAMPLE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(DOWNSAMPLE_MODES)}")
+
+    y = np.ascontiguousarray(temperatures, dtype=np.float64)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n, dtype=np.int64)
+
+    if mode == 'lttb':
+        if times is None:
+            x = np.arange(n, dtype=np.float64)
+        else:
+            x = np.ascontiguousarray(times, dtype=np.float64)
+        return _lttb_indices(y, x, max_points)
+    if mode == 'minmax':
+        return _minmax_indices(y, max_points)
+    return _extremes_indices(y, max_points)
+
+
+def _timestamps_to_seconds(data_points):
+    """
+    各ポイントの時刻をエポック秒の配列に変換（解析できない場合None）
+
+    ts（エポックミリ秒）があればそれを使い、なければ timestamp 文字列を解析する
+    """
+    if data_points[0].get('ts') is not None:
+        try:
+            return np.fromiter(
+                (point['ts'] for point in data_points), dtype=np.float64, count=len(data_points)
+            ) / 1000.0
+        except (KeyError, TypeError):
+            pass
+    try:
+        stamps = np.array([point.get('timestamp') for point in data_points], dtype='datetime64[s]')
+        return stamps.astype(np.int64).astype(np.float64)
+    except (ValueError, TypeError):
+        return None
+
+
+def downsample_readings(data_points, max_points, mode=DEFAULT_DOWNSAMPLE_MODE):
+    """
+    温度データ（dictのリスト）を間引き
+
+    Args:
+        data_points: 温度データのリスト（dict形式、temperature / timestamp キーを含む、時系列順）
+        max_points: 最大データポイント数
+        mode: DOWNSAMPLE_MODES のいずれか
+
+    Returns:
+        間引き後のデータポイントリスト（入力と同じdictを時系列順で返す）
+    """
+    if mode not in DOWNSAMPLE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(DOWNSAMPLE_MODES)}")
+
+    if len(data_points) <= max_points:
+        return data_points
+
+    if not numpy_available:
+        if mode != DEFAULT_DOWNSAMPLE_MODE:
+            logger.debug(f"numpy not installed, falling back to '{DEFAULT_DOWNSAMPLE_MODE}' downsampling")
+        return downsample_legacy(data_points, max_points)
+
+    temperatures = np.fromiter(
+        (point.get('temperature', 0) for point in data_points),
+        dtype=np.float64,
+        count=len(data_points)
+    )
+    times = _timestamps_to_seconds(data_points) if mode == 'lttb' else None
+    indices = select_indices(temperatures, max_points, mode, times)
+    return [data_points[i] for i in indices.tolist()]
+
+
+def select_column_indices(temperatures, max_points, mode=DEFAULT_DOWNSAMPLE_MODE, times=None):
+    """
+    列形式データ用に残すインデックスを選択（NumPy がなくても動作）
+
+    Args:
+        temperatures: 温度のシーケンス（時系列順）
+        max_points: 最大データポイント数
+        mode: DOWNSAMPLE_MODES のいずれか
+        times: 時刻のシーケンス（lttb のX軸）
+
+    Returns:
+        インデックスのリスト
+    """
+    if mode not in DOWNSAMPLE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(DOWNSAMPLE_MODES)}")
+
+    n = len(temperatures)
+    if n <= max_points:
+        return list(range(n))
+
+    if numpy_available:
+        return select_indices(temperatures, max_points, mode, times).tolist()
+
+    # 従来実装にインデックスを timestamp として渡して選択結果を得る
+    points = [{'temperature': t, 'timestamp': i} for i, t in enumerate(temperatures)]
+    return [point['timestamp'] for point in downsample_legacy(points, max_points)]
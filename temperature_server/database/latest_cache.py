@@ -0,0 +1,149 @@
+"""
+temperature_server/database/latest_cache.py
+センサーごとの最新データのメモリキャッシュ
+
+- 起動時（または初回アクセス時）に sensor_latest テーブルから読み込む
+- 取り込みパスがコミットするたびに該当センサーを更新する
+- 参照は SQL を発行せず O(センサー数) で返す
+- データが変わるたび（取り込みのコミット・削除・他プロセスの変更の反映）に version を進める
+  （HTTP キャッシュの ETag / Last-Modified に使用、utils/http_cache.py）
+- センサーごとの版（sensor_stamp()）も持ち、応答キャッシュ（utils/response_cache.py）は
+  対象センサーのデータが変わったときだけ無効にする
+"""
+
+import threading
+import time
+from database.models import read_connection
+
+# sensor_latest から取得する列（temperatures の SELECT * と同じ順序）
+LATEST_COLUMNS = (
+    'id', 'sensor_id', 'sensor_name', 'temperature', 'humidity',
+    'rssi', 'battery_mode', 'connection_type', 'timestamp', 'ts'
+)
+
+
+class LatestReadingCache:
+    """センサーごとの最新データキャッシュ（スレッドセーフ）"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._pending = None
+        # データの版（変更のたびに増える）と最終変更時刻（エポック秒）
+        self.version = 0
+        self.modified_at = time.time()
+        # センサーごとの最終変更時の版と、全センサーが変わった（削除・再読み込み）ときの版
+        self._sensor_versions = {}
+        self._reset_version = 0
+
+    def _bump(self, sensor_ids=None):
+        """
+        データの版を進める（ロック内で呼ぶ）
+
+        Args:
+            sensor_ids: 変更されたセンサーID（None の場合は全センサー）
+        """
+        self.version += 1
+        self.modified_at = time.time()
+        if sensor_ids is None:
+            # 削除や他プロセスの変更は影響範囲が分からないため全センサーを変更扱いにする
+            self._reset_version = self.version
+            self._sensor_versions = {}
+        else:
+            for sensor_id in sensor_ids:
+                self._sensor_versions[sensor_id] = self.version
+
+    def sensor_stamp(self, sensor_ids):
+        """
+        指定センサーのデータの版（いずれかのデータが変わると値が変わる）
+
+        Args:
+            sensor_ids: センサーIDのリスト
+
+        Returns:
+            tuple: 比較用の値
+        """
+        with self._lock:
+            versions = self._sensor_versions
+            return (self._reset_version,) + tuple(versions.get(sensor_id, 0) for sensor_id in sensor_ids)
+
+    def reload(self, changed_sensor_ids=None):
+        """
+        sensor_latest テーブルからキャッシュを再構築
+
+        Args:
+            changed_sensor_ids: 変更されたことが分かっているセンサーID（他プロセスの変更の反映で、
+                新着行のセンサー）。指定した場合は、それらと最新データが変わったセンサーの版だけを進める
+                （センサーが消えた場合は全センサー）。None の場合は全センサーを変更扱いにする
+        """
+        with self._lock:
+            # 読み込み中に update() で反映されたデータを記録する
+            self._pending = {}
+
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(LATEST_COLUMNS)} FROM sensor_latest")
+            data = {row['sensor_id']: dict(row) for row in cursor.fetchall()}
+
+        with self._lock:
+            for sensor_id, row in (self._pending or {}).items():
+                loaded = data.get(sensor_id)
+                if loaded is None or row['ts'] >= loaded['ts']:
+                    data[sensor_id] = row
+            self._pending = None
+            previous = self._data if self._loaded else None
+            self._data = data
+            self._loaded = True
+            if changed_sensor_ids is None or previous is None or not previous.keys() <= data.keys():
+                self._bump()
+                return
+            changed = set(changed_sensor_ids)
+            changed.update(sensor_id for sensor_id, row in data.items() if previous.get(sensor_id) != row)
+            if changed:
+                self._bump(changed)
+
+    def invalidate(self):
+        """キャッシュを破棄（削除処理の後に使用、次回参照時に再読み込み）"""
+        with self._lock:
+            self._data = {}
+            self._loaded = False
+            self._bump()
+
+    def update(self, rows):
+        """
+        最新データを反映（タイムスタンプが古いものは無視）
+
+        Args:
+            rows: sensor_latest の行（dict）のリスト
+        """
+        with self._lock:
+            for row in rows:
+                current = self._data.get(row['sensor_id'])
+                if current is None or row['ts'] >= current['ts']:
+                    self._data[row['sensor_id']] = row
+                if self._pending is not None:
+                    self._pending[row['sensor_id']] = row
+            if rows:
+                self._bump({row['sensor_id'] for row in rows})
+
+    def get(self, sensor_id):
+        """指定センサーの最新データを取得（存在しない場合None）"""
+        if not self._loaded:
+            self.reload()
+        row = self._data.get(sensor_id)
+        return dict(row) if row else None
+
+    def get_all(self):
+        """全センサーの最新データを sensor_id 順で取得"""
+        if not self._loaded:
+            self.reload()
+        with self._lock:
+            rows = list(self._data.values())
+        rows.sort(key=lambda row: row['sensor_id'])
+        # 呼び出し側での変更がキャッシュに影響しないようコピーを返す
+        return [dict(row) for row in rows]
+
+
+# グローバルインスタンス
+latest_cache = LatestReadingCache()
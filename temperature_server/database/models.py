@@ -1,20 +1,107 @@
 """
 temperature_server/database/models.py
-SQLite スキーマ定義
+SQLite スキーマ定義・接続管理
 """
 
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from config import Config
 
 DB_PATH = Path(Config.DATA_DIR) / "temperature.db"
 
+# synchronous に指定可能な値
+_SYNCHRONOUS_LEVELS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+# 集計テーブル（ロールアップ）の解像度定義（粗い順）
+# bucket_sql: timestamp 列からバケット開始時刻を求めるSQL式
+# floor_format: Python 側で datetime をバケット開始時刻に丸める書式
+ROLLUP_RESOLUTIONS = {
+    '1d': {
+        'table': 'temperature_rollup_1d',
+        'seconds': 86400,
+        'bucket_sql': "substr({ts}, 1, 10) || ' 00:00:00'",
+        'floor_format': '%Y-%m-%d 00:00:00',
+    },
+    '1h': {
+        'table': 'temperature_rollup_1h',
+        'seconds': 3600,
+        'bucket_sql': "substr({ts}, 1, 13) || ':00:00'",
+        'floor_format': '%Y-%m-%d %H:00:00',
+    },
+    '1m': {
+        'table': 'temperature_rollup_1m',
+        'seconds': 60,
+        'bucket_sql': "substr({ts}, 1, 16) || ':00'",
+        'floor_format': '%Y-%m-%d %H:%M:00',
+    },
+}
+
+# JST の 'YYYY-MM-DD HH:MM:SS' 文字列をエポックミリ秒に変換するSQL式
+JST_EPOCH_MS_SQL = "(CAST(strftime('%s', {column}) AS INTEGER) - 32400) * 1000"
+
+# sensor_latest の列（temperatures と同じ順序）
+_LATEST_COLUMNS_SQL = "sensor_id, id, sensor_name, temperature, humidity, rssi, battery_mode, connection_type, timestamp, ts"
+
+
+def _rollup_upsert_sql(resolution, source):
+    """
+    集計テーブルへの UPSERT 文を生成
+    
+    Args:
+        resolution: ROLLUP_RESOLUTIONS のキー
+        source: 'VALUES'（トリガー内、NEW行から）または 'SELECT'（temperatures 全体から再構築）
+    """
+    spec = ROLLUP_RESOLUTIONS[resolution]
+    
+    if source == 'VALUES':
+        bucket = spec['bucket_sql'].format(ts='NEW.timestamp')
+        rows = f"""VALUES (NEW.sensor_id, {bucket}, 1, NEW.temperature, NEW.temperature, NEW.temperature,
+                    NEW.temperature, NEW.timestamp, NEW.temperature, NEW.timestamp)"""
+    else:
+        bucket = spec['bucket_sql'].format(ts='timestamp')
+        # WHERE true は UPSERT 構文との曖昧さを避けるため
+        rows = f"""SELECT sensor_id, {bucket}, 1, temperature, temperature, temperature,
+                    temperature, timestamp, temperature, timestamp
+                FROM temperatures WHERE true ORDER BY id"""
+    
+    # DO UPDATE SET の右辺はすべて更新前の値で評価される
+    return f"""
+        INSERT INTO {spec['table']}
+        (sensor_id, bucket, count, min_temp, max_temp, sum_temp,
+         first_temp, first_timestamp, last_temp, last_timestamp)
+        {rows}
+        ON CONFLICT(sensor_id, bucket) DO UPDATE SET
+            count = count + 1,
+            min_temp = MIN(min_temp, excluded.min_temp),
+            max_temp = MAX(max_temp, excluded.max_temp),
+            sum_temp = sum_temp + excluded.sum_temp,
+            first_temp = CASE WHEN excluded.first_timestamp < first_timestamp
+                              THEN excluded.first_temp ELSE first_temp END,
+            first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+            last_temp = CASE WHEN excluded.last_timestamp >= last_timestamp
+                             THEN excluded.last_temp ELSE last_temp END,
+            last_timestamp = MAX(last_timestamp, excluded.last_timestamp)
+    """
+
+
 def init_database():
     """データベーステーブルを初期化"""
     conn = sqlite3.connect(str(DB_PATH))
     cursor = conn.cursor()
     
+    # 削除した領域を少しずつファイルから返せるようにする
+    # （テーブル作成前のみ有効、既存DBは RetentionQueries.enable_incremental_vacuum() で切り替え）
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    
+    # WALモード（DBファイルに永続化され、読み取りと書き込みが並行可能になる）
+    cursor.execute("PRAGMA journal_mode=WAL")
+    
     # 温度データテーブル
+    # ts: エポックミリ秒（範囲検索・並び替えに使用）
+    # timestamp: JST文字列（互換性のため保持）
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS temperatures (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -25,16 +112,132 @@ def init_database():
             rssi INTEGER,
             battery_mode INTEGER DEFAULT 0,
             connection_type TEXT DEFAULT 'unknown',
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ts INTEGER
         )
     """)
     
-    # インデックス作成（クエリ高速化）
+    # センサーごとの最新データ（get_all_latest 用のマテリアライズドテーブル）
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_sensor_timestamp 
-        ON temperatures(sensor_id, timestamp DESC)
+        CREATE TABLE IF NOT EXISTS sensor_latest (
+            sensor_id TEXT PRIMARY KEY,
+            id INTEGER NOT NULL,
+            sensor_name TEXT,
+            temperature REAL NOT NULL,
+            humidity REAL,
+            rssi INTEGER,
+            battery_mode INTEGER DEFAULT 0,
+            connection_type TEXT,
+            timestamp DATETIME,
+            ts INTEGER
+        )
+    """)
+    
+    # 既存DBの移行: ts 列を追加して文字列から埋める
+    _migrate_epoch_timestamps(cursor)
+    
+    # 範囲検索・MAX参照をインデックスのみで完結させるカバリングインデックス
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sensor_ts
+        ON temperatures(sensor_id, ts, temperature)
+    """)
+    # 文字列タイムスタンプのインデックスは ts に置き換え
+    cursor.execute("DROP INDEX IF EXISTS idx_sensor_timestamp")
+    
+    # ts を指定せずに挿入された行（スクリプト・旧バージョン）は文字列から補完
+    new_ts = f"COALESCE(NEW.ts, {JST_EPOCH_MS_SQL.format(column='NEW.timestamp')})"
+    cursor.execute("DROP TRIGGER IF EXISTS trg_temperatures_fill_ts")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_temperatures_fill_ts
+        AFTER INSERT ON temperatures
+        WHEN NEW.ts IS NULL
+        BEGIN
+            UPDATE temperatures SET ts = {new_ts} WHERE id = NEW.id;
+        END
     """)
     
+    # 挿入時に最新データを更新（他プロセスからの書き込みにも追従）
+    # トリガーは定義変更に追従するため毎回作り直す
+    cursor.execute("DROP TRIGGER IF EXISTS trg_sensor_latest_insert")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_sensor_latest_insert
+        AFTER INSERT ON temperatures
+        BEGIN
+            INSERT INTO sensor_latest ({_LATEST_COLUMNS_SQL})
+            VALUES (NEW.sensor_id, NEW.id, NEW.sensor_name, NEW.temperature, NEW.humidity,
+                    NEW.rssi, NEW.battery_mode, NEW.connection_type, NEW.timestamp, {new_ts})
+            ON CONFLICT(sensor_id) DO UPDATE SET
+                id = excluded.id,
+                sensor_name = excluded.sensor_name,
+                temperature = excluded.temperature,
+                humidity = excluded.humidity,
+                rssi = excluded.rssi,
+                battery_mode = excluded.battery_mode,
+                connection_type = excluded.connection_type,
+                timestamp = excluded.timestamp,
+                ts = excluded.ts
+            WHERE excluded.ts >= sensor_latest.ts;
+        END
+    """)
+    
+    # 最新データが削除された場合のみ、残りのデータから再計算
+    cursor.execute("DROP TRIGGER IF EXISTS trg_sensor_latest_delete")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_sensor_latest_delete
+        AFTER DELETE ON temperatures
+        WHEN OLD.id = (SELECT id FROM sensor_latest WHERE sensor_id = OLD.sensor_id)
+        BEGIN
+            DELETE FROM sensor_latest WHERE sensor_id = OLD.sensor_id;
+            INSERT INTO sensor_latest ({_LATEST_COLUMNS_SQL})
+            SELECT sensor_id, id, sensor_name, temperature, humidity, rssi, battery_mode, connection_type, timestamp, MAX(ts)
+            FROM temperatures WHERE sensor_id = OLD.sensor_id
+            GROUP BY sensor_id;
+        END
+    """)
+    
+    # 既存DBの初回移行: 最新データを一括で作成
+    cursor.execute("SELECT COUNT(*) FROM sensor_latest")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"""
+            INSERT INTO sensor_latest ({_LATEST_COLUMNS_SQL})
+            SELECT sensor_id, id, sensor_name, temperature, humidity, rssi, battery_mode, connection_type, timestamp, MAX(ts)
+            FROM temperatures
+            GROUP BY sensor_id
+        """)
+    
+    # 集計テーブル（1分 / 1時間 / 1日）
+    for resolution, spec in ROLLUP_RESOLUTIONS.items():
+        table = spec['table']
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                sensor_id TEXT NOT NULL,
+                bucket DATETIME NOT NULL,
+                count INTEGER NOT NULL,
+                min_temp REAL NOT NULL,
+                max_temp REAL NOT NULL,
+                sum_temp REAL NOT NULL,
+                first_temp REAL NOT NULL,
+                first_timestamp DATETIME NOT NULL,
+                last_temp REAL NOT NULL,
+                last_timestamp DATETIME NOT NULL,
+                PRIMARY KEY (sensor_id, bucket)
+            ) WITHOUT ROWID
+        """)
+        
+        # 挿入時に集計を更新（他プロセスからの書き込みにも追従）
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_insert
+            AFTER INSERT ON temperatures
+            BEGIN
+                {_rollup_upsert_sql(resolution, 'VALUES')};
+            END
+        """)
+        
+        # 既存DBの初回移行: 既存データから集計を作成
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(_rollup_upsert_sql(resolution, 'SELECT'))
+    
     # WiFi 接続履歴
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS wifi_connections (
@@ -101,6 +304,24 @@ def init_database():
     conn.commit()
     conn.close()
 
+def _migrate_epoch_timestamps(cursor):
+    """
+    temperatures / sensor_latest に ts（エポックミリ秒）列を追加し、既存の文字列から埋める
+    
+    列が既に存在する場合は何もしない（以降の挿入は trg_temperatures_fill_ts が補完する）
+    """
+    for table in ('temperatures', 'sensor_latest'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if 'ts' in {row[1] for row in cursor.fetchall()}:
+            continue
+        
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN ts INTEGER")
+        cursor.execute(f"""
+            UPDATE {table} SET ts = {JST_EPOCH_MS_SQL.format(column='timestamp')}
+            WHERE timestamp IS NOT NULL
+        """)
+
+
 def migrate_add_rssi_battery():
     """既存のテーブルに rssi と battery_mode カラムを追加"""
     conn = sqlite3.connect(str(DB_PATH))
@@ -123,8 +344,145 @@ def migrate_add_rssi_battery():
     conn.commit()
     conn.close()
 
-def get_connection():
-    """スレッドセーフなDB接続を取得"""
-    conn = sqlite3.connect(str(DB_PATH), timeout=5.0, check_same_thread=False)
+def _apply_pragmas(conn):
+    """接続ごとのPRAGMAを設定"""
+    synchronous = Config.DB_SYNCHRONOUS.upper()
+    if synchronous not in _SYNCHRONOUS_LEVELS:
+        synchronous = 'NORMAL'
+    
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    conn.execute(f"PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)}")
+    # 負の値はKB単位の指定
+    conn.execute(f"PRAGMA cache_size={-int(Config.DB_CACHE_SIZE_KB)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+
+def _open_connection(readonly=False):
+    """PRAGMA設定済みの接続を作成"""
+    conn = sqlite3.connect(
+        str(DB_PATH),
+        timeout=Config.DB_BUSY_TIMEOUT,
+        check_same_thread=False
+    )
     conn.row_factory = sqlite3.Row
+    _apply_pragmas(conn)
+    if readonly:
+        conn.execute("PRAGMA query_only=1")
     return conn
+
+
+class ConnectionPool:
+    """
+    SQLite 接続プール
+    
+    - 読み取り: スレッドごとに接続を貸し出し、返却後は再利用（ロック不要）
+    - 書き込み: 専用の接続1本を書き込みロックで直列化
+    
+    WALモードのため、読み取りは書き込み中でもブロックされない
+    """
+    
+    def __init__(self, max_readers=8):
+        self.max_readers = max_readers
+        self._readers = queue.LifoQueue(maxsize=max_readers)
+        self._writer = None
+        self.write_lock = threading.RLock()
+    
+    @contextmanager
+    def reader(self):
+        """読み取り用接続を貸し出す"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = _open_connection(readonly=True)
+        
+        try:
+            yield conn
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    @contextmanager
+    def writer(self):
+        """書き込み用接続を貸し出す（終了時にコミット、例外時はロールバック）"""
+        with self.write_lock:
+            if self._writer is None:
+                self._writer = _open_connection()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    
+    def close_all(self):
+        """保持しているすべての接続を閉じる"""
+        with self.write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# グローバル接続プール
+pool = ConnectionPool(max_readers=Config.DB_READ_POOL_SIZE)
+
+
+def read_connection():
+    """読み取り用の接続を取得（with文で使用）"""
+    return pool.reader()
+
+
+def write_connection():
+    """書き込み用の接続を取得（with文で使用、終了時にコミット）"""
+    return pool.writer()
+
+
+@contextmanager
+def export_connection():
+    """
+    エクスポート用の読み取り接続を取得（with文で使用、終了時に close）
+    
+    ダウンロードの間はクライアントの受信速度で保持されるため、プールの接続は使わない
+    （遅いクライアントが DB_READ_POOL_SIZE の接続を使い切らないように）
+    """
+    conn = _open_connection(readonly=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_connection():
+    """
+    単発の接続を取得（スクリプト用、使用後は close() すること）
+    
+    アプリケーション内では read_connection() / write_connection() を使用する
+    """
+    return _open_connection()
+
+
+def backup_database(dest_path):
+    """
+    データベースのバックアップを作成（SQLite のオンラインバックアップ API）
+    
+    WALモードではコミット済みの行がチェックポイントまで temperature.db-wal に残るため、
+    ファイルのコピーではなく読み取り用の接続から一貫したスナップショットを書き出す
+    （書き込みはブロックしない）
+    
+    Args:
+        dest_path: バックアップ先のファイルパス
+    """
+    target = sqlite3.connect(str(dest_path))
+    try:
+        with read_connection() as conn:
+            conn.backup(target)
+    finally:
+        target.close()
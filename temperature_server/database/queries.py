@@ -3,215 +3,547 @@ temperature_server/database/queries.py
 データベースクエリ操作（スレッドセーフ）
 """
 
-import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
-from database.models import get_connection
-
-db_lock = threading.Lock()
+from itertools import groupby
+from operator import itemgetter
+from config import Config
+from database.models import read_connection, write_connection, export_connection, ROLLUP_RESOLUTIONS, JST_EPOCH_MS_SQL
+from database.latest_cache import latest_cache, LATEST_COLUMNS
+from database.downsampling import (
+    downsample_readings,
+    select_column_indices,
+    DOWNSAMPLE_MODES,
+    DEFAULT_DOWNSAMPLE_MODE
+)
 
 # JST タイムゾーン定義
 JST = timezone(timedelta(hours=9))
 
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# エクスポートで出力する列（iter_export_batches の行タプルの順序）
+EXPORT_COLUMNS = (
+    'sensor_id', 'sensor_name', 'temperature', 'humidity', 'rssi',
+    'battery_mode', 'connection_type', 'timestamp', 'ts'
+)
+
+# iter_export_batches のキーセット（idx_sensor_ts の並び順 ts, temperature, rowid）の位置
+_EXPORT_TS = EXPORT_COLUMNS.index('ts')
+_EXPORT_TEMPERATURE = EXPORT_COLUMNS.index('temperature')
+
 
-def _downsample_temperature_data(data_points, max_points):
+def _epoch_ms(dt):
+    """aware な datetime をエポックミリ秒に変換"""
+    return int(dt.timestamp() * 1000)
+
+
+def _downsample_temperature_data(data_points, max_points, mode=DEFAULT_DOWNSAMPLE_MODE):
     """
-    温度データを間引き（最大値・最小値・急激な変化を保持）
+    温度データを間引き（database.downsampling のエンジンを使用）
     
     Args:
         data_points: 温度データのリスト（dict形式、temperatureキーを含む）
         max_points: 最大データポイント数
+        mode: 間引きモード（'extremes' / 'lttb' / 'minmax'）
     
     Returns:
         間引き後のデータポイントリスト
     """
-    if len(data_points) <= max_points:
-        return data_points
-    
-    downsampled = []
-    
-    # 1. 最初と最後のポイントは必ず含める
-    downsampled.append(data_points[0])
-    
-    # 2. 最大値・最小値を検出して保持
-    max_temp = data_points[0].get('temperature', 0)
-    min_temp = data_points[0].get('temperature', 0)
-    max_index = 0
-    min_index = 0
-    
-    for i in range(1, len(data_points) - 1):
-        temp = data_points[i].get('temperature', 0)
-        if temp > max_temp:
-            max_temp = temp
-            max_index = i
-        if temp < min_temp:
-            min_temp = temp
-            min_index = i
-    
-    # 重複チェック用のセット（O(1)参照で高速化）
-    added_indices = {0}  # 最初のポイントのインデックス
-    
-    # 最大値・最小値のポイントを追加（重複チェック）
-    if max_index > 0 and max_index < len(data_points) - 1:
-        if max_index not in added_indices:
-            downsampled.append(data_points[max_index])
-            added_indices.add(max_index)
-    
-    if min_index > 0 and min_index < len(data_points) - 1 and min_index != max_index:
-        if min_index not in added_indices:
-            downsampled.append(data_points[min_index])
-            added_indices.add(min_index)
-    
-    # 3. 急激な変化（変化率が大きい箇所）を検出して保持
-    change_threshold = 0.5  # 0.5°C以上の変化を検出
-    important_indices = set()
-    
-    for i in range(1, len(data_points) - 1):
-        prev_temp = data_points[i - 1].get('temperature', 0)
-        curr_temp = data_points[i].get('temperature', 0)
-        next_temp = data_points[i + 1].get('temperature', 0)
-        
-        # 前後のポイントとの変化率を計算
-        change1 = abs(curr_temp - prev_temp)
-        change2 = abs(next_temp - curr_temp)
-        
-        # 急激な変化がある場合は保持
-        if change1 > change_threshold or change2 > change_threshold:
-            important_indices.add(i)
-    
-    # 重要ポイントを追加（最大値・最小値と重複しないように）
-    for index in important_indices:
-        if index not in added_indices:
-            downsampled.append(data_points[index])
-            added_indices.add(index)
-    
-    # 4. 残りのポイントを均等に間引き
-    remaining_slots = max_points - len(downsampled) - 1  # -1は最後のポイント用
-    if remaining_slots > 0:
-        adjusted_step = max(1, (len(data_points) - 1) // remaining_slots)
-        for i in range(adjusted_step, len(data_points) - 1, adjusted_step):
-            # 既に追加されているポイントはスキップ
-            if i not in added_indices:
-                downsampled.append(data_points[i])
-                added_indices.add(i)
-    
-    # 5. 最後のポイントを追加
-    if len(data_points) > 1:
-        last_index = len(data_points) - 1
-        if last_index not in added_indices:
-            downsampled.append(data_points[last_index])
-            added_indices.add(last_index)
-    
-    # 6. タイムスタンプでソート（順序を保証）
-    downsampled.sort(key=lambda x: x.get('timestamp', ''))
-    
-    return downsampled
+    return downsample_readings(data_points, max_points, mode)
+
+
+def _validate_batch_params(sensor_ids, hours, max_points_per_sensor, downsample_mode):
+    """
+    バッチ取得のパラメータを検証
+    
+    Returns:
+        検証済みのセンサーIDリスト（空の場合は取得対象なし）
+    """
+    if not sensor_ids:
+        return []
+    
+    if not isinstance(sensor_ids, (list, tuple)):
+        raise ValueError("sensor_ids must be a list or tuple")
+    
+    # 空のリストを除外し、文字列型を検証
+    valid_sensor_ids = []
+    for sensor_id in sensor_ids:
+        if isinstance(sensor_id, str) and sensor_id.strip() and len(sensor_id) <= 100:
+            valid_sensor_ids.append(sensor_id.strip())
+    
+    if not valid_sensor_ids:
+        return []
+    
+    # hours の検証
+    if not isinstance(hours, (int, float)) or hours <= 0 or hours > 8760:
+        raise ValueError("hours must be between 0 and 8760")
+    
+    # max_points_per_sensor の検証
+    if not isinstance(max_points_per_sensor, int) or max_points_per_sensor <= 0 or max_points_per_sensor > 10000:
+        raise ValueError("max_points_per_sensor must be between 1 and 10000")
+    
+    # downsample_mode の検証
+    if downsample_mode not in DOWNSAMPLE_MODES:
+        raise ValueError(f"downsample_mode must be one of {', '.join(DOWNSAMPLE_MODES)}")
+    
+    return valid_sensor_ids
+
+
+def _select_rollup_resolution(hours, max_points):
+    """
+    グラフ用の集計解像度の候補を選択
+    
+    期間内のバケット数が max_points 以上となる最も粗い解像度を返す
+    （該当なしの場合はNone = 生データを使用、実際に使うかは _group_by_resolution() で決める）
+    """
+    window_seconds = hours * 3600
+    for resolution, spec in ROLLUP_RESOLUTIONS.items():
+        if window_seconds / spec['seconds'] >= max_points:
+            return resolution
+    return None
+
+
+def _raw_rows_exceed(cursor, sensor_id, since_ms):
+    """期間内の生データが ROLLUP_RAW_ROW_LIMIT 件を超えるか（インデックスを上限+1件まで数えるだけ）"""
+    cursor.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM temperatures WHERE sensor_id = ? AND ts >= ? LIMIT ?
+        )
+    """, (sensor_id, since_ms, Config.ROLLUP_RAW_ROW_LIMIT + 1))
+    return cursor.fetchone()[0] > Config.ROLLUP_RAW_ROW_LIMIT
+
+
+def _raw_history_missing(cursor, sensor_id, resolution, since_ms):
+    """
+    期間内に、生データの最初の行より前の集計バケットがあるか
+    （保持期間（RETENTION_RAW_DAYS）を過ぎて生データだけが削除され、集計テーブルに残っている履歴）
+    
+    生データの最初の行はインデックスで1件引くだけ、集計テーブルも1件あるかを見るだけ
+    """
+    spec = ROLLUP_RESOLUTIONS[resolution]
+    
+    def bucket(ms):
+        return datetime.fromtimestamp(ms / 1000, JST).strftime(spec['floor_format'])
+    
+    cursor.execute("SELECT MIN(ts) FROM temperatures WHERE sensor_id = ? AND ts >= ?", (sensor_id, since_ms))
+    earliest = cursor.fetchone()[0]
+    query = f"SELECT 1 FROM {spec['table']} WHERE sensor_id = ? AND bucket >= ?"
+    params = [sensor_id, bucket(since_ms)]
+    if earliest is not None:
+        query += " AND bucket < ?"
+        params.append(bucket(earliest))
+    cursor.execute(query + " LIMIT 1", params)
+    return cursor.fetchone() is not None
+
+
+def _select_sensor_resolution(cursor, sensor_id, hours, max_points, since_ms):
+    """
+    センサーのグラフを読み出す解像度を選択
+    
+    集計テーブルは解像度の候補があり、生データが多すぎるか、生データが期間の先頭まで
+    残っていない（保持期間で削除済み）センサーのみ使う
+    （件数が少なく期間全体をカバーしていれば、生データを間引く方がスパイクも行の形式（id・humidity・rssi）も保てる）
+    
+    Returns:
+        集計解像度（生データの場合None）
+    """
+    resolution = _select_rollup_resolution(hours, max_points)
+    if resolution is None:
+        return None
+    if _raw_rows_exceed(cursor, sensor_id, since_ms) or _raw_history_missing(cursor, sensor_id, resolution, since_ms):
+        return resolution
+    return None
+
+
+def _group_by_resolution(cursor, sensor_ids, hours, max_points, since_ms):
+    """
+    センサーを読み出す解像度ごとに分ける（_select_sensor_resolution() 参照）
+    
+    Returns:
+        [(resolution, [sensor_id, ...]), ...]（生データの resolution はNone、空のグループは含まない）
+    """
+    groups = {}
+    for sensor_id in sensor_ids:
+        resolution = _select_sensor_resolution(cursor, sensor_id, hours, max_points, since_ms)
+        groups.setdefault(resolution, []).append(sensor_id)
+    return list(groups.items())
+
+
+def _select_rollup_indices(times, averages, mins, maxs, max_points, mode):
+    """
+    集計行の間引きで残すインデックスを選択（時系列順）
+    
+    extremes / minmax はバケットの最大値・最小値の列それぞれで選んで合わせる
+    （平均値で選ぶとスパイクを含むバケットが落ちるため）。lttb は平均値の形状で選ぶ
+    """
+    if len(times) <= max_points:
+        return list(range(len(times)))
+    if mode == 'lttb':
+        return select_column_indices(averages, max_points, mode, times)
+    high = max(1, max_points // 2)
+    low = max(1, max_points - high)
+    return sorted(
+        set(select_column_indices(maxs, high, mode, times))
+        | set(select_column_indices(mins, low, mode, times))
+    )
+
+
+def _downsample_rollup_rows(readings, max_points, mode):
+    """集計行（_fetch_rollup_rows() の dict）を間引き"""
+    if len(readings) <= max_points:
+        return readings
+    indices = _select_rollup_indices(
+        [r['ts'] for r in readings],
+        [r['temperature'] for r in readings],
+        [r['temperature_min'] for r in readings],
+        [r['temperature_max'] for r in readings],
+        max_points, mode
+    )
+    return [readings[i] for i in indices]
+
+
+def _select_statistics_resolution(hours):
+    """統計用の集計解像度を選択（バケット幅が期間の1/4以下となる最も粗い解像度）"""
+    window_seconds = hours * 3600
+    for resolution, spec in ROLLUP_RESOLUTIONS.items():
+        if window_seconds >= spec['seconds'] * 4:
+            return resolution
+    return None
+
+
+def make_cursor(resolution, ts, watermark):
+    """
+    差分取得用のカーソル文字列を作成（'<解像度>:<エポックms>:<行ID>'、生データの解像度は 'raw'）
+    
+    行IDは読み出した時点でコミット済みの最大の id（_commit_watermark()）。次回はこれより後に
+    コミットされた行を対象にするため、ts が古い行（一括アップロード・スピルの書き戻し）も検出できる
+    """
+    return f"{resolution or 'raw'}:{int(ts)}:{int(watermark)}"
+
+
+def parse_cursor(value):
+    """
+    差分取得用のカーソル文字列を解析
+    
+    Returns:
+        (resolution, ts, watermark) のタプル（生データの resolution はNone、
+        行IDを含まない以前の形式 '<解像度>:<エポックms>' の watermark はNone）
+    
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    if not isinstance(value, str) or ':' not in value:
+        raise ValueError(f"invalid cursor: {value!r}")
+    resolution, _, position = value.partition(':')
+    if resolution != 'raw' and resolution not in ROLLUP_RESOLUTIONS:
+        raise ValueError(f"invalid cursor resolution: {resolution!r}")
+    ts, _, watermark = position.partition(':')
+    try:
+        ts = int(ts)
+        watermark = int(watermark) if watermark else None
+    except ValueError:
+        raise ValueError(f"invalid cursor timestamp: {value!r}")
+    return (None if resolution == 'raw' else resolution), ts, watermark
+
+
+def _commit_watermark(cursor):
+    """
+    コミット済みの最大の行ID（id は AUTOINCREMENT のため再利用されず、書き込みは直列のためコミット順）
+    
+    rowid の末尾を読むだけで、行数によらず一定時間
+    """
+    cursor.execute("SELECT MAX(id) FROM temperatures")
+    return cursor.fetchone()[0] or 0
+
+
+@contextmanager
+def _read_snapshot(conn):
+    """
+    読み取りトランザクションを開始してカーソルを返す（with文で使用）
+    
+    複数の SELECT（行ID・生データ・集計テーブル）を同じスナップショットで読む
+    """
+    conn.execute("BEGIN")
+    try:
+        yield conn.cursor()
+    finally:
+        conn.commit()
+
+
+def _fetch_rollup_rows(cursor, resolution, sensor_ids, since_dt):
+    """
+    集計テーブルからセンサーごとのデータを取得
+    
+    Returns:
+        {sensor_id: [reading dict, ...]}（temperature はバケット平均）
+    """
+    spec = ROLLUP_RESOLUTIONS[resolution]
+    bucket_since = since_dt.strftime(spec['floor_format'])
+    placeholders = ','.join(['?' for _ in sensor_ids])
+    
+    cursor.execute(f"""
+        SELECT sensor_id, bucket, {JST_EPOCH_MS_SQL.format(column='bucket')}, count, min_temp, max_temp, sum_temp
+        FROM {spec['table']}
+        WHERE sensor_id IN ({placeholders}) AND bucket >= ?
+        ORDER BY sensor_id, bucket ASC
+    """, tuple(sensor_ids) + (bucket_since,))
+    
+    results = {}
+    for sensor_id, bucket, ts, count, min_temp, max_temp, sum_temp in cursor.fetchall():
+        readings = results.get(sensor_id)
+        if readings is None:
+            latest = latest_cache.get(sensor_id) or {}
+            sensor_name = latest.get('sensor_name')
+            readings = results[sensor_id] = []
+        readings.append({
+            'sensor_id': sensor_id,
+            'sensor_name': sensor_name,
+            'temperature': sum_temp / count,
+            'timestamp': bucket,
+            'ts': ts,
+            'temperature_min': min_temp,
+            'temperature_max': max_temp,
+            'sample_count': count,
+            'resolution': resolution,
+        })
+    return results
+
+
+def _read_range_batch(cursor, sensor_ids, hours, max_points, downsample_mode):
+    """
+    get_range_batch() の本体（検証済みのセンサーID、呼び出し側の接続・スナップショットで読む）
+    
+    Returns:
+        {sensor_id: [reading dict, ...]}
+    """
+    # JSTタイムゾーンで指定時間前の時刻を計算
+    since_dt = datetime.now(JST) - timedelta(hours=hours)
+    
+    # 期間が長く生データが多すぎるセンサーは集計テーブルから取得（生データを全件読まない）
+    results = {}
+    raw_sensor_ids = []
+    for resolution, group in _group_by_resolution(cursor, sensor_ids, hours, max_points, _epoch_ms(since_dt)):
+        if resolution is None:
+            raw_sensor_ids = group
+            continue
+        for sensor_id, readings in _fetch_rollup_rows(cursor, resolution, group, since_dt).items():
+            results[sensor_id] = _downsample_rollup_rows(readings, max_points, downsample_mode)
+    if not raw_sensor_ids:
+        return results
+    
+    # プレースホルダーを生成（検証済みのIDのみ使用）
+    placeholders = ','.join(['?' for _ in raw_sensor_ids])
+    
+    # 全データを取得（間引きはPython側で実施）
+    query = f"""
+        SELECT * FROM temperatures 
+        WHERE sensor_id IN ({placeholders}) AND ts >= ?
+        ORDER BY sensor_id, ts ASC
+    """
+    cursor.execute(query, tuple(raw_sensor_ids) + (_epoch_ms(since_dt),))
+    
+    rows = cursor.fetchall()
+    
+    # センサーIDごとにグループ化
+    for row in rows:
+        sensor_id = row['sensor_id']
+        if sensor_id not in results:
+            results[sensor_id] = []
+        results[sensor_id].append(dict(row))
+    
+    # さらにPython側で間引き（最大値・最小値・急激な変化を保持）
+    for sensor_id in raw_sensor_ids:
+        if len(results.get(sensor_id, ())) > max_points:
+            original = results[sensor_id]
+            downsampled = _downsample_temperature_data(original, max_points, downsample_mode)
+            results[sensor_id] = downsampled
+    
+    return results
+
+
+def _iter_columnar(cursor, resolution, sensor_ids, since_dt, max_points, mode):
+    """
+    センサーごとの列形式データを順に返すジェネレータ
+    
+    カーソルのタプルを列ごとに転置するだけで、行ごとのdictは作らない。
+    カーソルは sensor_id 順に少しずつ読み、同時に保持するのは1センサー分の列のみ
+    
+    Yields:
+        (sensor_id, {'sensor_name', 'connection_type', 'resolution', 'count',
+                     'timestamps'(エポックms), 'temperatures', ...})
+    """
+    placeholders = ','.join(['?' for _ in sensor_ids])
+    cursor.row_factory = None
+    
+    if resolution is None:
+        columns = ('timestamps', 'temperatures', 'humidity')
+        cursor.execute(f"""
+            SELECT sensor_id, ts, temperature, humidity
+            FROM temperatures
+            WHERE sensor_id IN ({placeholders}) AND ts >= ?
+            ORDER BY sensor_id, ts ASC
+        """, tuple(sensor_ids) + (_epoch_ms(since_dt),))
+    else:
+        columns = ('timestamps', 'temperatures', 'temperature_min', 'temperature_max', 'sample_counts')
+        spec = ROLLUP_RESOLUTIONS[resolution]
+        cursor.execute(f"""
+            SELECT sensor_id, {JST_EPOCH_MS_SQL.format(column='bucket')},
+                   sum_temp / count, min_temp, max_temp, count
+            FROM {spec['table']}
+            WHERE sensor_id IN ({placeholders}) AND bucket >= ?
+            ORDER BY sensor_id, bucket ASC
+        """, tuple(sensor_ids) + (since_dt.strftime(spec['floor_format']),))
+    
+    for sensor_id, group in groupby(cursor, key=itemgetter(0)):
+        # 行タプルを列タプルに転置（先頭の sensor_id 列は除く）
+        values = list(zip(*group))[1:]
+        if resolution is None:
+            indices = select_column_indices(values[1], max_points, mode, values[0])
+        else:
+            indices = _select_rollup_indices(values[0], values[1], values[2], values[3], max_points, mode)
+        if len(indices) < len(values[0]):
+            values = [[column[i] for i in indices] for column in values]
+        
+        # センサーのメタデータは1回だけ
+        latest = latest_cache.get(sensor_id) or {}
+        entry = {
+            'sensor_name': latest.get('sensor_name'),
+            'connection_type': latest.get('connection_type'),
+            'resolution': resolution or 'raw',
+            'count': len(values[0]),
+        }
+        entry.update(zip(columns, values))
+        yield sensor_id, entry
 
 
 class TemperatureQueries:
     
+    @staticmethod
+    def build_reading_row(sensor_id, temperature, sensor_name=None, humidity=None, rssi=None, battery_mode=False, connection_type=None, timestamp=None):
+        """
+        INSERT 用の行タプルを作成（JSTタイムゾーン）
+        
+        書き込みキューに積む時点で受信時刻を確定させるため、
+        タイムスタンプはここで決定する
+        
+        timestamp にはJSTの文字列（TIMESTAMP_FORMAT）または aware な datetime
+        （デバイス側の測定時刻）を指定できる
+        """
+        if timestamp is None:
+            # JSTタイムゾーンで現在時刻を取得
+            now = datetime.now(JST)
+            timestamp = now.strftime(TIMESTAMP_FORMAT)
+            ts = _epoch_ms(now)
+        elif isinstance(timestamp, datetime):
+            measured_at = timestamp.astimezone(JST)
+            timestamp = measured_at.strftime(TIMESTAMP_FORMAT)
+            ts = _epoch_ms(measured_at)
+        else:
+            ts = _epoch_ms(datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=JST))
+        
+        # connection_type を自動判定（指定なしの場合）
+        if connection_type is None:
+            # RSSIがある=WiFi AP直接接続、無い=ESP-NOW
+            connection_type = 'wifi_ap' if rssi is not None else 'esp_now'
+        
+        return (sensor_id, sensor_name, temperature, humidity, rssi, int(battery_mode), connection_type, timestamp, ts)
+    
     @staticmethod
     def insert_reading(sensor_id, temperature, sensor_name=None, humidity=None, rssi=None, battery_mode=False, connection_type=None):
         """温度データを挿入（JSTタイムゾーン）"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                # JSTタイムゾーンで現在時刻を取得
-                now = datetime.now(JST).strftime('%Y-%m-%d %H:%M:%S')
-                
-                # connection_type を自動判定（指定なしの場合）
-                if connection_type is None:
-                    # RSSIがある=WiFi AP直接接続、無い=ESP-NOW
-                    connection_type = 'wifi_ap' if rssi is not None else 'esp_now'
-                
-                cursor.execute("""
-                    INSERT INTO temperatures 
-                    (sensor_id, sensor_name, temperature, humidity, rssi, battery_mode, connection_type, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (sensor_id, sensor_name, temperature, humidity, rssi, int(battery_mode), connection_type, now))
-                conn.commit()
-            finally:
-                conn.close()
+        row = TemperatureQueries.build_reading_row(
+            sensor_id, temperature, sensor_name, humidity, rssi, battery_mode, connection_type
+        )
+        TemperatureQueries.insert_readings_batch([row])
+    
+    @staticmethod
+    def insert_readings_batch(rows):
+        """
+        複数の温度データを1トランザクションで挿入
+        
+        Args:
+            rows: build_reading_row() で作成した行タプルのリスト
+        
+        Returns:
+            挿入した行数
+        """
+        if not rows:
+            return 0
+        
+        sensor_ids = list({row[0] for row in rows})
+        placeholders = ','.join(['?' for _ in sensor_ids])
+        
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO temperatures 
+                (sensor_id, sensor_name, temperature, humidity, rssi, battery_mode, connection_type, timestamp, ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            # トリガーで更新された最新データを取得（キャッシュ更新用）
+            cursor.execute(f"""
+                SELECT {', '.join(LATEST_COLUMNS)} FROM sensor_latest
+                WHERE sensor_id IN ({placeholders})
+            """, sensor_ids)
+            latest_rows = [dict(row) for row in cursor.fetchall()]
+        
+        # コミット後にキャッシュへ反映
+        latest_cache.update(latest_rows)
+        return len(rows)
     
     @staticmethod
     def get_latest_reading(sensor_id):
-        """センサーの最新データを取得"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM temperatures 
-                    WHERE sensor_id = ? 
-                    ORDER BY timestamp DESC LIMIT 1
-                """, (sensor_id,))
-                result = cursor.fetchone()
-                if result:
-                    return dict(result)
-                return None
-            finally:
-                conn.close()
+        """センサーの最新データを取得（メモリキャッシュから）"""
+        return latest_cache.get(sensor_id)
     
     @staticmethod
     def get_all_latest():
-        """全センサーの最新データを取得"""
+        """全センサーの最新データを取得（メモリキャッシュから、SQL発行なし）"""
         import logging
         db_logger = logging.getLogger('database.queries')
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                
-                # 全センサーの最新データを1つのクエリで取得（デッドロック回避）
-                # MAX(timestamp) で時系列最新を取得（MAX(id)でなく）
-                cursor.execute("""
-                    SELECT t1.* FROM temperatures t1
-                    WHERE t1.timestamp = (
-                        SELECT MAX(timestamp) FROM temperatures t2 
-                        WHERE t2.sensor_id = t1.sensor_id
-                    )
-                    ORDER BY t1.sensor_id
-                """)
-                rows = cursor.fetchall()
-                results = [dict(row) for row in rows]
-                
-                db_logger.info(f"get_all_latest: Found {len(results)} sensors")
-                for data in results:
-                    db_logger.debug(f"get_all_latest: Sensor: {data.get('sensor_id')}, Temp: {data.get('temperature')}, Time: {data.get('timestamp')}")
-                
-                return results
-            finally:
-                conn.close()
+        results = latest_cache.get_all()
+        
+        db_logger.debug(f"get_all_latest: Found {len(results)} sensors")
+        return results
+    
+    @staticmethod
+    def reload_latest_cache():
+        """最新データキャッシュを sensor_latest テーブルから再構築（起動時）"""
+        latest_cache.reload()
     
     @staticmethod
     def get_range(sensor_id, hours=24):
         """指定時間範囲のデータを取得（JSTタイムゾーン）"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                # JSTタイムゾーンで指定時間前の時刻を計算
-                since = (datetime.now(JST) - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
-                cursor.execute("""
-                    SELECT * FROM temperatures 
-                    WHERE sensor_id = ? AND timestamp >= ?
-                    ORDER BY timestamp ASC
-                """, (sensor_id, since))
-                rows = cursor.fetchall()
-                results = [dict(row) for row in rows]
-                return results
-            finally:
-                conn.close()
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            # 指定時間前の時刻（エポックミリ秒）
+            since = _epoch_ms(datetime.now(JST) - timedelta(hours=hours))
+            cursor.execute("""
+                SELECT * FROM temperatures 
+                WHERE sensor_id = ? AND ts >= ?
+                ORDER BY ts ASC
+            """, (sensor_id, since))
+            rows = cursor.fetchall()
+            results = [dict(row) for row in rows]
+            return results
     
     @staticmethod
     def get_statistics(sensor_id, hours=24):
-        """温度統計を計算（JSTタイムゾーン）"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                # JSTタイムゾーンで指定時間前の時刻を計算
-                since = (datetime.now(JST) - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
+        """
+        温度統計を計算（JSTタイムゾーン）
+        
+        期間が長い場合は集計テーブルを使用し、先頭の端数バケット分のみ生データを集計する
+        """
+        # JSTタイムゾーンで指定時間前の時刻を計算
+        since_dt = datetime.now(JST) - timedelta(hours=hours)
+        since = _epoch_ms(since_dt)
+        resolution = _select_statistics_resolution(hours)
+        
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            
+            if resolution is None:
                 cursor.execute("""
                     SELECT 
                         COUNT(*) as count,
@@ -219,123 +551,326 @@ class TemperatureQueries:
                         MIN(temperature) as min_temp,
                         MAX(temperature) as max_temp
                     FROM temperatures 
-                    WHERE sensor_id = ? AND timestamp >= ?
+                    WHERE sensor_id = ? AND ts >= ?
                 """, (sensor_id, since))
                 result = cursor.fetchone()
                 if result:
                     return dict(result)
                 return {}
-            finally:
-                conn.close()
+            
+            # 最初の完全なバケットの開始時刻
+            spec = ROLLUP_RESOLUTIONS[resolution]
+            boundary_dt = datetime.strptime(since_dt.strftime(spec['floor_format']), TIMESTAMP_FORMAT).replace(tzinfo=JST)
+            if boundary_dt < since_dt:
+                boundary_dt += timedelta(seconds=spec['seconds'])
+            boundary = boundary_dt.strftime(TIMESTAMP_FORMAT)
+            
+            # 端数部分は生データから
+            cursor.execute("""
+                SELECT COUNT(*), SUM(temperature), MIN(temperature), MAX(temperature)
+                FROM temperatures
+                WHERE sensor_id = ? AND ts >= ? AND ts < ?
+            """, (sensor_id, since, _epoch_ms(boundary_dt)))
+            parts = [tuple(cursor.fetchone())]
+            
+            # 残りは集計テーブルから
+            cursor.execute(f"""
+                SELECT SUM(count), SUM(sum_temp), MIN(min_temp), MAX(max_temp)
+                FROM {spec['table']}
+                WHERE sensor_id = ? AND bucket >= ?
+            """, (sensor_id, boundary))
+            parts.append(tuple(cursor.fetchone()))
+        
+        count = sum(part[0] or 0 for part in parts)
+        total = sum(part[1] or 0.0 for part in parts)
+        mins = [part[2] for part in parts if part[2] is not None]
+        maxs = [part[3] for part in parts if part[3] is not None]
+        return {
+            'count': count,
+            'avg_temp': total / count if count else None,
+            'min_temp': min(mins) if mins else None,
+            'max_temp': max(maxs) if maxs else None,
+        }
     
     @staticmethod
-    def get_range_batch(sensor_ids, hours=24, max_points_per_sensor=500):
+    def get_range_batch(sensor_ids, hours=24, max_points_per_sensor=500, downsample_mode=DEFAULT_DOWNSAMPLE_MODE):
         """複数センサーの指定時間範囲のデータを一括取得（高速化・間引き対応）"""
-        # 入力検証
-        if not sensor_ids:
+        valid_sensor_ids = _validate_batch_params(sensor_ids, hours, max_points_per_sensor, downsample_mode)
+        if not valid_sensor_ids:
             return {}
         
-        if not isinstance(sensor_ids, (list, tuple)):
-            raise ValueError("sensor_ids must be a list or tuple")
+        with read_connection() as conn:
+            return _read_range_batch(conn.cursor(), valid_sensor_ids, hours, max_points_per_sensor, downsample_mode)
+
+    @staticmethod
+    def get_range_batch_with_watermark(sensor_ids, hours=24, max_points_per_sensor=500, downsample_mode=DEFAULT_DOWNSAMPLE_MODE):
+        """
+        get_range_batch() と同じデータと、同じスナップショットでのコミット済みの最大の行IDを取得
+        （batch_cursor() で差分取得用のカーソルを作るため）
         
-        # 空のリストを除外し、文字列型を検証
-        valid_sensor_ids = []
-        for sensor_id in sensor_ids:
-            if isinstance(sensor_id, str) and sensor_id.strip() and len(sensor_id) <= 100:
-                valid_sensor_ids.append(sensor_id.strip())
+        Returns:
+            ({sensor_id: [reading, ...]}, watermark) のタプル
+        """
+        valid_sensor_ids = _validate_batch_params(sensor_ids, hours, max_points_per_sensor, downsample_mode)
         
-        if not valid_sensor_ids:
-            return {}
+        with read_connection() as conn, _read_snapshot(conn) as cursor:
+            watermark = _commit_watermark(cursor)
+            if not valid_sensor_ids:
+                return {}, watermark
+            return _read_range_batch(cursor, valid_sensor_ids, hours, max_points_per_sensor, downsample_mode), watermark
+
+    @staticmethod
+    def batch_cursor(readings, hours, watermark):
+        """
+        get_range_batch_with_watermark() の結果（1センサー分）から差分取得用のカーソルを作成
         
-        # hours の検証
-        if not isinstance(hours, (int, float)) or hours <= 0 or hours > 8760:
-            raise ValueError("hours must be between 0 and 8760")
+        データがない場合は期間の開始時刻を指すカーソルを返す
+        （生データが上限以下のセンサーは集計テーブルを使わないため、解像度は生データ）
+        """
+        if readings:
+            last = readings[-1]
+            return make_cursor(last.get('resolution'), last['ts'], watermark)
+        return make_cursor(None, _epoch_ms(datetime.now(JST) - timedelta(hours=hours)), watermark)
+    
+    @staticmethod
+    def get_range_batch_since(cursors, hours=24, max_points_per_sensor=500):
+        """
+        カーソルの作成後にコミットされたデータのみを取得（差分更新用）
         
-        # max_points_per_sensor の検証
-        if not isinstance(max_points_per_sensor, int) or max_points_per_sensor <= 0 or max_points_per_sensor > 10000:
-            raise ValueError("max_points_per_sensor must be between 1 and 10000")
+        - 生データ: カーソルの行IDより後にコミットされた行のみ（差分には間引きを適用しない）
+        - 集計テーブル: 新しい行がコミットされていれば、カーソルのバケット以降
+          （最後のバケットは集計途中のため再送する）
         
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                # JSTタイムゾーンで指定時間前の時刻を計算
-                since = (datetime.now(JST) - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
-                
-                # プレースホルダーを生成（検証済みのIDのみ使用）
-                placeholders = ','.join(['?' for _ in valid_sensor_ids])
-                
-                # 全データを取得（間引きはPython側で実施）
-                query = f"""
-                    SELECT * FROM temperatures 
-                    WHERE sensor_id IN ({placeholders}) AND timestamp >= ?
-                    ORDER BY sensor_id, timestamp ASC
-                """
-                cursor.execute(query, tuple(valid_sensor_ids) + (since,))
+        次の場合は refetch=True を返し、クライアントに全体の再取得を求める:
+        - 期間・max_points・生データの件数に対する解像度がカーソル作成時と異なる
+        - 新しいデータが max_points を超える（間引きが必要）
+        - カーソルの時刻より古い ts の行が後からコミットされた（一括アップロード・スピルの書き戻しなど。
+          グラフの末尾に追記できないため）
+        - カーソルが行IDを含まない以前の形式
+        
+        Args:
+            cursors: {sensor_id: カーソル文字列}
+        
+        Returns:
+            {sensor_id: {'readings': [...], 'cursor': 新しいカーソル, 'refetch': bool}}
+        
+        Raises:
+            ValueError: パラメータまたはカーソルが不正な場合
+        """
+        if not isinstance(cursors, dict):
+            raise ValueError("since must be an object of {sensor_id: cursor}")
+        valid_sensor_ids = _validate_batch_params(
+            list(cursors.keys()), hours, max_points_per_sensor, DEFAULT_DOWNSAMPLE_MODE
+        )
+        parsed = {sensor_id: parse_cursor(cursors[sensor_id]) for sensor_id in valid_sensor_ids}
+        
+        window_start = _epoch_ms(datetime.now(JST) - timedelta(hours=hours))
+        
+        results = {}
+        with read_connection() as conn, _read_snapshot(conn) as cursor:
+            watermark = _commit_watermark(cursor)
+            for sensor_id, (cursor_resolution, cursor_ts, cursor_watermark) in parsed.items():
+                refetch = {'readings': [], 'cursor': cursors[sensor_id], 'refetch': True}
+                resolution = _select_sensor_resolution(
+                    cursor, sensor_id, hours, max_points_per_sensor, window_start
+                )
+                if cursor_watermark is None or cursor_resolution != resolution:
+                    # 以前の形式のカーソル、または間引きの境界（解像度）が変わった
+                    results[sensor_id] = refetch
+                    continue
                 
-                rows = cursor.fetchall()
+                # カーソルの作成後にコミットされた行（rowid の範囲を読む。sensor_id のインデックスを
+                # 使うとセンサーの全履歴を走査するため、単項 + でインデックスを使わせない）
+                cursor.execute("""
+                    SELECT * FROM temperatures
+                    WHERE id > ? AND id <= ? AND +sensor_id = ? AND ts >= ?
+                    ORDER BY ts ASC
+                    LIMIT ?
+                """, (cursor_watermark, watermark, sensor_id, window_start, max_points_per_sensor + 1))
+                new_rows = [dict(row) for row in cursor.fetchall()]
+                if new_rows and new_rows[0]['ts'] < cursor_ts:
+                    # 表示済みの範囲に後から行が追加された
+                    results[sensor_id] = refetch
+                    continue
                 
-                # センサーIDごとにグループ化
-                results = {}
-                for row in rows:
-                    sensor_id = row['sensor_id']
-                    if sensor_id not in results:
-                        results[sensor_id] = []
-                    results[sensor_id].append(dict(row))
+                if resolution is None or not new_rows:
+                    readings = new_rows
+                else:
+                    start_dt = datetime.fromtimestamp(max(cursor_ts, window_start) / 1000, JST)
+                    readings = _fetch_rollup_rows(cursor, resolution, [sensor_id], start_dt).get(sensor_id, [])
                 
-                # さらにPython側で間引き（最大値・最小値・急激な変化を保持）
-                for sensor_id in results:
-                    if len(results[sensor_id]) > max_points_per_sensor:
-                        original = results[sensor_id]
-                        downsampled = _downsample_temperature_data(original, max_points_per_sensor)
-                        results[sensor_id] = downsampled
+                if len(readings) > max_points_per_sensor:
+                    results[sensor_id] = refetch
+                    continue
                 
-                return results
-            finally:
-                conn.close()
+                results[sensor_id] = {
+                    'readings': readings,
+                    'cursor': make_cursor(resolution, readings[-1]['ts'] if readings else cursor_ts, watermark),
+                    'refetch': False,
+                }
+        return results
+
+    @staticmethod
+    def get_range_batch_columnar(sensor_ids, hours=24, max_points_per_sensor=500, downsample_mode=DEFAULT_DOWNSAMPLE_MODE):
+        """
+        複数センサーのデータを列形式で一括取得（format=columnar 用）
+        
+        タイムスタンプはエポックミリ秒の整数、センサー名などのメタデータはセンサーごとに1回だけ返す
+        """
+        valid_sensor_ids = _validate_batch_params(sensor_ids, hours, max_points_per_sensor, downsample_mode)
+        if not valid_sensor_ids:
+            return {}
+        
+        since_dt = datetime.now(JST) - timedelta(hours=hours)
+        
+        with read_connection() as conn:
+            results = {}
+            for resolution, group in _group_by_resolution(
+                conn.cursor(), valid_sensor_ids, hours, max_points_per_sensor, _epoch_ms(since_dt)
+            ):
+                results.update(_iter_columnar(
+                    conn.cursor(), resolution, group, since_dt,
+                    max_points_per_sensor, downsample_mode
+                ))
+            return results
+
+    @staticmethod
+    def iter_export_batches(since_ms, until_ms=None, sensor_ids=None, batch_size=2000):
+        """
+        エクスポート用に生データを (sensor_id, ts) 順に少しずつ返すジェネレータ
+        
+        センサーごとにインデックス順のキーセット（ts, temperature, id）で batch_size 件ずつ読む
+        （期間によらずメモリは一定）。SELECT はバッチごとに読み切るため、yield している間
+        （クライアントが受信している間）は読み取りスナップショットを保持せず、WAL のチェックポイントを妨げない。
+        接続はプール外の専用接続で、最後まで読むか close() したときに閉じる
+        
+        全体は1つのスナップショットではないため、ダウンロード中に追加・削除された行は
+        読み出し位置によって含まれる場合と含まれない場合がある
+        
+        Args:
+            since_ms (int): 開始時刻（エポックミリ秒、この時刻を含む）
+            until_ms (int): 終了時刻（エポックミリ秒、この時刻を含まない、None の場合は最新まで）
+            sensor_ids: 対象のセンサーID（None の場合は全センサー）
+            batch_size (int): 1回に返す最大件数
+        
+        Yields:
+            list[tuple]: EXPORT_COLUMNS の順の行タプル
+        """
+        if sensor_ids is not None and not sensor_ids:
+            return
+        
+        until_sql, until_params = ("AND ts < ?", (until_ms,)) if until_ms is not None else ("", ())
+        select_sql = f"""
+            SELECT {', '.join(EXPORT_COLUMNS)}, id
+            FROM temperatures
+            WHERE sensor_id = ? AND {{start}} {until_sql}
+            ORDER BY ts, temperature, id
+            LIMIT ?
+        """
+        first_sql = select_sql.format(start="ts >= ?")
+        next_sql = select_sql.format(start="(ts, temperature, id) > (?, ?, ?)")
+        
+        with export_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            if sensor_ids is None:
+                cursor.execute("SELECT sensor_id FROM sensor_latest ORDER BY sensor_id")
+                sensor_ids = [row[0] for row in cursor.fetchall()]
+            else:
+                sensor_ids = sorted(set(sensor_ids))
+            
+            pending = []
+            for sensor_id in sensor_ids:
+                sql, params = first_sql, (sensor_id, since_ms)
+                while True:
+                    limit = batch_size - len(pending)
+                    cursor.execute(sql, params + until_params + (limit,))
+                    rows = cursor.fetchall()
+                    pending.extend(row[:-1] for row in rows)
+                    if len(pending) >= batch_size:
+                        yield pending
+                        pending = []
+                    if len(rows) < limit:
+                        break
+                    last = rows[-1]
+                    sql, params = next_sql, (sensor_id, last[_EXPORT_TS], last[_EXPORT_TEMPERATURE], last[-1])
+            if pending:
+                yield pending
+
+    @staticmethod
+    def iter_range_batch_columnar(sensor_ids, hours=24, max_points_per_sensor=500, downsample_mode=DEFAULT_DOWNSAMPLE_MODE):
+        """
+        get_range_batch_columnar() と同じデータをセンサーごとに (sensor_id, entry) で返すジェネレータ
+        
+        全センサー分の列を同時に保持しない（レスポンスのバイト列に直接変換する場合に使用、
+        読み取り用の接続は最後まで読むか close() するまで保持する）
+        """
+        valid_sensor_ids = _validate_batch_params(sensor_ids, hours, max_points_per_sensor, downsample_mode)
+        if not valid_sensor_ids:
+            return
+        
+        since_dt = datetime.now(JST) - timedelta(hours=hours)
+        
+        with read_connection() as conn:
+            for resolution, group in _group_by_resolution(
+                conn.cursor(), valid_sensor_ids, hours, max_points_per_sensor, _epoch_ms(since_dt)
+            ):
+                yield from _iter_columnar(
+                    conn.cursor(), resolution, group, since_dt,
+                    max_points_per_sensor, downsample_mode
+                )
 
     @staticmethod
-    def delete_old_records(days_old=30):
-        """指定日数以前のデータを削除（JSTタイムゾーン）"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                since = (datetime.now(JST) - timedelta(days=days_old)).strftime('%Y-%m-%d %H:%M:%S')
-                cursor.execute("DELETE FROM temperatures WHERE timestamp < ?", (since,))
-                deleted = cursor.rowcount
-                conn.commit()
-                return deleted
-            finally:
-                conn.close()
+    def delete_old_records(days_old=30, chunk_size=2000):
+        """
+        指定日数以前のデータを削除（JSTタイムゾーン）
+        
+        生データのみ削除し、集計テーブルは長期グラフ用に保持する
+        chunk_size 件ごとに別トランザクションで削除し、書き込みロックを長時間保持しない
+        """
+        before_ts = _epoch_ms(datetime.now(JST) - timedelta(days=days_old))
+        deleted = 0
+        for sensor_id in RetentionQueries.get_sensor_ids('temperatures'):
+            while True:
+                count = RetentionQueries.delete_raw_chunk(sensor_id, before_ts, chunk_size)
+                deleted += count
+                if count < chunk_size:
+                    break
+        
+        # 最新データはトリガーで更新済み、キャッシュは再読み込み
+        if deleted:
+            latest_cache.invalidate()
+        return deleted
 
     @staticmethod
     def delete_test_sensors():
         """テストセンサーのデータを削除"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM temperatures WHERE sensor_id LIKE ?", ('%TEST%',))
-                deleted = cursor.rowcount
-                conn.commit()
-                return deleted
-            finally:
-                conn.close()
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM temperatures WHERE sensor_id LIKE ?", ('%TEST%',))
+            deleted = cursor.rowcount
+            # 集計テーブルからも削除
+            for spec in ROLLUP_RESOLUTIONS.values():
+                cursor.execute(f"DELETE FROM {spec['table']} WHERE sensor_id LIKE ?", ('%TEST%',))
+        
+        # 最新データはトリガーで更新済み、キャッシュは再読み込み
+        latest_cache.invalidate()
+        return deleted
 
     @staticmethod
     def delete_sensor(sensor_id):
         """特定センサーのデータを削除"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM temperatures WHERE sensor_id = ?", (sensor_id,))
-                deleted = cursor.rowcount
-                conn.commit()
-                return deleted
-            finally:
-                conn.close()
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM temperatures WHERE sensor_id = ?", (sensor_id,))
+            deleted = cursor.rowcount
+            # 集計テーブルからも削除
+            for spec in ROLLUP_RESOLUTIONS.values():
+                cursor.execute(f"DELETE FROM {spec['table']} WHERE sensor_id = ?", (sensor_id,))
+        
+        # 最新データはトリガーで更新済み、キャッシュは再読み込み
+        latest_cache.invalidate()
+        return deleted
 
 
 class SystemLogQueries:
@@ -343,47 +878,143 @@ class SystemLogQueries:
     @staticmethod
     def insert_log(level, module, message):
         """システムログを挿入"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO system_logs (level, module, message)
-                    VALUES (?, ?, ?)
-                """, (level, module, message))
-                conn.commit()
-            finally:
-                conn.close()
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO system_logs (level, module, message)
+                VALUES (?, ?, ?)
+            """, (level, module, message))
     
     @staticmethod
     def get_recent_logs(limit=100):
         """最近のログを取得"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM system_logs 
-                    ORDER BY timestamp DESC LIMIT ?
-                """, (limit,))
-                rows = cursor.fetchall()
-                results = [dict(row) for row in rows]
-                return results
-            finally:
-                conn.close()
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM system_logs 
+                ORDER BY timestamp DESC LIMIT ?
+            """, (limit,))
+            rows = cursor.fetchall()
+            results = [dict(row) for row in rows]
+            return results
     
     @staticmethod
     def cleanup_old_logs(days=7):
         """古いログを削除（JSTタイムゾーン）"""
-        with db_lock:
-            conn = get_connection()
-            try:
-                cursor = conn.cursor()
-                since = (datetime.now(JST) - timedelta(days=days)).isoformat()
-                cursor.execute("DELETE FROM system_logs WHERE timestamp < ?", (since,))
-                deleted = cursor.rowcount
-                conn.commit()
-                return deleted
-            finally:
-                conn.close()
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            since = (datetime.now(JST) - timedelta(days=days)).isoformat()
+            cursor.execute("DELETE FROM system_logs WHERE timestamp < ?", (since,))
+            deleted = cursor.rowcount
+            return deleted
+
 
+class RetentionQueries:
+    """データ保持（リテンション）用のクエリ（小さな単位で削除する）"""
+    
+    @staticmethod
+    def get_sensor_ids(table):
+        """
+        テーブルに存在するセンサーIDを取得
+        
+        インデックス上で次のIDへ飛びながら列挙する（全件走査しない）
+        """
+        sensor_ids = []
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT MIN(sensor_id) FROM {table}")
+            sensor_id = cursor.fetchone()[0]
+            while sensor_id is not None:
+                sensor_ids.append(sensor_id)
+                cursor.execute(f"SELECT MIN(sensor_id) FROM {table} WHERE sensor_id > ?", (sensor_id,))
+                sensor_id = cursor.fetchone()[0]
+        return sensor_ids
+    
+    @staticmethod
+    def delete_raw_chunk(sensor_id, before_ts, limit):
+        """
+        生データを古い順に最大 limit 件削除（1トランザクション）
+        
+        Args:
+            before_ts: これより前（エポックミリ秒）のデータを削除
+        
+        Returns:
+            削除した行数
+        """
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM temperatures WHERE id IN (
+                    SELECT id FROM temperatures
+                    WHERE sensor_id = ? AND ts < ?
+                    ORDER BY ts LIMIT ?
+                )
+            """, (sensor_id, before_ts, limit))
+            return cursor.rowcount
+    
+    @staticmethod
+    def delete_rollup_chunk(resolution, sensor_id, before_ts, limit):
+        """
+        集計テーブルのバケットを古い順に最大 limit 件削除（1トランザクション）
+        
+        Returns:
+            削除した行数
+        """
+        spec = ROLLUP_RESOLUTIONS[resolution]
+        before_bucket = datetime.fromtimestamp(before_ts / 1000, JST).strftime(spec['floor_format'])
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                DELETE FROM {spec['table']} WHERE sensor_id = ? AND bucket IN (
+                    SELECT bucket FROM {spec['table']}
+                    WHERE sensor_id = ? AND bucket < ?
+                    ORDER BY bucket LIMIT ?
+                )
+            """, (sensor_id, sensor_id, before_bucket, limit))
+            return cursor.rowcount
+    
+    @staticmethod
+    def get_vacuum_info():
+        """
+        空き領域の情報を取得
+        
+        Returns:
+            {'auto_vacuum': 'none'|'full'|'incremental', 'freelist_pages', 'page_size', 'page_count'}
+        """
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            info = {}
+            for pragma in ('auto_vacuum', 'freelist_count', 'page_size', 'page_count'):
+                cursor.execute(f"PRAGMA {pragma}")
+                info[pragma] = cursor.fetchone()[0]
+        return {
+            'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(info['auto_vacuum'], 'unknown'),
+            'freelist_pages': info['freelist_count'],
+            'page_size': info['page_size'],
+            'page_count': info['page_count'],
+        }
+    
+    @staticmethod
+    def incremental_vacuum(pages):
+        """
+        空きページを最大 pages 件ファイルから切り詰める（auto_vacuum=INCREMENTAL の場合のみ有効）
+        
+        Returns:
+            実行後の空きページ数
+        """
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            # 結果を読み切るまで処理が進まないため fetchall() する
+            cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            cursor.execute("PRAGMA freelist_count")
+            return cursor.fetchone()[0]
+    
+    @staticmethod
+    def enable_incremental_vacuum():
+        """
+        既存DBを auto_vacuum=INCREMENTAL に切り替える（VACUUM でDB全体を再構築するため時間がかかる）
+        """
+        with write_connection() as conn:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.commit()
+            conn.execute("VACUUM")
@@ -0,0 +1,62 @@
+"""
+temperature_server/gunicorn.conf.py
+gunicorn の設定（本番用）
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+- gthread ワーカー: ワーカーごとにスレッドプールで接続を処理し、keep-alive を維持する
+- マスターは fork 前にデータベースの初期化（スキーマ作成・マイグレーション）だけを行う
+- 各ワーカーは起動後にアプリを読み込み、プライマリロックを取れた1プロセスだけが
+  シリアル受信・バックグラウンドタスクを動かす（services/process_roles.py）
+- 設定値は環境変数（WEB_WORKERS / WEB_THREADS / WEB_KEEPALIVE / WEB_TIMEOUT）で変更できる
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# 環境変数設定
+os.environ.setdefault('FLASK_ENV', 'production')
+# 複数のワーカーが同じログファイルに書くため、ローテーションは logrotate で行う
+# （各ワーカーが0時に個別に切り替えると、切り替え後のファイルを上書きし合う、systemd/logrotate-temperature-server）
+os.environ.setdefault('LOG_ROTATION', 'external')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+
+bind = f"{Config.FLASK_HOST}:{Config.FLASK_PORT}"
+workers = Config.WEB_WORKERS
+worker_class = 'gthread'
+threads = Config.WEB_THREADS
+keepalive = Config.WEB_KEEPALIVE
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = 30
+
+# ワーカーごとにアプリを読み込む（マスターでスレッドや SQLite 接続を作らない）
+preload_app = False
+
+# リクエストログはアプリ側（utils/request_logging.py）で記録する
+accesslog = None
+errorlog = '-'
+
+
+def on_starting(server):
+    """マスター起動時（fork 前）: データベースを初期化"""
+    from database.models import init_database
+    init_database()
+
+
+def post_worker_init(worker):
+    """ワーカー起動後: 最新データキャッシュの読み込み、プライマリならシリアル受信等を開始"""
+    from services.process_roles import start_process_services
+    primary = start_process_services(multi_process=True)
+    worker.log.info(f"Worker {worker.pid} ready ({'primary' if primary else 'secondary'})")
+
+
+def worker_exit(server, worker):
+    """ワーカー終了時: 書き込みキューを書き出し、プライマリロックを解放"""
+    from services.process_roles import stop_process_services
+    stop_process_services()
@@ -1,84 +1,300 @@
 """
 temperature_server/logger.py
 ロギング設定
+
+構成:
+- setup_logger() で作成したロガーはすべてプロセスで1つの QueueHandler に積む
+  （呼び出し元のスレッドではメッセージの整形もファイル書き込みも行わない）
+- 1つのバックグラウンドスレッド（LogWriter）がキューからまとめて取り出し、
+  整形・センシティブデータのマスク・ファイル書き込みをバッチで行う
+- 出力は JSON Lines（LOG_FORMAT=text で従来のテキスト形式）
+- マスクは実際に出力されるレコードにだけ適用する（レベルで捨てられるレコードは整形しない）
+- ローテーションは LOG_ROTATION で切り替える。internal は TimedRotatingFileHandler（1プロセス用）、
+  external は WatchedFileHandler（logrotate が移動したファイルを開き直す）。gunicorn の複数ワーカーは
+  同じファイルに追記するため external（各ワーカーが個別にローテーションすると互いのファイルを上書きする）
 """
 
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
 import logging
 import logging.handlers
-from pathlib import Path
+from datetime import datetime
 from config import Config
 
-class SensitiveDataFilter(logging.Filter):
-    """センシティブデータをマスクするフィルター"""
-    
-    def filter(self, record):
-        """ログメッセージからセンシティブデータをマスク"""
-        if hasattr(record, 'msg') and record.msg:
-            msg = str(record.msg)
-            # パスワードをマスク
-            if Config.AP_PASSWORD and Config.AP_PASSWORD in msg:
-                record.msg = msg.replace(Config.AP_PASSWORD, '***')
-            # SECRET_KEYをマスク
-            if Config.SECRET_KEY and Config.SECRET_KEY in msg:
-                record.msg = msg.replace(Config.SECRET_KEY, '***')
-        return True
+# LogRecord の標準属性（これ以外は extra として JSON に含める）
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# json.dumps にオプションを渡すと毎回エンコーダーを作るため、1つを使い回す
+_json_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+# キュー制御用の番兵
+_STOP = object()
+
+TEXT_FORMAT_PRODUCTION = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+TEXT_FORMAT_DEBUG = '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+
+
+def mask_sensitive(text):
+    """ログ文字列からセンシティブデータ（パスワード・SECRET_KEY）をマスク"""
+    for secret in (Config.AP_PASSWORD, Config.SECRET_KEY):
+        if secret and secret in text:
+            text = text.replace(secret, '***')
+    return text
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """1レコード1行の JSON に整形"""
+
+    def __init__(self, include_location=False):
+        super().__init__()
+        self.include_location = include_location
+        # 同じ秒のレコードが続くため、秒までの文字列を使い回す
+        self._last_second = None
+        self._last_prefix = ''
+
+    def _timestamp(self, created):
+        second = int(created)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_prefix = datetime.fromtimestamp(second).strftime('%Y-%m-%dT%H:%M:%S')
+        return f"{self._last_prefix}.{int((created - second) * 1000):03d}"
+
+    def format(self, record):
+        entry = {
+            'ts': self._timestamp(record.created),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if self.include_location:
+            entry['file'] = f"{record.filename}:{record.lineno}"
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        for key in record.__dict__.keys() - _RECORD_ATTRS:
+            if not key.startswith('_'):
+                entry[key] = record.__dict__[key]
+        return _json_encoder.encode(entry)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    メッセージの整形を LogWriter のスレッドに任せる QueueHandler
+
+    標準の QueueHandler は呼び出し元のスレッドでメッセージを整形するため、
+    引数（args）はそのまま渡し、例外情報だけをここで文字列化する
+    （引数には後から変更されない値を渡すこと）
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            # トレースバックはこのスレッドでしか参照できない
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LogWriter:
+    """キューのレコードをまとめて整形・マスクしてファイルに書き込むスレッド"""
+
+    def __init__(self, log_queue, file_handler, formatter, console=None, batch_size=512):
+        """
+        Args:
+            log_queue: DeferredQueueHandler と共有するキュー
+            file_handler: ファイルハンドラー（ストリームとローテーションのみ使用、
+                TimedRotatingFileHandler または WatchedFileHandler）
+            formatter: レコードの整形に使う Formatter
+            console: コンソール出力先（開発環境のみ、None で出力しない）
+            batch_size (int): 1回の書き込みでまとめる最大レコード数
+        """
+        self.queue = log_queue
+        self.file_handler = file_handler
+        self.formatter = formatter
+        self.console = console
+        self.batch_size = batch_size
+        self._thread = None
+
+        # 統計情報
+        self.stats = {
+            'records': 0,
+            'batches': 0,
+            'errors': 0,
+        }
+
+    def start(self):
+        """書き込みスレッドを開始"""
+        self._thread = threading.Thread(target=self._run, daemon=True, name="LogWriter")
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """キューに残ったレコードを書き出して停止"""
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def flush(self, timeout=5.0):
+        """キューに積まれているレコードをすべて書き出すまで待機"""
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        """キューから最大 batch_size 件ずつ取り出して書き込む"""
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = []
+            events = []
+            stop = False
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    records.append(item)
+
+            if records:
+                self._write(records)
+            for event in events:
+                event.set()
+            if stop:
+                break
+
+    def _write(self, records):
+        """整形・マスクしてまとめて書き込む"""
+        lines = []
+        for record in records:
+            try:
+                lines.append(mask_sensitive(self.formatter.format(record)))
+            except Exception:
+                self.stats['errors'] += 1
+        if not lines:
+            return
+        text = '\n'.join(lines) + '\n'
+
+        handler = self.file_handler
+        handler.acquire()
+        try:
+            if isinstance(handler, logging.handlers.WatchedFileHandler):
+                # 外部でローテーションされた場合は開き直す
+                handler.reopenIfNeeded()
+            elif handler.shouldRollover(records[-1]):
+                handler.doRollover()
+            if handler.stream is None:
+                handler.stream = handler._open()
+            # 追記モードの fd に1回の write で書く（複数ワーカーが同じファイルに追記しても行が混ざらない）
+            data = text.encode('utf-8')
+            fd = handler.stream.fileno()
+            while data:
+                data = data[os.write(fd, data):]
+        except Exception:
+            self.stats['errors'] += 1
+        finally:
+            handler.release()
+
+        if self.console is not None:
+            try:
+                self.console.write(text)
+                self.console.flush()
+            except Exception:
+                pass
+
+        self.stats['records'] += len(lines)
+        self.stats['batches'] += 1
+
+
+_backend_lock = threading.Lock()
+_queue_handler = None
+_log_writer = None
+
+
+def _log_level():
+    """環境に応じたログレベル"""
+    return logging.INFO if Config.FLASK_ENV == 'production' else logging.DEBUG
+
+
+def _get_queue_handler():
+    """プロセスで共有する QueueHandler を取得（初回に書き込みスレッドを開始）"""
+    global _queue_handler, _log_writer
+
+    with _backend_lock:
+        if _queue_handler is not None:
+            return _queue_handler
+
+        json_lines = Config.LOG_FORMAT == 'json'
+        log_file = Config.LOGS_DIR / ('server.jsonl' if json_lines else 'server.log')
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # ファイルハンドラー（書き込みは LogWriter がまとめて行う）
+        if Config.LOG_ROTATION == 'external':
+            file_handler = logging.handlers.WatchedFileHandler(str(log_file), encoding='utf-8')
+        else:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                str(log_file),
+                when='midnight',
+                interval=1,
+                backupCount=Config.LOG_BACKUP_COUNT,
+                encoding='utf-8'
+            )
+
+        # フォーマッタ
+        debug = Config.FLASK_ENV != 'production'
+        if json_lines:
+            formatter = JsonLinesFormatter(include_location=debug)
+        else:
+            formatter = logging.Formatter(
+                TEXT_FORMAT_DEBUG if debug else TEXT_FORMAT_PRODUCTION,
+                datefmt='%Y-%m-%d %H:%M:%S'
+            )
+
+        log_queue = queue.SimpleQueue()
+        _log_writer = LogWriter(
+            log_queue,
+            file_handler,
+            formatter,
+            # コンソール出力（開発環境のみ）
+            console=sys.stderr if Config.FLASK_DEBUG else None,
+            batch_size=Config.LOG_BATCH_SIZE
+        )
+        _log_writer.start()
+        # 終了時にキューに残ったレコードを書き出す
+        atexit.register(_log_writer.stop)
+
+        _queue_handler = DeferredQueueHandler(log_queue)
+        return _queue_handler
+
+
+def get_log_writer():
+    """書き込みスレッド（統計・flush 用）を取得"""
+    _get_queue_handler()
+    return _log_writer
+
 
 def setup_logger(name):
-    """ロガーをセットアップ"""
+    """ロガーをセットアップ（共有の非同期バックエンドに接続）"""
     logger = logging.getLogger(name)
-    
+
     # 既にハンドラーが設定されている場合はスキップ
     if logger.handlers:
         return logger
-    
+
     # ログレベル設定
-    if Config.FLASK_ENV == 'production':
-        logger.setLevel(logging.INFO)
-    else:
-        logger.setLevel(logging.DEBUG)
-    
-    # ログファイルのパス
-    log_file = Config.LOGS_DIR / f'{name}.log'
-    log_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    # ローテーション付きファイルハンドラー
-    handler = logging.handlers.TimedRotatingFileHandler(
-        str(log_file),
-        when='midnight',
-        interval=1,
-        backupCount=Config.LOG_BACKUP_COUNT,
-        encoding='utf-8'
-    )
-    
-    # フォーマッタ
-    if Config.FLASK_ENV == 'production':
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-    else:
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-    
-    handler.setFormatter(formatter)
-    
-    # センシティブデータフィルターを追加
-    handler.addFilter(SensitiveDataFilter())
-    
-    logger.addHandler(handler)
-    
-    # コンソールハンドラー（開発環境のみ）
-    if Config.FLASK_DEBUG:
-        console = logging.StreamHandler()
-        console.setFormatter(formatter)
-        console.addFilter(SensitiveDataFilter())
-        logger.addHandler(console)
-    
+    logger.setLevel(_log_level())
+    logger.addHandler(_get_queue_handler())
+    # 親ロガー（app → app.routes.api 等）も同じハンドラーを持つため、二重に出力しない
+    logger.propagate = False
     return logger
-
-
-
-
-
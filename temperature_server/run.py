@@ -7,6 +7,9 @@ temperature_server/run.py
 1. データベース初期化
 2. シリアルリーダー起動（USB/Serial経由のESP32データ受信）
 3. Flask Webサーバー起動
+
+開発用（Flask の開発サーバー、1プロセス）。本番は gunicorn を使用する:
+    gunicorn -c gunicorn.conf.py wsgi:app
 """
 
 import sys
@@ -24,7 +27,8 @@ from config import Config
 from database.models import init_database, migrate_add_rssi_battery
 from logger import setup_logger
 from app import create_app
-from services.serial_reader import create_serial_reader
+from services.serial_gateway import serial_gateway
+from services.process_roles import start_process_services, stop_process_services
 
 logger = setup_logger('main')
 
@@ -41,54 +45,6 @@ def main():
     migrate_add_rssi_battery()  # 既存DBにカラムを追加
     logger.info("✓ データベース初期化完了")
 
-# グローバル変数（シリアルリーダー）
-serial_reader = None
-
-
-def start_serial_reader():
-    """
-    シリアルリーダーを起動（USB/Serial経由のESP32データ受信）
-    
-    この機能により以下が可能になります:
-    - ラズパイにUSB接続したESP32からシリアル経由でデータを受信
-    - 受信したESP32はESP-NOWで複数のESP32/ESP8266からデータを受信
-    - すべてのデータが自動的にSQLiteに格納される
-    """
-    global serial_reader
-    
-    if not Config.SERIAL_ENABLED:
-        logger.info("Serial reader is disabled (SERIAL_ENABLED=False)")
-        return
-    
-    try:
-        logger.info("Starting serial reader...")
-        serial_reader = create_serial_reader(Config)
-        
-        if serial_reader.port is None:
-            logger.warning("No serial port found. Check USB connection.")
-            serial_reader = None
-            return
-        
-        serial_reader.start()
-        logger.info(f"✅ Serial reader started on {serial_reader.port}")
-        
-    except Exception as e:
-        logger.error(f"Failed to start serial reader: {e}", exc_info=True)
-        serial_reader = None
-
-
-def stop_serial_reader():
-    """シリアルリーダーを停止"""
-    global serial_reader
-    
-    if serial_reader:
-        try:
-            serial_reader.stop()
-            logger.info("Serial reader stopped")
-        except Exception as e:
-            logger.error(f"Error stopping serial reader: {e}")
-
-
 def main():
     """アプリケーション起動"""
     try:
@@ -96,8 +52,9 @@ def main():
         logger.info("Initializing database...")
         init_database()
         
-        # シリアルリーダー起動
-        start_serial_reader()
+        # シリアルリーダー・バックグラウンドタスク起動（単一プロセスなので常にプライマリ、
+        # gunicorn が同じデータディレクトリで動いている場合はそちらに任せる）
+        start_process_services()
         
         # Flask アプリを作成
         logger.info("Creating Flask application...")
@@ -112,8 +69,9 @@ def main():
         print(f"⚙️  Management: http://{Config.FLASK_HOST}:{Config.FLASK_PORT}/management\n")
         
         if Config.SERIAL_ENABLED:
-            if serial_reader:
-                print(f"📶 Serial Reader: {serial_reader.port} @ {serial_reader.baudrate} baud\n")
+            ports = serial_gateway.get_connected_ports()
+            if ports:
+                print(f"📶 Serial Reader: {', '.join(ports)} @ {serial_gateway.baudrate} baud\n")
             else:
                 print(f"⚠️  Serial Reader: Not connected (check USB connection)\n")
         
@@ -129,8 +87,8 @@ def main():
         print(f"❌ Error: {e}")
         sys.exit(1)
     finally:
-        # クリーンアップ
-        stop_serial_reader()
+        # クリーンアップ（書き込みキューに残っているデータも書き出す）
+        stop_process_services()
 
 
 if __name__ == '__main__':
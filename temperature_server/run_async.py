@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+temperature_server/run_async.py
+asyncio サーバー（aiohttp）起動スクリプト（オプション）
+
+温度データの受信・参照・SSE のみを提供する（管理画面等は run.py / gunicorn を使用）。
+    pip install aiohttp
+    python run_async.py
+"""
+
+import sys
+from pathlib import Path
+import os
+
+# 環境変数設定
+os.environ.setdefault('FLASK_ENV', 'production')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from aiohttp import web
+from config import Config
+from logger import setup_logger
+from async_server import create_async_app
+
+logger = setup_logger('main')
+
+
+def main():
+    """アプリケーション起動"""
+    logger.info(f"Starting asyncio server on {Config.FLASK_HOST}:{Config.FLASK_PORT}")
+    # リクエストログは出さない（1リクエストごとの書き込みを避ける）
+    web.run_app(create_async_app(), host=Config.FLASK_HOST, port=Config.FLASK_PORT, access_log=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
 """
 temperature_server/services/background_tasks.py
-バックグラウンドタスク（ヘルスチェック、メモリ監視）
+バックグラウンドタスク（ヘルスチェック、メモリ監視、データ保持）
+
+各タスクは1回分の処理（check_memory() 等）と実行間隔の組として定義し、
+スレッド（BackgroundTaskManager.start()）でもコルーチン（async_server）でも同じ処理を動かす
 """
 
 import threading
@@ -13,121 +16,145 @@ from config import Config
 
 logger = logging.getLogger(__name__)
 
+
+class PeriodicTask:
+    """定期実行するタスク1つ分の定義"""
+
+    __slots__ = ('name', 'func', 'interval', 'initial_delay', 'error_delay')
+
+    def __init__(self, name, func, interval, initial_delay=0.0, error_delay=60.0):
+        """
+        Args:
+            name (str): タスク名（スレッド名・ログ用）
+            func: 1回分の処理（ブロッキング）
+            interval (float): 実行間隔（秒）
+            initial_delay (float): 初回実行までの待ち時間（秒）
+            error_delay (float): エラー時に次の実行まで待つ時間（秒）
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.error_delay = error_delay
+
+
 class BackgroundTaskManager:
     """バックグラウンドタスク管理"""
-    
+
     def __init__(self):
         self.running = False
         self.threads = []
         self.last_cleanup = datetime.now()
-    
+        self._stop_event = threading.Event()
+        self._wifi_manager = None
+
+    def get_tasks(self):
+        """
+        実行するタスクの一覧
+
+        Returns:
+            list[PeriodicTask]
+        """
+        tasks = [
+            # メモリ監視タスク
+            PeriodicTask("MemoryMonitor", self.check_memory, Config.MEMORY_CHECK_INTERVAL),
+            # WiFi ヘルスチェックタスク
+            PeriodicTask("WiFiHealthCheck", self.check_wifi, Config.WIFI_CHECK_INTERVAL),
+            # ログクリーンアップタスク（24時間ごと）
+            PeriodicTask("LogCleanup", self.cleanup_logs, 86400, error_delay=3600),
+        ]
+        # データ保持（古いデータの削除）タスク（RETENTION_ENABLED=True の場合のみ）
+        if Config.RETENTION_ENABLED:
+            # 起動直後の負荷を避けるため少し待ってから開始
+            tasks.append(PeriodicTask(
+                "Retention", self.run_retention, Config.RETENTION_INTERVAL, initial_delay=60, error_delay=600
+            ))
+        return tasks
+
     def start(self):
-        """すべてのバックグラウンドタスクを開始"""
+        """すべてのバックグラウンドタスクをスレッドで開始"""
         if self.running:
             return
-        
+
         self.running = True
+        self._stop_event.clear()
         logger.info("Starting background tasks...")
-        
-        # メモリ監視タスク
-        self.start_memory_monitor()
-        
-        # WiFi ヘルスチェックタスク
-        self.start_wifi_health_check()
-        
-        # ログクリーンアップタスク
-        self.start_log_cleanup()
-        
+
+        for task in self.get_tasks():
+            thread = threading.Thread(target=self._run_task, args=(task,), daemon=True, name=task.name)
+            thread.start()
+            self.threads.append(thread)
+
         logger.info(f"✓ Background tasks started ({len(self.threads)} threads)")
-    
+
     def stop(self):
         """すべてのバックグラウンドタスクを停止"""
         self.running = False
+        self._stop_event.set()
         logger.info("Stopping background tasks...")
-        
+
         for thread in self.threads:
             thread.join(timeout=5)
-        
+        self.threads = []
+
         logger.info("✓ Background tasks stopped")
-    
-    def start_memory_monitor(self):
+
+    def _run_task(self, task):
+        """タスクを停止まで定期実行（スレッド）"""
+        if self._stop_event.wait(task.initial_delay):
+            return
+        while self.running:
+            try:
+                task.func()
+                delay = task.interval
+            except Exception as e:
+                logger.error(f"{task.name} error: {e}")
+                delay = task.error_delay
+            if self._stop_event.wait(delay):
+                break
+
+    def check_memory(self):
         """メモリ使用率を監視"""
-        def monitor():
-            while self.running:
-                try:
-                    mem = psutil.virtual_memory()
-                    
-                    if mem.percent >= Config.MEMORY_THRESHOLD:
-                        logger.warning(
-                            f"⚠️  Memory usage high: {mem.percent}% "
-                            f"(threshold: {Config.MEMORY_THRESHOLD}%)"
-                        )
-                        
-                        # キャッシュをクリア
-                        try:
-                            import subprocess
-                            subprocess.run(['sync'], timeout=5)
-                            logger.info("✓ Cache cleared")
-                        except Exception as e:
-                            logger.warning(f"Failed to clear cache: {e}")
-                    
-                    time.sleep(Config.MEMORY_CHECK_INTERVAL)
-                
-                except Exception as e:
-                    logger.error(f"Memory monitor error: {e}")
-                    time.sleep(60)
-        
-        thread = threading.Thread(target=monitor, daemon=True, name="MemoryMonitor")
-        thread.start()
-        self.threads.append(thread)
-    
-    def start_wifi_health_check(self):
+        mem = psutil.virtual_memory()
+
+        if mem.percent >= Config.MEMORY_THRESHOLD:
+            logger.warning(
+                f"⚠️  Memory usage high: {mem.percent}% "
+                f"(threshold: {Config.MEMORY_THRESHOLD}%)"
+            )
+
+            # キャッシュをクリア
+            try:
+                import subprocess
+                subprocess.run(['sync'], timeout=5)
+                logger.info("✓ Cache cleared")
+            except Exception as e:
+                logger.warning(f"Failed to clear cache: {e}")
+
+    def check_wifi(self):
         """WiFi のヘルスチェック"""
-        def health_check():
+        if self._wifi_manager is None:
             from services.wifi_manager import WiFiManager
-            wifi_manager = WiFiManager()
-            
-            while self.running:
-                try:
-                    health = wifi_manager.health_check()
-                    
-                    if health.get('overall') != 'healthy':
-                        logger.warning(f"WiFi health: {health.get('overall')}")
-                    
-                    time.sleep(Config.WIFI_CHECK_INTERVAL)
-                
-                except Exception as e:
-                    logger.error(f"WiFi health check error: {e}")
-                    time.sleep(60)
-        
-        thread = threading.Thread(target=health_check, daemon=True, name="WiFiHealthCheck")
-        thread.start()
-        self.threads.append(thread)
-    
-    def start_log_cleanup(self):
-        """古いログファイルをクリーンアップ"""
-        def cleanup():
-            from database.queries import SystemLogQueries
-            
-            while self.running:
-                try:
-                    # 古いログを削除
-                    deleted = SystemLogQueries.cleanup_old_logs(
-                        days=Config.LOG_RETENTION_DAYS
-                    )
-                    if deleted > 0:
-                        logger.info(f"Cleaned up {deleted} old log entries")
-                    
-                    # 24時間ごとに実行
-                    time.sleep(86400)
-                
-                except Exception as e:
-                    logger.error(f"Log cleanup error: {e}")
-                    time.sleep(3600)
-        
-        thread = threading.Thread(target=cleanup, daemon=True, name="LogCleanup")
-        thread.start()
-        self.threads.append(thread)
+            self._wifi_manager = WiFiManager()
+
+        health = self._wifi_manager.health_check()
+        if health.get('overall') != 'healthy':
+            logger.warning(f"WiFi health: {health.get('overall')}")
+
+    def cleanup_logs(self):
+        """古いログを削除"""
+        from database.queries import SystemLogQueries
+
+        deleted = SystemLogQueries.cleanup_old_logs(
+            days=Config.LOG_RETENTION_DAYS
+        )
+        if deleted > 0:
+            logger.info(f"Cleaned up {deleted} old log entries")
+
+    def run_retention(self):
+        """保持期間を過ぎたデータを削除"""
+        from services.retention import retention_engine
+        retention_engine.run_once()
 
 # グローバルインスタンス
 background_tasks = BackgroundTaskManager()
@@ -0,0 +1,261 @@
+"""
+temperature_server/services/data_export.py
+温度データのエクスポート（ストリーミング）
+
+- センサーごとに (sensor_id, ts) 順で EXPORT_FETCH_SIZE 行ずつ読み、チャンクごとに出力する
+  （期間・センサー数によらずメモリ使用量は一定）
+- 接続はプール外の専用接続で、ダウンロードが終わるまで保持する（切断された場合はジェネレータの close() で閉じる）。
+  遅い・止まったクライアントでも読み取りプールは減らない。また、各バッチの SELECT は読み切ってから送るため、
+  送信待ちの間はスナップショットを保持せず WAL のチェックポイントも妨げない
+  （その代わり全体は1つのスナップショットではなく、ダウンロード中に追加された行が含まれる場合がある）
+- 形式: csv（従来の日本語ヘッダー）・ndjson・parquet・arrow（Arrow IPC ストリーム）
+  parquet・arrow は pyarrow がインストールされている場合のみ
+- csv 以外は分析ツール向けの列（ts は UTC のエポックミリ秒 / timestamp[ms]、battery_mode は真偽値）
+"""
+
+import csv
+import logging
+from config import Config
+from database.queries import TemperatureQueries, EXPORT_COLUMNS
+from utils.json_provider import dumps_bytes
+
+# pyarrow はオプション（インストールされていなくても csv・ndjson は動作する）
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    arrow_available = True
+except ImportError:
+    pa = pq = None
+    arrow_available = False
+
+logger = logging.getLogger(__name__)
+
+# csv 以外の形式の列（EXPORT_COLUMNS の文字列の timestamp は含めない）
+FIELDS = ('sensor_id', 'sensor_name', 'ts', 'temperature', 'humidity', 'rssi', 'battery_mode', 'connection_type')
+_FIELD_INDEXES = tuple(EXPORT_COLUMNS.index(name) for name in FIELDS)
+
+if arrow_available:
+    ARROW_SCHEMA = pa.schema([
+        ('sensor_id', pa.string()),
+        ('sensor_name', pa.string()),
+        ('ts', pa.timestamp('ms', tz='UTC')),
+        ('temperature', pa.float64()),
+        ('humidity', pa.float64()),
+        ('rssi', pa.int32()),
+        ('battery_mode', pa.bool_()),
+        ('connection_type', pa.string()),
+    ])
+
+# CSV のヘッダー（従来の /api/export/csv と同じ）
+CSV_HEADER = ['センサーID', 'センサー名', '温度 (°C)', '湿度 (%)', 'RSSI (dBm)', 'バッテリー', '接続タイプ', 'タイムスタンプ']
+
+
+class _ChunkBuffer:
+    """csv.writer の書き込み先（書き込まれた文字列を溜めてチャンクとして取り出す）"""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, text):
+        self._parts.append(text)
+
+    def drain(self):
+        """溜まった文字列を UTF-8 のバイト列で取り出す"""
+        data = ''.join(self._parts).encode('utf-8')
+        self._parts.clear()
+        return data
+
+
+def iter_csv(since_ms, until_ms=None, sensor_ids=None):
+    """
+    CSV を少しずつ返すジェネレータ
+
+    Args:
+        since_ms (int): 開始時刻（エポックミリ秒）
+        until_ms (int): 終了時刻（エポックミリ秒、None の場合は最新まで）
+        sensor_ids: 対象のセンサーID（None の場合は全センサー）
+
+    Yields:
+        bytes: CSV のチャンク（読み出し1回分）
+    """
+    buffer = _ChunkBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.drain()
+
+    batches = TemperatureQueries.iter_export_batches(
+        since_ms, until_ms, sensor_ids, batch_size=Config.EXPORT_FETCH_SIZE
+    )
+    rows_written = 0
+    try:
+        for rows in batches:
+            writer.writerows(
+                (sensor_id, sensor_name, temperature, humidity, rssi,
+                 'バッテリー' if battery_mode else 'AC', connection_type, timestamp)
+                for sensor_id, sensor_name, temperature, humidity, rssi, battery_mode, connection_type, timestamp, _ in rows
+            )
+            rows_written += len(rows)
+            yield buffer.drain()
+    except Exception as e:
+        # ヘッダー送信後はステータスを変更できないため、ログに残して打ち切る
+        logger.error(f"CSV export aborted after {rows_written} rows: {e}", exc_info=True)
+    finally:
+        batches.close()
+
+
+def iter_ndjson(since_ms, until_ms=None, sensor_ids=None):
+    """
+    NDJSON（1行1件）を少しずつ返すジェネレータ（引数は iter_csv() と同じ）
+
+    Yields:
+        bytes: NDJSON のチャンク（読み出し1回分）
+    """
+    batches = TemperatureQueries.iter_export_batches(
+        since_ms, until_ms, sensor_ids, batch_size=Config.EXPORT_FETCH_SIZE
+    )
+    rows_written = 0
+    try:
+        for rows in batches:
+            lines = []
+            for row in rows:
+                record = dict(zip(FIELDS, (row[i] for i in _FIELD_INDEXES)))
+                record['battery_mode'] = bool(record['battery_mode'])
+                lines.append(dumps_bytes(record))
+            lines.append(b'')
+            rows_written += len(rows)
+            yield b'\n'.join(lines)
+    except Exception as e:
+        logger.error(f"NDJSON export aborted after {rows_written} rows: {e}", exc_info=True)
+    finally:
+        batches.close()
+
+
+class _ByteSink:
+    """pyarrow の書き込み先（書き込まれたバイト列を溜めてチャンクとして取り出す）"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        """溜まったバイト列を取り出す"""
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _record_batch(rows):
+    """読み出し1回分の行タプルを Arrow の RecordBatch に変換"""
+    columns = list(zip(*rows))
+    arrays = [pa.array(columns[i], type=field.type) if field.name != 'battery_mode'
+              else pa.array([bool(value) for value in columns[i]], type=pa.bool_())
+              for i, field in zip(_FIELD_INDEXES, ARROW_SCHEMA)]
+    return pa.RecordBatch.from_arrays(arrays, schema=ARROW_SCHEMA)
+
+
+def _compression(name):
+    """pyarrow が対応していない圧縮方式は使わない（None = 圧縮なし）"""
+    if not name or name == 'none':
+        return None
+    return name if pa.Codec.is_available(name) else None
+
+
+def _iter_arrow(since_ms, until_ms, sensor_ids, open_writer, write, label):
+    """
+    pyarrow の writer の出力を少しずつ返す（iter_parquet()・iter_arrow_stream() の共通処理）
+
+    Args:
+        open_writer: 書き込み先を受け取って writer を返す関数
+        write: (writer, RecordBatch のリスト) を書き込む関数
+        label (str): ログに出す形式名
+    """
+    sink = _ByteSink()
+    writer = open_writer(sink)
+    batches = TemperatureQueries.iter_export_batches(
+        since_ms, until_ms, sensor_ids, batch_size=Config.EXPORT_FETCH_SIZE
+    )
+    pending = []
+    pending_rows = 0
+    rows_written = 0
+    try:
+        for rows in batches:
+            pending.append(_record_batch(rows))
+            pending_rows += len(rows)
+            if pending_rows >= Config.EXPORT_ROW_GROUP_SIZE:
+                write(writer, pending)
+                rows_written += pending_rows
+                pending, pending_rows = [], 0
+                yield sink.drain()
+        if pending:
+            write(writer, pending)
+            rows_written += pending_rows
+        writer.close()
+        yield sink.drain()
+    except Exception as e:
+        # フッターを書かずに打ち切る（受信側で不完全なファイルとして検出できる）
+        logger.error(f"{label} export aborted after {rows_written} rows: {e}", exc_info=True)
+    finally:
+        batches.close()
+
+
+def iter_parquet(since_ms, until_ms=None, sensor_ids=None):
+    """
+    Parquet を少しずつ返すジェネレータ（引数は iter_csv() と同じ）
+
+    読み出した行を EXPORT_ROW_GROUP_SIZE 行ごとに1つの row group として書き出す
+    （保持するのは Arrow の列形式の1 row group 分のみ）
+
+    Yields:
+        bytes: Parquet のチャンク（row group 1つ分、最後はフッター）
+    """
+    def open_writer(sink):
+        return pq.ParquetWriter(sink, ARROW_SCHEMA, compression=_compression(Config.EXPORT_PARQUET_COMPRESSION) or 'none')
+
+    def write(writer, record_batches):
+        table = pa.Table.from_batches(record_batches, schema=ARROW_SCHEMA)
+        writer.write_table(table, row_group_size=table.num_rows)
+
+    return _iter_arrow(since_ms, until_ms, sensor_ids, open_writer, write, 'Parquet')
+
+
+def iter_arrow_stream(since_ms, until_ms=None, sensor_ids=None):
+    """
+    Arrow IPC ストリーム形式を少しずつ返すジェネレータ（引数は iter_csv() と同じ）
+
+    Yields:
+        bytes: IPC ストリームのチャンク（EXPORT_ROW_GROUP_SIZE 行ごと）
+    """
+    def open_writer(sink):
+        options = pa.ipc.IpcWriteOptions(compression=_compression(Config.EXPORT_ARROW_COMPRESSION))
+        return pa.ipc.new_stream(sink, ARROW_SCHEMA, options=options)
+
+    def write(writer, record_batches):
+        for record_batch in record_batches:
+            writer.write_batch(record_batch)
+
+    return _iter_arrow(since_ms, until_ms, sensor_ids, open_writer, write, 'Arrow')
+
+
+# 形式ごとの (ジェネレータ, MIME タイプ, 拡張子, 転送時に gzip 圧縮するか)
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv', 'csv', True),
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson', True),
+    'parquet': (iter_parquet, 'application/vnd.apache.parquet', 'parquet', False),
+    'arrow': (iter_arrow_stream, 'application/vnd.apache.arrow.stream', 'arrows', False),
+}
+ARROW_FORMATS = ('parquet', 'arrow')
@@ -0,0 +1,154 @@
+"""
+temperature_server/services/db_watcher.py
+他プロセスの書き込みの検知（複数ワーカー構成用）
+
+gunicorn で複数のワーカーを動かすと、最新データキャッシュと SSE の購読者は
+プロセスごとに持つため、他のワーカーがコミットしたデータが反映されない。
+
+- PRAGMA data_version を一定間隔で確認し、他の接続のコミットを検知する
+  （同じプロセスの書き込み用接続のコミットも検知される）
+- 変更があれば前回以降に追加された行を SSE の購読者に配信し、最新データキャッシュを
+  sensor_latest から再読み込みする。応答キャッシュ・ETag の版は新着行のセンサーだけ進める
+  （行が削除された場合（id の最大値の減少・最小値の増加、センサーの消滅）は全センサー）
+"""
+
+import threading
+import logging
+from config import Config
+from database.models import get_connection
+from database.latest_cache import latest_cache
+from services.reading_stream import reading_broadcaster, STREAM_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+class DataVersionWatcher:
+    """データベースの変更を監視し、キャッシュと SSE に反映する"""
+
+    def __init__(self, interval=0.25, fetch_limit=1000):
+        """
+        初期化
+
+        Args:
+            interval (float): data_version を確認する間隔（秒）
+            fetch_limit (int): 1回のクエリで取得する新着行の最大数
+        """
+        self.interval = interval
+        self.fetch_limit = fetch_limit
+        self._conn = None
+        self._data_version = None
+        self._last_id = 0
+        self._min_id = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.is_running = False
+
+        # 統計情報
+        self.stats = {
+            'changes': 0,
+            'rows': 0,
+            'errors': 0,
+        }
+
+    def start(self):
+        """監視スレッドを開始（SSE の配信元をこのスレッドに切り替える）"""
+        if self.is_running:
+            return
+        self._conn = get_connection()
+        self._data_version = self._read_data_version()
+        # 起動前のデータは配信しない
+        self._min_id, self._last_id = self._read_id_range()
+
+        reading_broadcaster.source = 'database'
+        self.is_running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch_loop, daemon=True, name="DataVersionWatcher")
+        self._thread.start()
+        logger.info(f"Data version watcher started (interval={self.interval}s)")
+
+    def stop(self):
+        """監視スレッドを停止"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self._stop_event.set()
+        self._thread.join(timeout=self.interval + 5)
+        self._thread = None
+        reading_broadcaster.source = 'local'
+        self._conn.close()
+        self._conn = None
+
+    def poll(self):
+        """
+        変更を確認して反映
+
+        Returns:
+            int: 配信した新着行の数（変更がない場合0）
+        """
+        version = self._read_data_version()
+        if version == self._data_version:
+            return 0
+        self._data_version = version
+        self.stats['changes'] += 1
+
+        # リテンション・センサー削除で行が消えた場合は、影響範囲が分からないため全センサーを変更扱いにする
+        min_id, max_id = self._read_id_range()
+        deleted = max_id < self._last_id or (self._min_id and min_id > self._min_id)
+        self._min_id = min_id
+        if max_id < self._last_id:
+            self._last_id = max_id
+
+        published = 0
+        changed_sensor_ids = set()
+        while True:
+            cursor = self._conn.execute(f"""
+                SELECT id, {', '.join(STREAM_COLUMNS)} FROM temperatures
+                WHERE id > ? ORDER BY id LIMIT ?
+            """, (self._last_id, self.fetch_limit))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            self._last_id = rows[-1][0]
+            readings = [tuple(row)[1:] for row in rows]
+            changed_sensor_ids.update(reading[0] for reading in readings)
+            reading_broadcaster.publish(readings, source='database')
+            published += len(rows)
+            if len(rows) < self.fetch_limit:
+                break
+
+        # 最新データはセンサー数分の行のみのため全体を読み直す
+        latest_cache.reload(None if deleted else changed_sensor_ids)
+
+        self.stats['rows'] += published
+        return published
+
+    def _read_id_range(self):
+        """temperatures の id の (最小値, 最大値)（行がない場合は 0）"""
+        # MIN・MAX を別のサブクエリにすると、それぞれ rowid の端を読むだけになる
+        return tuple(self._conn.execute("""
+            SELECT COALESCE((SELECT MIN(id) FROM temperatures), 0),
+                   COALESCE((SELECT MAX(id) FROM temperatures), 0)
+        """).fetchone())
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _watch_loop(self):
+        """監視スレッド"""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Data version watcher error: {e}")
+
+    def get_stats(self):
+        """統計情報を取得"""
+        stats = dict(self.stats)
+        stats['running'] = self.is_running
+        stats['last_id'] = self._last_id
+        return stats
+
+
+# グローバルインスタンス（複数ワーカー構成のときのみ start() する）
+data_version_watcher = DataVersionWatcher(interval=Config.DB_WATCH_INTERVAL)
@@ -0,0 +1,331 @@
+"""
+temperature_server/services/ingest_queue.py
+温度データの書き込みキュー（ライトビハインド）
+
+構成:
+- HTTP ハンドラ / シリアルリーダーは enqueue() で行をキューに積んで即座に戻る
+- 単一のライタースレッドがキューから取り出し、件数または経過時間の閾値で
+  executemany による1トランザクションにまとめてコミットする
+- enqueue_many() で積んだ行（ゲートウェイの1フレーム分）は分割せず同じトランザクションでコミットする
+- シャットダウン時は stop() でキューを最後まで書き出す（データ欠損なし）
+- リトライしてもコミットできなかった行はスピルファイルに退避し、次のコミット成功時に書き戻す
+  （services/ingest_spill.py、応答済みの行を破棄しない）。内容が不正な行だけは除外して記録する
+- 統計情報はハンドラのスレッドとライタースレッドから更新するためロックで保護する
+"""
+
+import atexit
+import queue
+import threading
+import time
+import logging
+from config import Config
+from database.queries import TemperatureQueries
+from services.reading_stream import reading_broadcaster
+from services.ingest_spill import write_with_retry, has_spill, replay_spill
+from utils.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+# キュー制御用の番兵
+_STOP = object()
+
+
+class _Group:
+    """同じトランザクションでコミットする行のまとまり"""
+
+    __slots__ = ('rows', 'enqueued_at')
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.enqueued_at = time.monotonic()
+
+
+class IngestQueue:
+    """温度データの書き込みキュー（単一ライタースレッド）"""
+
+    def __init__(self, batch_size=200, flush_interval=0.25, maxsize=10000):
+        """
+        初期化
+
+        Args:
+            batch_size (int): 1トランザクションでコミットする最大行数
+            flush_interval (float): 最初の行を受け取ってからコミットするまでの最大待ち時間（秒）
+            maxsize (int): キューの最大件数（超過時は同期書き込みにフォールバック）
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._atexit_registered = False
+        self.is_running = False
+
+        # 統計情報（_count() で更新する）
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'rejected': 0,
+            'lost': 0,
+            'sync_fallback': 0,
+            'last_batch_size': 0,
+            'last_commit_ms': 0.0,
+        }
+        # enqueue_many() からコミット完了までの遅延
+        self.commit_latency = LatencyStats()
+
+    def _count(self, **deltas):
+        """統計情報のカウンターを加算"""
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    def start(self):
+        """ライタースレッドを開始"""
+        with self._lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self._thread = threading.Thread(target=self._writer_loop, daemon=True, name="IngestWriter")
+            self._thread.start()
+
+            # 通常終了時にもキューを書き出す
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+        logger.info(
+            f"Ingest queue started (batch_size={self.batch_size}, "
+            f"flush_interval={self.flush_interval}s)"
+        )
+
+    def stop(self, timeout=10.0):
+        """
+        キューを最後まで書き出してライタースレッドを停止（drain）
+
+        Args:
+            timeout (float): 書き出し完了を待つ最大時間（秒）
+        """
+        with self._lock:
+            if not self.is_running:
+                return
+            self.is_running = False
+            thread = self._thread
+            self._thread = None
+
+        self._queue.put(_STOP)
+        thread.join(timeout=timeout)
+        if thread.is_alive():
+            logger.warning(f"Ingest writer did not finish within {timeout}s")
+        else:
+            logger.info(f"Ingest queue drained and stopped (written={self.stats['written']})")
+
+    def enqueue(self, sensor_id, temperature, sensor_name=None, humidity=None, rssi=None, battery_mode=False, connection_type=None):
+        """
+        温度データをキューに積む（受信時刻はこの時点で確定）
+
+        Returns:
+            bool: キューに積んだ場合True、同期書き込みにフォールバックした場合False
+        """
+        row = TemperatureQueries.build_reading_row(
+            sensor_id, temperature, sensor_name, humidity, rssi, battery_mode, connection_type
+        )
+
+        if not self.is_running:
+            self.start()
+
+        try:
+            self._queue.put(row, timeout=1.0)
+            self._count(enqueued=1)
+            return True
+        except queue.Full:
+            # キューが溢れた場合はデータを失わないよう同期で書き込む
+            self._write_sync([row])
+            return False
+
+    def enqueue_many(self, readings):
+        """
+        複数の温度データをまとめてキューに積む（同じトランザクションでコミットされる）
+
+        Args:
+            readings: enqueue() と同じキーを持つdictのリスト（sensor_id, temperature は必須）
+
+        Returns:
+            bool: キューに積んだ場合True、同期書き込みにフォールバックした場合False
+        """
+        rows = [
+            TemperatureQueries.build_reading_row(
+                reading['sensor_id'],
+                reading['temperature'],
+                reading.get('sensor_name'),
+                reading.get('humidity'),
+                reading.get('rssi'),
+                reading.get('battery_mode', False),
+                reading.get('connection_type'),
+                reading.get('timestamp')
+            )
+            for reading in readings
+        ]
+        if not rows:
+            return True
+
+        if not self.is_running:
+            self.start()
+
+        group = _Group(rows)
+        try:
+            self._queue.put(group, timeout=1.0)
+            self._count(enqueued=len(rows))
+            return True
+        except queue.Full:
+            if self._write_sync(rows):
+                self.commit_latency.record(time.monotonic() - group.enqueued_at)
+            return False
+
+    def _write_sync(self, rows):
+        """
+        キューが溢れた場合に呼び出し元のスレッドで書き込む
+
+        キューが溢れるのは多くの場合ライターの書き込みが失敗しているときのため、
+        例外を呼び出し元に返さず、ライターと同じリトライ・退避・除外の方針で書き込む
+
+        Returns:
+            bool: すべての行をコミットした場合True
+        """
+        logger.warning("Ingest queue is full, writing synchronously")
+        result = write_with_retry(rows)
+        self._count(
+            sync_fallback=len(rows), written=len(result.committed), failed=result.failed,
+            spilled=len(result.spilled), rejected=len(result.rejected), lost=len(result.lost)
+        )
+        if result.committed:
+            reading_broadcaster.publish(result.committed)
+            self._replay_spill()
+        return not result.failed
+
+    def flush(self, timeout=5.0):
+        """
+        キューに積まれている行をすべてコミットするまで待機
+
+        Returns:
+            bool: タイムアウトまでに書き出しが完了した場合True
+        """
+        if not self.is_running:
+            return True
+
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def get_stats(self):
+        """統計情報を取得"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['pending'] = self._queue.qsize()
+        stats['running'] = self.is_running
+        stats['commit_latency'] = self.commit_latency.to_dict()
+        return stats
+
+    def _writer_loop(self):
+        """ライタースレッド: 件数または時間の閾値でまとめてコミット"""
+        batch = []
+        groups = []  # バッチに含まれる _Group の enqueue 時刻
+        deadline = None
+
+        # 前回の実行で退避した行を書き戻す
+        self._replay_spill()
+
+        while True:
+            if batch:
+                wait = max(0.0, deadline - time.monotonic())
+            else:
+                wait = None
+
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                # 時間の閾値に到達
+                self._write_batch(batch, groups)
+                batch, groups = [], []
+                continue
+
+            if item is _STOP:
+                self._write_batch(batch, groups)
+                break
+
+            if isinstance(item, threading.Event):
+                # flush() 要求
+                self._write_batch(batch, groups)
+                batch, groups = [], []
+                item.set()
+                continue
+
+            if not batch:
+                deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, _Group):
+                # まとまりは分割しない（batch_size を超えても同じバッチに入れる）
+                batch.extend(item.rows)
+                groups.append(item.enqueued_at)
+            else:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch, groups)
+                batch, groups = [], []
+
+    def _write_batch(self, batch, groups=(), retries=3):
+        """
+        バッチを1トランザクションで書き込み
+        （失敗時はリトライし、それでも失敗した場合は退避、内容が不正な行は除外して残りをコミット）
+        """
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        result = write_with_retry(batch, retries)
+        self._count(
+            failed=result.failed, spilled=len(result.spilled),
+            rejected=len(result.rejected), lost=len(result.lost)
+        )
+        committed = result.committed
+        if not committed:
+            return
+
+        commit_ms = round((time.perf_counter() - started) * 1000, 2)
+        with self._stats_lock:
+            self.stats['written'] += len(committed)
+            self.stats['batches'] += 1
+            self.stats['last_batch_size'] = len(committed)
+            self.stats['last_commit_ms'] = commit_ms
+        logger.debug(f"Committed {len(committed)} readings in {commit_ms}ms")
+
+        committed_at = time.monotonic()
+        for enqueued_at in groups:
+            self.commit_latency.record(committed_at - enqueued_at)
+
+        # コミット済みの行をSSE購読者に配信
+        reading_broadcaster.publish(committed)
+
+        # 書き込めるようになったので退避していた行を書き戻す
+        self._replay_spill()
+
+    def _replay_spill(self):
+        """スピルファイルの行を書き戻して配信"""
+        if not has_spill():
+            return
+        result = replay_spill()
+        self._count(replayed=len(result.committed), rejected=len(result.rejected))
+        if result.committed:
+            reading_broadcaster.publish(result.committed)
+
+
+# グローバルインスタンス
+ingest_queue = IngestQueue(
+    batch_size=Config.INGEST_BATCH_SIZE,
+    flush_interval=Config.INGEST_FLUSH_INTERVAL,
+    maxsize=Config.INGEST_QUEUE_MAXSIZE
+)
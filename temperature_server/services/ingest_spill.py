@@ -0,0 +1,209 @@
+"""
+temperature_server/services/ingest_spill.py
+書き込みキューのコミット（リトライ）と、コミットできなかった行の退避（スピルファイル）
+
+- 書き込みキュー（services/ingest_queue.py・async_server/ingest.py）はクライアントに応答した後に
+  コミットするため、リトライしてもコミットできなかった行は破棄せず JSON Lines のファイルに退避する
+- 退避した行はライターの起動時と、次にコミットが成功したときに書き戻す
+- 行の内容が原因の失敗（sqlite3.IntegrityError）はリトライしても同じため、バッチを二分して
+  書き込める行だけをコミットし、1行でも失敗する行は除外ファイル（INGEST_REJECTED_FILE）に記録する
+  （1行の不正な値でバッチ全体・スピルファイル全体が書き込めなくなるのを防ぐ）
+- ファイルは fcntl.flock で排他するため、複数のプロセス（gunicorn のワーカー）で共有できる
+  （書き戻しのコミット後・ファイルの書き直し前にプロセスが落ちた場合は、次回に重複して書き込まれる）
+"""
+
+import fcntl
+import json
+import os
+import sqlite3
+import time
+import logging
+from config import Config
+from database.queries import TemperatureQueries
+
+logger = logging.getLogger(__name__)
+
+
+class WriteResult:
+    """write_with_retry() / replay_spill() の結果（行タプルのリスト）"""
+
+    __slots__ = ('committed', 'rejected', 'spilled', 'lost', 'pending')
+
+    def __init__(self):
+        self.committed = []  # コミットした行
+        self.rejected = []   # 行の内容が原因で書き込めず、除外ファイルに記録した行
+        self.spilled = []    # スピルファイルに退避した行
+        self.lost = []       # 退避にも失敗した行
+        self.pending = []    # 処理中に IntegrityError 以外で失敗し、未処理のまま残った行
+
+    @property
+    def failed(self):
+        """コミットできなかった行数"""
+        return len(self.rejected) + len(self.spilled) + len(self.lost)
+
+
+def _commit_rows(rows, result):
+    """
+    行をコミット（IntegrityError の場合は二分して、書き込める行だけをコミットする）
+
+    1行でも IntegrityError になる行は除外ファイルに記録して result.rejected に入れる。
+    IntegrityError 以外の例外はそのまま送出する（未処理の行は元の順序で result.pending に入れる）
+    """
+    stack = [rows]
+    while stack:
+        chunk = stack.pop()
+        try:
+            TemperatureQueries.insert_readings_batch(chunk)
+        except sqlite3.IntegrityError as e:
+            if len(chunk) == 1:
+                reject_rows(chunk, e)
+                result.rejected.extend(chunk)
+            else:
+                middle = len(chunk) // 2
+                stack.append(chunk[middle:])
+                stack.append(chunk[:middle])
+            continue
+        except Exception:
+            stack.append(chunk)
+            result.pending = [row for pending in reversed(stack) for row in pending]
+            raise
+        result.committed.extend(chunk)
+    result.pending = []
+
+
+def write_with_retry(rows, retries=3):
+    """
+    行を1トランザクションで書き込む
+
+    - IntegrityError: リトライせず、書き込める行だけをコミットし、残りは除外する
+    - それ以外の失敗: リトライし、それでも失敗した行は退避する
+
+    Args:
+        rows: build_reading_row() で作成した行タプルのリスト
+        retries (int): 最大試行回数
+
+    Returns:
+        WriteResult: コミット・除外・退避・消失した行
+    """
+    result = WriteResult()
+    pending = rows
+    for attempt in range(1, retries + 1):
+        try:
+            _commit_rows(pending, result)
+            return result
+        except Exception as e:
+            pending = result.pending
+            logger.error(f"Failed to write batch of {len(pending)} readings (attempt {attempt}/{retries}): {e}")
+            if attempt < retries:
+                time.sleep(0.1 * attempt)
+    result.pending = []
+    if spill_rows(pending):
+        result.spilled = pending
+    else:
+        result.lost = pending
+    return result
+
+
+def _append_lines(path, lines):
+    """JSON Lines のファイルに排他ロックを取って追記し、fsync する"""
+    data = ''.join(lines).encode('utf-8')
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        while data:
+            data = data[os.write(fd, data):]
+        os.fsync(fd)
+    finally:
+        # close でロックも解放される
+        os.close(fd)
+
+
+def _row_line(row):
+    return json.dumps(list(row), ensure_ascii=False) + '\n'
+
+
+def spill_rows(rows):
+    """
+    行をスピルファイルに追記
+
+    Returns:
+        bool: 退避できた場合True
+    """
+    path = Config.INGEST_SPILL_FILE
+    try:
+        _append_lines(path, [_row_line(row) for row in rows])
+    except OSError as e:
+        logger.critical(f"Lost {len(rows)} readings: could not spill to {path}: {e}")
+        return False
+    logger.warning(f"Spilled {len(rows)} readings to {path} (written back after the next successful commit)")
+    return True
+
+
+def reject_rows(rows, error):
+    """
+    書き込めない行を除外ファイルに記録（書き戻しはしない、ログにも残す）
+
+    Args:
+        rows: 行タプルのリスト
+        error: 書き込み時の例外
+    """
+    path = Config.INGEST_REJECTED_FILE
+    logger.error(f"Rejected {len(rows)} readings that cannot be written ({error}): {rows}")
+    try:
+        _append_lines(path, [
+            json.dumps({'error': str(error), 'row': list(row)}, ensure_ascii=False) + '\n' for row in rows
+        ])
+    except OSError as e:
+        logger.error(f"Could not record rejected readings to {path}: {e}")
+
+
+def has_spill():
+    """書き戻していない行があるか（ファイルのサイズのみ確認）"""
+    try:
+        return os.path.getsize(Config.INGEST_SPILL_FILE) > 0
+    except OSError:
+        return False
+
+
+def replay_spill():
+    """
+    スピルファイルの行を書き戻し、コミットした行・除外した行をファイルから取り除く
+
+    write_with_retry() と同じく IntegrityError の行は除外し、それ以外の失敗で
+    書き戻せなかった行はファイルに残す（次回に再度書き戻す）
+
+    Returns:
+        WriteResult: 書き戻した行（committed）・除外した行（rejected）
+    """
+    result = WriteResult()
+    if not has_spill():
+        return result
+    path = Config.INGEST_SPILL_FILE
+    try:
+        with open(path, 'r+', encoding='utf-8') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            rows = []
+            for line in f:
+                try:
+                    rows.append(tuple(json.loads(line)))
+                except ValueError:
+                    # 書き込み途中で落ちた行は読めないため捨てる
+                    logger.error(f"Skipped a broken line in {path}")
+            try:
+                _commit_rows(rows, result)
+            except Exception as e:
+                logger.error(f"Failed to write back {len(result.pending)} spilled readings from {path}: {e}")
+            # 書き戻せなかった行だけを残してファイルを書き直す
+            f.seek(0)
+            f.truncate()
+            f.writelines(_row_line(row) for row in result.pending)
+            f.flush()
+            os.fsync(f.fileno())
+    except FileNotFoundError:
+        return result
+    except OSError as e:
+        logger.error(f"Failed to rewrite spill file {path}: {e}")
+        return result
+    if result.committed:
+        logger.info(f"Wrote back {len(result.committed)} spilled readings from {path}")
+    return result
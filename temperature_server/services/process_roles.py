@@ -0,0 +1,145 @@
+"""
+temperature_server/services/process_roles.py
+プロセスの役割分担（開発サーバー / gunicorn の複数ワーカー）
+
+- シリアル受信とバックグラウンドタスク（データ保持・監視）はプライマリの1プロセスだけで動かす
+- プライマリはロックファイルの fcntl.flock で決める
+  （プロセスが終了するとロックは自動的に解放され、再起動したワーカーが引き継ぐ）
+- 複数ワーカー構成では、すべてのワーカーで DataVersionWatcher を動かし、
+  他のワーカーの書き込みを最新データキャッシュと SSE に反映する
+"""
+
+import fcntl
+import os
+import logging
+from config import Config
+from database.queries import TemperatureQueries
+from services.serial_gateway import serial_gateway
+from services.ingest_queue import ingest_queue
+from services.background_tasks import background_tasks
+from services.db_watcher import data_version_watcher
+
+logger = logging.getLogger(__name__)
+
+
+class PrimaryProcessLock:
+    """プライマリプロセスを1つに限定するロック（fcntl.flock）"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: ロックファイルのパス
+        """
+        self.path = str(path)
+        self._fd = None
+
+    @property
+    def is_held(self):
+        """このプロセスがロックを保持しているか"""
+        return self._fd is not None
+
+    def acquire(self):
+        """
+        ロックを取得（待たない）
+
+        Returns:
+            bool: 取得できた場合True（他のプロセスが保持している場合False）
+        """
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        # 調査用に保持しているプロセスのPIDを書いておく
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        """ロックを解放"""
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+primary_lock = PrimaryProcessLock(Config.PRIMARY_LOCK_FILE)
+
+
+def start_serial_reader():
+    """
+    シリアルゲートウェイを起動（USB/Serial経由のESP32データ受信）
+
+    この機能により以下が可能になります:
+    - ラズパイにUSB接続したESP32からシリアル経由でデータを受信
+    - 受信したESP32はESP-NOWで複数のESP32/ESP8266からデータを受信
+    - 複数のESP32を接続した場合はポートごとに受信（抜き差し・再接続にも追従）
+    - すべてのデータが自動的にSQLiteに格納される
+    """
+    if not Config.SERIAL_ENABLED:
+        logger.info("Serial reader is disabled (SERIAL_ENABLED=False)")
+        return
+
+    try:
+        logger.info("Starting serial gateway manager...")
+        serial_gateway.start()
+
+        ports = serial_gateway.get_connected_ports()
+        if ports:
+            logger.info(f"✅ Serial reader started on {', '.join(ports)}")
+        else:
+            logger.warning("No serial port found. Check USB connection (rescanning in background).")
+
+    except Exception as e:
+        logger.error(f"Failed to start serial gateway manager: {e}", exc_info=True)
+
+
+def stop_serial_reader():
+    """シリアルゲートウェイを停止"""
+    try:
+        serial_gateway.stop()
+    except Exception as e:
+        logger.error(f"Error stopping serial gateway manager: {e}")
+
+
+def start_process_services(multi_process=False):
+    """
+    プロセス起動時のサービス開始（データベースの初期化後に呼ぶ）
+
+    Args:
+        multi_process (bool): 複数ワーカー構成の場合True（他プロセスの書き込みを監視する）
+
+    Returns:
+        bool: このプロセスがプライマリになった場合True
+    """
+    # 最新データキャッシュを sensor_latest から読み込む
+    TemperatureQueries.reload_latest_cache()
+
+    if multi_process:
+        data_version_watcher.start()
+
+    if not primary_lock.acquire():
+        logger.info(f"Serial reader and background tasks run in another process (pid={os.getpid()})")
+        return False
+
+    logger.info(f"Primary process: starting serial reader and background tasks (pid={os.getpid()})")
+    start_serial_reader()
+    # バックグラウンドタスク起動（メモリ監視・データ保持など）
+    background_tasks.start()
+    return True
+
+
+def stop_process_services():
+    """プロセス終了時のサービス停止"""
+    if primary_lock.is_held:
+        stop_serial_reader()
+        background_tasks.stop()
+    data_version_watcher.stop()
+    # 書き込みキューに残っているデータを書き出す
+    ingest_queue.stop()
+    primary_lock.release()
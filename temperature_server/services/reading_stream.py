@@ -0,0 +1,181 @@
+"""
+temperature_server/services/reading_stream.py
+新着データのプッシュ配信（Server-Sent Events 用）
+
+構成:
+- 書き込みキューがコミットした行を publish() で全購読者に配る
+- 購読者（SSE接続）ごとに上限付きのキューを持ち、遅い接続が他を止めないようにする
+- キューが溢れた購読者には resync を通知し、クライアント側で再取得させる
+- 複数プロセス構成（gunicorn）では、他のプロセスがコミットした行も配信するため
+  配信元を DataVersionWatcher（データベースの変更検知）に切り替える
+"""
+
+import math
+import queue
+import threading
+import logging
+from config import Config
+from utils.json_provider import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+# 配信する列（build_reading_row() の行タプルと同じ順序）
+STREAM_COLUMNS = (
+    'sensor_id', 'sensor_name', 'temperature', 'humidity',
+    'rssi', 'battery_mode', 'connection_type', 'timestamp', 'ts'
+)
+
+# 購読者のキューに積む制御用の番兵
+RESYNC = object()
+
+
+def _finite(value):
+    """NaN・inf は None（ブラウザの JSON.parse は NaN を読めず、イベント全体が失われるため）"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class Subscription:
+    """SSE接続1本分の購読"""
+
+    def __init__(self, sensor_ids=None, maxsize=100):
+        """
+        Args:
+            sensor_ids: 配信対象のセンサーID（None の場合は全センサー）
+            maxsize (int): 未送信のバッチを保持する最大数
+        """
+        self.sensor_ids = frozenset(sensor_ids) if sensor_ids else None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, events):
+        """
+        シリアライズ済みの (sensor_id, JSON文字列) のリストを受け取り、対象分だけ積む
+
+        キューが満杯の場合は破棄して resync を要求する
+
+        Returns:
+            bool: 取りこぼしが発生した場合False
+        """
+        if self.sensor_ids is not None:
+            events = [event for event in events if event[0] in self.sensor_ids]
+        if not events:
+            return True
+
+        try:
+            self._queue.put_nowait('[' + ','.join(payload for _, payload in events) + ']')
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self._request_resync()
+            return False
+
+    def _request_resync(self):
+        """古いバッチを捨てて resync を積む"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            self._queue.put_nowait(RESYNC)
+        except queue.Full:
+            pass
+
+    def get(self, timeout):
+        """
+        次のバッチを取得
+
+        Returns:
+            JSON配列の文字列 / RESYNC / タイムアウト時はNone
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ReadingBroadcaster:
+    """新着データを購読者に配信（スレッドセーフ）"""
+
+    def __init__(self, max_subscribers=20, client_queue_size=100):
+        """
+        Args:
+            max_subscribers (int): 同時接続数の上限
+            client_queue_size (int): 購読者ごとの未送信バッチの上限
+        """
+        self.max_subscribers = max_subscribers
+        self.client_queue_size = client_queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        # 配信元: local（このプロセスの書き込み） / database（DataVersionWatcher）
+        self.source = 'local'
+
+        # 統計情報
+        self.stats = {
+            'published': 0,
+            'batches': 0,
+            'resyncs': 0,
+        }
+
+    def subscribe(self, sensor_ids=None):
+        """
+        購読を開始
+
+        Returns:
+            Subscription（上限に達している場合None）
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(sensor_ids, maxsize=self.client_queue_size)
+            self._subscribers.add(subscription)
+        logger.debug(f"Stream subscriber added (total={len(self._subscribers)})")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """購読を終了"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+        logger.debug(f"Stream subscriber removed (total={len(self._subscribers)})")
+
+    def publish(self, rows, source='local'):
+        """
+        コミット済みの行を配信
+
+        Args:
+            rows: build_reading_row() で作成した行タプルのリスト
+            source (str): 配信元（self.source と異なる場合は配信しない）
+        """
+        if source != self.source:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers or not rows:
+            return
+
+        # 1行につき1回だけシリアライズし、全購読者で共有する
+        events = [
+            (row[0], dumps_bytes({column: _finite(value) for column, value in zip(STREAM_COLUMNS, row)}).decode('utf-8'))
+            for row in rows
+        ]
+        for subscription in subscribers:
+            if not subscription.offer(events):
+                self.stats['resyncs'] += 1
+
+        self.stats['published'] += len(rows)
+        self.stats['batches'] += 1
+
+    def get_stats(self):
+        """統計情報を取得"""
+        stats = dict(self.stats)
+        stats['subscribers'] = len(self._subscribers)
+        return stats
+
+
+# グローバルインスタンス
+reading_broadcaster = ReadingBroadcaster(
+    max_subscribers=Config.STREAM_MAX_CLIENTS,
+    client_queue_size=Config.STREAM_CLIENT_QUEUE_SIZE
+)
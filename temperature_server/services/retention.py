@@ -0,0 +1,200 @@
+"""
+temperature_server/services/retention.py
+データ保持（リテンション）エンジン
+
+構成:
+- 保持ポリシー（生データ N日、集計テーブル M年）より古いデータを削除する
+- 削除は センサー × 最大 chunk_size 行 ごとに別トランザクションで行い、
+  チャンク間で待機して書き込みキュー（取り込み）を止めない
+- 削除後は auto_vacuum=INCREMENTAL の場合に incremental_vacuum で空き領域をファイルから返す
+- 進捗と所要時間は get_status() で参照できる（/api/retention）
+"""
+
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from config import Config
+from database.models import ROLLUP_RESOLUTIONS
+from database.queries import RetentionQueries, JST
+from database.latest_cache import latest_cache
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionEngine:
+    """保持期間を過ぎたデータを少しずつ削除する"""
+
+    def __init__(self, policy, chunk_size=2000, chunk_pause=0.05, vacuum_pages=256):
+        """
+        初期化
+
+        Args:
+            policy (dict): {'raw': 日数, '1m': 日数, '1h': 日数, '1d': 日数}（0 は無期限）
+            chunk_size (int): 1トランザクションで削除する最大行数
+            chunk_pause (float): チャンク間の待ち時間（秒）
+            vacuum_pages (int): incremental_vacuum 1回あたりのページ数
+        """
+        self.policy = dict(policy)
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.vacuum_pages = vacuum_pages
+        self._run_lock = threading.Lock()
+        self._progress = None
+        self.last_run = None
+        self.runs = 0
+
+    def run_once(self):
+        """
+        ポリシーに従って1回削除を実行
+
+        Returns:
+            実行結果（dict）、既に実行中の場合None
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return None
+
+        try:
+            started = time.perf_counter()
+            progress = self._progress = {
+                'started_at': datetime.now(JST).isoformat(),
+                'phase': None,
+                'deleted': {},
+                'chunks': 0,
+                'max_chunk_ms': 0.0,
+                'vacuum': None,
+            }
+
+            now = datetime.now(JST)
+            for target, days in self.policy.items():
+                if days <= 0:
+                    continue
+                before_ts = int((now - timedelta(days=days)).timestamp() * 1000)
+                progress['phase'] = target
+                progress['deleted'][target] = self._purge(target, before_ts, progress)
+
+            if progress['deleted'].get('raw'):
+                # 最新データはトリガーで更新済み、キャッシュは再読み込み
+                latest_cache.invalidate()
+
+            progress['phase'] = 'vacuum'
+            progress['vacuum'] = self._vacuum()
+
+            progress['phase'] = None
+            progress['finished_at'] = datetime.now(JST).isoformat()
+            progress['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self.last_run = progress
+            self.runs += 1
+
+            total = sum(progress['deleted'].values())
+            if total:
+                logger.info(
+                    f"Retention removed {total} rows in {progress['chunks']} chunks "
+                    f"({progress['duration_ms']}ms, max chunk {progress['max_chunk_ms']}ms)"
+                )
+            return progress
+        finally:
+            self._progress = None
+            self._run_lock.release()
+
+    def run_async(self):
+        """
+        別スレッドで run_once() を実行
+
+        Returns:
+            bool: 開始した場合True、既に実行中の場合False
+        """
+        if self._run_lock.locked():
+            return False
+        thread = threading.Thread(target=self._run_safely, daemon=True, name="RetentionRun")
+        thread.start()
+        return True
+
+    def is_running(self):
+        """実行中かどうか"""
+        return self._run_lock.locked()
+
+    def get_status(self):
+        """ポリシー・進捗・前回の実行結果を取得"""
+        return {
+            'running': self.is_running(),
+            'scheduled': Config.RETENTION_ENABLED,
+            'policy_days': dict(self.policy),
+            'chunk_size': self.chunk_size,
+            'current': self._progress,
+            'last_run': self.last_run,
+            'runs': self.runs,
+            'storage': RetentionQueries.get_vacuum_info(),
+        }
+
+    def _run_safely(self):
+        """スレッド用: 例外をログに記録"""
+        try:
+            self.run_once()
+        except Exception as e:
+            logger.error(f"Retention run failed: {e}", exc_info=True)
+
+    def _purge(self, target, before_ts, progress):
+        """対象（'raw' または集計の解像度）から before_ts より古いデータを削除"""
+        if target == 'raw':
+            table = 'temperatures'
+            delete_chunk = RetentionQueries.delete_raw_chunk
+        else:
+            table = ROLLUP_RESOLUTIONS[target]['table']
+            delete_chunk = lambda sensor_id, ts, limit: RetentionQueries.delete_rollup_chunk(target, sensor_id, ts, limit)
+
+        deleted = 0
+        for sensor_id in RetentionQueries.get_sensor_ids(table):
+            while True:
+                chunk_started = time.perf_counter()
+                count = delete_chunk(sensor_id, before_ts, self.chunk_size)
+                elapsed_ms = round((time.perf_counter() - chunk_started) * 1000, 2)
+
+                deleted += count
+                progress['deleted'][target] = deleted
+                progress['chunks'] += 1
+                progress['max_chunk_ms'] = max(progress['max_chunk_ms'], elapsed_ms)
+
+                if count < self.chunk_size:
+                    break
+                # 書き込みキューがロックを取得できるよう間を空ける
+                time.sleep(self.chunk_pause)
+        return deleted
+
+    def _vacuum(self):
+        """空きページをファイルから返す（auto_vacuum=INCREMENTAL の場合のみ）"""
+        info = RetentionQueries.get_vacuum_info()
+        result = {'auto_vacuum': info['auto_vacuum'], 'freed_pages': 0}
+        if info['auto_vacuum'] != 'incremental':
+            return result
+
+        freelist = info['freelist_pages']
+        while freelist > 0:
+            remaining = RetentionQueries.incremental_vacuum(self.vacuum_pages)
+            if remaining >= freelist:
+                break
+            result['freed_pages'] += freelist - remaining
+            freelist = remaining
+            time.sleep(self.chunk_pause)
+        result['freed_bytes'] = result['freed_pages'] * info['page_size']
+        return result
+
+
+def _policy_from_config():
+    """Config から保持ポリシー（日数）を作成"""
+    rollup_days = Config.RETENTION_ROLLUP_YEARS * 365
+    return {
+        'raw': Config.RETENTION_RAW_DAYS,
+        '1m': Config.RETENTION_ROLLUP_1M_DAYS,
+        '1h': rollup_days,
+        '1d': rollup_days,
+    }
+
+
+# グローバルインスタンス
+retention_engine = RetentionEngine(
+    _policy_from_config(),
+    chunk_size=Config.RETENTION_CHUNK_SIZE,
+    chunk_pause=Config.RETENTION_CHUNK_PAUSE,
+    vacuum_pages=Config.RETENTION_VACUUM_PAGES
+)
@@ -0,0 +1,122 @@
+"""
+temperature_server/services/serial_frames.py
+ESP32 ゲートウェイのバイナリフレーム形式
+
+JSON 行の代わりに SensorData 構造体（docs/esp_devices/sensor_data.h）を
+そのまま並べた長さ付き・CRC付きのフレームを送る形式。
+受信側（LineAssembler）はフレームごとに先頭のマジックバイトで JSON 行と判別する。
+
+フレーム構成（リトルエンディアン）:
+
+    offset  size  内容
+    0       2     マジック 0xA5 0x5A
+    2       1     バージョン（1）
+    3       2     ペイロード長 N（uint16）
+    5       N     ペイロード:
+                    char device_id[16]
+                    SensorData × ((N - 16) / 64)
+    5+N     2     CRC-16/CCITT-FALSE（バージョン〜ペイロード末尾、初期値 0xFFFF）
+
+SensorData（ESP32 の memcpy そのまま、アライメント込みで 64 バイト）:
+
+    char sensor_id[16], char sensor_name[32], float temp, float humidity,
+    int8_t rssi, (3バイトのパディング), uint32_t timestamp
+"""
+
+import math
+import struct
+import binascii
+from functools import lru_cache
+
+FRAME_MAGIC = b'\xa5\x5a'
+FRAME_VERSION = 1
+
+# マジック・バージョン・ペイロード長
+FRAME_HEADER = struct.Struct('<2sBH')
+FRAME_CRC = struct.Struct('<H')
+FRAME_OVERHEAD = FRAME_HEADER.size + FRAME_CRC.size
+
+DEVICE_ID = struct.Struct('<16s')
+SENSOR_DATA = struct.Struct('<16s32sffb3xI')
+
+CRC_INIT = 0xFFFF
+
+
+def frame_crc(data):
+    """CRC-16/CCITT-FALSE を計算（bytes / memoryview）"""
+    return binascii.crc_hqx(data, CRC_INIT)
+
+
+def is_valid_payload_length(length):
+    """ペイロード長がデバイスID + SensorData の整数倍か"""
+    return length >= DEVICE_ID.size and (length - DEVICE_ID.size) % SENSOR_DATA.size == 0
+
+
+@lru_cache(maxsize=1024)
+def _c_string(raw):
+    """NUL終端の char 配列を文字列に変換（センサーIDは毎フレーム同じ値なのでキャッシュする）"""
+    return raw.partition(b'\0')[0].decode('utf-8', 'replace')
+
+
+def decode_payload(payload):
+    """
+    ペイロードを JSON 形式と同じ構造の dict に変換
+
+    Args:
+        payload: フレームのペイロード（bytes / memoryview、CRC検証済み）
+
+    Returns:
+        dict: {'device_id': ..., 'sensors': [{'sensor_id', 'sensor_name', 'temp', 'humidity', 'rssi', 'timestamp'}, ...]}
+
+    Raises:
+        ValueError: ペイロード長が不正な場合
+    """
+    with memoryview(payload) as view:
+        if not is_valid_payload_length(len(view)):
+            raise ValueError(f"Invalid frame payload length: {len(view)}")
+
+        (device_id,) = DEVICE_ID.unpack_from(view, 0)
+        with view[DEVICE_ID.size:] as records:
+            sensors = [
+                {
+                    'sensor_id': _c_string(sensor_id),
+                    'sensor_name': _c_string(sensor_name),
+                    'temp': temp,
+                    # 湿度を持たないセンサーが NaN を送る場合は未設定として扱う
+                    'humidity': None if math.isnan(humidity) else humidity,
+                    'rssi': rssi,
+                    'timestamp': timestamp,
+                }
+                for sensor_id, sensor_name, temp, humidity, rssi, timestamp
+                in SENSOR_DATA.iter_unpack(records)
+            ]
+
+    return {'device_id': _c_string(device_id), 'sensors': sensors}
+
+
+def encode_frame(device_id, sensors):
+    """
+    バイナリフレームを作成（テスト・送信ツール用、ESP32 側の実装と同じ形式）
+
+    Args:
+        device_id (str): マスターESP32のID
+        sensors: dictのリスト（sensor_id, sensor_name, temp, humidity, rssi, timestamp）
+
+    Returns:
+        bytes: フレーム
+    """
+    payload = bytearray(DEVICE_ID.pack(device_id.encode('utf-8')))
+    for sensor in sensors:
+        humidity = sensor.get('humidity')
+        payload += SENSOR_DATA.pack(
+            sensor['sensor_id'].encode('utf-8'),
+            sensor.get('sensor_name', '').encode('utf-8'),
+            sensor['temp'],
+            math.nan if humidity is None else humidity,
+            sensor.get('rssi', 0),
+            sensor.get('timestamp', 0)
+        )
+
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(payload))
+    crc = frame_crc(header[len(FRAME_MAGIC):] + payload)
+    return header + bytes(payload) + FRAME_CRC.pack(crc)
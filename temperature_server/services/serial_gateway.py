@@ -0,0 +1,293 @@
+"""
+temperature_server/services/serial_gateway.py
+複数のESP32ゲートウェイ（シリアルポート）の管理
+
+構成:
+- 検出したポートごとに SerialReader を1つ起動する（すべて同じ書き込みキューに流れる）
+- 一定間隔でポートを再スキャンし、抜き差し・再列挙（ttyUSB0 → ttyUSB1 等）に追従する
+- 接続に失敗した・切断されたポートは指数バックオフで再接続する
+"""
+
+import glob
+import os
+import threading
+import time
+import logging
+from config import Config
+from services.serial_reader import SerialReader
+
+logger = logging.getLogger(__name__)
+
+# Linux: /dev/ttyUSB* (CH340等) または /dev/ttyACM* (STM32等)
+DEFAULT_PORT_PATTERNS = ('/dev/ttyUSB*', '/dev/ttyACM*')
+
+
+def detect_serial_ports(ports=None, port_patterns=DEFAULT_PORT_PATTERNS):
+    """
+    現在接続されているポートを取得
+
+    Args:
+        ports: 使用するポートのリスト（None の場合は port_patterns で自動検出）
+        port_patterns: 自動検出に使う glob パターン
+
+    Returns:
+        list[str]: ポートパス（ソート済み）
+    """
+    if ports:
+        return sorted(port for port in ports if os.path.exists(port))
+    found = set()
+    for pattern in port_patterns:
+        found.update(glob.glob(pattern))
+    return sorted(found)
+
+
+class _GatewayPort:
+    """ポート1つ分の状態"""
+
+    __slots__ = ('port', 'reader', 'failures', 'next_attempt', 'last_error', 'connected_at', 'reconnects')
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = None
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.last_error = None
+        self.connected_at = None
+        self.reconnects = 0
+
+
+class SerialGatewayManager:
+    """ポートごとの SerialReader を起動・監視・再接続する"""
+
+    def __init__(self, ports=None, port_patterns=DEFAULT_PORT_PATTERNS, baudrate=115200, timeout=1,
+                 max_line_length=4096, parse_queue_size=1000, scan_interval=5.0,
+                 reconnect_initial=1.0, reconnect_max=60.0):
+        """
+        初期化
+
+        Args:
+            ports: 使用するポートのリスト（None の場合は port_patterns で自動検出）
+            port_patterns: 自動検出に使う glob パターン
+            baudrate (int): ボーレート
+            timeout (float): 読み込みタイムアウト（秒）
+            max_line_length (int): 1行の最大バイト数
+            parse_queue_size (int): ポートごとのパース待ちの最大行数
+            scan_interval (float): ポートを再スキャンする間隔（秒）
+            reconnect_initial (float): 再接続の初回待ち時間（秒、失敗ごとに倍）
+            reconnect_max (float): 再接続の最大待ち時間（秒）
+        """
+        self.ports = list(ports) if ports else None
+        self.port_patterns = tuple(port_patterns)
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.max_line_length = max_line_length
+        self.parse_queue_size = parse_queue_size
+        self.scan_interval = scan_interval
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+
+        self._gateways = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.is_running = False
+
+    def start(self):
+        """初回スキャンを行い、監視スレッドを開始"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._stop_event.clear()
+
+        self.scan()
+        self._thread = threading.Thread(target=self._monitor_loop, daemon=True, name="SerialGateway")
+        self._thread.start()
+        logger.info(
+            f"Serial gateway manager started ({len(self.get_connected_ports())} connected, "
+            f"scan_interval={self.scan_interval}s)"
+        )
+
+    def stop(self):
+        """監視スレッドとすべての SerialReader を停止"""
+        self.is_running = False
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.scan_interval + 5)
+            self._thread = None
+
+        with self._lock:
+            gateways = list(self._gateways.values())
+            self._gateways.clear()
+        for gateway in gateways:
+            self._stop_reader(gateway)
+        if gateways:
+            logger.info("Serial gateway manager stopped")
+
+    def detect_ports(self):
+        """
+        現在接続されているポートを取得
+
+        Returns:
+            list[str]: ポートパス（ソート済み）
+        """
+        return detect_serial_ports(self.ports, self.port_patterns)
+
+    def scan(self):
+        """
+        ポートを再スキャンし、追加・削除・切断に対応
+
+        Returns:
+            float: 次の再接続予定までの秒数（予定がない場合None）
+        """
+        now = time.monotonic()
+        present = set(self.detect_ports())
+
+        with self._lock:
+            removed = [self._gateways.pop(port) for port in list(self._gateways) if port not in present]
+            for port in present:
+                if port not in self._gateways:
+                    self._gateways[port] = _GatewayPort(port)
+                    logger.info(f"Serial gateway detected: {port}")
+            gateways = list(self._gateways.values())
+
+        for gateway in removed:
+            logger.info(f"Serial gateway removed: {gateway.port}")
+            self._stop_reader(gateway)
+
+        next_retry = None
+        for gateway in gateways:
+            reader = gateway.reader
+            if reader is not None:
+                if reader.is_alive():
+                    # 接続が維持できている: バックオフをリセット
+                    gateway.failures = 0
+                    continue
+                # 読み込み中に切断された
+                gateway.last_error = reader.last_error or 'reader stopped'
+                logger.warning(f"Serial gateway disconnected: {gateway.port} ({gateway.last_error})")
+                self._stop_reader(gateway)
+                self._schedule_retry(gateway, now)
+
+            if now >= gateway.next_attempt:
+                self._connect(gateway, now)
+
+            if gateway.reader is None:
+                wait = max(0.0, gateway.next_attempt - now)
+                next_retry = wait if next_retry is None else min(next_retry, wait)
+
+        return next_retry
+
+    def get_connected_ports(self):
+        """受信中のポートの一覧"""
+        with self._lock:
+            gateways = list(self._gateways.values())
+        return sorted(g.port for g in gateways if g.reader is not None and g.reader.is_alive())
+
+    def get_status(self):
+        """ポートごとの接続状態と受信統計を取得"""
+        now = time.monotonic()
+        with self._lock:
+            gateways = sorted(self._gateways.values(), key=lambda g: g.port)
+
+        ports = []
+        for gateway in gateways:
+            reader = gateway.reader
+            connected = reader is not None and reader.is_alive()
+            ports.append({
+                'port': gateway.port,
+                'connected': connected,
+                'failures': gateway.failures,
+                'reconnects': gateway.reconnects,
+                'last_error': gateway.last_error,
+                'retry_in_sec': None if connected else round(max(0.0, gateway.next_attempt - now), 1),
+                'stats': reader.get_stats() if reader is not None else None,
+            })
+        return {
+            'running': self.is_running,
+            'auto_detect': not self.ports,
+            'ports': ports,
+        }
+
+    def _monitor_loop(self):
+        """監視スレッド: 再スキャンと再接続"""
+        while not self._stop_event.is_set():
+            try:
+                next_retry = self.scan()
+            except Exception as e:
+                logger.error(f"Error scanning serial ports: {e}", exc_info=True)
+                next_retry = None
+
+            wait = self.scan_interval if next_retry is None else min(self.scan_interval, next_retry)
+            self._stop_event.wait(max(wait, 0.1))
+
+    def _connect(self, gateway, now):
+        """SerialReader を作成して接続（失敗時は再試行を予約）"""
+        reader = SerialReader(
+            port=gateway.port,
+            baudrate=self.baudrate,
+            timeout=self.timeout,
+            max_line_length=self.max_line_length,
+            parse_queue_size=self.parse_queue_size
+        )
+        if not reader.start():
+            gateway.last_error = reader.last_error or 'connection failed'
+            self._schedule_retry(gateway, now)
+            return
+
+        if gateway.connected_at is not None:
+            gateway.reconnects += 1
+        gateway.reader = reader
+        gateway.connected_at = now
+        gateway.last_error = None
+        logger.info(f"Serial gateway connected: {gateway.port}")
+
+    def _schedule_retry(self, gateway, now):
+        """指数バックオフで次の接続試行時刻を決める"""
+        gateway.failures += 1
+        delay = min(self.reconnect_max, self.reconnect_initial * (2 ** (gateway.failures - 1)))
+        gateway.next_attempt = now + delay
+        logger.info(f"Serial gateway {gateway.port}: retry in {delay:.1f}s (failures={gateway.failures})")
+
+    def _stop_reader(self, gateway):
+        """SerialReader を停止（パース待ちの行は書き込みキューに流してから終了）"""
+        reader, gateway.reader = gateway.reader, None
+        if reader is None:
+            return
+        try:
+            reader.stop()
+        except Exception as e:
+            logger.error(f"Error stopping serial reader on {gateway.port}: {e}")
+
+
+def create_serial_gateway(config_obj=None):
+    """
+    SerialGatewayManager のファクトリ関数
+
+    SERIAL_PORT はカンマ区切りで複数指定可能（未指定の場合は自動検出）
+
+    Args:
+        config_obj: Config オブジェクト（デフォルト: Config）
+
+    Returns:
+        SerialGatewayManager
+    """
+    if config_obj is None:
+        config_obj = Config
+
+    ports = getattr(config_obj, 'SERIAL_PORT', None)
+    patterns = getattr(config_obj, 'SERIAL_PORT_PATTERNS', None)
+    return SerialGatewayManager(
+        ports=[port.strip() for port in ports.split(',') if port.strip()] if ports else None,
+        port_patterns=[p.strip() for p in patterns.split(',') if p.strip()] if patterns else DEFAULT_PORT_PATTERNS,
+        baudrate=getattr(config_obj, 'SERIAL_BAUDRATE', 115200),
+        timeout=getattr(config_obj, 'SERIAL_TIMEOUT', 1),
+        max_line_length=getattr(config_obj, 'SERIAL_MAX_LINE_LENGTH', 4096),
+        parse_queue_size=getattr(config_obj, 'SERIAL_PARSE_QUEUE_SIZE', 1000),
+        scan_interval=getattr(config_obj, 'SERIAL_SCAN_INTERVAL', 5.0),
+        reconnect_initial=getattr(config_obj, 'SERIAL_RECONNECT_INITIAL', 1.0),
+        reconnect_max=getattr(config_obj, 'SERIAL_RECONNECT_MAX', 60.0)
+    )
+
+
+# グローバルインスタンス（run.py で start() する）
+serial_gateway = create_serial_gateway()
@@ -7,25 +7,183 @@ USB/シリアル経由でESP32からの温度データを受信
 - このESP32はESP-NOWで複数のESP32/ESP8266からデータを受信
 - ラズパイはUSB/シリアル経由でこのESP32から温度データを取得
 - 受信データをSQLiteに格納
+
+処理パイプライン:
+- 受信スレッド: シリアルから読み込み、行（JSON）またはバイナリフレーム
+  （services/serial_frames.py）に分割して上限付きのパースキューに積む
+  （キューが満杯の場合は破棄して数え、UARTの読み込みを止めない）
+- パーススレッド: パース・検証を行い、1フレーム（sensors 配列）分の行を
+  書き込みキューにまとめて積む（同じトランザクションでコミットされる）
+- 書き込みキュー: ライタースレッドがまとめてコミット（services/ingest_queue.py）
 """
 
 import serial
 import threading
+import queue
 import json
+import struct
 import logging
 import time
 from datetime import datetime
 from pathlib import Path
 from config import Config
-from database.queries import TemperatureQueries
+from services.ingest_queue import ingest_queue
+from services.serial_frames import (
+    FRAME_MAGIC, FRAME_VERSION, FRAME_HEADER, FRAME_CRC, FRAME_OVERHEAD,
+    frame_crc, is_valid_payload_length, decode_payload
+)
+from utils.metrics import LatencyStats
+from utils.validators import validate_sensor_id, validate_temperature, validate_humidity
 
 logger = logging.getLogger(__name__)
 
+# パースキュー停止用の番兵
+_STOP = object()
+
+
+class LineAssembler:
+    """
+    受信したバイト列を行（JSON）とバイナリフレームに分割
+    
+    - bytearray に追記し、memoryview のスライス（コピーなし）で行・フレームを切り出す
+    - 区切りごとに先頭がマジックバイトならバイナリフレーム、それ以外は改行までを1行とみなす
+    - バイナリフレームは長さとCRCを検証し、ペイロード（bytes）だけを返す
+    - 完成した行だけをデコードする
+    - 改行が来ないまま max_line_length を超えた行は次の改行まで破棄する
+    """
+    
+    def __init__(self, max_line_length=4096):
+        self.max_line_length = max_line_length
+        self._buffer = bytearray()
+        self._discarding = False
+        
+        # 統計情報
+        self.stats = {
+            'bytes': 0,
+            'lines': 0,
+            'binary_frames': 0,
+            'frame_errors': 0,
+            'overflow': 0,
+            'decode_errors': 0,
+        }
+    
+    def feed(self, data):
+        """
+        受信データを追加し、完成した行・フレームを返す
+        
+        Args:
+            data (bytes): 受信したバイト列
+        
+        Returns:
+            list: 完成した行（str、前後の空白を除去、空行は含まない）と
+                  バイナリフレームのペイロード（bytes）を受信順に並べたリスト
+        """
+        self.stats['bytes'] += len(data)
+        buffer = self._buffer
+        buffer += data
+        
+        items = []
+        start = 0
+        with memoryview(buffer) as view:
+            while start < len(buffer):
+                if not self._discarding:
+                    if buffer.startswith(FRAME_MAGIC, start):
+                        consumed = self._read_frame(buffer, view, start, items)
+                        if consumed is None:
+                            break  # フレームの途中（続きを待つ）
+                        start = consumed
+                        continue
+                    if start == len(buffer) - 1 and buffer.endswith(FRAME_MAGIC[:1]):
+                        break  # マジックの途中（続きを待つ）
+                
+                end = buffer.find(b'\n', start)
+                if end < 0:
+                    break
+                
+                line_start, start = start, end + 1
+                if self._discarding:
+                    # 長すぎる行の残り
+                    self._discarding = False
+                    continue
+                if end - line_start > self.max_line_length:
+                    self.stats['overflow'] += 1
+                    continue
+                
+                with view[line_start:end] as line:
+                    try:
+                        text = str(line, 'utf-8').strip()
+                    except UnicodeDecodeError:
+                        # 不正なUTF-8の行はスキップ
+                        self.stats['decode_errors'] += 1
+                        continue
+                if text:
+                    items.append(text)
+                    self.stats['lines'] += 1
+        
+        # 処理済みの部分を削除（memoryview の解放後に行う）
+        del buffer[:start]
+        
+        if len(buffer) > self.max_line_length + FRAME_OVERHEAD:
+            # 改行が来ないまま上限を超えた: 次の改行まで破棄
+            self.stats['overflow'] += 1
+            self._discarding = True
+            buffer.clear()
+        
+        return items
+    
+    def _read_frame(self, buffer, view, start, items):
+        """
+        start から始まるバイナリフレームを検証して items に追加
+        
+        Returns:
+            int: 次の読み取り位置（フレームが揃っていない場合None）
+        """
+        if len(buffer) - start < FRAME_HEADER.size:
+            return None
+        
+        _, version, length = FRAME_HEADER.unpack_from(view, start)
+        if (version != FRAME_VERSION or length > self.max_line_length
+                or not is_valid_payload_length(length)):
+            self.stats['frame_errors'] += 1
+            return self._resync(buffer, start + 1)
+        
+        end = start + FRAME_HEADER.size + length + FRAME_CRC.size
+        if len(buffer) < end:
+            return None
+        
+        crc_offset = end - FRAME_CRC.size
+        with view[start + len(FRAME_MAGIC):crc_offset] as body:
+            crc = frame_crc(body)
+        if crc != FRAME_CRC.unpack_from(view, crc_offset)[0]:
+            self.stats['frame_errors'] += 1
+            return self._resync(buffer, start + 1)
+        
+        with view[start + FRAME_HEADER.size:crc_offset] as payload:
+            items.append(bytes(payload))
+        self.stats['binary_frames'] += 1
+        return end
+    
+    def _resync(self, buffer, start):
+        """壊れたフレームの後、次のマジックまたは改行の直後まで読み飛ばす"""
+        candidates = []
+        magic_at = buffer.find(FRAME_MAGIC, start)
+        if magic_at >= 0:
+            candidates.append(magic_at)
+        newline_at = buffer.find(b'\n', start)
+        if newline_at >= 0:
+            candidates.append(newline_at + 1)
+        if candidates:
+            return min(candidates)
+        # マジックの1バイト目が末尾にある場合は続きを待つ
+        if buffer.endswith(FRAME_MAGIC[:1]):
+            return len(buffer) - 1
+        return len(buffer)
+
 
 class SerialReader:
     """USB/シリアル経由でESP32からデータを受信"""
     
-    def __init__(self, port=None, baudrate=115200, timeout=1):
+    def __init__(self, port=None, baudrate=115200, timeout=1, max_line_length=4096, parse_queue_size=1000, ingest=None):
         """
         初期化
         
@@ -34,13 +192,36 @@ class SerialReader:
                        Noneの場合は自動検出
             baudrate (int): ボーレート（デフォルト: 115200）
             timeout (float): 読み込みタイムアウト（秒）
+            max_line_length (int): 1行の最大バイト数（超過した行は破棄）
+            parse_queue_size (int): パース待ちの最大行数（超過した行は破棄）
+            ingest: 1フレーム分のセンサーデータを受け取る関数（デフォルト: ingest_queue.enqueue_many）
         """
         self.port = port or self._auto_detect_port()
         self.baudrate = baudrate
         self.timeout = timeout
+        self.max_line_length = max_line_length
         self.serial_conn = None
         self.is_running = False
         self.reader_thread = None
+        self.line_assembler = LineAssembler(max_line_length)
+        self.ingest = ingest or ingest_queue.enqueue_many
+        self._started_at = None
+        self.last_error = None
+        
+        # 受信スレッド → パーススレッド
+        self.parse_queue = queue.Queue(maxsize=parse_queue_size)
+        self.parser_thread = None
+        
+        # パイプラインの統計情報
+        self.pipeline_stats = {
+            'dropped': 0,        # パースキューが満杯で破棄した行
+            'frames': 0,         # 処理したフレーム（JSON行）
+            'readings': 0,       # 書き込みキューに積んだセンサーデータ
+            'invalid': 0,        # 検証エラーで除外したセンサーデータ
+            'parse_errors': 0,   # JSONとして解析できなかった行
+        }
+        self.queue_wait = LatencyStats()   # 受信 → パース開始
+        self.parse_time = LatencyStats()   # パース・検証・キュー投入
         
         logger.info(f"SerialReader initialized: port={self.port}, baudrate={self.baudrate}")
     
@@ -49,7 +230,7 @@ class SerialReader:
         利用可能なシリアルポートを自動検出
         
         /dev/ttyUSB* または /dev/ttyACM* から検出
-        複数ある場合は最初のものを使用
+        複数ある場合は最初のものを使用（すべてのポートを使う場合は SerialGatewayManager）
         
         Returns:
             str: ポートパス（見つからない場合はNone）
@@ -88,13 +269,16 @@ class SerialReader:
                 timeout=self.timeout
             )
             
+            self._started_at = time.monotonic()
             logger.info(f"Connected to {self.port} at {self.baudrate} baud")
             return True
         
         except serial.SerialException as e:
+            self.last_error = str(e)
             logger.error(f"Failed to connect to serial port: {e}")
             return False
         except Exception as e:
+            self.last_error = str(e)
             logger.error(f"Unexpected error during serial connection: {e}")
             return False
     
@@ -112,61 +296,143 @@ class SerialReader:
         シリアル受信スレッドを開始
         
         バックグラウンドスレッドで常時リッスンを開始
+        
+        Returns:
+            bool: 開始した場合True（接続に失敗した場合False）
         """
         if self.is_running:
             logger.warning("Serial reader is already running")
-            return
+            return True
         
         if not self.connect():
             logger.error("Cannot start serial reader without connection")
-            return
+            return False
         
         self.is_running = True
-        self.reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.parser_thread = threading.Thread(target=self._parse_loop, daemon=True, name="SerialParser")
+        self.parser_thread.start()
+        self.reader_thread = threading.Thread(target=self._read_loop, daemon=True, name="SerialReader")
         self.reader_thread.start()
         logger.info("Serial reader thread started")
+        return True
+    
+    def is_alive(self):
+        """受信スレッドが動作中か（切断されて終了した場合False）"""
+        return self.is_running and self.reader_thread is not None and self.reader_thread.is_alive()
     
     def stop(self):
-        """シリアル受信スレッドを停止"""
+        """シリアル受信スレッドを停止（パース待ちの行は処理してから終了）"""
         self.is_running = False
         if self.reader_thread:
             self.reader_thread.join(timeout=5)
+        if self.parser_thread:
+            self.parse_queue.put(_STOP)
+            self.parser_thread.join(timeout=5)
+            self.parser_thread = None
         self.disconnect()
-        logger.info("Serial reader stopped")
+        stats = self.get_stats()
+        logger.info(
+            f"Serial reader stopped (lines={stats['lines']}, bytes={stats['bytes']}, "
+            f"overflow={stats['overflow']}, decode_errors={stats['decode_errors']}, "
+            f"dropped={stats['dropped']}, invalid={stats['invalid']})"
+        )
+    
+    def get_stats(self):
+        """受信・パースの統計情報（スループット・段階ごとの遅延を含む）を取得"""
+        stats = dict(self.line_assembler.stats)
+        stats.update(self.pipeline_stats)
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        stats['uptime_sec'] = round(elapsed, 1)
+        stats['lines_per_sec'] = round(stats['lines'] / elapsed, 2) if elapsed else 0.0
+        stats['bytes_per_sec'] = round(stats['bytes'] / elapsed, 1) if elapsed else 0.0
+        stats['parse_queue_depth'] = self.parse_queue.qsize()
+        stats['latency'] = {
+            'queue_wait': self.queue_wait.to_dict(),
+            'parse': self.parse_time.to_dict(),
+            'commit': ingest_queue.commit_latency.to_dict(),
+        }
+        return stats
+    
+    def submit_line(self, line, received_at=None):
+        """
+        受信した1行（またはバイナリフレーム）をパースキューに積む（ブロックしない）
+        
+        Args:
+            line: 受信した行文字列（str）またはバイナリフレームのペイロード（bytes）
+            received_at (float): 受信時刻（time.monotonic()、省略時は現在時刻）
+        
+        Returns:
+            bool: 積んだ場合True、キューが満杯で破棄した場合False
+        """
+        try:
+            self.parse_queue.put_nowait((received_at or time.monotonic(), line))
+            return True
+        except queue.Full:
+            self.pipeline_stats['dropped'] += 1
+            dropped = self.pipeline_stats['dropped']
+            if dropped == 1 or dropped % 100 == 0:
+                logger.warning(f"Serial parse queue is full, dropped {dropped} lines so far")
+            return False
     
     def _read_loop(self):
         """
         シリアル読み込みループ（バックグラウンドスレッド）
         
         常時ESP32からのデータを監視し、
-        受信したら _process_data() で処理
-        """
-        buffer = ""
+        受信したらパースキューに積む（パース・DB書き込みはここでは行わない）
         
+        受信待ちはブロッキング（timeout まで）で行い、受信済みのデータはまとめて読み込む
+        """
         while self.is_running:
             try:
-                # シリアルポートから1バイト読み込み
-                if self.serial_conn.in_waiting > 0:
-                    byte = self.serial_conn.read(1).decode('utf-8', errors='ignore')
-                    buffer += byte
-                    
-                    # 改行で1行が完成
-                    if byte == '\n':
-                        line = buffer.strip()
-                        buffer = ""
-                        
-                        if line:
-                            self._process_line(line)
-                else:
-                    time.sleep(0.01)  # CPU負荷軽減
+                # 受信済みのバイトをまとめて読む（なければ最初の1バイトを timeout まで待つ）
+                data = self.serial_conn.read(self.serial_conn.in_waiting or 1)
+                if not data:
+                    continue  # タイムアウト（停止要求の確認のみ）
+                
+                received_at = time.monotonic()
+                for line in self.line_assembler.feed(data):
+                    self.submit_line(line, received_at)
             
-            except UnicodeDecodeError:
-                # 不正なUTF-8はスキップ
-                buffer = ""
+            except (serial.SerialException, OSError) as e:
+                # デバイスの切断等: ループを抜ける（再接続は SerialGatewayManager が行う）
+                self.last_error = str(e)
+                logger.error(f"Serial port {self.port} disconnected: {e}")
+                break
             except Exception as e:
                 logger.error(f"Error in read loop: {e}")
                 time.sleep(1)
     
+    def _parse_loop(self):
+        """
+        パースループ（バックグラウンドスレッド）
+        
+        パースキューから行を取り出して _process_line() で処理
+        停止時はキューに残った行を処理してから終了する
+        """
+        while True:
+            item = self.parse_queue.get()
+            if item is _STOP:
+                break
+            
+            received_at, line = item
+            started = time.monotonic()
+            self.queue_wait.record(started - received_at)
+            self.process(line)
+            self.parse_time.record(time.monotonic() - started)
+    
+    def process(self, line):
+        """
+        LineAssembler.feed() が返した1行（str）またはバイナリフレームのペイロード（bytes）を処理
+        
+        Args:
+            line: 受信した行文字列またはバイナリフレームのペイロード
+        """
+        if isinstance(line, bytes):
+            self._process_binary_frame(line)
+        else:
+            self._process_line(line)
+    
     def _process_line(self, line):
         """
         受信した1行をパース・処理
@@ -187,10 +453,29 @@ class SerialReader:
         
         except json.JSONDecodeError as e:
             # JSON形式以外のテキスト（デバッグ出力等）はスキップ
+            self.pipeline_stats['parse_errors'] += 1
             logger.debug(f"Non-JSON line: {line}")
         except Exception as e:
             logger.error(f"Error processing line: {e}")
     
+    def _process_binary_frame(self, payload):
+        """
+        CRC検証済みのバイナリフレームのペイロードを処理
+        
+        SensorData 構造体の並びを JSON と同じ構造に変換して _process_json_data() に渡す
+        
+        Args:
+            payload (bytes): フレームのペイロード
+        """
+        try:
+            data = decode_payload(payload)
+        except (ValueError, struct.error) as e:
+            self.pipeline_stats['parse_errors'] += 1
+            logger.warning(f"Invalid binary frame: {e}")
+            return
+        
+        self._process_json_data(data)
+    
     def _process_json_data(self, data):
         """
         受信したJSONデータを処理・DB保存
@@ -226,63 +511,68 @@ class SerialReader:
                 logger.warning(f"Invalid 'sensors' format: {type(sensors)}")
                 return
             
-            # 各センサーのデータをDB保存
-            saved_count = 0
+            self.pipeline_stats['frames'] += 1
+            
+            # 検証済みのセンサーデータを集め、フレーム単位で書き込みキューに積む
+            readings = []
             for sensor in sensors:
-                if self._save_sensor_data(sensor, master_device_id):
-                    saved_count += 1
+                reading = self._build_sensor_reading(sensor, master_device_id)
+                if reading is None:
+                    self.pipeline_stats['invalid'] += 1
+                else:
+                    readings.append(reading)
             
-            if saved_count > 0:
-                logger.info(f"[Serial] Saved {saved_count} sensor readings from {master_device_id}")
+            if readings:
+                self.ingest(readings)
+                self.pipeline_stats['readings'] += len(readings)
+                logger.info(f"[Serial] Saved {len(readings)} sensor readings from {master_device_id}")
         
         except Exception as e:
             logger.error(f"Error processing JSON data: {e}", exc_info=True)
     
-    def _save_sensor_data(self, sensor, master_id):
+    def _build_sensor_reading(self, sensor, master_id):
         """
-        センサーデータをDBに保存
+        センサーデータを検証し、書き込みキュー用のdictを作成
         
         Args:
             sensor (dict): センサーデータ
             master_id (str): マスターESP32のID
         
         Returns:
-            bool: 保存成功時True
+            dict: ingest_queue.enqueue_many() に渡すデータ（不正な場合None）
         """
-        try:
-            # 必須フィールド取得
-            sensor_id = sensor.get('sensor_id')
-            temperature = sensor.get('temp') or sensor.get('temperature')
-            
-            if not sensor_id or temperature is None:
-                logger.warning(f"Missing required fields in sensor data: {sensor}")
-                return False
-            
-            # オプショナルフィールド
-            sensor_name = sensor.get('sensor_name', 'Unknown')
-            humidity = sensor.get('humidity')
-            rssi = sensor.get('rssi')  # 信号強度（情報用）
-            
-            # DBに挿入
-            TemperatureQueries.insert_reading(
-                sensor_id=sensor_id,
-                temperature=float(temperature),
-                sensor_name=sensor_name,
-                humidity=float(humidity) if humidity is not None else None
-            )
-            
-            logger.debug(
-                f"[Serial] Saved: {sensor_id} = {temperature}°C "
-                f"(via {master_id}, name={sensor_name}, humidity={humidity}, rssi={rssi})"
-            )
-            return True
+        if not isinstance(sensor, dict):
+            logger.warning(f"Invalid sensor entry: {sensor}")
+            return None
         
-        except (ValueError, TypeError) as e:
-            logger.error(f"Invalid data type in sensor: {sensor}, error: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Error saving sensor data: {e}", exc_info=True)
-            return False
+        # 必須フィールド取得
+        sensor_id = sensor.get('sensor_id')
+        temperature = sensor.get('temp', sensor.get('temperature'))
+        humidity = sensor.get('humidity')
+        
+        for is_valid, error_msg in (
+            validate_sensor_id(sensor_id),
+            validate_temperature(temperature),
+            validate_humidity(humidity),
+        ):
+            if not is_valid:
+                logger.warning(f"Invalid sensor data from {master_id}: {error_msg} ({sensor})")
+                return None
+        
+        # オプショナルフィールド
+        sensor_name = sensor.get('sensor_name', 'Unknown')
+        rssi = sensor.get('rssi')  # 信号強度（情報用）
+        
+        logger.debug(
+            f"[Serial] Parsed: {sensor_id} = {temperature}°C "
+            f"(via {master_id}, name={sensor_name}, humidity={humidity}, rssi={rssi})"
+        )
+        return {
+            'sensor_id': sensor_id,
+            'temperature': float(temperature),
+            'sensor_name': sensor_name,
+            'humidity': float(humidity) if humidity is not None else None,
+        }
 
 
 def create_serial_reader(config_obj=None):
@@ -298,9 +588,15 @@ def create_serial_reader(config_obj=None):
     if config_obj is None:
         config_obj = Config
     
+    # 複数指定されている場合は最初のポート（複数ポートは SerialGatewayManager を使用）
+    ports = getattr(config_obj, 'SERIAL_PORT', None)
+    port = ports.split(',')[0].strip() if ports else None
+    
     reader = SerialReader(
-        port=getattr(config_obj, 'SERIAL_PORT', None),
+        port=port or None,
         baudrate=getattr(config_obj, 'SERIAL_BAUDRATE', 115200),
-        timeout=getattr(config_obj, 'SERIAL_TIMEOUT', 1)
+        timeout=getattr(config_obj, 'SERIAL_TIMEOUT', 1),
+        max_line_length=getattr(config_obj, 'SERIAL_MAX_LINE_LENGTH', 4096),
+        parse_queue_size=getattr(config_obj, 'SERIAL_PARSE_QUEUE_SIZE', 1000)
     )
     return reader
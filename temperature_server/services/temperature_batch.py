@@ -0,0 +1,210 @@
+"""
+temperature_server/services/temperature_batch.py
+複数センサーのデータ一括取得（/api/temperature/batch）
+
+Flask（app/routes/api.py）と asyncio サーバー（async_server/）で同じ処理を使うため、
+リクエストの dict を受け取り (レスポンスの dict, HTTPステータス) を返す
+（列形式はセンサーごとにエンコードしたバイト列を返す）。
+応答キャッシュ（utils/response_cache.py）のキーは batch_cache_key() で作る
+"""
+
+import logging
+from database.queries import TemperatureQueries
+from database.downsampling import DOWNSAMPLE_MODES, DEFAULT_DOWNSAMPLE_MODE
+from utils.json_provider import iter_object_chunks
+
+logger = logging.getLogger(__name__)
+
+# 読み取りAPIのレスポンス形式
+RESPONSE_FORMATS = ('rows', 'columnar')
+
+
+def _normalized_sensor_ids(sensor_ids):
+    """センサーIDのリストを重複なし・昇順のタプルに変換（文字列のリストでない場合None）"""
+    if not isinstance(sensor_ids, list) or not all(isinstance(sensor_id, str) for sensor_id in sensor_ids):
+        return None
+    return tuple(sorted(set(sensor_ids)))
+
+
+def batch_cache_key(data):
+    """
+    一括取得の応答キャッシュのキー（既定値を補った正規化済みのパラメータ）
+
+    センサーIDの順序は区別しない（レスポンスはセンサーIDをキーとする dict のため）。
+
+    Args:
+        data (dict): リクエストのJSON
+
+    Returns:
+        (tuple, tuple): キーと対象センサーID（差分取得（since）など、キャッシュしない場合は (None, None)）
+    """
+    if not isinstance(data, dict) or data.get('since') is not None:
+        return None, None
+    sensor_ids = _normalized_sensor_ids(data.get('sensor_ids'))
+    if not sensor_ids:
+        return None, None
+    try:
+        hours_value = data.get('hours', 24)
+        hours = float(hours_value) if hours_value is not None else 24.0
+        max_points_value = data.get('max_points')
+        max_points = int(max_points_value) if max_points_value is not None else None
+    except (TypeError, ValueError):
+        return None, None
+    key = (
+        'batch', sensor_ids, hours, max_points,
+        data.get('downsample_mode') or DEFAULT_DOWNSAMPLE_MODE,
+        data.get('format') or 'rows',
+        bool(data.get('include_stats', False)),
+    )
+    return key, sensor_ids
+
+
+def combined_cache_key(data):
+    """
+    ダッシュボード統合エンドポイントの応答キャッシュのキー
+
+    Returns:
+        tuple: キー（キャッシュしない場合None）
+    """
+    if not isinstance(data, dict):
+        return None
+    sensor_ids = _normalized_sensor_ids(data.get('sensor_ids', []))
+    if sensor_ids is None:
+        return None
+    try:
+        hours = float(data.get('hours', 6))
+    except (TypeError, ValueError):
+        return None
+    return ('combined', sensor_ids, hours, data.get('format') or 'rows')
+
+
+def _encode_columnar(sensor_ids, hours, max_points, downsample_mode):
+    """
+    列形式のレスポンスを JSON のバイト列で作成
+
+    カーソルからセンサーごとに読み、1センサーずつエンコードする（全センサー分の列を同時に保持しない）
+    """
+    totals = {'count': 0, 'total_points': 0}
+
+    def entries():
+        for sensor_id, entry in TemperatureQueries.iter_range_batch_columnar(
+            sensor_ids, hours, max_points_per_sensor=max_points, downsample_mode=downsample_mode
+        ):
+            totals['count'] += 1
+            totals['total_points'] += entry['count']
+            yield sensor_id, entry
+
+    return b''.join(iter_object_chunks(
+        {"status": "success", "format": "columnar"}, "data", entries(),
+        tail=lambda: dict(totals, downsample_mode=downsample_mode)
+    ))
+
+
+def run_batch_query(data):
+    """
+    複数センサーのデータを一括取得（高速化・間引き対応）
+
+    Args:
+        data (dict): リクエストのJSON（sensor_ids, hours, max_points, downsample_mode, format, since, include_stats）
+
+    Returns:
+        (dict | bytes, int): レスポンスとHTTPステータス（format=columnar の場合はエンコード済みの JSON）
+    """
+    try:
+        if not data or 'sensor_ids' not in data:
+            return {'status': 'error', 'message': 'sensor_idsが指定されていません'}, 400
+
+        sensor_ids = data.get('sensor_ids', [])
+        # hoursがNoneの場合はデフォルト値を使用
+        hours_value = data.get('hours', 24)
+        hours = float(hours_value) if hours_value is not None else 24.0
+        # 初期読み込み時は間引きを強制（パフォーマンス向上）
+        max_points_value = data.get('max_points')
+        if max_points_value is not None:
+            max_points = int(max_points_value)
+        else:
+            max_points = 200 if hours <= 1 else 500  # 1時間以下は200ポイントに制限
+
+        if not isinstance(sensor_ids, list) or len(sensor_ids) == 0:
+            return {'status': 'error', 'message': 'sensor_idsは空でないリストである必要があります'}, 400
+
+        # 間引きモード（extremes: 従来方式, lttb: 形状保持, minmax: バケットごとの最小・最大）
+        downsample_mode = data.get('downsample_mode') or DEFAULT_DOWNSAMPLE_MODE
+        if downsample_mode not in DOWNSAMPLE_MODES:
+            return {
+                'status': 'error',
+                'message': f"downsample_modeは {', '.join(DOWNSAMPLE_MODES)} のいずれかである必要があります"
+            }, 400
+
+        # レスポンス形式（rows: 従来のdict配列, columnar: フィールドごとの配列）
+        response_format = data.get('format') or 'rows'
+        if response_format not in RESPONSE_FORMATS:
+            return {
+                'status': 'error',
+                'message': f"formatは {', '.join(RESPONSE_FORMATS)} のいずれかである必要があります"
+            }, 400
+
+        logger.debug(f"GET /api/temperature/batch - sensor_ids={sensor_ids}, hours={hours}, max_points={max_points}, mode={downsample_mode}, format={response_format}")
+
+        # 差分取得（since: {sensor_id: カーソル}、前回のレスポンスの cursor をそのまま渡す）
+        since = data.get('since')
+        if since is not None:
+            if response_format != 'rows':
+                return {'status': 'error', 'message': 'sinceは format=rows でのみ指定できます'}, 400
+            try:
+                results = TemperatureQueries.get_range_batch_since(since, hours, max_points_per_sensor=max_points)
+            except ValueError as e:
+                return {'status': 'error', 'message': str(e)}, 400
+
+            return {
+                "status": "success",
+                "incremental": True,
+                "data": results,
+                "count": len(results),
+                "total_points": sum(len(entry['readings']) for entry in results.values()),
+                "refetch": any(entry['refetch'] for entry in results.values()),
+                "downsample_mode": downsample_mode
+            }, 200
+
+        if response_format == 'columnar':
+            # 列形式（行ごとのdictを作らない、統計情報は含めない）
+            return _encode_columnar(sensor_ids, hours, max_points, downsample_mode), 200
+
+        # バッチ取得（サーバー側で間引き、統計情報は取得しない（高速化））
+        # カーソル用の行IDはデータと同じスナップショットで読む
+        readings_map, watermark = TemperatureQueries.get_range_batch_with_watermark(
+            sensor_ids, hours, max_points_per_sensor=max_points, downsample_mode=downsample_mode
+        )
+
+        # 統計情報は取得しない（初期読み込み時の高速化）
+        include_stats = data.get('include_stats', False)  # デフォルトはFalse
+
+        results = {}
+        total_downsampled_points = 0
+
+        for sensor_id in sensor_ids:
+            readings = readings_map.get(sensor_id, [])
+            result_data = {
+                "readings": readings,
+                # 次回の差分取得（since）に使うカーソル
+                "cursor": TemperatureQueries.batch_cursor(readings, hours, watermark)
+            }
+            # 統計情報が必要な場合のみ取得（通常は不要）
+            if include_stats:
+                stats = TemperatureQueries.get_statistics(sensor_id, hours)
+                result_data["statistics"] = stats
+            results[sensor_id] = result_data
+            total_downsampled_points += len(readings)
+
+        logger.debug(f"GET /api/temperature/batch - Found data for {len(results)} sensors, {total_downsampled_points} total points")
+
+        return {
+            "status": "success",
+            "data": results,
+            "count": len(results),
+            "total_points": total_downsampled_points,
+            "downsample_mode": downsample_mode
+        }, 200
+    except Exception as e:
+        logger.error(f"Error fetching batch temperature data: {e}", exc_info=True)
+        return {"status": "error", "message": str(e)}, 500
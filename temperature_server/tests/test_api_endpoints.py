@@ -5,15 +5,31 @@ Flaskアプリケーションのテストクライアントを使用
 
 import unittest
 import sys
+import os
 import json
+import gzip
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from email.utils import formatdate
+from unittest import mock
 
 # プロジェクトルートをパスに追加
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from app import create_app
+from config import Config
 from database.models import init_database
+from database.queries import TemperatureQueries
+from services.ingest_queue import ingest_queue
+from services.reading_stream import reading_broadcaster
+from services.retention import RetentionEngine
+from utils.response_cache import response_cache
+
+JST = timezone(timedelta(hours=9))
 
 
 class TestAPIEndpoints(unittest.TestCase):
@@ -103,6 +119,16 @@ class TestAPIEndpoints(unittest.TestCase):
         self.assertEqual(json_data['status'], 'error')
         self.assertIn('out of valid range', json_data['message'])
     
+    def test_receive_temperature_rejects_non_finite(self):
+        """NaN・Infinity はキューに積む前に 400 を返す（コミット時の失敗はクライアントに返せない）"""
+        for body in ('{"device_id": "TEST_SENSOR_NAN", "temperature": NaN}',
+                     '{"device_id": "TEST_SENSOR_NAN", "temperature": 20.0, "humidity": Infinity}'):
+            response = self.client.post('/api/temperature', data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.data)['error_code'], 'VALIDATION_ERROR')
+        self.assertTrue(ingest_queue.flush())
+        self.assertIsNone(TemperatureQueries.get_latest_reading('TEST_SENSOR_NAN'))
+    
     def test_get_all_sensors(self):
         """全センサー取得"""
         response = self.client.get('/api/sensors')
@@ -134,6 +160,529 @@ class TestAPIEndpoints(unittest.TestCase):
         self.assertIn('readings', json_data)
         self.assertIn('statistics', json_data)
     
+    def test_receive_temperature_queued_then_stored(self):
+        """書き込みキュー経由で受信データが保存される"""
+        data = {
+            "device_id": "TEST_SENSOR_QUEUE",
+            "temperature": 21.25
+        }
+        response = self.client.post(
+            '/api/temperature',
+            data=json.dumps(data),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        
+        # キューを書き出してから取得
+        self.assertTrue(ingest_queue.flush())
+        response = self.client.get('/api/temperature/TEST_SENSOR_QUEUE?hours=1')
+        json_data = json.loads(response.data)
+        temperatures = [r['temperature'] for r in json_data['readings']]
+        self.assertIn(21.25, temperatures)
+    
+    def test_readings_include_epoch_ts(self):
+        """読み取り結果にエポックミリ秒の ts が含まれ、時系列順に並ぶ"""
+        for temperature in (19.0, 19.5):
+            self.client.post(
+                '/api/temperature',
+                data=json.dumps({"device_id": "TEST_SENSOR_TS", "temperature": temperature}),
+                content_type='application/json'
+            )
+        self.assertTrue(ingest_queue.flush())
+        
+        response = self.client.get('/api/temperature/TEST_SENSOR_TS?hours=1')
+        readings = json.loads(response.data)['readings']
+        stamps = [r['ts'] for r in readings]
+        self.assertTrue(all(isinstance(ts, int) for ts in stamps))
+        self.assertEqual(stamps, sorted(stamps))
+        self.assertLess(abs(stamps[-1] - time.time() * 1000), 60 * 1000)
+    
+    def test_get_all_sensors_reflects_latest_reading(self):
+        """最新データキャッシュが受信データで更新される"""
+        for temperature in (20.0, 22.5):
+            self.client.post(
+                '/api/temperature',
+                data=json.dumps({"device_id": "TEST_SENSOR_LATEST", "temperature": temperature}),
+                content_type='application/json'
+            )
+        self.assertTrue(ingest_queue.flush())
+        
+        response = self.client.get('/api/sensors')
+        json_data = json.loads(response.data)
+        latest = {s['sensor_id']: s for s in json_data['sensors']}
+        self.assertIn('TEST_SENSOR_LATEST', latest)
+        self.assertEqual(latest['TEST_SENSOR_LATEST']['temperature'], 22.5)
+    
+    def test_temperature_batch_uses_rollup_for_long_range(self):
+        """生データが ROLLUP_RAW_ROW_LIMIT 件以下なら長期間でも生データ、超えるセンサーのみ集計テーブルから返す"""
+        self.client.post(
+            '/api/temperature',
+            data=json.dumps({"device_id": "TEST_SENSOR_ROLLUP", "temperature": 23.0, "humidity": 40.0}),
+            content_type='application/json'
+        )
+        self.assertTrue(ingest_queue.flush())
+        
+        def batch():
+            response = self.client.post(
+                '/api/temperature/batch',
+                data=json.dumps({"sensor_ids": ["TEST_SENSOR_ROLLUP"], "hours": 24, "max_points": 500}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200)
+            return json.loads(response.data)['data']['TEST_SENSOR_ROLLUP']
+        
+        entry = batch()
+        self.assertNotIn('resolution', entry['readings'][-1])
+        self.assertEqual(entry['readings'][-1]['humidity'], 40.0)
+        self.assertTrue(entry['cursor'].startswith('raw:'))
+        
+        response_cache.clear()
+        with mock.patch.object(Config, 'ROLLUP_RAW_ROW_LIMIT', 0):
+            entry = batch()
+        self.assertEqual(entry['readings'][-1]['resolution'], '1m')
+        self.assertIn('temperature_max', entry['readings'][-1])
+        self.assertTrue(entry['cursor'].startswith('1m:'))
+    
+    def test_rollup_downsampling_keeps_spikes(self):
+        """extremes / minmax では集計行をバケットの最大値・最小値で間引く（平均に埋もれたスパイクを残す）"""
+        sensor_id = f"TEST_SENSOR_SPIKE_{time.time_ns()}"
+        start = datetime.now(JST).replace(second=0, microsecond=0) - timedelta(minutes=110)
+        rows = []
+        for minute in range(110):
+            # どのバケットも平均は 20.0、1つのバケットだけ 35.0 / 5.0 を含む
+            pair = (35.0, 5.0) if minute == 50 else (20.0, 20.0)
+            for second, temperature in zip((10, 40), pair):
+                rows.append(TemperatureQueries.build_reading_row(
+                    sensor_id, temperature, timestamp=start + timedelta(minutes=minute, seconds=second)
+                ))
+        TemperatureQueries.insert_readings_batch(rows)
+        
+        with mock.patch.object(Config, 'ROLLUP_RAW_ROW_LIMIT', 0):
+            for mode in ('extremes', 'minmax'):
+                readings = TemperatureQueries.get_range_batch([sensor_id], 2, 20, mode)[sensor_id]
+                self.assertLessEqual(len(readings), 20)
+                self.assertEqual({r['resolution'] for r in readings}, {'1m'})
+                self.assertIn(35.0, [r['temperature_max'] for r in readings])
+                self.assertIn(5.0, [r['temperature_min'] for r in readings])
+                
+                columnar = TemperatureQueries.get_range_batch_columnar([sensor_id], 2, 20, mode)[sensor_id]
+                self.assertIn(35.0, columnar['temperature_max'])
+        TemperatureQueries.delete_sensor(sensor_id)
+
+    def test_rollup_covers_history_deleted_by_retention(self):
+        """保持期間で生データが削除された期間は、生データが上限以下でも集計テーブルから返す（統計と一致する）"""
+        sensor_id = f"TEST_SENSOR_RETAINED_{time.time_ns()}"
+        start = datetime.now(JST).replace(minute=0, second=0, microsecond=0) - timedelta(days=300)
+        TemperatureQueries.insert_readings_batch([
+            TemperatureQueries.build_reading_row(sensor_id, 20.0, timestamp=start + timedelta(hours=hour, minutes=30))
+            for hour in range(300 * 24)
+        ])
+        RetentionEngine({'raw': 90}, chunk_pause=0).run_once()
+
+        readings = TemperatureQueries.get_range_batch([sensor_id], 8760, 500)[sensor_id]
+        self.assertEqual({r['resolution'] for r in readings}, {'1h'})
+        self.assertEqual(readings[0]['ts'], int(start.timestamp() * 1000))
+        self.assertEqual(TemperatureQueries.get_statistics(sensor_id, 8760)['count'], 300 * 24)
+        TemperatureQueries.delete_sensor(sensor_id)
+
+    def test_temperature_batch_columnar(self):
+        """format=columnar ではフィールドごとの配列で返す"""
+        self.client.post(
+            '/api/temperature',
+            data=json.dumps({"device_id": "TEST_SENSOR_COLUMNAR", "temperature": 24.5, "name": "列形式"}),
+            content_type='application/json'
+        )
+        self.assertTrue(ingest_queue.flush())
+        
+        response = self.client.post(
+            '/api/temperature/batch',
+            data=json.dumps({"sensor_ids": ["TEST_SENSOR_COLUMNAR"], "hours": 1, "format": "columnar"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        json_data = json.loads(response.data)
+        self.assertEqual(json_data['format'], 'columnar')
+        entry = json_data['data']['TEST_SENSOR_COLUMNAR']
+        self.assertEqual(entry['sensor_name'], '列形式')
+        self.assertEqual(len(entry['timestamps']), len(entry['temperatures']))
+        self.assertIsInstance(entry['timestamps'][-1], int)
+        self.assertEqual(entry['temperatures'][-1], 24.5)
+    
+    def test_temperature_batch_since_cursor(self):
+        """since カーソル以降の新しいデータのみを返す"""
+        def post(temperature):
+            self.client.post(
+                '/api/temperature',
+                data=json.dumps({"device_id": "TEST_SENSOR_CURSOR", "temperature": temperature}),
+                content_type='application/json'
+            )
+            self.assertTrue(ingest_queue.flush())
+        
+        def batch(body):
+            response = self.client.post('/api/temperature/batch', data=json.dumps(body), content_type='application/json')
+            return response.status_code, json.loads(response.data)
+        
+        post(18.0)
+        _, full = batch({"sensor_ids": ["TEST_SENSOR_CURSOR"], "hours": 1})
+        cursor = full['data']['TEST_SENSOR_CURSOR']['cursor']
+        self.assertTrue(cursor.startswith('raw:'))
+        
+        post(18.5)
+        status, incremental = batch({"sensor_ids": ["TEST_SENSOR_CURSOR"], "hours": 1, "since": {"TEST_SENSOR_CURSOR": cursor}})
+        self.assertEqual(status, 200)
+        entry = incremental['data']['TEST_SENSOR_CURSOR']
+        self.assertFalse(entry['refetch'])
+        self.assertEqual([r['temperature'] for r in entry['readings']], [18.5])
+        self.assertNotEqual(entry['cursor'], cursor)
+
+        # カーソルより古い ts の行が後からコミットされた場合（一括アップロードなど）は再取得を要求する
+        TemperatureQueries.insert_readings_batch([TemperatureQueries.build_reading_row(
+            "TEST_SENSOR_CURSOR", 17.0, timestamp=datetime.now(JST) - timedelta(minutes=10)
+        )])
+        _, backfilled = batch({"sensor_ids": ["TEST_SENSOR_CURSOR"], "hours": 1, "since": {"TEST_SENSOR_CURSOR": entry['cursor']}})
+        self.assertTrue(backfilled['refetch'])
+        _, full = batch({"sensor_ids": ["TEST_SENSOR_CURSOR"], "hours": 1})
+        self.assertIn(17.0, [r['temperature'] for r in full['data']['TEST_SENSOR_CURSOR']['readings']])
+
+        # 行IDを含まない以前の形式のカーソルも再取得
+        _, legacy = batch({"sensor_ids": ["TEST_SENSOR_CURSOR"], "hours": 1, "since": {"TEST_SENSOR_CURSOR": cursor.rpartition(':')[0]}})
+        self.assertTrue(legacy['refetch'])
+
+        # 解像度が変わる場合は再取得を要求する
+        with mock.patch.object(Config, 'ROLLUP_RAW_ROW_LIMIT', 0):
+            _, changed = batch({"sensor_ids": ["TEST_SENSOR_CURSOR"], "hours": 720, "max_points": 500, "since": {"TEST_SENSOR_CURSOR": cursor}})
+        self.assertTrue(changed['refetch'])
+        
+        status, _ = batch({"sensor_ids": ["TEST_SENSOR_CURSOR"], "hours": 1, "since": {"TEST_SENSOR_CURSOR": "bogus"}})
+        self.assertEqual(status, 400)
+    
+    def test_conditional_get_returns_304_until_new_data(self):
+        """ETag が一致すれば 304、新着データがあれば 200 を返す"""
+        def post(temperature):
+            self.client.post(
+                '/api/temperature',
+                data=json.dumps({"device_id": "TEST_SENSOR_ETAG", "temperature": temperature}),
+                content_type='application/json'
+            )
+            self.assertTrue(ingest_queue.flush())
+        
+        post(20.0)
+        # リクエストIDはボディに含めない（同じデータなら同じボディになる）
+        self.assertIn('X-Request-ID', self.client.get('/api/sensors').headers)
+        for url in ('/api/sensors', '/api/temperature/TEST_SENSOR_ETAG?hours=1',
+                    '/api/temperature/batch?sensor_ids=TEST_SENSOR_ETAG&hours=1'):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            etag = first.headers['ETag']
+            self.assertIn('Cache-Control', first.headers)
+            
+            cached = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached.data, b'')
+            self.assertEqual(cached.headers['ETag'], etag)
+            
+            # パラメータが違えば別の ETag
+            other = self.client.get(url + ('&' if '?' in url else '?') + 'x=1')
+            self.assertNotEqual(other.headers['ETag'], etag)
+            
+            post(20.5)
+            fresh = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(fresh.status_code, 200)
+            self.assertNotEqual(fresh.headers['ETag'], etag)
+    
+    def test_if_modified_since_detects_write_in_same_second(self):
+        """If-Modified-Since のみのクライアントにも、同じ秒の後の書き込みで 304 を返さない"""
+        from utils import http_cache
+        from database.latest_cache import latest_cache
+
+        def get(now, modified_at, since=None):
+            headers = {'If-Modified-Since': since} if since else {}
+            with mock.patch.object(http_cache.time, 'time', return_value=now), \
+                    mock.patch.object(latest_cache, 'modified_at', modified_at):
+                return self.client.get('/api/sensors', headers=headers)
+
+        # 最終変更と同じ秒の応答: 切り捨てた時刻を返し、同じ秒の後の書き込みは 200
+        last_modified = get(1000.5, 1000.3).headers['Last-Modified']
+        self.assertEqual(last_modified, formatdate(1000, usegmt=True))
+        self.assertEqual(get(1005.0, 1000.7, last_modified).status_code, 200)
+        # 最終変更の秒が終わった後の応答: 切り上げた時刻を返し、変更がなければ 304
+        last_modified = get(1005.0, 1000.7).headers['Last-Modified']
+        self.assertEqual(last_modified, formatdate(1001, usegmt=True))
+        self.assertEqual(get(1006.0, 1000.7, last_modified).status_code, 304)
+        self.assertEqual(get(1006.0, 1005.2, last_modified).status_code, 200)
+
+    def test_temperature_batch_get_matches_post(self):
+        """GET のクエリパラメータでも POST と同じ内容を返す"""
+        self.client.post(
+            '/api/temperature',
+            data=json.dumps({"device_id": "TEST_SENSOR_BATCH_GET", "temperature": 25.5}),
+            content_type='application/json'
+        )
+        self.assertTrue(ingest_queue.flush())
+        
+        response = self.client.get('/api/temperature/batch?sensor_ids=TEST_SENSOR_BATCH_GET,TEST_SENSOR_NONE&hours=1&include_stats=true')
+        self.assertEqual(response.status_code, 200)
+        json_data = json.loads(response.data)
+        self.assertEqual(set(json_data['data']), {'TEST_SENSOR_BATCH_GET', 'TEST_SENSOR_NONE'})
+        entry = json_data['data']['TEST_SENSOR_BATCH_GET']
+        self.assertEqual(entry['readings'][-1]['temperature'], 25.5)
+        self.assertIn('statistics', entry)
+        
+        posted = self.client.post(
+            '/api/temperature/batch',
+            data=json.dumps({"sensor_ids": ["TEST_SENSOR_BATCH_GET", "TEST_SENSOR_NONE"], "hours": 1, "include_stats": True}),
+            content_type='application/json'
+        )
+        self.assertEqual(
+            json.loads(posted.data)['data']['TEST_SENSOR_BATCH_GET']['readings'],
+            entry['readings']
+        )
+        
+        response = self.client.get('/api/temperature/batch?hours=1')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_temperature_batch_response_cache(self):
+        """同じ条件の一括取得はキャッシュから返し、対象センサーの新着データで作り直す"""
+        def post(device_id, temperature):
+            self.client.post(
+                '/api/temperature',
+                data=json.dumps({"device_id": device_id, "temperature": temperature}),
+                content_type='application/json'
+            )
+            self.assertTrue(ingest_queue.flush())
+        
+        def batch(sensor_ids):
+            return self.client.post(
+                '/api/temperature/batch',
+                data=json.dumps({"sensor_ids": sensor_ids, "hours": 1}),
+                content_type='application/json'
+            )
+        
+        post("TEST_SENSOR_RC_A", 20.0)
+        post("TEST_SENSOR_RC_B", 30.0)
+        first = batch(["TEST_SENSOR_RC_A", "TEST_SENSOR_RC_B"])
+        hits = response_cache.get_stats()['hits']
+        # センサーIDの順序が違っても同じエントリ
+        second = batch(["TEST_SENSOR_RC_B", "TEST_SENSOR_RC_A"])
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(response_cache.get_stats()['hits'], hits + 1)
+        
+        # 対象外のセンサーの新着データでは無効にならない
+        post("TEST_SENSOR_RC_OTHER", 10.0)
+        hits = response_cache.get_stats()['hits']
+        batch(["TEST_SENSOR_RC_A", "TEST_SENSOR_RC_B"])
+        self.assertEqual(response_cache.get_stats()['hits'], hits + 1)
+        
+        post("TEST_SENSOR_RC_B", 31.0)
+        third = json.loads(batch(["TEST_SENSOR_RC_A", "TEST_SENSOR_RC_B"]).data)
+        self.assertEqual(third['data']['TEST_SENSOR_RC_B']['readings'][-1]['temperature'], 31.0)
+        
+        response = self.client.get('/api/cache')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(json.loads(response.data)['cache']['entries'], 0)
+    
+    def test_stream_readings_pushes_new_rows(self):
+        """SSE で購読中のセンサーの新着データだけが配信される"""
+        response = self.client.get('/api/stream/readings?sensor_ids=TEST_SENSOR_STREAM', buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        stream = iter(response.response)
+        self.assertIn(b'retry:', next(stream))
+        
+        for device_id, temperature in (("TEST_SENSOR_OTHER", 10.0), ("TEST_SENSOR_STREAM", 23.75)):
+            self.client.post(
+                '/api/temperature',
+                data=json.dumps({"device_id": device_id, "temperature": temperature}),
+                content_type='application/json'
+            )
+        self.assertTrue(ingest_queue.flush())
+        
+        event = next(stream).decode()
+        response.close()
+        self.assertEqual(reading_broadcaster.get_stats()['subscribers'], 0)
+        self.assertTrue(event.startswith('event: readings\n'))
+        readings = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual([r['sensor_id'] for r in readings], ['TEST_SENSOR_STREAM'])
+        self.assertEqual(readings[0]['temperature'], 23.75)
+
+    def test_stream_payload_has_no_nan(self):
+        """SSE のペイロードは NaN・inf を null にする（標準の json でも、ブラウザの JSON.parse で読める）"""
+        def strict_loads(payload):
+            return json.loads(payload, parse_constant=lambda name: self.fail(f"{name} in {payload}"))
+
+        row = TemperatureQueries.build_reading_row("TEST_SENSOR_STREAM_NAN", float('inf'), humidity=float('nan'))
+        for use_orjson in (True, False):
+            with mock.patch('utils.json_provider.use_orjson', use_orjson):
+                subscription = reading_broadcaster.subscribe(['TEST_SENSOR_STREAM_NAN'])
+                try:
+                    reading_broadcaster.publish([row])
+                    readings = strict_loads(subscription.get(timeout=1))
+                finally:
+                    reading_broadcaster.unsubscribe(subscription)
+            self.assertIsNone(readings[0]['temperature'])
+            self.assertIsNone(readings[0]['humidity'])
+
+    def test_retention_status(self):
+        """リテンションのポリシーと状態を取得"""
+        response = self.client.get('/api/retention')
+        self.assertEqual(response.status_code, 200)
+        retention = json.loads(response.data)['retention']
+        self.assertIn('raw', retention['policy_days'])
+        self.assertIn(retention['storage']['auto_vacuum'], ('none', 'full', 'incremental'))
+        
+        # 定期削除は明示的に有効にした場合のみ
+        from config import Config
+        from services.background_tasks import BackgroundTaskManager
+        if os.getenv('RETENTION_ENABLED') is None:
+            self.assertFalse(retention['scheduled'])
+            self.assertNotIn('Retention', [task.name for task in BackgroundTaskManager().get_tasks()])
+        self.assertEqual(retention['scheduled'], Config.RETENTION_ENABLED)
+    
+    def test_bulk_upload_per_item_results(self):
+        """一括アップロードは正常な要素だけを保存し、要素ごとの結果を返す"""
+        now = time.time()
+        data = {
+            "device_id": "TEST_BULK_01",
+            "name": "バルクテスト",
+            "battery_mode": True,
+            "readings": [
+                {"temperature": 20.5, "timestamp": now - 120},
+                {"temperature": 21.0, "age": 60},
+                {"temperature": 150.0},
+                {"temperature": 22.0, "timestamp": now + 3600},
+            ]
+        }
+        response = self.client.post(
+            '/api/temperature/bulk', data=json.dumps(data), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 207)
+        json_data = json.loads(response.data)
+        self.assertEqual(json_data['stored'], 2)
+        self.assertEqual(
+            [r['status'] for r in json_data['results']],
+            ['stored', 'stored', 'rejected', 'rejected']
+        )
+        
+        latest = TemperatureQueries.get_latest_reading('TEST_BULK_01')
+        self.assertEqual(latest['temperature'], 21.0)
+        self.assertEqual(latest['battery_mode'], 1)
+        self.assertAlmostEqual(latest['ts'] / 1000, now - 60, delta=2)
+    
+    def test_bulk_upload_rejects_non_finite(self):
+        """NaN・Infinity の要素はその要素だけのエラー（リクエスト全体を 500 にしない）"""
+        device_id = f"TEST_BULK_NAN_{time.time_ns()}"
+        body = json.dumps({
+            "device_id": device_id,
+            "readings": [
+                {"temperature": 20.5, "age": 30},
+                {"temperature": float('nan'), "age": 20},
+                {"temperature": 21.0, "humidity": float('inf'), "age": 10},
+            ]
+        })
+        self.assertIn('NaN', body)
+        response = self.client.post('/api/temperature/bulk', data=body, content_type='application/json')
+        self.assertEqual(response.status_code, 207)
+        json_data = json.loads(response.data)
+        self.assertEqual([r['status'] for r in json_data['results']], ['stored', 'rejected', 'rejected'])
+        self.assertEqual(TemperatureQueries.get_latest_reading(device_id)['temperature'], 20.5)
+    
+    def test_bulk_upload_gzip_ndjson(self):
+        """gzip 圧縮の NDJSON を受け付ける（不正な行は要素のエラー）"""
+        lines = [json.dumps({"device_id": "TEST_BULK_02", "temperature": 19.0 + i, "age": 30 * (3 - i)}) for i in range(3)]
+        lines.insert(1, '{broken')
+        response = self.client.post(
+            '/api/temperature/bulk',
+            data=gzip.compress('\n'.join(lines).encode()),
+            headers={'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'}
+        )
+        self.assertEqual(response.status_code, 207)
+        results = json.loads(response.data)['results']
+        self.assertEqual([r['status'] for r in results], ['stored', 'rejected', 'stored', 'stored'])
+        self.assertIn('JSON', results[1]['error'])
+    
+    def test_export_csv_streams_rows(self):
+        """CSVエクスポートはストリーミングで返し、センサーID・時刻順に並ぶ（gzip 指定時は .csv.gz）"""
+        suffix = str(time.time_ns())
+        sensor_a, sensor_b = f"TEST_EXPORT_A_{suffix}", f"TEST_EXPORT_B_{suffix}"
+        for sensor_id, temperature in ((sensor_b, 18.5), (sensor_a, 20.0), (sensor_a, 20.5)):
+            self.client.post(
+                '/api/temperature',
+                data=json.dumps({"device_id": sensor_id, "temperature": temperature}),
+                content_type='application/json'
+            )
+        self.assertTrue(ingest_queue.flush())
+
+        response = self.client.get('/api/export/csv?hours=1', headers={'Accept-Encoding': 'identity'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0].split(',')[0], 'センサーID')
+        rows = [line.split(',') for line in lines[1:]]
+        self.assertEqual([(r[0], r[2]) for r in rows if r[0].endswith(suffix)],
+                         [(sensor_a, '20.0'), (sensor_a, '20.5'), (sensor_b, '18.5')])
+        self.assertEqual([r[0] for r in rows], sorted(r[0] for r in rows))
+
+        response = self.client.get(f'/api/export/csv?hours=1&sensor_id={sensor_b}', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(response.get_data()).decode().splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [sensor_b])
+
+        response = self.client.get(f'/api/export/csv?hours=1&sensor_id={sensor_a}&gzip=1')
+        self.assertEqual(response.mimetype, 'application/gzip')
+        self.assertIn('.csv.gz', response.headers['Content-Disposition'])
+        self.assertEqual(len(gzip.decompress(response.get_data()).decode().splitlines()), 3)
+
+    def test_export_ndjson_with_filters(self):
+        """/api/export の NDJSON はセンサー・期間で絞り込み、不正な形式・期間は 400"""
+        sensor_id = f"TEST_EXPORT_NDJSON_{time.time_ns()}"
+        for temperature in (17.0, 17.5):
+            self.client.post(
+                '/api/temperature',
+                data=json.dumps({"device_id": sensor_id, "temperature": temperature}),
+                content_type='application/json'
+            )
+        self.assertTrue(ingest_queue.flush())
+
+        start = int(time.time()) - 600
+        response = self.client.get(f'/api/export?format=ndjson&sensor_ids={sensor_id}&start={start}',
+                                   headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertIn('.ndjson', response.headers['Content-Disposition'])
+        records = [json.loads(line) for line in gzip.decompress(response.get_data()).splitlines()]
+        self.assertEqual([(r['sensor_id'], r['temperature']) for r in records], [(sensor_id, 17.0), (sensor_id, 17.5)])
+
+        response = self.client.get(f'/api/export?format=ndjson&sensor_ids={sensor_id}&end={start}')
+        self.assertEqual(response.get_data(), b'')
+
+        for query in ('format=xlsx', 'start=yesterday', f'start={start}&end={start - 60}'):
+            response = self.client.get(f'/api/export?{query}')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.data)['error_code'], 'VALIDATION_ERROR')
+
+    def test_backup_includes_rows_in_wal(self):
+        """バックアップに WAL 内のコミット済みの行が含まれ、そのまま復元できる"""
+        sensor_id = f"TEST_BACKUP_{time.time_ns()}"
+        TemperatureQueries.insert_readings_batch([
+            TemperatureQueries.build_reading_row(sensor_id, 20.0 + i * 0.1) for i in range(50)
+        ])
+
+        response = self.client.get('/api/backup')
+        self.assertEqual(response.status_code, 200)
+        with tempfile.TemporaryDirectory() as tmp:
+            restored = Path(tmp) / 'restored.db'
+            restored.write_bytes(response.get_data())
+            conn = sqlite3.connect(str(restored))
+            try:
+                count = conn.execute(
+                    "SELECT COUNT(*) FROM temperatures WHERE sensor_id = ?", (sensor_id,)
+                ).fetchone()[0]
+                self.assertEqual(conn.execute("PRAGMA integrity_check").fetchone()[0], 'ok')
+            finally:
+                conn.close()
+        self.assertEqual(count, 50)
+
     def test_get_sensor_data_invalid_hours(self):
         """無効なhoursパラメータ"""
         response = self.client.get('/api/temperature/TEST_SENSOR?hours=10000')
@@ -0,0 +1,150 @@
+"""
+asyncio サーバー（async_server/）のユニットテスト
+
+aiohttp がインストールされていない場合はスキップする
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from aiohttp.test_utils import TestClient, TestServer
+    from async_server import create_async_app
+    from async_server.app import INGEST
+    from async_server.ingest import AsyncIngestWriter
+    from async_server.serial_transport import AsyncSerialGateway
+    aiohttp_available = True
+except ImportError:
+    aiohttp_available = False
+
+from config import Config
+from database.models import get_connection
+from database.queries import TemperatureQueries
+
+
+@unittest.skipUnless(aiohttp_available, "aiohttp is not installed")
+class TestAsyncServer(unittest.IsolatedAsyncioTestCase):
+    """aiohttp アプリのエンドポイントのテスト"""
+
+    async def asyncSetUp(self):
+        self.client = TestClient(TestServer(create_async_app(primary_tasks=False)))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        with get_connection() as conn:
+            conn.execute("DELETE FROM temperatures WHERE sensor_id LIKE 'TEST_ASYNC_%'")
+
+    async def test_ingest_stream_and_read(self):
+        """受信したデータが SSE で配信され、最新データ・一括取得に反映される"""
+        stream = await self.client.get('/api/stream/readings', params={'sensor_ids': 'TEST_ASYNC_01'})
+        self.assertEqual(stream.status, 200)
+        self.assertEqual(await stream.content.readline(), b'retry: 5000\n')
+
+        response = await self.client.post('/api/temperature', data=json.dumps({
+            'device_id': 'TEST_ASYNC_01', 'name': 'Async', 'temperature': 23.5, 'humidity': 40.0
+        }))
+        self.assertEqual(response.status, 201)
+
+        await stream.content.readline()
+        self.assertEqual(await stream.content.readline(), b'event: readings\n')
+        events = json.loads((await stream.content.readline())[len(b'data: '):])
+        self.assertEqual(events[0]['sensor_id'], 'TEST_ASYNC_01')
+        self.assertEqual(events[0]['temperature'], 23.5)
+        stream.close()
+
+        response = await self.client.get('/api/sensors')
+        sensors = {s['sensor_id']: s for s in (await response.json())['sensors']}
+        self.assertEqual(sensors['TEST_ASYNC_01']['sensor_name'], 'Async')
+
+        response = await self.client.post('/api/temperature/batch', json={'sensor_ids': ['TEST_ASYNC_01'], 'hours': 1})
+        body = await response.json()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body['data']['TEST_ASYNC_01']['readings'][0]['temperature'], 23.5)
+
+    async def test_invalid_requests(self):
+        """不正なリクエストは Flask 版と同じく 400 を返す"""
+        response = await self.client.post('/api/temperature', data=b'not json')
+        self.assertEqual(response.status, 400)
+        self.assertEqual((await response.json())['error_code'], 'VALIDATION_ERROR')
+
+        response = await self.client.post('/api/temperature', json={'device_id': 'TEST_ASYNC_02'})
+        self.assertEqual(response.status, 400)
+
+        # NaN・範囲外はキューに積む前に弾く（コミット時の失敗はクライアントに返せない）
+        for body in (b'{"device_id": "TEST_ASYNC_02", "temperature": NaN}',
+                     b'{"device_id": "TEST_ASYNC_02", "temperature": 1000}',
+                     b'{"device_id": "TEST_ASYNC_02", "temperature": 20, "humidity": Infinity}'):
+            response = await self.client.post('/api/temperature', data=body)
+            self.assertEqual(response.status, 400)
+        self.assertEqual(self.client.app[INGEST].stats['enqueued'], 0)
+
+        response = await self.client.post('/api/temperature/batch', json={'sensor_ids': []})
+        self.assertEqual(response.status, 400)
+
+    async def test_serial_port_via_event_loop(self):
+        """シリアルポート（疑似端末）をスレッドなしで受信し、書き込みキューに積む"""
+        master, slave = os.openpty()
+        ingest = self.client.server.app[INGEST]
+        gateway = AsyncSerialGateway(ingest.put_nowait, ports=[os.ttyname(slave)], scan_interval=60)
+        task = asyncio.get_running_loop().create_task(gateway.run())
+        try:
+            await asyncio.sleep(0.2)
+            self.assertEqual(gateway.get_connected_ports(), [os.ttyname(slave)])
+
+            frame = {'device_id': 'TEST_ASYNC_GW', 'sensors': [{'sensor_id': 'TEST_ASYNC_03', 'temp': 19.5}]}
+            os.write(master, (json.dumps(frame) + '\n').encode())
+            for _ in range(50):
+                if ingest.stats['enqueued'] >= 1:
+                    break
+                await asyncio.sleep(0.05)
+            self.assertEqual(gateway.get_status()['ports'][0]['stats']['readings'], 1)
+            self.assertEqual(ingest.stats['enqueued'], 1)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            os.close(master)
+            os.close(slave)
+
+    async def test_ingest_writer_retries_and_spills(self):
+        """コミットに失敗したバッチは同期版と同じくリトライ後に退避し、次のコミット後に書き戻す"""
+        published = []
+
+        class Recorder:
+            def publish(self, rows):
+                published.extend(rows)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        writer = AsyncIngestWriter(executor, Recorder(), flush_interval=0.01)
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                mock.patch.object(Config, 'INGEST_SPILL_FILE', os.path.join(tmpdir, 'spill.jsonl')):
+            writer.start()
+            try:
+                with mock.patch.object(TemperatureQueries, 'insert_readings_batch',
+                                       side_effect=[RuntimeError('locked'), RuntimeError('locked'), RuntimeError('locked')]):
+                    await writer.put([{'sensor_id': 'TEST_ASYNC_SPILL', 'temperature': 18.0}])
+                    await writer._queue.join()
+                self.assertEqual((writer.stats['failed'], writer.stats['spilled']), (1, 1))
+
+                await writer.put([{'sensor_id': 'TEST_ASYNC_SPILL', 'temperature': 18.5}])
+                await writer._queue.join()
+                self.assertEqual(writer.stats['replayed'], 1)
+                self.assertEqual(sorted(row[2] for row in published), [18.0, 18.5])
+            finally:
+                await writer.stop()
+                executor.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+レスポンス圧縮（方式の選択・サイズのしきい値・ETag ごとの圧縮済みボディのキャッシュ）のユニットテスト
+"""
+
+import gzip
+import json
+import unittest
+import sys
+from pathlib import Path
+from flask import Flask, jsonify
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.compression import ResponseCompressor, CODECS, skip_compression
+from utils.response_cache import ResponseCache
+
+LARGE = {'readings': [{'sensor_id': 'TEST', 'temperature': 21.5 + i / 100} for i in range(200)]}
+
+
+class TestResponseCompressor(unittest.TestCase):
+    """レスポンス圧縮のテスト"""
+
+    def setUp(self):
+        self.cache = ResponseCache(max_entries=8, max_bytes=1 << 20, ttl=60)
+        app = Flask(__name__)
+        app.after_request(ResponseCompressor(['br', 'gzip'], 1024, self.cache))
+
+        @app.route('/large')
+        def large():
+            response = jsonify(LARGE)
+            response.headers['ETag'] = '"v1"'
+            return response
+
+        @app.route('/small')
+        def small():
+            return jsonify({'status': 'success'})
+
+        @app.route('/ingest', methods=['POST'])
+        @skip_compression
+        def ingest():
+            return jsonify(LARGE), 201
+
+        self.client = app.test_client()
+
+    def test_gzip_and_etag_suffix(self):
+        """gzip のみ受け付けるクライアントには gzip で返し、ETag に圧縮方式を付ける"""
+        response = self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['ETag'], '"v1:gzip"')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.data)), LARGE)
+
+    @unittest.skipUnless('br' in CODECS, 'brotli is not installed')
+    def test_negotiation_prefers_server_order_and_quality(self):
+        """q 値が同じならサーバーの優先順、q 値が高い方式があればそれを選ぶ"""
+        import brotli
+        response = self.client.get('/large', headers={'Accept-Encoding': 'gzip, deflate, br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(brotli.decompress(response.data)), LARGE)
+
+        response = self.client.get('/large', headers={'Accept-Encoding': 'br;q=0.5, gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+
+    def test_compressed_body_cached_per_etag(self):
+        """同じ ETag・圧縮方式の2回目以降は圧縮済みのボディを使い回す"""
+        first = self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+        second = self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(first.data, second.data)
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_skips(self):
+        """しきい値未満・非対応のクライアント・圧縮しないビューは圧縮しない"""
+        response = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+        response = self.client.get('/large', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.headers['ETag'], '"v1"')
+
+        response = self.client.post('/ingest', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Vary', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
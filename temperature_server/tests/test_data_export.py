@@ -0,0 +1,131 @@
+"""
+データエクスポート（期間のバリデーション、NDJSON・Parquet・Arrow IPC のストリーミング出力）のユニットテスト
+"""
+
+import io
+import json
+import time
+import unittest
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from database.models import init_database, get_connection
+from database.queries import TemperatureQueries
+from services import data_export
+from services.data_export import iter_ndjson, iter_parquet, iter_arrow_stream
+from utils.validators import validate_export_range
+
+if data_export.arrow_available:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+JST = timezone(timedelta(hours=9))
+
+
+class TestDataExport(unittest.TestCase):
+    """エクスポートのテスト（テストごとに別のセンサーIDのデータを使う）"""
+
+    @classmethod
+    def setUpClass(cls):
+        """5件のデータ（1分間隔、1件目はバッテリー駆動）を挿入"""
+        init_database()
+        cls.sensor_id = f"TEST_EXPORT_{time.time_ns()}"
+        start = datetime.now(JST).replace(microsecond=0) - timedelta(minutes=10)
+        cls.times = [start + timedelta(minutes=i) for i in range(5)]
+        TemperatureQueries.insert_readings_batch([
+            TemperatureQueries.build_reading_row(
+                cls.sensor_id, 20.0 + i, 'エクスポート', humidity=40.0 + i,
+                battery_mode=(i == 0), timestamp=measured_at
+            )
+            for i, measured_at in enumerate(cls.times)
+        ])
+        cls.since_ms = int(cls.times[0].timestamp() * 1000)
+
+    def read_ndjson(self, since_ms, until_ms=None):
+        return [json.loads(line) for line in b''.join(iter_ndjson(since_ms, until_ms, [self.sensor_id])).splitlines()]
+
+    def test_validate_export_range(self):
+        """start・end はエポック秒・ミリ秒・ISO 8601（タイムゾーンなしは JST）、省略時は hours"""
+        now = datetime(2026, 1, 2, 0, 0, tzinfo=JST)
+        self.assertEqual(validate_export_range(hours='24', now=now)[2],
+                         (int((now - timedelta(hours=24)).timestamp() * 1000), None))
+        self.assertEqual(validate_export_range('2026-01-01T00:00:00', '1767279600000')[2],
+                         (1767193200000, 1767279600000))
+        self.assertEqual(validate_export_range(1767193200)[2][0], 1767193200000)
+        for start, end, hours in (('yesterday', None, None), ('2026-01-02', '2026-01-01', None), (None, None, '-1')):
+            is_valid, error_msg, _ = validate_export_range(start, end, hours)
+            self.assertFalse(is_valid)
+            self.assertTrue(error_msg)
+
+    def test_ndjson_rows_and_time_range(self):
+        """NDJSON は時刻順で、end の時刻は含まない"""
+        records = self.read_ndjson(self.since_ms)
+        self.assertEqual([r['temperature'] for r in records], [20.0, 21.0, 22.0, 23.0, 24.0])
+        self.assertEqual(records[0]['ts'], self.since_ms)
+        self.assertIs(records[0]['battery_mode'], True)
+        self.assertEqual(set(records[0]), set(data_export.FIELDS))
+
+        until_ms = int(self.times[3].timestamp() * 1000)
+        self.assertEqual([r['temperature'] for r in self.read_ndjson(self.since_ms + 1, until_ms)], [21.0, 22.0])
+
+    def test_batches_release_snapshot_between_yields(self):
+        """バッチはセンサーをまたいで batch_size 件ずつ（同時刻の行も欠けない）、yield 中は WAL をチェックポイントできる"""
+        tie_id = f"{self.sensor_id}_TIE"
+        TemperatureQueries.insert_readings_batch([
+            TemperatureQueries.build_reading_row(tie_id, 30.0, timestamp=self.times[0]) for _ in range(3)
+        ])
+        batches = TemperatureQueries.iter_export_batches(
+            self.since_ms, sensor_ids=[tie_id, self.sensor_id], batch_size=2
+        )
+        received = [next(batches)]
+
+        conn = get_connection()
+        try:
+            busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        finally:
+            conn.close()
+        self.assertEqual(busy, 0)
+
+        received.extend(batches)
+        self.assertEqual([len(rows) for rows in received], [2, 2, 2, 2])
+        rows = [row for rows in received for row in rows]
+        self.assertEqual([row[0] for row in rows], [self.sensor_id] * 5 + [tie_id] * 3)
+        self.assertEqual([row[2] for row in rows], [20.0, 21.0, 22.0, 23.0, 24.0, 30.0, 30.0, 30.0])
+        TemperatureQueries.delete_sensor(tie_id)
+
+    @unittest.skipUnless(data_export.arrow_available, 'pyarrow is not installed')
+    def test_parquet_row_groups(self):
+        """Parquet は EXPORT_ROW_GROUP_SIZE 行以上たまるごとに row group を書き、内容は NDJSON と同じ"""
+        with mock.patch.object(Config, 'EXPORT_FETCH_SIZE', 2), mock.patch.object(Config, 'EXPORT_ROW_GROUP_SIZE', 3):
+            chunks = list(iter_parquet(self.since_ms, sensor_ids=[self.sensor_id]))
+        self.assertEqual(len(chunks), 2)
+
+        parquet_file = pq.ParquetFile(io.BytesIO(b''.join(chunks)))
+        self.assertEqual([parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.num_row_groups)], [4, 1])
+        table = parquet_file.read()
+        self.assertEqual(table.schema, data_export.ARROW_SCHEMA)
+        rows = table.to_pylist()
+        for row in rows:
+            row['ts'] = int(row['ts'].timestamp() * 1000)
+        self.assertEqual(rows, self.read_ndjson(self.since_ms))
+
+    @unittest.skipUnless(data_export.arrow_available, 'pyarrow is not installed')
+    def test_arrow_stream(self):
+        """Arrow IPC ストリームはそのまま読み込める（対象外のセンサーは含まない）"""
+        with mock.patch.object(Config, 'EXPORT_FETCH_SIZE', 2):
+            body = b''.join(iter_arrow_stream(self.since_ms, sensor_ids=[self.sensor_id]))
+        table = pa.ipc.open_stream(body).read_all()
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(set(table.column('sensor_id').to_pylist()), {self.sensor_id})
+        self.assertEqual(table.column('humidity').to_pylist(), [40.0, 41.0, 42.0, 43.0, 44.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+間引きエンジンのユニットテスト
+"""
+
+import unittest
+import sys
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.downsampling import downsample_legacy, downsample_readings, numpy_available
+
+
+def make_readings(temperatures):
+    """温度リストから時系列順のデータを作成"""
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            'temperature': temperature,
+            'timestamp': (start + timedelta(seconds=30 * i)).strftime('%Y-%m-%d %H:%M:%S')
+        }
+        for i, temperature in enumerate(temperatures)
+    ]
+
+
+@unittest.skipUnless(numpy_available, "numpy is not installed")
+class TestDownsampling(unittest.TestCase):
+    """間引きエンジンのテスト"""
+
+    def test_extremes_matches_legacy(self):
+        """extremes モードは従来実装と同じポイントを選ぶ"""
+        rng = random.Random(1)
+        for noise in (0.05, 0.4, 1.0):
+            temperatures = [round(22 + rng.gauss(0, noise), 2) for _ in range(5000)]
+            readings = make_readings(temperatures)
+            expected = downsample_legacy(readings, 300)
+            actual = downsample_readings(readings, 300, 'extremes')
+            self.assertEqual(actual, expected)
+
+    def test_small_input_is_unchanged(self):
+        """max_points 以下の場合はそのまま返す"""
+        readings = make_readings([20.0, 21.0, 22.0])
+        for mode in ('extremes', 'lttb', 'minmax'):
+            self.assertEqual(downsample_readings(readings, 10, mode), readings)
+
+    def test_lttb_keeps_endpoints_and_size(self):
+        """LTTB は先頭・末尾を含み max_points 件を返す"""
+        readings = make_readings([20 + (i % 100) / 10 for i in range(2000)])
+        result = downsample_readings(readings, 200, 'lttb')
+        self.assertEqual(len(result), 200)
+        self.assertIs(result[0], readings[0])
+        self.assertIs(result[-1], readings[-1])
+        timestamps = [r['timestamp'] for r in result]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_minmax_keeps_spikes(self):
+        """minmax は最大値・最小値のスパイクを保持する"""
+        temperatures = [22.0] * 10000
+        temperatures[1234] = 35.0
+        temperatures[8765] = -5.0
+        result = downsample_readings(make_readings(temperatures), 100, 'minmax')
+        self.assertLessEqual(len(result), 100)
+        values = [r['temperature'] for r in result]
+        self.assertIn(35.0, values)
+        self.assertIn(-5.0, values)
+
+    def test_invalid_mode(self):
+        """不正なモードはエラー"""
+        with self.assertRaises(ValueError):
+            downsample_readings(make_readings([1.0] * 10), 5, 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+書き込みキューのコミット失敗時の退避（スピルファイル）と書き戻しのユニットテスト
+"""
+
+import json
+import queue
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from database.models import init_database, get_connection
+from database.queries import TemperatureQueries
+from services.ingest_queue import IngestQueue
+from services import ingest_spill
+
+
+class TestIngestSpill(unittest.TestCase):
+    """コミットできなかった行を破棄せず、次のコミット成功時に書き戻す"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_database()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.spill_file = Path(self.tmpdir.name) / 'ingest_spill.jsonl'
+        self.rejected_file = Path(self.tmpdir.name) / 'ingest_rejected.jsonl'
+        self.config_patch = mock.patch.multiple(
+            Config, INGEST_SPILL_FILE=str(self.spill_file), INGEST_REJECTED_FILE=str(self.rejected_file)
+        )
+        self.config_patch.start()
+        self.sensor_id = f'TEST_SPILL_{time.time_ns()}'
+        self.queue = IngestQueue(batch_size=50, flush_interval=0.05)
+
+    def tearDown(self):
+        self.queue.stop()
+        self.config_patch.stop()
+        self.tmpdir.cleanup()
+        with get_connection() as conn:
+            conn.execute("DELETE FROM temperatures WHERE sensor_id = ?", (self.sensor_id,))
+
+    def stored_temperatures(self):
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT temperature FROM temperatures WHERE sensor_id = ? ORDER BY id", (self.sensor_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def test_failed_batch_is_spilled_and_written_back(self):
+        """リトライしても失敗したバッチは退避され、次のバッチのコミット後に書き戻される"""
+        with mock.patch.object(TemperatureQueries, 'insert_readings_batch', side_effect=RuntimeError('disk I/O error')):
+            self.queue.enqueue_many([{'sensor_id': self.sensor_id, 'temperature': t} for t in (20.0, 20.5)])
+            self.assertTrue(self.queue.flush())
+        self.assertTrue(ingest_spill.has_spill())
+        self.assertEqual(self.stored_temperatures(), [])
+        self.assertEqual(self.queue.get_stats()['spilled'], 2)
+
+        self.queue.enqueue(self.sensor_id, 21.0)
+        self.assertTrue(self.queue.flush())
+        self.assertEqual(sorted(self.stored_temperatures()), [20.0, 20.5, 21.0])
+        self.assertFalse(ingest_spill.has_spill())
+        stats = self.queue.get_stats()
+        self.assertEqual((stats['replayed'], stats['lost']), (2, 0))
+
+    def test_bad_row_is_rejected_without_blocking_the_batch(self):
+        """IntegrityError の行（NaN の温度）だけを除外し、同じバッチの他の行はリトライ・退避せずにコミットする"""
+        temperatures = (20.0, 20.5, float('nan'), 21.0, 21.5)
+        self.queue.enqueue_many([{'sensor_id': self.sensor_id, 'temperature': t} for t in temperatures])
+        self.assertTrue(self.queue.flush())
+
+        self.assertEqual(self.stored_temperatures(), [20.0, 20.5, 21.0, 21.5])
+        self.assertFalse(ingest_spill.has_spill())
+        stats = self.queue.get_stats()
+        self.assertEqual((stats['written'], stats['rejected'], stats['spilled'], stats['failed']), (4, 1, 0, 1))
+        rejected = [json.loads(line) for line in self.rejected_file.read_text().splitlines()]
+        self.assertEqual(len(rejected), 1)
+        self.assertIn('NOT NULL', rejected[0]['error'])
+
+    def test_replay_skips_bad_rows(self):
+        """スピルファイルに書き込めない行があっても、他の行は書き戻してファイルから取り除く"""
+        ingest_spill.spill_rows([
+            TemperatureQueries.build_reading_row(self.sensor_id, t) for t in (19.0, float('nan'), 19.5)
+        ])
+        result = ingest_spill.replay_spill()
+        self.assertEqual((len(result.committed), len(result.rejected)), (2, 1))
+        self.assertEqual(self.stored_temperatures(), [19.0, 19.5])
+        self.assertFalse(ingest_spill.has_spill())
+
+    def test_replay_keeps_rows_on_failure(self):
+        """IntegrityError 以外で書き戻せなかった行はファイルに残す（コミットした行は取り除く）"""
+        ingest_spill.spill_rows([TemperatureQueries.build_reading_row(self.sensor_id, t) for t in (18.0, 18.5)])
+        with mock.patch.object(TemperatureQueries, 'insert_readings_batch', side_effect=RuntimeError('disk I/O error')):
+            result = ingest_spill.replay_spill()
+        self.assertEqual(result.committed, [])
+        self.assertEqual(len(self.spill_file.read_text().splitlines()), 2)
+
+        result = ingest_spill.replay_spill()
+        self.assertEqual(len(result.committed), 2)
+        self.assertFalse(ingest_spill.has_spill())
+
+    def test_sync_fallback_uses_retry_and_spill(self):
+        """キューが溢れた場合の同期書き込みも例外を返さず、失敗した行は退避する"""
+        self.queue.start()
+        with mock.patch.object(self.queue._queue, 'put', side_effect=queue.Full), \
+                mock.patch.object(TemperatureQueries, 'insert_readings_batch', side_effect=RuntimeError('database is locked')):
+            self.assertFalse(self.queue.enqueue(self.sensor_id, 22.0))
+            self.assertFalse(self.queue.enqueue_many([{'sensor_id': self.sensor_id, 'temperature': 22.5}]))
+        stats = self.queue.get_stats()
+        self.assertEqual((stats['sync_fallback'], stats['spilled'], stats['written']), (2, 2, 0))
+
+        with mock.patch.object(self.queue._queue, 'put', side_effect=queue.Full):
+            self.queue.enqueue(self.sensor_id, 23.0)
+        self.assertEqual(self.queue.get_stats()['written'], 1)
+        self.assertTrue(self.queue.flush())
+        self.assertEqual(sorted(self.stored_temperatures()), [22.0, 22.5, 23.0])
+
+    def test_spill_written_back_on_start(self):
+        """前回の実行で退避した行はライターの起動時に書き戻す"""
+        ingest_spill.spill_rows([TemperatureQueries.build_reading_row(self.sensor_id, 19.5)])
+        self.queue.start()
+        self.assertTrue(self.queue.flush())
+        self.assertEqual(self.stored_temperatures(), [19.5])
+        self.assertFalse(ingest_spill.has_spill())
+
+
+if __name__ == '__main__':
+    unittest.main()
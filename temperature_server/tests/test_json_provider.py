@@ -0,0 +1,91 @@
+"""
+JSON のエンコード（orjson / 標準の json、NumPy・datetime、センサーごとのエンコード）のユニットテスト
+"""
+
+import json
+import unittest
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+from flask import Flask, jsonify, request
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import json_provider
+from utils.json_provider import dumps_bytes, loads, iter_object_chunks, init_json_provider
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKENDS = [False] + ([True] if json_provider.orjson_available else [])
+
+
+class TestJsonProvider(unittest.TestCase):
+    """JSON のエンコードのテスト（orjson・標準の json の両方で同じ結果）"""
+
+    def test_datetime_and_unicode(self):
+        """datetime は ISO 8601、日本語はそのまま UTF-8"""
+        value = {'name': '温度', 'at': datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)}
+        for backend in BACKENDS:
+            with self.subTest(orjson=backend), mock.patch.object(json_provider, 'use_orjson', backend):
+                self.assertEqual(
+                    json.loads(dumps_bytes(value)),
+                    {'name': '温度', 'at': '2026-01-02T03:04:05+00:00'}
+                )
+                self.assertIn('温度'.encode(), dumps_bytes(value))
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_numpy_arrays_and_scalars(self):
+        """NumPy の配列・スカラーはリスト・数値に変換し、NaN は null"""
+        value = {
+            'ts': np.array([1, 2], dtype=np.int64),
+            'temperatures': np.array([21.5, np.nan]),
+            'count': np.int64(2),
+            'every_other': np.arange(4.0)[::2],
+        }
+        for backend in BACKENDS:
+            with self.subTest(orjson=backend), mock.patch.object(json_provider, 'use_orjson', backend):
+                self.assertEqual(json.loads(dumps_bytes(value)), {
+                    'ts': [1, 2], 'temperatures': [21.5, None], 'count': 2, 'every_other': [0.0, 2.0]
+                })
+
+    def test_fallback_for_unsupported_values(self):
+        """orjson が扱えない値（64ビットを超える整数・NaN の入力）は標準の json で処理"""
+        self.assertEqual(json.loads(dumps_bytes({'big': 2 ** 70})), {'big': 2 ** 70})
+        value = loads('{"humidity": NaN}')
+        self.assertNotEqual(value['humidity'], value['humidity'])
+        with self.assertRaises(ValueError):
+            loads('{"broken":')
+
+    def test_iter_object_chunks_matches_dumps(self):
+        """センサーごとにエンコードした結果は全体をエンコードした結果と同じ内容"""
+        entries = [('A', {'count': 1, 'temperatures': [20.5]}), ('B', {'count': 0, 'temperatures': []})]
+        body = b''.join(iter_object_chunks(
+            {'status': 'success'}, 'data', iter(entries), tail=lambda: {'count': 2}
+        ))
+        self.assertEqual(json.loads(body), {'status': 'success', 'data': dict(entries), 'count': 2})
+        self.assertEqual(json.loads(b''.join(iter_object_chunks({}, 'data', []))), {'data': {}})
+
+    def test_flask_provider(self):
+        """jsonify・request.get_json がプロバイダーを使う"""
+        app = Flask(__name__)
+        init_json_provider(app)
+
+        @app.route('/echo', methods=['POST'])
+        def echo():
+            return jsonify(dict(request.get_json(), at=datetime(2026, 1, 2)))
+
+        response = app.test_client().post('/echo', data='{"t": 21.5}', content_type='application/json')
+        self.assertEqual(json.loads(response.data), {'t': 21.5, 'at': '2026-01-02T00:00:00'})
+
+        response = app.test_client().post('/echo', data='{"t": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+ログの非同期バックエンド（LogWriter・JSON Lines・マスク）のユニットテスト
+"""
+
+import json
+import queue
+import logging
+import logging.handlers
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from logger import DeferredQueueHandler, JsonLinesFormatter, LogWriter
+
+
+class TestLogWriter(unittest.TestCase):
+    """キュー経由のバッチ書き込みのテスト"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.log_file = Path(self.tmpdir.name) / 'server.jsonl'
+        file_handler = logging.handlers.TimedRotatingFileHandler(str(self.log_file), when='midnight', encoding='utf-8')
+        self.log_queue = queue.SimpleQueue()
+        self.writer = LogWriter(self.log_queue, file_handler, JsonLinesFormatter(), batch_size=64)
+        self.writer.start()
+
+        self.logger = logging.getLogger('tests.log_writer')
+        self.logger.handlers = [DeferredQueueHandler(self.log_queue)]
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+    def tearDown(self):
+        self.writer.stop()
+        self.writer.file_handler.close()
+        self.logger.handlers = []
+        self.tmpdir.cleanup()
+
+    def read_entries(self):
+        self.assertTrue(self.writer.flush())
+        with open(self.log_file, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_json_lines_with_extra_and_exception(self):
+        """1レコード1行の JSON（extra・例外を含む）で書き込む"""
+        self.logger.info("%s %s -> %d", 'POST', '/api/temperature', 201, extra={'endpoint': 'api.receive_temperature'})
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.logger.error("failed", exc_info=True)
+
+        entries = self.read_entries()
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['msg'], 'POST /api/temperature -> 201')
+        self.assertEqual(entries[0]['level'], 'INFO')
+        self.assertEqual(entries[0]['logger'], 'tests.log_writer')
+        self.assertEqual(entries[0]['endpoint'], 'api.receive_temperature')
+        self.assertIn('ValueError: boom', entries[1]['exc'])
+
+    def test_masks_secrets_in_emitted_records(self):
+        """出力される文字列（引数を埋め込んだ後）のパスワードをマスクする"""
+        self.logger.info("connecting with %s", Config.AP_PASSWORD)
+        self.logger.debug("dropped %s", Config.AP_PASSWORD)
+
+        entries = self.read_entries()
+        self.assertEqual(len(entries), 1)
+        self.assertNotIn(Config.AP_PASSWORD, json.dumps(entries[0], ensure_ascii=False))
+        self.assertEqual(entries[0]['msg'], 'connecting with ***')
+
+    def test_batches_records(self):
+        """まとめて積まれたレコードは少ない書き込み回数で出力する"""
+        for i in range(500):
+            self.logger.info("record %d", i)
+
+        entries = self.read_entries()
+        self.assertEqual([e['msg'] for e in entries], [f"record {i}" for i in range(500)])
+        self.assertEqual(self.writer.stats['records'], 500)
+        self.assertLess(self.writer.stats['batches'], 500)
+
+    def test_reopens_after_external_rotation(self):
+        """WatchedFileHandler（LOG_ROTATION=external）は logrotate が移動したファイルを開き直す"""
+        self.writer.stop()
+        self.writer.file_handler.close()
+        self.writer = LogWriter(self.log_queue, logging.handlers.WatchedFileHandler(str(self.log_file), encoding='utf-8'),
+                                JsonLinesFormatter(), batch_size=64)
+        self.writer.start()
+
+        self.logger.info("before rotation")
+        self.assertTrue(self.writer.flush())
+        rotated = self.log_file.with_name('server.jsonl-20260101')
+        self.log_file.rename(rotated)
+        self.logger.info("after rotation")
+
+        self.assertEqual([e['msg'] for e in self.read_entries()], ['after rotation'])
+        with open(rotated, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['msg'] for line in f], ['before rotation'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+複数ワーカー構成（プライマリロック・他プロセスの書き込み検知）のユニットテスト
+"""
+
+import json
+import subprocess
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.models import init_database, get_connection
+from database.queries import TemperatureQueries
+from database.latest_cache import latest_cache
+from services.process_roles import PrimaryProcessLock
+from services.db_watcher import DataVersionWatcher
+from services.reading_stream import reading_broadcaster
+from utils.response_cache import ResponseCache
+
+# 別プロセス（他のワーカー）として1件書き込むスクリプト
+_INSERT_SCRIPT = """
+import sys
+from database.queries import TemperatureQueries
+TemperatureQueries.insert_readings_batch([TemperatureQueries.build_reading_row(sys.argv[1], 23.5)])
+"""
+
+
+class TestPrimaryProcessLock(unittest.TestCase):
+    """プライマリロックのテスト"""
+
+    def test_only_one_holder(self):
+        """ロックを保持できるのは1つだけで、解放後は他が取得できる"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'primary.lock'
+            first = PrimaryProcessLock(path)
+            second = PrimaryProcessLock(path)
+
+            self.assertTrue(first.acquire())
+            self.assertTrue(first.acquire())
+            self.assertFalse(second.acquire())
+            self.assertFalse(second.is_held)
+
+            first.release()
+            self.assertTrue(second.acquire())
+            second.release()
+
+
+class TestDataVersionWatcher(unittest.TestCase):
+    """他の接続のコミットの検知のテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_database()
+
+    def setUp(self):
+        self.watcher = DataVersionWatcher(interval=60)
+        self.watcher.start()
+        self.subscription = reading_broadcaster.subscribe(['TEST_WATCHER_01'])
+
+    def tearDown(self):
+        reading_broadcaster.unsubscribe(self.subscription)
+        self.watcher.stop()
+        with get_connection() as conn:
+            conn.execute("DELETE FROM temperatures WHERE sensor_id = 'TEST_WATCHER_01'")
+        latest_cache.invalidate()
+
+    def test_publishes_rows_committed_elsewhere(self):
+        """別の接続（他のワーカー）がコミットした行を配信し、最新データに反映する"""
+        self.assertEqual(self.watcher.poll(), 0)
+
+        # このプロセスの書き込みパスからの直接配信は行わない
+        TemperatureQueries.insert_readings_batch([
+            TemperatureQueries.build_reading_row('TEST_WATCHER_01', 21.5),
+        ])
+        reading_broadcaster.publish([('TEST_WATCHER_01',)])
+        self.assertIsNone(self.subscription.get(timeout=0))
+
+        with get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO temperatures (sensor_id, temperature, timestamp, ts) VALUES (?, ?, ?, ?)",
+                [('TEST_WATCHER_01', 22.0, '2030-01-01 00:00:00', 1893423600000)]
+            )
+
+        self.assertEqual(self.watcher.poll(), 2)
+        events = json.loads(self.subscription.get(timeout=0))
+        self.assertEqual([e['temperature'] for e in events], [21.5, 22.0])
+        self.assertEqual(TemperatureQueries.get_latest_reading('TEST_WATCHER_01')['temperature'], 22.0)
+        self.assertEqual(self.watcher.poll(), 0)
+
+    def test_other_process_ingest_keeps_unrelated_cache(self):
+        """他プロセスの取り込みで無効になるのは対象センサーの応答キャッシュだけ（削除時は全体）"""
+        suffix = time.time_ns()
+        sensor_a, sensor_b = f'TEST_WATCHER_A_{suffix}', f'TEST_WATCHER_B_{suffix}'
+        TemperatureQueries.insert_readings_batch([
+            TemperatureQueries.build_reading_row(sensor_a, 20.0),
+            TemperatureQueries.build_reading_row(sensor_b, 21.0),
+        ])
+        self.watcher.poll()
+
+        cache = ResponseCache(max_entries=8, max_bytes=1 << 20, ttl=60)
+        builds = []
+
+        def get(sensor_id):
+            return cache.get_or_build(sensor_id, latest_cache.sensor_stamp([sensor_id]),
+                                      lambda: builds.append(sensor_id) or sensor_id.encode())
+
+        get(sensor_a)
+        get(sensor_b)
+        subprocess.run([sys.executable, '-c', _INSERT_SCRIPT, sensor_b], cwd=str(project_root), check=True)
+        self.assertEqual(self.watcher.poll(), 1)
+
+        get(sensor_a)
+        get(sensor_b)
+        self.assertEqual(builds, [sensor_a, sensor_b, sensor_b])
+        self.assertEqual(cache.get_stats()['hits'], 1)
+
+        # 行の削除（ここでは最後の行、id の最大値が減る）は影響範囲が分からないため全センサーを無効にする
+        with get_connection() as conn:
+            conn.execute("DELETE FROM temperatures WHERE id = (SELECT MAX(id) FROM temperatures) AND sensor_id = ?", (sensor_b,))
+        self.watcher.poll()
+        get(sensor_a)
+        self.assertEqual(builds[-1], sensor_a)
+
+        with get_connection() as conn:
+            conn.execute("DELETE FROM temperatures WHERE sensor_id IN (?, ?)", (sensor_a, sensor_b))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+リクエストロギング（詳細度・サンプリング）のユニットテスト
+"""
+
+import unittest
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.request_logging import RequestLogPolicy, parse_route_levels
+
+
+class TestRequestLogPolicy(unittest.TestCase):
+    """ルートごとの設定のテスト"""
+
+    def test_parse_route_levels(self):
+        """エンドポイントごとの詳細度とサンプリング率を解析する"""
+        routes = parse_route_levels('api.receive_temperature=summary:0.01, static=off,api.get_status=full')
+        self.assertEqual(routes['api.receive_temperature'], ('summary', 0.01))
+        self.assertEqual(routes['static'], ('off', None))
+        self.assertEqual(routes['api.get_status'], ('full', None))
+        with self.assertRaises(ValueError):
+            parse_route_levels('api.receive_temperature=verbose')
+
+    def test_sampling_keeps_errors_and_slow_requests(self):
+        """サンプリング対象外でもエラー・遅いリクエストは記録する"""
+        policy = RequestLogPolicy(slow_ms=500, routes=parse_route_levels('ingest=summary:0.0,quiet=off'))
+        level, rate = policy.resolve('ingest')
+        self.assertFalse(policy.should_log(level, rate, 201, 1.0))
+        self.assertTrue(policy.should_log(level, rate, 400, 1.0))
+        self.assertTrue(policy.should_log(level, rate, 201, 800.0))
+
+        level, rate = policy.resolve('quiet')
+        self.assertFalse(policy.should_log(level, rate, 404, 800.0))
+        self.assertTrue(policy.should_log(level, rate, 500, 1.0))
+
+        # 設定のないルートは既定値
+        self.assertEqual(policy.resolve('api.get_all_sensors'), ('summary', 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+応答キャッシュ（LRU・データの版による無効化・同時作成の待ち合わせ）のユニットテスト
+"""
+
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.latest_cache import LatestReadingCache
+from utils.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    """応答キャッシュのテスト"""
+
+    def build_counter(self, body=b'{"status": "success"}'):
+        """呼び出し回数を数える build 関数"""
+        calls = []
+
+        def build():
+            calls.append(1)
+            return body
+        return build, calls
+
+    def test_hit_until_stamp_changes(self):
+        """同じ版の間はキャッシュを返し、版が変わると作り直す"""
+        cache = ResponseCache(max_entries=8, max_bytes=1 << 20, ttl=60)
+        build, calls = self.build_counter()
+
+        first = cache.get_or_build('k', (0, 1), build)
+        second = cache.get_or_build('k', (0, 1), build)
+        self.assertIs(first, second)
+        self.assertEqual(len(calls), 1)
+
+        cache.get_or_build('k', (0, 2), build)
+        self.assertEqual(len(calls), 2)
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['invalidations']), (1, 2, 1))
+
+    def test_ttl_expiry(self):
+        """有効期間を過ぎたエントリは作り直す"""
+        cache = ResponseCache(max_entries=8, max_bytes=1 << 20, ttl=0.01)
+        build, calls = self.build_counter()
+        cache.get_or_build('k', 0, build)
+        time.sleep(0.02)
+        cache.get_or_build('k', 0, build)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.get_stats()['expirations'], 1)
+
+    def test_lru_eviction_by_entries_and_bytes(self):
+        """上限を超えると最も長く使われていないエントリから削除する"""
+        cache = ResponseCache(max_entries=2, max_bytes=1 << 20, ttl=60)
+        build, calls = self.build_counter()
+        cache.get_or_build('a', 0, build)
+        cache.get_or_build('b', 0, build)
+        cache.get_or_build('a', 0, build)
+        cache.get_or_build('c', 0, build)  # b を削除
+        cache.get_or_build('a', 0, build)
+        self.assertEqual(len(calls), 3)
+        cache.get_or_build('b', 0, build)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(cache.get_stats()['evictions'], 2)
+
+        small = ResponseCache(max_entries=8, max_bytes=250, ttl=60)
+        for key in 'abc':
+            small.get_or_build(key, 0, lambda: b'x' * 100)
+        stats = small.get_stats()
+        self.assertEqual((stats['entries'], stats['bytes'], stats['evictions']), (2, 200, 1))
+
+    def test_uncacheable_result(self):
+        """build() が None を返した場合はキャッシュしない"""
+        cache = ResponseCache(max_entries=8, max_bytes=1 << 20, ttl=60)
+        self.assertIsNone(cache.get_or_build('k', 0, lambda: None))
+        self.assertEqual(cache.get_stats()['entries'], 0)
+
+    def test_concurrent_requests_build_once(self):
+        """同じキーを同時に要求しても作成は1回"""
+        cache = ResponseCache(max_entries=8, max_bytes=1 << 20, ttl=60)
+        calls = []
+        release = threading.Event()
+
+        def build():
+            calls.append(1)
+            release.wait(5)
+            return b'{}'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_build('k', 0, build)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is results[0] for result in results))
+
+
+class TestSensorStamp(unittest.TestCase):
+    """センサーごとのデータの版のテスト"""
+
+    def test_stamp_changes_only_for_updated_sensors(self):
+        """更新されたセンサーの版だけが変わり、無効化では全センサーの版が変わる"""
+        cache = LatestReadingCache()
+        cache._loaded = True
+        stamp_a = cache.sensor_stamp(['A'])
+        stamp_b = cache.sensor_stamp(['B'])
+
+        cache.update([{'sensor_id': 'A', 'ts': 1}])
+        self.assertNotEqual(cache.sensor_stamp(['A']), stamp_a)
+        self.assertEqual(cache.sensor_stamp(['B']), stamp_b)
+
+        stamp_b = cache.sensor_stamp(['B'])
+        cache.invalidate()
+        self.assertNotEqual(cache.sensor_stamp(['B']), stamp_b)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+"""
+シリアル受信（行分割・パイプライン）のユニットテスト
+"""
+
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.models import init_database
+from database.queries import TemperatureQueries
+from services.ingest_queue import ingest_queue
+from services.serial_frames import encode_frame, decode_payload, SENSOR_DATA
+from services.serial_reader import LineAssembler, SerialReader
+from services.serial_gateway import SerialGatewayManager
+
+
+class TestLineAssembler(unittest.TestCase):
+    """行分割のテスト"""
+
+    def test_lines_split_across_reads(self):
+        """複数回の受信にまたがる行を結合する"""
+        assembler = LineAssembler()
+        self.assertEqual(assembler.feed(b'{"device_id":'), [])
+        self.assertEqual(assembler.feed(b'"A"}\r\n{"dev'), ['{"device_id":"A"}'])
+        self.assertEqual(assembler.feed(b'ice_id":"B"}\n\n'), ['{"device_id":"B"}'])
+        self.assertEqual(assembler.stats['lines'], 2)
+
+    def test_many_lines_in_one_read(self):
+        """1回の受信に含まれる複数行をすべて返す"""
+        assembler = LineAssembler()
+        data = b''.join(f'line{i}\n'.encode() for i in range(100))
+        lines = assembler.feed(data)
+        self.assertEqual(len(lines), 100)
+        self.assertEqual(lines[-1], 'line99')
+
+    def test_overlong_line_is_dropped(self):
+        """上限を超えた行は次の改行まで破棄する"""
+        assembler = LineAssembler(max_line_length=8)
+        self.assertEqual(assembler.feed(b'0123456789'), [])
+        self.assertEqual(assembler.feed(b'abcdef\nok\n'), ['ok'])
+        self.assertEqual(assembler.feed(b'0123456789\nok2\n'), ['ok2'])
+        self.assertEqual(assembler.stats['overflow'], 2)
+
+    def test_invalid_utf8_line_is_skipped(self):
+        """不正なUTF-8の行だけをスキップする"""
+        assembler = LineAssembler()
+        self.assertEqual(assembler.feed(b'\xff\xfe\nvalid\n'), ['valid'])
+        self.assertEqual(assembler.stats['decode_errors'], 1)
+
+
+class TestBinaryFrames(unittest.TestCase):
+    """バイナリフレームのテスト"""
+
+    SENSORS = [
+        {'sensor_id': 'ESP32_PROT_01', 'sensor_name': 'DS18B20-01', 'temp': 22.5,
+         'humidity': None, 'rssi': -45, 'timestamp': 1000},
+        {'sensor_id': 'ESP8266_PROT_03', 'sensor_name': 'DHT22-03', 'temp': 21.75,
+         'humidity': 48.25, 'rssi': -58, 'timestamp': 2000},
+    ]
+
+    def test_struct_matches_sensor_data(self):
+        """SensorData 構造体（ESP32 のアライメント込み）と同じ64バイト"""
+        self.assertEqual(SENSOR_DATA.size, 64)
+
+    def test_frame_round_trip(self):
+        """エンコードしたフレームを JSON と同じ構造に復元する"""
+        frame = encode_frame('ESP32_MAIN', self.SENSORS)
+        payloads = LineAssembler().feed(frame)
+        self.assertEqual(len(payloads), 1)
+        data = decode_payload(payloads[0])
+        self.assertEqual(data['device_id'], 'ESP32_MAIN')
+        self.assertEqual(data['sensors'], self.SENSORS)
+
+    def test_mixed_json_and_binary_split_across_reads(self):
+        """JSON 行とバイナリフレームをフレームごとに判別する"""
+        stream = b'{"status":"started"}\n' + encode_frame('ESP32_MAIN', self.SENSORS) + b'{"a":1}\n'
+        assembler = LineAssembler()
+        items = []
+        for i in range(0, len(stream), 7):
+            items.extend(assembler.feed(stream[i:i + 7]))
+        self.assertEqual(items[0], '{"status":"started"}')
+        self.assertIsInstance(items[1], bytes)
+        self.assertEqual(items[2], '{"a":1}')
+        self.assertEqual(assembler.stats['binary_frames'], 1)
+
+    def test_corrupted_frame_is_skipped(self):
+        """CRC が一致しないフレームは破棄し、次のフレームから再同期する"""
+        good = encode_frame('ESP32_MAIN', self.SENSORS[:1])
+        bad = bytearray(good)
+        bad[30] ^= 0xFF
+        items = LineAssembler().feed(bytes(bad) + good)
+        self.assertEqual(len(items), 1)
+        self.assertEqual(decode_payload(items[0])['sensors'][0]['sensor_id'], 'ESP32_PROT_01')
+
+
+class TestSerialPipeline(unittest.TestCase):
+    """受信 → パース → 書き込みキューのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        init_database()
+
+    def test_full_parse_queue_drops_lines(self):
+        """パースキューが満杯の場合は行を破棄して数える（ブロックしない）"""
+        reader = SerialReader(port='/dev/null', parse_queue_size=2)
+        self.assertTrue(reader.submit_line('a'))
+        self.assertTrue(reader.submit_line('b'))
+        self.assertFalse(reader.submit_line('c'))
+        self.assertEqual(reader.get_stats()['dropped'], 1)
+        self.assertEqual(reader.get_stats()['parse_queue_depth'], 2)
+
+    def test_frame_is_validated_and_written_together(self):
+        """フレーム内の不正なセンサーだけを除外し、残りを同じバッチでコミットする"""
+        reader = SerialReader(port='/dev/null')
+        frame = {
+            'device_id': 'TEST_GATEWAY',
+            'sensors': [
+                {'sensor_id': 'TEST_SERIAL_01', 'temp': 0.0, 'humidity': 40.0},
+                {'sensor_id': 'TEST_SERIAL_02', 'temp': 21.5},
+                {'sensor_id': 'TEST_SERIAL_03', 'temp': 150.0},
+            ]
+        }
+        reader._process_line(json.dumps(frame))
+        self.assertTrue(ingest_queue.flush())
+
+        stats = reader.get_stats()
+        self.assertEqual(stats['frames'], 1)
+        self.assertEqual(stats['readings'], 2)
+        self.assertEqual(stats['invalid'], 1)
+        self.assertEqual(ingest_queue.stats['last_batch_size'], 2)
+
+        latest = TemperatureQueries.get_latest_reading('TEST_SERIAL_01')
+        self.assertEqual(latest['temperature'], 0.0)
+        self.assertIsNone(TemperatureQueries.get_latest_reading('TEST_SERIAL_03'))
+
+    def test_binary_frame_rejects_non_finite(self):
+        """float32 の NaN・inf の温度・湿度は除外し、同じフレームの他のセンサーは書き込む（湿度の NaN は「なし」）"""
+        reader = SerialReader(port='/dev/null')
+        # sensor_id はフレーム内で最大15バイト
+        prefix = f"TN{time.time_ns() % 10**9}"
+        frame = encode_frame('TEST_GATEWAY', [
+            {'sensor_id': f"{prefix}_A", 'sensor_name': 'NaN', 'temp': float('nan'),
+             'humidity': None, 'rssi': -50, 'timestamp': 1000},
+            {'sensor_id': f"{prefix}_B", 'sensor_name': 'inf', 'temp': 22.5,
+             'humidity': float('inf'), 'rssi': -50, 'timestamp': 1000},
+            {'sensor_id': f"{prefix}_C", 'sensor_name': 'OK', 'temp': 23.0,
+             'humidity': None, 'rssi': -50, 'timestamp': 1000},
+        ])
+        reader._process_binary_frame(LineAssembler().feed(frame)[0])
+        self.assertTrue(ingest_queue.flush())
+
+        self.assertEqual(reader.get_stats()['invalid'], 2)
+        self.assertIsNone(TemperatureQueries.get_latest_reading(f"{prefix}_A"))
+        self.assertIsNone(TemperatureQueries.get_latest_reading(f"{prefix}_B"))
+        self.assertEqual(TemperatureQueries.get_latest_reading(f"{prefix}_C")['temperature'], 23.0)
+
+
+class TestSerialGatewayManager(unittest.TestCase):
+    """複数ポートの管理（疑似端末をゲートウェイとして使用）"""
+
+    def test_reader_per_port_and_hotplug(self):
+        """ポートごとに受信し、抜かれたポートは停止する"""
+        ptys = [os.openpty() for _ in range(2)]
+        ports = [os.ttyname(slave) for _, slave in ptys]
+        manager = SerialGatewayManager(ports=ports + ['/dev/nonexistent_tty'], timeout=0.1)
+        try:
+            manager.scan()
+            self.assertEqual(manager.get_connected_ports(), sorted(ports))
+
+            for i, (master, _) in enumerate(ptys):
+                frame = {'device_id': f'TEST_GW_{i}', 'sensors': [{'sensor_id': f'TEST_GW_SENSOR_{i}', 'temp': 20.0 + i}]}
+                os.write(master, (json.dumps(frame) + '\n').encode())
+
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                status = manager.get_status()['ports']
+                if all(p['stats']['readings'] == 1 for p in status):
+                    break
+                time.sleep(0.05)
+            self.assertTrue(all(p['stats']['readings'] == 1 for p in manager.get_status()['ports']))
+
+            # 1台目を「抜く」
+            manager.ports = ports[1:]
+            manager.scan()
+            self.assertEqual(manager.get_connected_ports(), ports[1:])
+        finally:
+            manager.stop()
+            for master, slave in ptys:
+                os.close(master)
+                os.close(slave)
+
+    def test_reconnect_backoff(self):
+        """接続に失敗したポートは指数バックオフで再試行する"""
+        with tempfile.NamedTemporaryFile() as not_a_tty:
+            manager = SerialGatewayManager(ports=[not_a_tty.name], reconnect_initial=1.0, reconnect_max=3.0)
+            manager.scan()
+            status = manager.get_status()['ports'][0]
+            self.assertFalse(status['connected'])
+            self.assertEqual(status['failures'], 1)
+            self.assertIsNotNone(status['last_error'])
+
+            # 待ち時間中は再試行しない
+            manager.scan()
+            self.assertEqual(manager.get_status()['ports'][0]['failures'], 1)
+
+            gateway = manager._gateways[not_a_tty.name]
+            for expected_delay in (2.0, 3.0, 3.0):
+                gateway.next_attempt = 0.0
+                manager.scan()
+                self.assertAlmostEqual(gateway.next_attempt - time.monotonic(), expected_delay, delta=0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
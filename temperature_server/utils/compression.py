@@ -0,0 +1,186 @@
+"""
+レスポンスの圧縮（flask_compress の置き換え）
+
+- Accept-Encoding から zstd / br / gzip を選ぶ（q 値が同じ場合は COMPRESS_ALGORITHMS の順）
+- ETag のあるレスポンスは圧縮済みのボディを (ETag, 圧縮方式) ごとにキャッシュし、
+  同じデータを複数のクライアントに返すときに圧縮し直さない
+- COMPRESS_MIN_SIZE より小さいボディ・ストリーミング・圧縮済みのレスポンスは圧縮しない
+- 取り込み（ESP32 の POST）のように応答が小さく件数の多いエンドポイントは
+  @skip_compression で圧縮処理自体を省く
+- ストリーミングのレスポンス（エクスポート）は iter_gzip() で少しずつ圧縮する
+- brotli・zstandard はオプション（インストールされていない方式は使わない）
+"""
+
+import gzip
+import zlib
+from flask import request, current_app
+from config import Config
+from utils.response_cache import ResponseCache
+
+# brotli・zstandard はオプション（インストールされていなくても gzip で動作する）
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 圧縮するレスポンスの MIME タイプ
+COMPRESSIBLE_MIMETYPES = frozenset((
+    'application/json', 'application/x-ndjson', 'text/csv',
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'application/javascript',
+))
+
+
+def _compress_gzip(body):
+    """gzip で圧縮"""
+    # mtime を固定して同じ入力から同じ出力にする
+    return gzip.compress(body, compresslevel=Config.COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def _compress_br(body):
+    """Brotli で圧縮"""
+    return brotli.compress(body, quality=Config.COMPRESS_BR_LEVEL)
+
+
+def _compress_zstd(body):
+    """Zstandard で圧縮"""
+    # ZstdCompressor は同時に複数スレッドから使えないため呼び出しごとに作る
+    return zstandard.ZstdCompressor(level=Config.COMPRESS_ZSTD_LEVEL).compress(body)
+
+
+# 利用できる圧縮方式
+CODECS = {'gzip': _compress_gzip}
+if brotli is not None:
+    CODECS['br'] = _compress_br
+if zstandard is not None:
+    CODECS['zstd'] = _compress_zstd
+
+
+def available_encodings():
+    """
+    使用する圧縮方式（優先順）
+
+    Returns:
+        list[str]: COMPRESS_ALGORITHMS のうちインストールされているもの
+    """
+    names = [name.strip() for name in Config.COMPRESS_ALGORITHMS.split(',')]
+    return [name for name in names if name in CODECS]
+
+
+def compress(body, encoding):
+    """
+    ボディを圧縮
+
+    Args:
+        body (bytes): 圧縮前のボディ
+        encoding (str): 圧縮方式（zstd / br / gzip）
+
+    Returns:
+        bytes: 圧縮後のボディ
+    """
+    return CODECS[encoding](body)
+
+
+def iter_gzip(chunks, level=None):
+    """
+    バイト列のチャンクを少しずつ gzip 圧縮して返すジェネレータ（全体を保持しない）
+
+    Args:
+        chunks: 圧縮前のバイト列のイテラブル
+        level (int): 圧縮レベル（None の場合は COMPRESS_GZIP_LEVEL）
+
+    Yields:
+        bytes: 圧縮後のデータ
+    """
+    # wbits=31: gzip 形式（ヘッダー・CRC 付き）
+    compressor = zlib.compressobj(Config.COMPRESS_GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # 途中で切断された場合も元のジェネレータ（DB の接続など）を閉じる
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def skip_compression(view):
+    """圧縮処理を省くビューに付けるデコレータ（@api_bp.route の下に付ける）"""
+    view.skip_compression = True
+    return view
+
+
+class ResponseCompressor:
+    """レスポンスを圧縮する after_request フック"""
+
+    def __init__(self, encodings, min_size, cache):
+        """
+        Args:
+            encodings (list[str]): 使用する圧縮方式（優先順）
+            min_size (int): これより小さいボディは圧縮しない（バイト）
+            cache (ResponseCache): 圧縮済みボディのキャッシュ
+        """
+        self.encodings = encodings
+        self.min_size = min_size
+        self.cache = cache
+
+    def __call__(self, response):
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, 'skip_compression', False):
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.status_code == 204
+                or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers):
+            return response
+        if response.content_length is not None and response.content_length < self.min_size:
+            return response
+
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        etag = response.headers.get('ETag')
+        if etag and etag.endswith('"'):
+            # 同じ ETag のボディは同じ内容のため、圧縮済みのボディを使い回す（長さが違えば作り直す）
+            entry = self.cache.get_or_build((etag, encoding), len(body), lambda: compress(body, encoding))
+            data = entry.body
+            response.headers['ETag'] = f'{etag[:-1]}:{encoding}"'
+        else:
+            data = compress(body, encoding)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+# 圧縮済みボディのキャッシュ（ETag ごと）
+compressed_cache = ResponseCache(
+    Config.COMPRESS_CACHE_MAX_ENTRIES,
+    Config.COMPRESS_CACHE_MAX_BYTES,
+    Config.COMPRESS_CACHE_TTL,
+)
+
+
+def init_compression(app):
+    """
+    Flask アプリにレスポンス圧縮を登録
+
+    Returns:
+        list[str]: 有効な圧縮方式（無効の場合は空）
+    """
+    encodings = available_encodings() if Config.COMPRESS_ENABLED else []
+    if encodings:
+        app.after_request(ResponseCompressor(encodings, Config.COMPRESS_MIN_SIZE, compressed_cache))
+    return encodings
@@ -3,6 +3,7 @@
 システムの状態を監視
 """
 
+import time
 from typing import Dict, Any, List
 from datetime import datetime
 from logger import setup_logger
@@ -96,18 +97,9 @@ class HealthChecker:
                     "sensor_count": 0
                 }
             
-            # 最新データが5分以内かチェック
-            from datetime import datetime, timedelta
-            recent_count = 0
-            for sensor in sensors:
-                timestamp_str = sensor.get('timestamp')
-                if timestamp_str:
-                    try:
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-                        if datetime.now() - timestamp < timedelta(minutes=5):
-                            recent_count += 1
-                    except:
-                        pass
+            # 最新データが5分以内かチェック（ts はエポックミリ秒）
+            recent_since = int((time.time() - 5 * 60) * 1000)
+            recent_count = sum(1 for sensor in sensors if (sensor.get('ts') or 0) >= recent_since)
             
             status = "healthy" if recent_count > 0 else "warning"
             
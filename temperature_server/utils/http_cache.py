@@ -0,0 +1,135 @@
+"""
+HTTP キャッシュ（ETag / Last-Modified / 304 Not Modified）
+
+- ETag はデータの版（latest_cache.version、取り込みのコミット・削除で進む）と
+  リクエストのパラメータ（パス・クエリ・POSTボディ）から作る
+- 条件付きリクエストの判定はビューの前に行い、一致すれば SQL を発行せずに 304 を返す
+- 期間指定（直近 N 時間）のデータは新着がなくても時間とともに範囲がずれるため、
+  window 秒ごとに ETag を変える
+- 版はプロセスごとのため、ETag にプロセスごとの識別子を含める
+  （別のワーカーに振り分けられた場合は 304 にならず 200 を返す）
+- Last-Modified は秒単位のため、最終変更の秒が終わるまでは切り捨てた時刻を返す
+  （同じ秒の後の書き込みを If-Modified-Since で見逃して古いデータに 304 を返さない）
+- 圧縮したレスポンスの ETag には圧縮方式が付く（"...:br"、utils/compression.py）。
+  If-None-Match の比較では圧縮方式を無視する
+"""
+
+import hashlib
+import math
+import time
+import uuid
+from functools import wraps
+from email.utils import formatdate, parsedate_to_datetime
+from flask import request, make_response
+from database.latest_cache import latest_cache
+
+# プロセスごとの識別子（再起動・別ワーカーで版の値が重複しても ETag が一致しないようにする）
+_PROCESS_TAG = uuid.uuid4().hex[:8]
+
+
+def make_etag(version, window_tick, params):
+    """
+    強い ETag を作成
+
+    Args:
+        version (int): データの版
+        window_tick (int): 時間窓の番号（期間指定のないデータは0）
+        params (bytes): リクエストのパラメータ
+
+    Returns:
+        str: 引用符付きの ETag
+    """
+    digest = hashlib.blake2b(params, digest_size=8).hexdigest()
+    return f'"{_PROCESS_TAG}-{version}-{window_tick}-{digest}"'
+
+
+def _request_params():
+    """ETag に含めるリクエストのパラメータ（パス・クエリ・ボディ）"""
+    parts = [request.path.encode(), request.query_string]
+    if request.method == 'POST':
+        parts.append(request.get_data(cache=True))
+    return b'\0'.join(parts)
+
+
+def _strip_coding(tag):
+    """ETag から圧縮方式の接尾辞（"...:gzip"）を除く"""
+    if tag.endswith('"') and ':' in tag:
+        return tag[:tag.rindex(':')] + '"'
+    return tag
+
+
+def _etag_matches(header, etag):
+    """If-None-Match に ETag が含まれるか（圧縮方式の違いは無視）"""
+    if header.strip() == '*':
+        return True
+    return any(_strip_coding(tag.strip()) == etag for tag in header.split(','))
+
+
+def _last_modified_second(last_modified, now):
+    """
+    Last-Modified ヘッダーに出す時刻（秒）
+
+    最終変更の秒が終わっていれば切り上げる（以降の書き込みはすべてこの時刻より後になる）。
+    同じ秒のうちは後の書き込みと区別できないため切り捨てる（If-Modified-Since では 304 にならない）
+    """
+    second = math.ceil(last_modified)
+    return second if second <= now else math.floor(last_modified)
+
+
+def _not_modified_since(header, last_modified):
+    """If-Modified-Since 以降に変更がないか（last_modified は秒未満を含む最終変更時刻）"""
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return False
+    return last_modified <= since
+
+
+def conditional(cache_control, window=None):
+    """
+    読み取りAPIに ETag / Last-Modified / Cache-Control を付け、条件付きリクエストに 304 を返すデコレータ
+
+    Args:
+        cache_control (str): Cache-Control ヘッダーの値
+        window (float): 期間指定のあるデータの ETag を変える間隔（秒、None の場合は版のみ）
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            # 版はビュー（SQL）より先に読む（実行中にコミットされても次回は新しい版で取り直させる）
+            version = latest_cache.version
+            last_modified = latest_cache.modified_at
+            now = time.time()
+            window_tick = 0
+            if window:
+                window_tick = int(now // window)
+                # 範囲がずれた時点も「変更」として扱う
+                last_modified = max(last_modified, window_tick * window)
+            etag = make_etag(version, window_tick, _request_params())
+
+            headers = {
+                'ETag': etag,
+                'Last-Modified': formatdate(_last_modified_second(last_modified, now), usegmt=True),
+                'Cache-Control': cache_control,
+            }
+
+            if_none_match = request.headers.get('If-None-Match')
+            if_modified_since = request.headers.get('If-Modified-Since')
+            if if_none_match is not None:
+                not_modified = _etag_matches(if_none_match, etag)
+            elif if_modified_since is not None and request.method == 'GET':
+                not_modified = _not_modified_since(if_modified_since, last_modified)
+            else:
+                not_modified = False
+
+            if not_modified:
+                response = make_response('', 304)
+                response.headers.update(headers)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.headers.update(headers)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,170 @@
+"""
+JSON のエンコード・デコード（orjson、インストールされていない場合は標準の json）
+
+- Flask の JSON プロバイダー（jsonify・request.get_json）を置き換える
+- NumPy の配列・スカラーと datetime・date はそのまま変換する（datetime は ISO 8601、NaN は null）
+- 列形式の一括取得はセンサーごとにバイト列に変換して連結する（iter_object_chunks()）。
+  全センサー分の dict とエンコード結果を同時に保持しない
+- キーは並べ替えない（Flask の既定の sort_keys は使わない）
+"""
+
+import json
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+
+# orjson はオプション（インストールされていなくても標準の json で動作する）
+try:
+    import orjson
+    orjson_available = True
+except ImportError:
+    orjson_available = False
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# orjson を使うか（JSON_ENCODER=stdlib で標準の json に切り替え）
+use_orjson = orjson_available and Config.JSON_ENCODER != 'stdlib'
+
+if orjson_available:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """orjson・標準の json がそのまま変換できない値を変換"""
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.kind == 'f':
+                # NaN は null（orjson と同じ）
+                return [None if value != value else value for value in obj.tolist()]
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            value = obj.item()
+            return None if isinstance(value, float) and value != value else value
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# json.dumps にオプションを渡すと毎回エンコーダーを作るため、使い回す
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+_stdlib_indent_encoder = json.JSONEncoder(ensure_ascii=False, indent=2, default=_default)
+
+
+def dumps_bytes(obj, indent=False):
+    """
+    UTF-8 の JSON バイト列に変換
+
+    Args:
+        obj: 変換する値
+        indent (bool): 2文字でインデントする場合True
+
+    Returns:
+        bytes
+    """
+    if use_orjson:
+        try:
+            return orjson.dumps(obj, default=_default,
+                                option=_ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+        except orjson.JSONEncodeError:
+            # 64ビットを超える整数など orjson が扱えない値は標準の json で変換
+            pass
+    encoder = _stdlib_indent_encoder if indent else _stdlib_encoder
+    return encoder.encode(obj).encode()
+
+
+def loads(data):
+    """
+    JSON を読み込む
+
+    Args:
+        data (str | bytes): JSON
+
+    Returns:
+        読み込んだ値
+    """
+    if use_orjson:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN・64ビットを超える整数など標準の json なら読める入力は従来どおり受け付ける
+            pass
+    return json.loads(data)
+
+
+def to_json_bytes(payload):
+    """レスポンスのボディに変換（エンコード済みのバイト列はそのまま）"""
+    if isinstance(payload, bytes):
+        return payload
+    return dumps_bytes(payload)
+
+
+def iter_object_chunks(head, key, pairs, tail=None):
+    """
+    JSON オブジェクトを少しずつバイト列で返す
+
+    {**head, key: {k1: v1, k2: v2, ...}, **tail()} を出力する。
+    pairs の値は1つずつ変換するため、全体の dict を作らずにエンコードできる
+
+    Args:
+        head (dict): 先頭のフィールド
+        key (str): pairs を格納するフィールド名
+        pairs: (キー, 値) の組のイテラブル
+        tail: 末尾のフィールドを返す関数（pairs をすべて出力した後に呼ぶ、件数の集計など）
+
+    Yields:
+        bytes
+    """
+    prefix = dumps_bytes(head)[:-1]
+    yield prefix + (b',' if len(prefix) > 1 else b'') + dumps_bytes(key) + b':{'
+    separator = b''
+    for name, value in pairs:
+        yield separator + dumps_bytes(name) + b':' + dumps_bytes(value)
+        separator = b','
+    fields = tail() if tail is not None else None
+    if fields:
+        yield b'},' + dumps_bytes(fields)[1:]
+    else:
+        yield b'}}'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """dumps_bytes()・loads() を使う Flask の JSON プロバイダー"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # indent などの指定がある場合は標準の json（Flask の既定と同じ動作）
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(dumps_bytes(obj, indent=indent), mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    """
+    Flask アプリの JSON プロバイダーを置き換える
+
+    Returns:
+        str: 使用するエンコーダー（orjson / json）
+    """
+    app.json = FastJSONProvider(app)
+    return 'orjson' if use_orjson else 'json'
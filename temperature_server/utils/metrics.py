@@ -0,0 +1,43 @@
+"""
+処理時間の計測ユーティリティ
+パイプラインの各段階の遅延（件数・平均・最大・直近）を集計する
+"""
+
+import threading
+
+
+class LatencyStats:
+    """処理時間の統計（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, seconds):
+        """
+        1件分の処理時間を記録
+
+        Args:
+            seconds (float): 処理時間（秒、time.monotonic() / perf_counter() の差分）
+        """
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.last_ms = elapsed_ms
+            if elapsed_ms > self.max_ms:
+                self.max_ms = elapsed_ms
+
+    def to_dict(self):
+        """統計情報を取得（ミリ秒）"""
+        with self._lock:
+            avg_ms = self.total_ms / self.count if self.count else 0.0
+            return {
+                'count': self.count,
+                'avg_ms': round(avg_ms, 3),
+                'max_ms': round(self.max_ms, 3),
+                'last_ms': round(self.last_ms, 3),
+            }
@@ -0,0 +1,126 @@
+"""
+リクエストロギング（構造化・サンプリング）
+
+- ルート（Flask のエンドポイント名）ごとに詳細度とサンプリング率を設定できる
+    off:     記録しない（5xx のみ記録）
+    summary: 1リクエスト1行（メソッド・パス・ステータス・処理時間）をサンプリングして記録
+    full:    summary に加えてクエリ文字列・ヘッダー等を記録（調査用）
+- エラー（4xx/5xx）と遅いリクエストはサンプリングに関係なく記録する
+- メッセージは %形式の引数で渡し、整形・書き込みはログの書き込みスレッド（logger.LogWriter）で行う
+"""
+
+import random
+import time
+from flask import request, g
+from logger import setup_logger
+
+request_logger = setup_logger('app.requests')
+
+VERBOSITY_LEVELS = ('off', 'summary', 'full')
+
+
+def parse_route_levels(spec):
+    """
+    ルートごとの設定を解析
+
+    形式: "エンドポイント=詳細度[:サンプリング率],..."
+    例:   "api.receive_temperature=summary:0.01,api.stream_readings=off"
+
+    Returns:
+        dict: {エンドポイント名: (詳細度, サンプリング率 or None)}
+
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    routes = {}
+    for entry in (spec or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        endpoint, _, setting = entry.partition('=')
+        level, _, rate = setting.partition(':')
+        level = level.strip() or 'summary'
+        if level not in VERBOSITY_LEVELS:
+            raise ValueError(f"Invalid request log level for {endpoint}: {level}")
+        routes[endpoint.strip()] = (level, float(rate) if rate else None)
+    return routes
+
+
+class RequestLogPolicy:
+    """ルートごとの詳細度・サンプリング率"""
+
+    def __init__(self, default_level='summary', sample_rate=1.0, slow_ms=1000.0, routes=None):
+        """
+        Args:
+            default_level (str): 設定のないルートの詳細度
+            sample_rate (float): 設定のないルートのサンプリング率（0.0〜1.0）
+            slow_ms (float): この時間を超えたリクエストは必ず記録（ミリ秒）
+            routes (dict): parse_route_levels() の結果
+        """
+        if default_level not in VERBOSITY_LEVELS:
+            raise ValueError(f"Invalid request log level: {default_level}")
+        self.default_level = default_level
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.routes = dict(routes or {})
+
+    def resolve(self, endpoint):
+        """エンドポイントの (詳細度, サンプリング率) を取得"""
+        level, rate = self.routes.get(endpoint, (self.default_level, None))
+        return level, self.sample_rate if rate is None else rate
+
+    def should_log(self, level, rate, status_code, duration_ms):
+        """このリクエストを記録するか"""
+        if status_code >= 500:
+            return True
+        if level == 'off':
+            return False
+        if status_code >= 400 or duration_ms >= self.slow_ms:
+            return True
+        return rate >= 1.0 or random.random() < rate
+
+
+def init_request_logging(app, policy):
+    """
+    アプリにリクエストロギングを登録
+
+    Args:
+        app: Flask アプリ
+        policy (RequestLogPolicy): ルートごとの設定
+    """
+
+    @app.before_request
+    def _start_request_log():
+        g._request_started = time.perf_counter()
+        level, _ = policy.resolve(request.endpoint)
+        if level == 'full':
+            request_logger.info(
+                "[REQUEST] %s %s from %s query=%r endpoint=%s headers=%r",
+                request.method, request.path, request.remote_addr,
+                request.query_string.decode(), request.endpoint, dict(request.headers)
+            )
+
+    @app.after_request
+    def _finish_request_log(response):
+        started = g.pop('_request_started', None)
+        if started is None:
+            return response
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        level, rate = policy.resolve(request.endpoint)
+        if not policy.should_log(level, rate, response.status_code, duration_ms):
+            return response
+
+        if level == 'full':
+            request_logger.info(
+                "[RESPONSE] %s %s -> %d %.1fms content_type=%s size=%s",
+                request.method, request.path, response.status_code, duration_ms,
+                response.headers.get('Content-Type'), response.content_length
+            )
+        else:
+            request_logger.info(
+                "%s %s -> %d %.1fms from %s",
+                request.method, request.path, response.status_code, duration_ms, request.remote_addr,
+                extra={'endpoint': request.endpoint, 'sample_rate': rate}
+            )
+        return response
@@ -0,0 +1,225 @@
+"""
+応答キャッシュ（シリアライズ済みレスポンスボディの LRU キャッシュ）
+
+- 同じ条件（正規化したパラメータ）の一括取得は SQL・間引き・JSON 変換を1回だけ行い、
+  以降はシリアライズ済みのボディをそのまま返す
+  （圧縮済みのボディは ETag ごとに utils/compression.py がキャッシュする）
+- エントリは対象センサーのデータの版（latest_cache.sensor_stamp()）が変わると無効になる
+- 期間指定（直近 N 時間）のデータは新着がなくても範囲がずれるため、TTL で期限切れにする
+- エントリ数・合計バイト数の上限を超えた場合は最も長く使われていないものから削除する
+- 同じキーの作成中に来たリクエストは作成の完了を待つ（同時に開いたダッシュボードでも SQL は1回）
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, jsonify
+from config import Config
+from utils.json_provider import to_json_bytes
+
+# 同じキーの作成を待つ最大時間（秒、超えた場合は自分で作成する）
+BUILD_WAIT_TIMEOUT = 30.0
+
+
+class CachedBody:
+    """キャッシュのエントリ1件分"""
+
+    __slots__ = ('body', 'stamp', 'expires_at', 'size')
+
+    def __init__(self, body, stamp, expires_at):
+        self.body = body
+        self.stamp = stamp
+        self.expires_at = expires_at
+        self.size = len(body)
+
+
+class ResponseCache:
+    """シリアライズ済みレスポンスボディの LRU キャッシュ（スレッドセーフ）"""
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        """
+        Args:
+            max_entries (int): 最大エントリ数（0 の場合はキャッシュしない）
+            max_bytes (int): ボディの合計サイズの上限（バイト）
+            ttl (float): エントリの有効期間（秒）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        """キャッシュが有効か"""
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def _remove(self, key):
+        """エントリを削除（ロック内で呼ぶ）"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _lookup(self, key, stamp):
+        """有効なエントリを取得（ロック内で呼ぶ、古いエントリは削除する）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.stamp != stamp:
+            self._remove(key)
+            self.invalidations += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, stamp, body):
+        """
+        エントリを追加（上限を超えた分は古いものから削除）
+
+        Args:
+            key: 正規化したパラメータ
+            stamp: データの版（作成前に読んだ値）
+            body (bytes): シリアライズ済みのボディ
+
+        Returns:
+            CachedBody: 追加したエントリ
+        """
+        entry = CachedBody(body, stamp, time.monotonic() + self.ttl)
+        if entry.size > self.max_bytes:
+            # 上限より大きいボディは保持しない
+            return entry
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return entry
+
+    def get_or_build(self, key, stamp, build):
+        """
+        エントリを取得し、なければ作成して追加
+
+        Args:
+            key: 正規化したパラメータ（None の場合はキャッシュしない）
+            stamp: データの版（build() を呼ぶ前に読んだ値）
+            build: ボディを作成する関数（キャッシュできない結果の場合 None を返す）
+
+        Returns:
+            CachedBody: キャッシュできない結果の場合None
+        """
+        if key is None or not self.enabled:
+            body = build()
+            return CachedBody(body, stamp, 0.0) if body is not None else None
+
+        with self._lock:
+            entry = self._lookup(key, stamp)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            pending = self._building.get(key)
+            if pending is None:
+                pending = self._building[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            # 同じキーを作成中のリクエストの完了を待つ
+            pending.wait(BUILD_WAIT_TIMEOUT)
+            with self._lock:
+                entry = self._lookup(key, stamp)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+
+        with self._lock:
+            self.misses += 1
+        try:
+            body = build()
+            if body is None:
+                return None
+            return self.put(key, stamp, body)
+        finally:
+            if owner:
+                with self._lock:
+                    self._building.pop(key, None)
+                pending.set()
+
+    def clear(self):
+        """すべてのエントリを削除"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """統計情報を取得"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_sec': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'expirations': self.expirations,
+            }
+
+
+def cached_json(key, stamp, build):
+    """
+    JSON レスポンスを応答キャッシュから返す（なければ作成してキャッシュ）
+
+    Args:
+        key: 正規化したパラメータ（None の場合はキャッシュしない）
+        stamp: データの版（SQL より先に読む、実行中にコミットされたデータは次回に反映）
+        build: (レスポンスの dict またはエンコード済みのバイト列, HTTPステータス) を返す関数
+               （200 以外はキャッシュしない）
+
+    Returns:
+        flask.Response
+    """
+    uncached = []
+
+    def render():
+        payload, status_code = build()
+        if status_code != 200:
+            response = jsonify(payload)
+            response.status_code = status_code
+            uncached.append(response)
+            return None
+        return to_json_bytes(payload)
+
+    entry = response_cache.get_or_build(key, stamp, render)
+    if entry is None:
+        return uncached[0]
+
+    return Response(entry.body, mimetype='application/json')
+
+
+# グローバルインスタンス
+response_cache = ResponseCache(
+    Config.RESPONSE_CACHE_MAX_ENTRIES if Config.RESPONSE_CACHE_ENABLED else 0,
+    Config.RESPONSE_CACHE_MAX_BYTES,
+    Config.RESPONSE_CACHE_TTL,
+)
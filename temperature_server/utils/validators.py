@@ -2,9 +2,14 @@
 バリデーション関数
 """
 
-from typing import Tuple, Optional, Dict, Any
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Tuple, Optional, Dict, Any, List
 from utils.exceptions import ValidationException, SensorException
 
+# デバイスのタイムスタンプにタイムゾーンがない場合は JST とみなす
+JST = timezone(timedelta(hours=9))
+
 
 def validate_sensor_id(sensor_id: Any) -> Tuple[bool, Optional[str]]:
     """
@@ -43,6 +48,10 @@ def validate_temperature(temperature: Any) -> Tuple[bool, Optional[str]]:
     except (ValueError, TypeError):
         return False, "温度値は数値である必要があります"
     
+    # NaN は範囲の比較がすべて False になるため先に除外（float32 のバイナリフレームで発生しうる）
+    if not math.isfinite(temp_float):
+        return False, f"温度値が有限の数値ではありません: {temp_float}"
+    
     # 合理的な範囲チェック（-50°C ～ 100°C）
     if temp_float < -50 or temp_float > 100:
         return False, f"温度値が範囲外です（-50°C ～ 100°C）: {temp_float}°C"
@@ -65,6 +74,9 @@ def validate_humidity(humidity: Any) -> Tuple[bool, Optional[str]]:
     except (ValueError, TypeError):
         return False, "湿度値は数値である必要があります"
     
+    if not math.isfinite(hum_float):
+        return False, f"湿度値が有限の数値ではありません: {hum_float}"
+    
     if hum_float < 0 or hum_float > 100:
         return False, f"湿度値が範囲外です（0% ～ 100%）: {hum_float}%"
     
@@ -167,3 +179,186 @@ def validate_sensor_ids(sensor_ids: Any) -> Tuple[bool, Optional[str], Optional[
     
     return True, None, validated_ids
 
+
+
+def validate_timestamp(
+    timestamp: Any,
+    age: Any = None,
+    now: Optional[datetime] = None,
+    max_skew_sec: float = 300,
+    max_age_days: float = 30
+) -> Tuple[bool, Optional[str], Optional[datetime]]:
+    """
+    デバイス側のタイムスタンプをバリデーション
+    
+    - timestamp: エポック秒（1e11 を超える場合はエポックミリ秒）または ISO 8601 文字列
+      （タイムゾーンがない場合は JST）
+    - age: 送信時点から何秒前の測定か（RTC を持たないデバイス用、timestamp より優先度は低い）
+    - どちらもない場合は受信時刻（now）
+    
+    Returns:
+        (is_valid, error_message, aware な datetime)
+    """
+    now = now or datetime.now(JST)
+    
+    if timestamp is not None:
+        if isinstance(timestamp, bool):
+            return False, "タイムスタンプの形式が不正です", None
+        if isinstance(timestamp, (int, float)):
+            seconds = timestamp / 1000 if timestamp > 1e11 else timestamp
+            try:
+                dt = datetime.fromtimestamp(seconds, JST)
+            except (OverflowError, OSError, ValueError):
+                return False, "タイムスタンプが範囲外です", None
+        elif isinstance(timestamp, str):
+            try:
+                dt = datetime.fromisoformat(timestamp.strip())
+            except ValueError:
+                return False, f"タイムスタンプの形式が不正です: {timestamp}", None
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=JST)
+        else:
+            return False, "タイムスタンプの形式が不正です", None
+    elif age is not None:
+        try:
+            age_sec = float(age)
+        except (ValueError, TypeError):
+            return False, "age は数値（秒）である必要があります", None
+        if age_sec < 0:
+            return False, "age は0以上である必要があります", None
+        dt = now - timedelta(seconds=age_sec)
+    else:
+        return True, None, now
+    
+    if dt - now > timedelta(seconds=max_skew_sec):
+        return False, f"タイムスタンプが未来の時刻です: {dt.isoformat()}", None
+    if now - dt > timedelta(days=max_age_days):
+        return False, f"タイムスタンプが古すぎます（最大{max_age_days:g}日前）: {dt.isoformat()}", None
+    
+    return True, None, dt.astimezone(JST)
+
+
+def validate_export_range(
+    start: Any = None,
+    end: Any = None,
+    hours: Any = None,
+    now: Optional[datetime] = None,
+    default_hours: float = 720
+) -> Tuple[bool, Optional[str], Optional[Tuple[int, Optional[int]]]]:
+    """
+    エクスポートの期間をバリデーション
+
+    - start / end: エポック秒（1e11 を超える場合はエポックミリ秒）または ISO 8601 文字列
+      （タイムゾーンがない場合は JST、クエリパラメータの数字の文字列も可）
+    - start がない場合は hours（時間、デフォルト default_hours）前から。end がない場合は最新まで
+    - 長期間の取り出しが目的のため、期間の上限は設けない
+
+    Returns:
+        (is_valid, error_message, (since_ms, until_ms または None))
+    """
+    def to_ms(name, value):
+        if isinstance(value, str):
+            text = value.strip()
+            try:
+                value = float(text)
+            except ValueError:
+                try:
+                    dt = datetime.fromisoformat(text)
+                except ValueError:
+                    raise ValueError(f"{name} の形式が不正です: {text}")
+                if dt.tzinfo is None:
+                    dt = dt.replace(tzinfo=JST)
+                return int(dt.timestamp() * 1000)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+            raise ValueError(f"{name} の形式が不正です")
+        return int(value if value > 1e11 else value * 1000)
+
+    try:
+        until_ms = to_ms('end', end) if end not in (None, '') else None
+        if start not in (None, ''):
+            since_ms = to_ms('start', start)
+        else:
+            try:
+                hours_float = float(default_hours if hours in (None, '') else hours)
+            except (ValueError, TypeError):
+                return False, "時間範囲は数値である必要があります", None
+            if not hours_float > 0:
+                return False, "時間範囲は0より大きい必要があります", None
+            now = now or datetime.now(JST)
+            since_ms = int(now.timestamp() * 1000 - hours_float * 3600 * 1000)
+    except (ValueError, OverflowError) as e:
+        return False, str(e), None
+
+    if until_ms is not None and until_ms <= since_ms:
+        return False, "end は start より後の時刻である必要があります", None
+
+    return True, None, (since_ms, until_ms)
+
+
+def validate_readings_batch(
+    items: List[Any],
+    defaults: Optional[Dict[str, Any]] = None,
+    now: Optional[datetime] = None,
+    max_skew_sec: float = 300,
+    max_age_days: float = 30
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, str]]]:
+    """
+    複数の温度データをまとめてバリデーション（1回の走査）
+    
+    各要素は validate_temperature_request() と同じキーに加えて
+    timestamp / age（validate_timestamp() 参照）を受け付ける。
+    受信時刻 now は全要素で共通。
+    
+    Args:
+        items: 温度データ（dict）のリスト
+        defaults: 各要素に欠けているキーの既定値（device_id, name, battery_mode 等）
+    
+    Returns:
+        (validated, errors)
+        validated: (インデックス, バリデーション済みデータ) のリスト
+        errors: (インデックス, エラーメッセージ) のリスト
+    """
+    now = now or datetime.now(JST)
+    defaults = defaults or {}
+    validated = []
+    errors = []
+    
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append((index, "要素はオブジェクトである必要があります"))
+            continue
+        if defaults:
+            item = {**defaults, **item}
+        
+        sensor_id = item.get('device_id') or item.get('sensor_id')
+        temperature = item.get('temperature', item.get('temp'))
+        humidity = item.get('humidity')
+        
+        error_msg = None
+        for is_valid, message in (
+            validate_sensor_id(sensor_id),
+            validate_temperature(temperature),
+            validate_humidity(humidity),
+        ):
+            if not is_valid:
+                error_msg = message
+                break
+        if error_msg is None:
+            is_valid, error_msg, measured_at = validate_timestamp(
+                item.get('timestamp'), item.get('age'), now, max_skew_sec, max_age_days
+            )
+        if error_msg is not None:
+            errors.append((index, error_msg))
+            continue
+        
+        validated.append((index, {
+            'sensor_id': sensor_id,
+            'temperature': float(temperature),
+            'sensor_name': item.get('name') or item.get('sensor_name', 'Unknown'),
+            'humidity': float(humidity) if humidity is not None else None,
+            'rssi': item.get('rssi'),
+            'battery_mode': bool(item.get('battery_mode', False)),
+            'timestamp': measured_at,
+        }))
+    
+    return validated, errors
@@ -0,0 +1,24 @@
+"""
+temperature_server/wsgi.py
+本番用 WSGI エントリーポイント（gunicorn）
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+各ワーカーがこのモジュールを読み込んでアプリを作成する（preload しない、ワーカー間で共有する状態なし）。
+データベースの初期化・シリアル受信等の起動は gunicorn.conf.py のフックで行う。
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# 環境変数設定
+os.environ.setdefault('FLASK_ENV', 'production')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app
+
+app = create_app()
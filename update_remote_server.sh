@@ -44,7 +44,7 @@ echo "=========================================="
 echo "完了"
 echo "=========================================="
 echo ""
-echo "ログを確認: ssh $REMOTE_HOST 'tail -f $REMOTE_DIR/logs/app.routes.api.log'"
+echo "ログを確認: ssh $REMOTE_HOST 'tail -f $REMOTE_DIR/logs/server.jsonl | grep --line-buffered app.routes.api'"
 
 
 
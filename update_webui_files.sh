@@ -69,6 +69,6 @@ echo ""
 echo "次のステップ:"
 echo "1. サーバーを再起動（必要に応じて）"
 echo "2. ブラウザで http://192.168.1.93:5000 にアクセスして動作確認"
-echo "3. ログを確認: ssh $REMOTE_HOST 'tail -f $REMOTE_DIR/logs/app.routes.api.log'"
+echo "3. ログを確認: ssh $REMOTE_HOST 'tail -f $REMOTE_DIR/logs/server.jsonl | grep --line-buffered app.routes.api'"
 echo ""
 